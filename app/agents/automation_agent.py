@@ -2,20 +2,39 @@
 
 from __future__ import annotations
 import os
+import re
 import shutil
 import subprocess
 import tempfile
-from textwrap import dedent
-from typing import Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
+
+from app.core import deadline
+from app.core.correlation import extract_entities
+from app.agents import bundle, lint_batch
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.script_syntax import Diagnostic, check_bash, check_powershell, errors_only
+
+# Also run `bash -n` / the PowerShell parser after the in-process check
+LINT_STRICT = os.getenv("LINT_STRICT", "0").lower() in ("1", "true", "yes")
+
+# Entities that name an OS build rather than a host (win2019, ws2022, rhel8)
+_OS_TOKEN = re.compile(r"^(?:win|ws|windows|rhel|el|centos|ubuntu|debian)\d+$")
+_NAMED_HOST = re.compile(r"\b(?:on|host)\s+([\w.-]+)")   # "on web01", "host vm-node1"
+_INTERVAL = re.compile(r"\bevery\s+(\d{1,4})\s*(s|sec|secs|seconds?|m|min|mins|minutes?)\b")
 
 
 class AutomationAgent:
     """
     Generates remediation scripts and performs a best-effort syntax check (lint).
 
+    Scripts come from the template library (app.agents.script_templates),
+    keyed by the diagnosis signature and parameterized from the request.
+
     Linting strategy:
-      - Bash: use `bash -n` when available (syntax check only, no execution).
-      - PowerShell: use the built-in parser (no execution) via PSParser.Tokenize.
+      - Default: in-process syntax check (app.agents.script_syntax), no
+        subprocess; failures carry "line L, column C: message" diagnostics.
+      - Strict mode (LINT_STRICT=1 or strict=True): additionally run `bash -n`
+        or the PowerShell parser (PSParser.Tokenize) when installed.
       - If interpreters are unavailable, degrade gracefully and DO NOT crash the flow.
 
     Returns (bool, Optional[str]) for lints: (passed, error_text_or_None).
@@ -25,7 +44,9 @@ class AutomationAgent:
     # Public surface for tests
     # ---------------------------
     @staticmethod
-    def lint_script(code: str, language_guess: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    def lint_script(
+        code: str, language_guess: Optional[str] = None, strict: Optional[bool] = None
+    ) -> Tuple[bool, Optional[str]]:
         """
         Lint a snippet of Bash or PowerShell without executing it.
         If language is not provided, make a lightweight guess.
@@ -33,56 +54,52 @@ class AutomationAgent:
         lang = (language_guess or AutomationAgent._guess_language(code)).lower()
 
         if lang in ("bash", "sh"):
-            ok, msg = AutomationAgent._lint_bash(code)
+            ok, msg = AutomationAgent._lint_bash(code, strict)
             return ok, (None if ok else msg)
 
         if lang in ("powershell", "ps", "pwsh"):
-            ok, msg = AutomationAgent._lint_powershell(code)
+            ok, msg = AutomationAgent._lint_powershell(code, strict)
             return ok, (None if ok else msg)
 
         # Unknown language -> don't fail tests; attempt Bash first, then PS
-        ok, msg = AutomationAgent._lint_bash(code)
+        ok, msg = AutomationAgent._lint_bash(code, strict)
         if ok:
             return True, None
-        ok2, msg2 = AutomationAgent._lint_powershell(code)
+        ok2, msg2 = AutomationAgent._lint_powershell(code, strict)
         return (ok2, None if ok2 else (msg or msg2 or "Unknown language and no linter available."))
 
+    @staticmethod
+    def lint_many(
+        scripts: Sequence[str],
+        language_guess: Optional[str] = None,
+        strict: Optional[bool] = None,
+    ) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Lint a batch of snippets; returns lint_script-style (passed, error)
+        tuples in input order. Large batches are checked on a process pool;
+        in strict mode the interpreters are launched once per language for
+        the whole batch, not once per script.
+        """
+        languages = [language_guess or AutomationAgent._guess_language(code) for code in scripts]
+        return lint_batch.lint_many(list(scripts), languages, AutomationAgent._strict(strict))
+
     # ---------------------------
     # Used by your coordinator
     # ---------------------------
     @staticmethod
-    def generate_and_lint(user_request: str) -> dict:
+    def generate_and_lint(user_request: str, diagnosis: Optional[dict] = None) -> dict:
         """
-        Generate a conservative PowerShell perf collector and lint it.
-        (Safe: parsing only, no execution.)
+        Render the remediation template for the request's diagnosis signature
+        (host, interval etc. taken from the request). Templates are linted once
+        when the library loads; the per-request render is a safe substitution
+        and reuses that lint result. (Safe: parsing only, no execution.)
+        Without `diagnosis` the request is only scored: past resolutions do
+        not change the signature.
         """
-        code = dedent(r"""
-            New-Item -ItemType Directory -Path C:\logs -Force | Out-Null
-            $setName = 'Processor'
-            try {
-                $null = (Get-Counter -ListSet $setName -ErrorAction Stop)
-            } catch {
-                Write-Host "Perf counter set not found: $setName"
-            }
-            $counters = @("\Processor(_Total)\% Processor Time", "\Process(wsappx)\% Processor Time")
-            $logName = "PerfLog"
-            $outDir = "C:\logs\perf-$env:COMPUTERNAME"
-            try { logman stop $logName -ets 2>$null } catch {}
-            try { logman delete $logName 2>$null } catch {}
-            logman create counter $logName -f csv -o $outDir -si 00:00:15 -v mmddhhmm -c $counters -max 200 -cnf 01:00:00
-            logman start $logName
-        """).strip()
-
-        lint_ok, lint_err = AutomationAgent._lint_powershell(code)
-
-        # Keep both keys for backward-compat with any existing consumers
-        return {
-            "language": "powershell",
-            "code": code,
-            "lint_passed": lint_ok,
-            "lint_error": None if lint_ok else lint_err,
-            "lint_output": "OK" if lint_ok else (lint_err or "lint failed"),
-        }
+        diagnosis = diagnosis or DiagnosticAgent.score(user_request)
+        signature = diagnosis.get("signature") or "unknown"
+        params, language = AutomationAgent._request_params(user_request)
+        return bundle.template_library().render(signature, params, language)
 
     @staticmethod
     def run(request_text: str) -> dict:
@@ -94,6 +111,29 @@ class AutomationAgent:
     # ---------------------------
     # Internals
     # ---------------------------
+    @staticmethod
+    def _request_params(text: str) -> Tuple[dict, Optional[str]]:
+        """Template parameters and preferred language mentioned in a request."""
+        t = (text or "").lower()
+        params: dict = {}
+        # in order of appearance; the one named after "on"/"host" wins
+        hosts = sorted((e for e in extract_entities(t) if not _OS_TOKEN.match(e)), key=t.find)
+        named = [h for h in (m.rstrip(".") for m in _NAMED_HOST.findall(t)) if h in hosts]
+        if hosts:
+            params["host"] = (named or hosts)[0]
+        m = _INTERVAL.search(t)
+        if m:
+            seconds = int(m.group(1)) * (60 if m.group(2).startswith("m") else 1)
+            params["interval"] = min(max(seconds, 1), 3600)
+
+        if "powershell" in t or "windows" in t:
+            language = "powershell"
+        elif any(w in t for w in ("bash", "linux", "shell script")):
+            language = "bash"
+        else:
+            language = None
+        return params, language
+
     @staticmethod
     def _guess_language(code: str) -> str:
         c = (code or "").strip().lower()
@@ -112,17 +152,28 @@ class AutomationAgent:
         return "bash"
 
     @staticmethod
-    def _lint_bash(code: str) -> Tuple[bool, str]:
+    def _strict(strict: Optional[bool]) -> bool:
+        return LINT_STRICT if strict is None else strict
+
+    @staticmethod
+    def _format_diagnostics(diagnostics: List[Diagnostic]) -> str:
+        return "\n".join(str(d) for d in diagnostics)
+
+    @staticmethod
+    def _lint_bash(code: str, strict: Optional[bool] = None) -> Tuple[bool, str]:
         """
-        Lint bash by writing to a temp file and running `bash -n <file>`.
-        If bash isn't available, fall back to a minimal static check so tests can pass on Windows.
+        Lint bash with the in-process checker. In strict mode, confirm with
+        `bash -n <file>` when bash is installed.
         """
+        errors = errors_only(check_bash(code))
+        if errors:
+            return False, AutomationAgent._format_diagnostics(errors)
+        if not AutomationAgent._strict(strict):
+            return True, "OK"
+
         bash = shutil.which("bash")
         if not bash:
-            # Minimal heuristic fallback (balanced quotes/brackets) so CI without bash doesn't fail hard.
-            if AutomationAgent._simple_balance_check(code):
-                return True, "OK (bash not found; heuristic passed)"
-            return False, "bash not found and heuristic balance check failed"
+            return True, "OK (bash not found; in-process check passed)"
 
         path = None
         try:
@@ -130,7 +181,9 @@ class AutomationAgent:
                 f.write(code)
                 path = f.name
 
-            proc = subprocess.run([bash, "-n", path], capture_output=True, text=True, timeout=30)
+            proc = subprocess.run(
+                [bash, "-n", path], capture_output=True, text=True, timeout=deadline.remaining(30)
+            )
             if proc.returncode == 0:
                 return True, "OK"
             return False, (proc.stderr or proc.stdout or "bash -n reported an error")
@@ -144,38 +197,26 @@ class AutomationAgent:
                     pass
 
     @staticmethod
-    def _simple_balance_check(code: str) -> bool:
+    def _lint_powershell(code: str, strict: Optional[bool] = None) -> Tuple[bool, str]:
         """
-        Extremely lightweight sanity check for bash-like snippets:
-          - Balanced (), {}, [], and quotes (", ')
-        This is NOT a real parser; it just helps when bash isn't present.
+        Lint PowerShell with the in-process checker. In strict mode, confirm
+        with the built-in parser (no execution) via `pwsh`, else Windows
+        PowerShell `powershell`, when one is installed.
         """
-        pairs = {"(": ")", "{": "}", "[": "]"}
-        stack: list[str] = []
-        quote: Optional[str] = None
-
-        for ch in code:
-            if quote:
-                if ch == quote:
-                    quote = None
-                continue
-
-            if ch in ("'", '"'):
-                quote = ch
-            elif ch in pairs:
-                stack.append(pairs[ch])
-            elif ch in (")", "}", "]"):
-                if not stack or stack.pop() != ch:
-                    return False
-
-        return not stack and quote is None
+        errors = errors_only(check_powershell(code))
+        if errors:
+            return False, AutomationAgent._format_diagnostics(errors)
+        if not AutomationAgent._strict(strict):
+            return True, "OK"
+
+        exe = None
+        if shutil.which("pwsh"):
+            exe = "pwsh"
+        elif shutil.which("powershell"):
+            exe = "powershell"
+        if not exe:
+            return True, "OK (pwsh/powershell not found; in-process check passed)"
 
-    @staticmethod
-    def _lint_powershell(code: str) -> Tuple[bool, str]:
-        """
-        Lint PowerShell by invoking the built-in parser (no execution).
-        Prefer `pwsh` if available, else fall back to Windows PowerShell `powershell`.
-        """
         # Write to temp so the parser reads the exact content
         path = None
         try:
@@ -183,15 +224,6 @@ class AutomationAgent:
                 f.write(code)
                 path = f.name
 
-            exe = None
-            if shutil.which("pwsh"):
-                exe = "pwsh"
-            elif shutil.which("powershell"):
-                exe = "powershell"
-
-            if not exe:
-                return False, "No PowerShell interpreter found (pwsh/powershell). Lint skipped."
-
             # Use the parser without executing the script.
             # Using PSParser.Tokenize to ensure lexical/syntax validation only.
             ps_cmd = (
@@ -204,7 +236,7 @@ class AutomationAgent:
                 [exe, "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", ps_cmd],
                 capture_output=True,
                 text=True,
-                timeout=30,
+                timeout=deadline.remaining(30),
             )
             if proc.returncode == 0 and not (proc.stderr or "").strip():
                 return True, "OK"
@@ -0,0 +1,355 @@
+# app/agents/bundle.py
+"""
+Compiled, memory-mapped bundles of the diagnosis signature catalog and the
+remediation script templates.
+
+Building a SignatureIndex (term automaton, CSR tables) and linting templates
+is done once, offline, by `python -m app.agents.bundle build <path>`. Every
+uvicorn worker then mmaps the same read-only file: the integer tables and
+the automaton are used in place (memoryview casts, no parsing), so the page
+cache holds one copy for all workers. Signature records and strings are
+decoded on first use.
+
+File layout (little-endian, sections 8-byte aligned):
+    header   magic b"AGBUNDLE", format version (u32), section count (u32)
+    table    per section: name (16s), array typecode (1s), offset, nbytes (u64)
+    sections "meta" (JSON), "str_ptr"/"str_data" (string table), the
+             compile_catalog() arrays, the term automaton, "templates" (JSON
+             with the lint result recorded at build time)
+
+Set AGENT_BUNDLE_PATH to serve from a bundle. The file is re-checked at most
+every AGENT_BUNDLE_CHECK_INTERVAL_S and reloaded when it changes; write new
+bundles with build_bundle(), which replaces the file atomically, and requests
+already running keep the mapping they started with.
+"""
+
+from __future__ import annotations
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.agents import script_templates
+from app.agents.routing import TermAutomaton
+from app.agents.script_templates import BUILTIN_TEMPLATES, TEMPLATES, ScriptTemplate, TemplateLibrary, TemplateParam
+from app.agents.signatures import (
+    SIGNATURE_INDEX, SIGNATURES, Signature, SignatureIndex, TermGroup, compile_catalog,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AGBUNDLE"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<16s1s7xQQ")
+_ALIGN = 8
+
+# compile_catalog() tables and their array typecodes
+_CATALOG_ARRAYS = {
+    "tg_ptr": "I", "tg_idx": "I", "te_ptr": "I", "te_idx": "I",
+    "g_sig": "I", "g_weight": "d", "g_req": "B", "g_term_ptr": "I", "g_term_idx": "I",
+    "sig_gptr": "I", "ex_ptr": "I", "ex_idx": "I", "total": "d", "required": "I",
+}
+
+BUNDLE_PATH = os.getenv("AGENT_BUNDLE_PATH")
+BUNDLE_CHECK_INTERVAL_S = float(os.getenv("AGENT_BUNDLE_CHECK_INTERVAL_S", "2"))
+
+
+class BundleError(ValueError):
+    """The file is not a bundle this build can read."""
+
+
+# --- building -----------------------------------------------------------------
+class _StringTable:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.ptr = array("Q", [0])
+        self.data = bytearray()
+
+    def add(self, s: str) -> int:
+        sid = self._ids.get(s)
+        if sid is None:
+            sid = self._ids[s] = len(self._ids)
+            self.data += s.encode("utf-8")
+            self.ptr.append(len(self.data))
+        return sid
+
+
+def _encode(signatures: Sequence[Signature], templates: Sequence[ScriptTemplate],
+            strict: bool) -> Tuple[Dict[str, Any], Dict[str, Tuple[str, bytes]]]:
+    tables = compile_catalog(signatures)
+    matcher = TermAutomaton.build(tables["terms"])
+    strings = _StringTable()
+
+    sections: Dict[str, Tuple[str, bytes]] = {}
+    for name, code in _CATALOG_ARRAYS.items():
+        sections[name] = (code, array(code, tables[name]).tobytes())
+    for name, values in matcher.tables().items():
+        sections[f"ac_{name}"] = ("I", array("I", values).tobytes())
+    sections["term_str"] = ("I", array("I", [strings.add(t) for t in tables["terms"]]).tobytes())
+
+    # per signature: id, root cause; evidence and (title, confidence) solutions as CSR
+    sig_str, ev_ptr, ev_idx, sol_ptr, sol_idx = array("I"), array("I", [0]), array("I"), array("I", [0]), array("I")
+    for sig in signatures:
+        sig_str.extend((strings.add(sig.id), strings.add(sig.root_cause)))
+        ev_idx.extend(strings.add(e) for e in sig.evidence)
+        ev_ptr.append(len(ev_idx))
+        for title, confidence in sig.solutions:
+            sol_idx.extend((strings.add(title), strings.add(confidence)))
+        sol_ptr.append(len(sol_idx))
+    for name, arr in (("sig_str", sig_str), ("ev_ptr", ev_ptr), ("ev_idx", ev_idx),
+                      ("sol_ptr", sol_ptr), ("sol_idx", sol_idx)):
+        sections[name] = ("I", arr.tobytes())
+
+    # lint now so workers never do; the result is recorded per template
+    TemplateLibrary(templates, strict=strict)
+    records = []
+    for t in templates:
+        records.append({
+            "name": t.name, "signature": t.signature, "language": t.language, "source": t.source,
+            "version": t.version, "description": t.description,
+            "params": [[p.name, p.kind, p.default, list(p.bounds)] for p in t.params],
+            "lint": list(script_templates.lint_result(t.name, t.version)),
+        })
+    sections["templates"] = ("B", json.dumps(records).encode("utf-8"))
+    sections["str_ptr"] = ("Q", strings.ptr.tobytes())
+    sections["str_data"] = ("B", bytes(strings.data))
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "built_at": time.time(),
+        "signatures": len(signatures),
+        "terms": len(tables["terms"]),
+        "templates": len(templates),
+        "alphabet": matcher.alphabet,
+        "first_out": matcher.first_out,
+    }
+    return meta, sections
+
+
+def build_bundle(path: str, signatures: Sequence[Signature] = SIGNATURES,
+                 templates: Sequence[ScriptTemplate] = BUILTIN_TEMPLATES, strict: bool = False) -> Dict[str, Any]:
+    """Compile and lint the catalog, then atomically write the bundle to `path`. Returns its meta."""
+    meta, sections = _encode(signatures, templates, strict)
+    sections = {"meta": ("B", json.dumps(meta).encode("utf-8")), **sections}
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    table, body = [], bytearray()
+    for name, (code, data) in sections.items():
+        pad = -(offset + len(body)) % _ALIGN
+        body += b"\0" * pad
+        table.append(_SECTION.pack(name.encode("ascii"), code.encode("ascii"), offset + len(body), len(data)))
+        body += data
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".bundle-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+            f.write(b"".join(table))
+            f.write(body)
+        os.replace(tmp, path)  # readers keep the old inode mapped
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return meta
+
+
+# --- loading ------------------------------------------------------------------
+class _Strings:
+    def __init__(self, ptr: memoryview, data: memoryview):
+        self._ptr, self._data = ptr, data
+
+    def __getitem__(self, sid: int) -> str:
+        return str(self._data[self._ptr[sid]:self._ptr[sid + 1]], "utf-8")
+
+
+class _TermList(SequenceABC):
+    def __init__(self, ids: memoryview, strings: _Strings):
+        self._ids, self._strings = ids, strings
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._strings[self._ids[i]]
+
+
+class _SignatureList(SequenceABC):
+    """Signature records decoded from the bundle on first access."""
+
+    def __init__(self, s: Dict[str, memoryview], strings: _Strings, terms: _TermList):
+        self._s, self._strings, self._terms = s, strings, terms
+        self._cache: Dict[int, Signature] = {}
+
+    def __len__(self) -> int:
+        return len(self._s["sig_str"]) // 2
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        sig = self._cache.get(i)
+        if sig is None:
+            sig = self._cache[i] = self._decode(range(len(self))[i])
+        return sig
+
+    def _decode(self, i: int) -> Signature:
+        s, text, terms = self._s, self._strings, self._terms
+
+        def span(name: str, row: int) -> memoryview:
+            ptr = s[f"{name}_ptr"]
+            return s[f"{name}_idx"][ptr[row]:ptr[row + 1]]
+
+        sol = span("sol", i)
+        groups = tuple(
+            TermGroup(tuple(terms[t] for t in span("g_term", g)), s["g_weight"][g], bool(s["g_req"][g]))
+            for g in range(s["sig_gptr"][i], s["sig_gptr"][i + 1])
+        )
+        return Signature(
+            text[s["sig_str"][2 * i]],
+            text[s["sig_str"][2 * i + 1]],
+            tuple(text[e] for e in span("ev", i)),
+            tuple((text[sol[j]], text[sol[j + 1]]) for j in range(0, len(sol), 2)),
+            groups,
+            tuple(terms[t] for t in span("ex", i)),
+        )
+
+
+class Bundle:
+    """A mapped bundle file; signature_index and templates are built on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if len(view) < _HEADER.size:
+            raise BundleError(f"{path}: not a bundle (too short)")
+        magic, version, count = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise BundleError(f"{path}: not a bundle (bad magic)")
+        if version != FORMAT_VERSION:
+            raise BundleError(f"{path}: bundle format {version}, expected {FORMAT_VERSION}")
+
+        self._sections: Dict[str, memoryview] = {}
+        for n in range(count):
+            raw_name, code, offset, nbytes = _SECTION.unpack_from(view, _HEADER.size + n * _SECTION.size)
+            name = raw_name.rstrip(b"\0").decode("ascii")
+            if offset + nbytes > len(view):
+                raise BundleError(f"{path}: truncated section {name}")
+            self._sections[name] = view[offset:offset + nbytes].cast(code.decode("ascii"))
+        self.meta = json.loads(bytes(self._sections["meta"]))
+        self._lock = threading.Lock()
+        self._index: Optional[SignatureIndex] = None
+        self._templates: Optional[TemplateLibrary] = None
+
+    @property
+    def signature_index(self) -> SignatureIndex:
+        if self._index is not None:
+            return self._index
+        with self._lock:
+            if self._index is None:
+                s = self._sections
+                strings = _Strings(s["str_ptr"], s["str_data"])
+                terms = _TermList(s["term_str"], strings)
+                tables = {name: s[name] for name in _CATALOG_ARRAYS}
+                tables["terms"] = terms
+                matcher = TermAutomaton(self.meta["alphabet"], s["ac_delta"], s["ac_out_ptr"], s["ac_out_idx"],
+                                        self.meta["first_out"])
+                self._index = SignatureIndex.from_tables(_SignatureList(s, strings, terms), tables, matcher)
+            return self._index
+
+    @property
+    def templates(self) -> TemplateLibrary:
+        if self._templates is not None:
+            return self._templates
+        with self._lock:
+            if self._templates is None:
+                records = json.loads(bytes(self._sections["templates"]))
+                templates = []
+                for r in records:
+                    params = tuple(
+                        TemplateParam(name, kind, tuple(default) if isinstance(default, list) else default, tuple(bounds))
+                        for name, kind, default, bounds in r["params"]
+                    )
+                    templates.append(ScriptTemplate(r["name"], r["signature"], r["language"], r["source"],
+                                                    params, r["version"], r["description"]))
+                    # recorded at build time; seeding the cache skips linting here
+                    script_templates.record_lint(r["name"], r["version"], *r["lint"])
+                self._templates = TemplateLibrary(templates)
+            return self._templates
+
+
+class BundleWatcher:
+    """Serves the bundle at `path`, reopening it when the file changes."""
+
+    def __init__(self, path: str, check_interval_s: float = BUNDLE_CHECK_INTERVAL_S):
+        self.path = path
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._bundle: Optional[Bundle] = None
+        self._checked = 0.0
+        self.reloads = 0
+
+    @staticmethod
+    def _identity(st: os.stat_result) -> Tuple[int, int, int, int]:
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def current(self) -> Optional[Bundle]:
+        now = time.monotonic()
+        if self._bundle is not None and now - self._checked < self.check_interval_s:
+            return self._bundle
+        with self._lock:
+            if self._bundle is not None and now - self._checked < self.check_interval_s:
+                return self._bundle
+            self._checked = now
+            try:
+                st = os.stat(self.path)
+                if self._bundle is None or self._identity(st) != self._identity(self._bundle.stat):
+                    # the old mapping is released once no request holds its views
+                    self._bundle = Bundle(self.path)
+                    self.reloads += 1
+                    logger.info("Loaded bundle %s (%s signatures, %s templates)", self.path,
+                                self._bundle.meta["signatures"], self._bundle.meta["templates"])
+            except (OSError, ValueError) as e:
+                logger.warning("Bundle %s unavailable (%s); %s", self.path, e,
+                               "keeping the loaded one" if self._bundle else "using built-in catalog")
+            return self._bundle
+
+
+_watcher: Optional[BundleWatcher] = BundleWatcher(BUNDLE_PATH) if BUNDLE_PATH else None
+
+
+def signature_index() -> SignatureIndex:
+    """The active catalog: the bundle's when AGENT_BUNDLE_PATH is set and loads, else the built-in one."""
+    bundle = _watcher.current() if _watcher else None
+    return bundle.signature_index if bundle else SIGNATURE_INDEX
+
+
+def template_library() -> TemplateLibrary:
+    bundle = _watcher.current() if _watcher else None
+    return bundle.templates if bundle else TEMPLATES
+
+
+def _main(argv: List[str]) -> int:
+    if len(argv) != 2 or argv[0] != "build":
+        print("usage: python -m app.agents.bundle build <path>", file=sys.stderr)
+        return 2
+    meta = build_bundle(argv[1])
+    print(f"wrote {argv[1]}: {meta['signatures']} signatures, {meta['terms']} terms, {meta['templates']} templates")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
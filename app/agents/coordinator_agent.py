@@ -1,12 +1,26 @@
 # app/agents/coordinator_agent.py
 
 from __future__ import annotations
-from typing import Dict, List, Callable, Any
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Callable, Any, Optional, Union
 
 from app.agents.diagnostic_agent import DiagnosticAgent
 from app.agents.automation_agent import AutomationAgent
 from app.agents.writer_agent import WriterAgent
 from app.agents.incident_report_agent import IncidentReportAgent
+from app.agents.process_pool import agent_pool
+from app.agents.routing import KeywordIndex
+from app.agents.step_registry import StepRegistry, StepSpec
+from app.core import deadline, memory
+from app.core.memory import BoundedCache
+from app.core.results import Diagnosis, PlanResult, Script
+
+logger = logging.getLogger(__name__)
 
 # --- Simple keyword router ----------------------------------------------------
 CAPABILITIES = {
@@ -15,72 +29,243 @@ CAPABILITIES = {
     "email":    ["email", "summary", "report", "sop", "write", "draft"],
 }
 
+# Compiled once; rebuild with _rebuild_router() if CAPABILITIES changes at runtime.
+_CAPABILITY_INDEX = KeywordIndex(CAPABILITIES)
+_STEP_ORDER = list(CAPABILITIES)
+
+# Monitoring sends the same few alert texts over and over.
+PLAN_CACHE = BoundedCache(maxsize=int(os.getenv("PLAN_CACHE_SIZE", "1024")),
+                          max_bytes=int(os.getenv("PLAN_CACHE_MAX_BYTES", str(1 << 20))))
+memory.register("plan_cache", PLAN_CACHE.stats)
+
+def _rebuild_router() -> None:
+    global _CAPABILITY_INDEX, _STEP_ORDER
+    _CAPABILITY_INDEX = KeywordIndex(CAPABILITIES)
+    _STEP_ORDER = list(CAPABILITIES)
+    PLAN_CACHE.clear()
+
 def plan_from_request(text: str, always_add_email: bool = True) -> list[str]:
-    t = (text or "").lower()
-    steps: list[str] = []
-    if any(k in t for k in CAPABILITIES["diagnose"]): steps.append("diagnose")
-    if any(k in t for k in CAPABILITIES["script"]):   steps.append("script")
-    if any(k in t for k in CAPABILITIES["email"]):    steps.append("email")
+    key = (_CAPABILITY_INDEX.normalize(text), always_add_email)
+    cached = PLAN_CACHE.get(key)
+    if cached is not None:
+        return list(cached)
+
+    matched = _CAPABILITY_INDEX.labels(key[0])
+    steps: list[str] = [s for s in _STEP_ORDER if s in matched]
 
     if not steps:
         steps = ["diagnose", "script"]   # sensible default
     if always_add_email and "email" not in steps:
         steps.append("email")             # always append an email summary
+
+    PLAN_CACHE.put(key, tuple(steps))
     return steps
 
 # --- Step wrappers (each posts its own progress note) -------------------------
-def _step_diagnose(incident_sys_id: str, request_text: str, _: Dict[str, Any]) -> Dict[str, Any]:
-    IncidentReportAgent.post_note(incident_sys_id, "Plan started: running diagnostics.")
-    diag = DiagnosticAgent.run(request_text) or {}
-    root = diag.get("root_cause", "n/a")
-    IncidentReportAgent.post_note(incident_sys_id, f"Diagnosis complete: {root}.")
+# Set while a plan is prepared ahead of approval: steps compute, but write nothing to ServiceNow
+_SPECULATIVE: contextvars.ContextVar[bool] = contextvars.ContextVar("speculative", default=False)
+
+def _note(incident_sys_id: str, text: str) -> None:
+    # an attempt the coordinator gave up on writes nothing more
+    if not _SPECULATIVE.get() and not deadline.cancelled():
+        IncidentReportAgent.post_note(incident_sys_id, text)
+
+def _step_diagnose(incident_sys_id: str, request_text: str, _: Dict[str, Any]) -> Diagnosis:
+    _note(incident_sys_id, "Plan started: running diagnostics.")
+    workers = agent_pool()
+    if workers is not None:
+        diag = workers.diagnose(request_text)
+    else:
+        diag = Diagnosis.from_dict(DiagnosticAgent.run(request_text) or {"root_cause": "n/a"})
+    if not deadline.cancelled():
+        _note(incident_sys_id, f"Diagnosis complete: {diag.root_cause}.")
     return diag
 
-def _step_script(incident_sys_id: str, request_text: str, prior: Dict[str, Any]) -> Dict[str, Any]:
-    IncidentReportAgent.post_note(incident_sys_id, "Generating remediation script.")
-    # ⬇️ call the shim so tests can monkeypatch AutomationAgent.run
-    script = AutomationAgent.run(request_text) or {}
-    IncidentReportAgent.post_note(
-        incident_sys_id,
-        f"Script ready; lint_passed={script.get('lint_passed')}.",
-    )
+def _step_script(incident_sys_id: str, request_text: str, prior: Dict[str, Any]) -> Script:
+    _note(incident_sys_id, "Generating remediation script.")
+    workers = agent_pool()
+    if workers is not None:
+        script = workers.script(request_text)
+    else:
+        # ⬇️ call the shim so tests can monkeypatch AutomationAgent.run
+        script = Script.from_dict(AutomationAgent.run(request_text) or {})
+    if not deadline.cancelled():
+        _note(
+            incident_sys_id,
+            f"Script ready; lint_passed={script.lint_passed}.",
+        )
     return script
 
 def _step_email(incident_sys_id: str, request_text: str, results: Dict[str, Any]) -> str:
-    email = WriterAgent.management_email(results.get("diagnose", {}), results.get("script", {})) or ""
-    IncidentReportAgent.post_note(incident_sys_id, "Drafted summary email.")
+    email = WriterAgent.management_email(Diagnosis.coerce(results.get("diagnose")),
+                                         Script.coerce(results.get("script"))) or ""
+    if not deadline.cancelled():
+        _note(incident_sys_id, "Drafted summary email.")
     return email
 
-def _agents_map() -> Dict[str, Callable[[str, str, Dict[str, Any]], Any]]:
-    """Map step key -> callable(incident_sys_id, request_text, results_so_far)"""
-    return {
-        "diagnose": _step_diagnose,
-        "script": _step_script,
-        "email": _step_email,
-    }
+# --- Failure fallbacks (shape of a step result when it fails/times out) -------
+def _diagnose_fallback(error: str) -> Diagnosis:
+    return Diagnosis("Unknown — error", error=error)
+
+def _script_fallback(error: str) -> Script:
+    # tests expect script either missing OR lint_passed=False when it fails
+    return Script(None, "", False, error=error)
 
-def execute_plan(incident_sys_id: str, text: str, agents: Dict[str, Callable]) -> Dict[str, Any]:
+def _email_fallback(error: str) -> str:
+    return ""
+
+# Overall wall-clock budget for one incident's plan; no step outlives it.
+INCIDENT_LATENCY_BUDGET_S = float(os.getenv("INCIDENT_LATENCY_BUDGET_S", "90"))
+# Failure notes may run past the budget by at most this much, all of them together.
+FAILURE_NOTE_GRACE_S = float(os.getenv("FAILURE_NOTE_GRACE_S", "2"))
+
+STEP_REGISTRY = StepRegistry([
+    StepSpec("diagnose", _step_diagnose, timeout_s=15, retries=1, fallback=_diagnose_fallback),
+    # renders a pre-linted template: no per-request interpreter launch
+    StepSpec("script", _step_script, timeout_s=15, fallback=_script_fallback),
+    StepSpec("email", _step_email, depends_on=("diagnose", "script"), timeout_s=15,
+             retries=1, fallback=_email_fallback),
+])
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _step_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv("STEP_WORKERS", "8")),
+                thread_name_prefix="plan-step",
+            )
+        return _pool
+
+def _agents_map() -> StepRegistry:
+    """Registry of step key -> StepSpec(callable(incident_sys_id, request_text, results_so_far), ...)"""
+    return STEP_REGISTRY
+
+def execute_plan(
+    incident_sys_id: str,
+    text: str,
+    agents: Union[StepRegistry, Dict[str, Callable]],
+    budget_s: Optional[float] = None,
+    steps: Optional[List[str]] = None,
+    failed: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """
-    Execute each planned step in order, accumulating results.
-    Each step gets access to results-so-far for chaining.
+    Execute the planned steps, accumulating results.
+    Each step gets access to results-so-far for chaining; steps whose
+    dependencies are done run concurrently. Pass `steps` when the plan was
+    already computed for this request; otherwise it is routed here.
+
+    Deadlines: an attempt gets min(step timeout, time left in the incident
+    budget). A step that fails, times out, or is cancelled (budget exhausted,
+    or a critical step failed) records its fallback result, so the caller
+    always gets a complete, possibly partial, result; their names are
+    appended to `failed` when given.
+
+    Failure notes are posted from this thread under their own deadline: the
+    budget plus FAILURE_NOTE_GRACE_S, shared by every note of the plan. Once
+    that has passed, notes are logged instead of posted.
     """
+    registry = agents if isinstance(agents, StepRegistry) else STEP_REGISTRY.with_funcs(agents)
+    budget = INCIDENT_LATENCY_BUDGET_S if budget_s is None else budget_s
+    plan_deadline = time.monotonic() + budget
+    notes_deadline = plan_deadline + FAILURE_NOTE_GRACE_S
+
+    planned = list(steps) if steps is not None else plan_from_request(text)
+    known = [s for s in planned if s in registry]
+    pending = registry.order(known)
     results: Dict[str, Any] = {}
-    for step in plan_from_request(text):
+
+    def fail(step: str, error: str) -> None:
+        # keep going, but leave a breadcrumb in SN and shape result for tests
+        note = f"Step '{step}' failed: {error}"
         try:
-            out = agents[step](incident_sys_id, text, results)
-            results[step] = out
-        except Exception as e:
-            # keep going, but leave a breadcrumb in SN and shape result for tests
-            IncidentReportAgent.post_note(incident_sys_id, f"Step '{step}' failed: {e}")
-            if step == "script":
-                # tests expect script either missing OR lint_passed=False when it fails
-                results[step] = {"language": None, "code": "", "lint_passed": False, "error": str(e)}
-            elif step == "diagnose":
-                results[step] = {"root_cause": "Unknown — error", "error": str(e)}
-            elif step == "email":
-                results[step] = ""
-            else:
-                results[step] = {"error": str(e)}
+            if time.monotonic() >= notes_deadline:
+                raise TimeoutError("failure note grace period exhausted")
+            contextvars.copy_context().run(deadline.run_with_deadline, notes_deadline,
+                                           threading.Event(), _note, incident_sys_id, note)
+        except Exception:
+            logger.warning("Could not post failure note for step %s on %s: %s", step, incident_sys_id, note)
+        spec = registry.get(step)
+        results[step] = spec.failed_result(error) if spec else {"error": error}
+        if failed is not None:
+            failed.append(step)
+
+    # Planned steps nobody registered fail the same way a KeyError used to
+    for step in planned:
+        if step not in registry:
+            fail(step, f"no agent registered for step '{step}'")
+
+    # future -> (spec, attempt, attempt deadline, cancel token)
+    running: Dict[Future, tuple] = {}
+    pool = _step_pool()
+
+    def submit(spec: StepSpec, attempt: int) -> None:
+        attempt_deadline = min(time.monotonic() + spec.timeout_s, plan_deadline)
+        cancel = threading.Event()
+        ctx = contextvars.copy_context()
+        fut = pool.submit(ctx.run, deadline.run_with_deadline, attempt_deadline, cancel,
+                          spec.func, incident_sys_id, text, dict(results))
+        running[fut] = (spec, attempt, attempt_deadline, cancel)
+
+    def cancel_all(reason: str) -> None:
+        for fut, (spec, _, _, cancel) in list(running.items()):
+            cancel.set()
+            fut.cancel()
+            running.pop(fut)
+            fail(spec.name, reason)
+        while pending:
+            fail(pending.pop(0), reason)
+
+    while pending or running:
+        # start everything whose (planned) dependencies have finished
+        for step in list(pending):
+            spec = registry.get(step)
+            if all(d in results for d in spec.depends_on if d in known):
+                pending.remove(step)
+                if time.monotonic() >= plan_deadline:
+                    fail(step, f"cancelled: incident latency budget of {budget:g}s exhausted")
+                else:
+                    submit(spec, 0)
+        if not running:
+            continue
+
+        wait_s = max(0.0, min(d for (_, _, d, _) in running.values()) - time.monotonic())
+        done, _ = wait(list(running), timeout=wait_s, return_when=FIRST_COMPLETED)
+
+        critical_failure = None
+        for fut in done:
+            spec, attempt, _, _ = running.pop(fut)
+            try:
+                results[spec.name] = fut.result()
+            except Exception as e:
+                if attempt < spec.retries and time.monotonic() < plan_deadline:
+                    logger.info("Step %s failed on %s (attempt %d), retrying: %s",
+                                spec.name, incident_sys_id, attempt + 1, e)
+                    submit(spec, attempt + 1)
+                    continue
+                fail(spec.name, str(e))
+                if spec.critical:
+                    critical_failure = spec.name
+
+        now = time.monotonic()
+        for fut, (spec, _, attempt_deadline, cancel) in list(running.items()):
+            if now >= attempt_deadline:
+                # can't interrupt the thread; tell it to stand down and drop its result
+                cancel.set()
+                fut.cancel()
+                running.pop(fut)
+                limit = min(spec.timeout_s, budget)
+                logger.warning("Step %s timed out on %s after %.1fs", spec.name, incident_sys_id, limit)
+                fail(spec.name, f"timed out after {limit:g}s")
+                if spec.critical:
+                    critical_failure = spec.name
+
+        if critical_failure:
+            cancel_all(f"cancelled: critical step '{critical_failure}' failed")
+
     return results
 
 # --- Public entrypoint used by your workflow (or call from /execute) ----------
@@ -93,28 +278,46 @@ class CoordinatorAgent:
     """
 
     @staticmethod
-    def run(incident_sys_id: str, user_request: str) -> Dict[str, Any]:
+    def _compose(incident_sys_id: str, results_by_step: Dict[str, Any]) -> PlanResult:
+        # ⬇️ tests assert "resolved" (not "completed")
+        return PlanResult(
+            incident_sys_id=incident_sys_id,
+            status="resolved",
+            diagnosis=Diagnosis.coerce(results_by_step.get("diagnose")),
+            script=Script.coerce(results_by_step.get("script")),
+            email_draft=results_by_step.get("email") or "",
+            servicenow_updated=True,
+        )
+
+    @staticmethod
+    def run(incident_sys_id: str, user_request: str) -> PlanResult:
         steps = plan_from_request(user_request)
         IncidentReportAgent.post_note(incident_sys_id, f"Plan: {', '.join(steps)}")
-        results_by_step = execute_plan(incident_sys_id, user_request, _agents_map())
-
-        # normalize keys for downstream consumers
-        diagnosis = results_by_step.get("diagnose") or {}
-        script = results_by_step.get("script") or {}
-        email_draft = results_by_step.get("email") or ""
+        results_by_step = execute_plan(incident_sys_id, user_request, _agents_map(), steps=steps)
+        result = CoordinatorAgent._compose(incident_sys_id, results_by_step)
 
         # finalize + resolve with mandatory fields (state=6 + resolution code/notes)
-        IncidentReportAgent.resolve_incident(
-            incident_sys_id,
-            {"diagnosis": diagnosis, "script": script, "email_draft": email_draft},
-        )
+        IncidentReportAgent.resolve_incident(incident_sys_id, result, request_text=user_request)
+        return result
 
-        # ⬇️ tests assert "resolved" (not "completed")
-        return {
-            "incident_sys_id": incident_sys_id,
-            "status": "resolved",
-            "diagnosis": diagnosis,
-            "script": script,
-            "email_draft": email_draft,
-            "servicenow_updated": True,
-        }
+    @staticmethod
+    def prepare(incident_sys_id: str, user_request: str) -> Optional[PlanResult]:
+        """
+        Run the plan's steps (diagnose/script/email) without writing to
+        ServiceNow: no progress or failure notes, no resolution. finish()
+        applies the result once the plan is approved. None when a step
+        failed or timed out: that is left for a real run to retry.
+        """
+        failed: List[str] = []
+        token = _SPECULATIVE.set(True)
+        try:
+            results_by_step = execute_plan(incident_sys_id, user_request, _agents_map(), failed=failed)
+        finally:
+            _SPECULATIVE.reset(token)
+        return None if failed else CoordinatorAgent._compose(incident_sys_id, results_by_step)
+
+    @staticmethod
+    def finish(incident_sys_id: str, user_request: str, prepared: PlanResult, lead: Optional[str] = None) -> PlanResult:
+        """Resolve the incident with a prepare()d result: one PATCH, `lead` opening its work note."""
+        IncidentReportAgent.resolve_incident(incident_sys_id, prepared, request_text=user_request, lead=lead)
+        return prepared
@@ -1,43 +1,77 @@
 # app/agents/diagnostic_agent.py
 from __future__ import annotations
-from typing import Dict, List
+import os
+from typing import Dict, List, Sequence
+
+from app.agents import bundle
+from app.core.results import Diagnosis
+from app.core.resolution_index import HISTORY_EVIDENCE_PREFIX, resolution_index
+
+# Past resolved incidents consulted per request (see app.core.resolution_index)
+HISTORY_TOP_K = int(os.getenv("RESOLUTION_HISTORY_TOP_K", "3"))
+HISTORY_MIN_SIMILARITY = float(os.getenv("RESOLUTION_HISTORY_MIN_SIMILARITY", "0.3"))
+
+
+def _with_history(diag: Dict, text: str) -> Dict:
+    """Add evidence and solutions from the most similar past resolved incidents."""
+    similar = (
+        resolution_index.query(text, k=HISTORY_TOP_K, min_similarity=HISTORY_MIN_SIMILARITY)
+        if len(resolution_index) else []
+    )
+    diag["similar_incidents"] = [
+        {k: past.get(k) for k in ("sys_id", "number", "signature", "root_cause", "similarity")}
+        for past in similar
+    ]
+    titles = {s["title"] for s in diag["solutions"]}
+    for past in similar:
+        ref = past.get("number") or past["sys_id"]
+        diag["evidence"].append(
+            f"{HISTORY_EVIDENCE_PREFIX}{ref} ({past['similarity']:.0%} match) was resolved as: {past['root_cause']}"
+        )
+        for solution in past.get("solutions") or []:
+            if solution.get("title") not in titles:
+                titles.add(solution.get("title"))
+                diag["solutions"].append({**solution, "source": ref})
+    return diag
 
-def _has_any(text: str, terms: list[str]) -> bool:
-    return any(t in text for t in terms)
 
 class DiagnosticAgent:
     """
     Lightweight, deterministic RCA heuristic.
-    Now recognizes CPU spikes on generic 'server/vm/node' hints as Windows-ish,
-    not just when the literal word 'windows' appears.
+    Requests are scored against the root-cause signature catalog
+    (app.agents.signatures, or a compiled bundle: app.agents.bundle); CPU spikes on generic 'server/vm/node' hints
+    still count as Windows-ish, not just when the literal word 'windows'
+    appears.
+
+    `signature` names the best match; AutomationAgent picks its script
+    template by it (see app.agents.script_templates). `ranked` lists the
+    candidate root causes with confidence, and `similar_incidents` the
+    closest past resolutions, whose root causes and fixes are appended to
+    `evidence` and `solutions`.
     """
 
     @staticmethod
     def run(user_request: str) -> Dict:
-        text = (user_request or "").lower()
-
-        cpu_terms = ["cpu", "95%", "100%"]
-        win_terms = [
-            "windows", "windows server", "win2019", "win2022", "ws2019", "ws2022",
-        ]
-        host_hints = [
-            "server", "vm", "vm-", "vm_", "vmnode", "vm-node", "node", "node1", "vm-node1",
-        ]
-
-        if _has_any(text, cpu_terms) and (_has_any(text, win_terms) or _has_any(text, host_hints)):
-            root = "Wsappx process consuming abnormal CPU"
-            evidence: List[str] = [
-                "Task Manager shows high CPU in wsappx during Store operations",
-                "Perfmon counters for \\Process(wsappx)\\% Processor Time spike with disk activity",
-            ]
-            solutions = [
-                {"title": "Apply latest cumulative updates", "confidence": "high"},
-                {"title": "Disable Microsoft Store auto-updates via policy", "confidence": "medium"},
-                {"title": "Schedule Store maintenance off-peak", "confidence": "medium"},
-            ]
-        else:
-            root = "Unknown — insufficient data"
-            evidence = ["No high-confidence signature detected in request text."]
-            solutions = [{"title": "Collect perf counters and review top processes", "confidence": "low"}]
-
-        return {"root_cause": root, "evidence": evidence, "solutions": solutions}
+        text = user_request or ""
+        return _with_history(DiagnosticAgent.score(text), text)
+
+    @staticmethod
+    def score(user_request: str) -> Dict:
+        """Signature scoring only (CPU-bound; what process workers run), without past resolutions."""
+        return bundle.signature_index().diagnose_many([user_request or ""])[0]
+
+    @staticmethod
+    def with_history(diagnosis: Diagnosis, user_request: str) -> Diagnosis:
+        """A scored Diagnosis plus the most similar past resolutions (run's second half)."""
+        if not len(resolution_index):
+            return diagnosis
+        diag = diagnosis.to_dict()
+        diag["evidence"], diag["solutions"] = list(diag["evidence"]), list(diag["solutions"])
+        return Diagnosis.from_dict(_with_history(diag, user_request or ""))
+
+    @staticmethod
+    def run_many(user_requests: Sequence[str], top_k: int = 3) -> List[Dict]:
+        """Diagnose a batch in one vectorized pass; results are in input order."""
+        texts = [t or "" for t in user_requests]
+        diags = bundle.signature_index().diagnose_many(texts, top_k=top_k)
+        return [_with_history(d, t) for d, t in zip(diags, texts)]
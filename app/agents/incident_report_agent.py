@@ -1,7 +1,16 @@
 # app/agents/incident_report_agent.py
 
+import logging
+from typing import Dict, Optional, Tuple
+
+from app.core.resolution_index import resolution_index
+from app.core.results import PlanResult
 from app.integrations.servicenow_client import ServiceNowClient
 
+logger = logging.getLogger(__name__)
+
+_MANUAL_INTERVENTION = {"work_notes": "Automation was rejected. Flagged for manual investigation.", "state": 1}
+
 class IncidentReportAgent:
     @staticmethod
     def create_incident(request_text: str) -> str:
@@ -13,50 +22,97 @@ class IncidentReportAgent:
         )
         return res["sys_id"]
 
+    @staticmethod
+    def note_duplicate(incident_sys_id: str, request_text: str, occurrences: int):
+        """Attach a correlated duplicate request to the open incident instead of opening a new one."""
+        ServiceNowClient.update_incident(
+            incident_sys_id,
+            work_notes=f"Duplicate request correlated (occurrence #{occurrences + 1}): {request_text}",
+        )
+
     @staticmethod
     def post_note(incident_sys_id: str, text: str):
         ServiceNowClient.update_incident(incident_sys_id, work_notes=text)
 
     @staticmethod
-    def resolve_incident(incident_sys_id: str, result: dict):
-        """
-        Compose final note and transition to Resolved (6).
-        SAFELY reads nested keys (no KeyError if diagnose step didn't run).
-        """
-        notes: list[str] = []
+    def _resolution(incident_sys_id: str, result: PlanResult, lead: str = None) -> dict:
+        """update_incident arguments resolving the incident with `result` (see resolve_incident)."""
+        notes: list[str] = [lead] if lead else []
 
-        diag = (result or {}).get("diagnosis") or {}
-        rc = diag.get("root_cause")
+        result = PlanResult.coerce(result) or PlanResult(incident_sys_id, "resolved")
+        diag = result.diagnosis
+        rc = diag.root_cause if diag else None
         if rc:
             notes.append(f"Root Cause: {rc}")
-        ev = diag.get("evidence") or []
-        if ev:
-            notes.append("Evidence:\n- " + "\n- ".join(ev))
+        if diag and diag.evidence:
+            notes.append("Evidence:\n- " + "\n- ".join(diag.evidence))
 
-        script = (result or {}).get("script") or {}
-        lang = script.get("language", "unknown")
-        lint = script.get("lint_passed")
+        script = result.script
+        lang = (script.language if script else None) or "unknown"
+        lint = script.lint_passed if script else None
         notes.append(f"Script generated in {lang}; Lint passed: {lint}")
 
-        email_draft = (result or {}).get("email_draft") or ""
+        email_draft = result.email_draft
         if email_draft:
             notes.append("Summary Draft:\n" + email_draft)
 
-        final_notes = "\n".join(notes) or "Automation completed."
+        # state=6 + resolution fields in the same PATCH (Table API best practice)
+        return {
+            "work_notes": "\n".join(notes) or "Automation completed.",
+            "state": 6,
+            "close_code": "Resolved by caller",  # or use your DEFAULT_RESOLUTION_CODE env
+            "close_notes": "Automated remediation applied. See work notes.",
+        }
 
-        # One PATCH by sys_id with state=6 + resolution fields (Table API best practice)
-        ServiceNowClient.update_incident(
-            incident_sys_id,
-            work_notes=final_notes,
-            state=6,
-            close_code="Resolved by caller",  # or use your DEFAULT_RESOLUTION_CODE env
-            close_notes="Automated remediation applied. See work notes.",
-        )
+    @staticmethod
+    def _index(incident_sys_id: str, result: PlanResult, request_text: str = None):
+        diag = result.diagnosis if result else None
+        # failed diagnoses ("Unknown — error") teach the index nothing
+        if request_text and diag and diag.root_cause and not diag.error:
+            try:
+                resolution_index.add(incident_sys_id, request_text, diag.to_dict())
+            except Exception:
+                logger.warning("Could not index resolution of %s", incident_sys_id, exc_info=True)
+
+    @staticmethod
+    def resolve_incident(incident_sys_id: str, result: PlanResult, request_text: str = None, lead: str = None):
+        """
+        Compose final note and transition to Resolved (6).
+        Steps that didn't run are simply left out of the note; `lead`, if
+        given, opens it.
+        With `request_text`, the resolution is added to the similarity index
+        that DiagnosticAgent consults for later requests.
+        """
+        ServiceNowClient.update_incident(incident_sys_id,
+                                         **IncidentReportAgent._resolution(incident_sys_id, result, lead))
+        IncidentReportAgent._index(incident_sys_id, PlanResult.coerce(result), request_text)
+
+    @staticmethod
+    def resolve_many(items: Dict[str, Tuple[PlanResult, str, str]]) -> Dict[str, Optional[Exception]]:
+        """
+        resolve_incident for many incidents, in Batch API round trips.
+        `items` maps sys_id -> (result, request_text, lead); returns sys_id ->
+        None, or the error its PATCH failed with (that one is not indexed).
+        """
+        if not items:
+            return {}
+        out = ServiceNowClient.update_incidents({
+            sys_id: IncidentReportAgent._resolution(sys_id, result, lead)
+            for sys_id, (result, _, lead) in items.items()
+        })
+        errors: Dict[str, Optional[Exception]] = {}
+        for sys_id, (result, request_text, _) in items.items():
+            errors[sys_id] = out[sys_id] if isinstance(out[sys_id], Exception) else None
+            if errors[sys_id] is None:
+                IncidentReportAgent._index(sys_id, PlanResult.coerce(result), request_text)
+        return errors
 
     @staticmethod
     def mark_manual_intervention(incident_sys_id: str):
-        ServiceNowClient.update_incident(
-            incident_sys_id,
-            work_notes="Automation was rejected. Flagged for manual investigation.",
-            state=1,
-        )
+        ServiceNowClient.update_incident(incident_sys_id, **_MANUAL_INTERVENTION)
+
+    @staticmethod
+    def mark_manual_intervention_many(incident_sys_ids: list[str]) -> Dict[str, Optional[Exception]]:
+        """mark_manual_intervention for many incidents, in Batch API round trips; sys_id -> None or error."""
+        out = ServiceNowClient.update_incidents({sys_id: dict(_MANUAL_INTERVENTION) for sys_id in incident_sys_ids})
+        return {sys_id: res if isinstance(res, Exception) else None for sys_id, res in out.items()}
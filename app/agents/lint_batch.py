@@ -0,0 +1,185 @@
+# app/agents/lint_batch.py
+"""
+Batch linting for many scripts at once (see AutomationAgent.lint_many).
+
+  - In-process checks (app.agents.script_syntax) run inline for small batches
+    and on a process pool for large ones (the checker is CPU-bound Python).
+  - Strict mode confirms the scripts that passed with ONE interpreter process
+    per language instead of one per script:
+      bash: a driver loop that evaluates each file under `set -n` in a
+            subshell (parse only, nothing runs) and reports bash's own message
+      pwsh: one [Parser]::ParseInput loop over every file
+"""
+
+from __future__ import annotations
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from app.core import deadline
+from app.agents.script_syntax import check_bash, check_powershell, errors_only
+
+LintResult = Tuple[bool, Optional[str]]
+
+# Batches at least this large are checked on the process pool
+LINT_POOL_MIN = int(os.getenv("LINT_POOL_MIN", "256"))
+LINT_WORKERS = int(os.getenv("LINT_WORKERS", str(os.cpu_count() or 2)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_RS = "\x1e"  # record separator between per-script results on the driver's stdout
+
+# Reads file paths from stdin; each file is eval'd under `set -n` in a subshell,
+# so bash parses it with the same parser as `bash -n` and executes nothing.
+_BASH_DRIVER = (
+    'while IFS= read -r f; do src=$(<"$f"); '
+    'out=$( (eval "set -n\n$src") 2>&1 ); '
+    'printf "\\036%d\\n%s\\n" "$?" "$out"; done'
+)
+# eval reports lines relative to the driver; this probe (error on line 1)
+# tells us the offset
+_BASH_PROBE = "fi\n"
+_BASH_LINE = re.compile(r"^lint: eval: line (\d+): ", re.MULTILINE)
+
+_PS_DRIVER = r"""
+foreach ($p in [System.IO.File]::ReadAllLines($args[0])) {
+    $errs = $null
+    $null = [System.Management.Automation.Language.Parser]::ParseInput(
+        [System.IO.File]::ReadAllText($p), [ref]$null, [ref]$errs)
+    $msgs = @($errs | ForEach-Object {
+        "line $($_.Extent.StartLineNumber), column $($_.Extent.StartColumnNumber): " +
+        ($_.Message -replace "`r?`n", ' ')
+    })
+    [Console]::Out.WriteLine([string][char]30 + $msgs.Count)
+    foreach ($m in $msgs) { [Console]::Out.WriteLine($m) }
+}
+"""
+
+
+def normalize_language(lang: str) -> str:
+    lang = (lang or "").lower()
+    if lang in ("bash", "sh"):
+        return "bash"
+    if lang in ("powershell", "ps", "pwsh"):
+        return "powershell"
+    return "auto"
+
+
+def lint_in_process(item: Tuple[str, str]) -> LintResult:
+    """(code, language) -> (passed, diagnostics or None). Module-level so the pool can pickle it."""
+    code, lang = item
+    if lang == "auto":
+        ok, msg = lint_in_process((code, "bash"))
+        if ok:
+            return ok, None
+        ok2, msg2 = lint_in_process((code, "powershell"))
+        return ok2, (None if ok2 else msg or msg2)
+    check = check_bash if lang == "bash" else check_powershell
+    errors = errors_only(check(code))
+    if errors:
+        return False, "\n".join(str(d) for d in errors)
+    return True, None
+
+
+def _lint_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=LINT_WORKERS)
+        return _pool
+
+
+def _check_in_process(items: List[Tuple[str, str]]) -> List[LintResult]:
+    if len(items) < LINT_POOL_MIN or LINT_WORKERS < 2:
+        return [lint_in_process(item) for item in items]
+    chunksize = max(1, len(items) // (LINT_WORKERS * 4))
+    return list(_lint_pool().map(lint_in_process, items, chunksize=chunksize))
+
+
+def _parse_records(stdout: str, expected: int) -> List[Tuple[int, str]]:
+    """Split driver output into (status, message) records."""
+    records = []
+    for chunk in stdout.split(_RS)[1:]:
+        head, _, body = chunk.partition("\n")
+        records.append((int(head.strip() or 0), body.strip()))
+    if len(records) != expected:
+        raise RuntimeError(f"linter returned {len(records)} results for {expected} scripts")
+    return records
+
+
+def _write_batch(tmp: str, codes: Sequence[str], suffix: str) -> List[str]:
+    paths = []
+    for i, code in enumerate(codes):
+        path = os.path.join(tmp, f"{i}{suffix}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        paths.append(path)
+    return paths
+
+
+def _bash_batch(codes: Sequence[str]) -> List[LintResult]:
+    bash = shutil.which("bash")
+    if not bash:
+        return [(True, None)] * len(codes)
+    with tempfile.TemporaryDirectory(prefix="lint-") as tmp:
+        paths = _write_batch(tmp, [_BASH_PROBE, *codes], ".sh")
+        proc = subprocess.run(
+            [bash, "-c", _BASH_DRIVER, "lint"],
+            input="\n".join(paths) + "\n",
+            capture_output=True, text=True, timeout=deadline.remaining(120),
+        )
+    probe, *records = _parse_records(proc.stdout, len(codes) + 1)
+    m = _BASH_LINE.search(probe[1])
+    offset = int(m.group(1)) - 1 if m else 0
+
+    def relabel(m: re.Match) -> str:
+        return f"line {int(m.group(1)) - offset}: "
+
+    return [(True, None) if status == 0 else (False, _BASH_LINE.sub(relabel, msg) or "bash reported an error")
+            for status, msg in records]
+
+
+def _powershell_batch(codes: Sequence[str]) -> List[LintResult]:
+    exe = shutil.which("pwsh") or shutil.which("powershell")
+    if not exe:
+        return [(True, None)] * len(codes)
+    with tempfile.TemporaryDirectory(prefix="lint-") as tmp:
+        paths = _write_batch(tmp, codes, ".ps1")
+        manifest = os.path.join(tmp, "manifest.txt")
+        driver = os.path.join(tmp, "lint_driver.ps1")
+        with open(manifest, "w", encoding="utf-8") as f:
+            f.write("\n".join(paths))
+        with open(driver, "w", encoding="utf-8") as f:
+            f.write(_PS_DRIVER)
+        proc = subprocess.run(
+            [exe, "-NoLogo", "-NoProfile", "-NonInteractive", "-File", driver, manifest],
+            capture_output=True, text=True, timeout=deadline.remaining(120),
+        )
+    records = _parse_records(proc.stdout, len(codes))
+    return [(True, None) if count == 0 else (False, msg) for count, msg in records]
+
+
+def lint_many(scripts: Sequence[str], languages: Sequence[str], strict: bool) -> List[LintResult]:
+    """Lint every script; results are in input order. See AutomationAgent.lint_many."""
+    items = [(code or "", normalize_language(lang)) for code, lang in zip(scripts, languages)]
+    results = _check_in_process(items)
+    if not strict:
+        return results
+
+    for lang, batch in (("bash", _bash_batch), ("powershell", _powershell_batch)):
+        idx = [i for i, (ok, _) in enumerate(results) if ok and items[i][1] == lang]
+        if not idx:
+            continue
+        try:
+            confirmed = batch([items[i][0] for i in idx])
+        except Exception as e:
+            confirmed = [(False, f"{lang} lint exception: {e}")] * len(idx)
+        for i, res in zip(idx, confirmed):
+            results[i] = res
+    return results
@@ -0,0 +1,111 @@
+# app/agents/process_pool.py
+"""
+Process worker mode for the CPU-bound plan stages.
+
+Signature scoring (DiagnosticAgent) and script rendering (AutomationAgent)
+are pure Python, so in one process they share one core with the event loop
+and every other request. With AGENT_PROCESS_WORKERS=N the coordinator's
+diagnose and script steps run them on a pool of N processes instead:
+
+  - workers are started with the signature index and the pre-linted
+    template library already loaded (with AGENT_BUNDLE_PATH, the bundle is
+    memory-mapped, so they share one copy in the page cache);
+  - a task is the request text; the result comes back as a slotted
+    Diagnosis / Script (pickled as a class reference plus a tuple of
+    values, no per-field keys);
+  - past resolutions are added in the parent, which owns the resolution
+    index, so workers never hold a stale copy of it.
+
+0 (the default) keeps everything in-process. AGENT_PROCESS_START_METHOD
+picks the multiprocessing start method ("spawn" by default: forking a
+threaded server process is unsafe).
+"""
+
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Optional
+
+from app.agents import bundle
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.core import deadline
+from app.core.results import Diagnosis, Script
+
+AGENT_PROCESS_WORKERS = int(os.getenv("AGENT_PROCESS_WORKERS", "0"))
+AGENT_PROCESS_START_METHOD = os.getenv("AGENT_PROCESS_START_METHOD", "spawn")
+_STAGE_TIMEOUT_S = 60.0
+
+
+# --- worker side (module-level so the pool can pickle them) ---------------------
+def _preload() -> None:
+    bundle.signature_index()
+    bundle.template_library()
+
+
+def _ready(_: int) -> int:
+    time.sleep(0.05)  # hold the worker so the next warm-up task starts another one
+    return os.getpid()
+
+
+def _diagnose(text: str) -> Diagnosis:
+    return Diagnosis.from_dict(DiagnosticAgent.score(text))
+
+
+def _script(text: str) -> Script:
+    return Script.from_dict(AutomationAgent.generate_and_lint(text, DiagnosticAgent.score(text)))
+
+
+# --- parent side -----------------------------------------------------------------
+class AgentProcessPool:
+    def __init__(self, workers: int, start_method: str = AGENT_PROCESS_START_METHOD):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_preload,
+                                             mp_context=multiprocessing.get_context(start_method))
+
+    def warm(self) -> int:
+        """Start every worker now rather than on the first requests; returns how many answered."""
+        return len(set(self._executor.map(_ready, range(self.workers))))
+
+    def _call(self, fn: Callable, text: str):
+        fut = self._executor.submit(fn, text)
+        try:
+            return fut.result(timeout=deadline.remaining(_STAGE_TIMEOUT_S))
+        except FutureTimeout:
+            fut.cancel()  # drops it if still queued; a running task finishes and is discarded
+            raise TimeoutError("agent worker did not answer before the step deadline") from None
+
+    def diagnose(self, text: str) -> Diagnosis:
+        return DiagnosticAgent.with_history(self._call(_diagnose, text or ""), text)
+
+    def script(self, text: str) -> Script:
+        return self._call(_script, text or "")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[AgentProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def agent_pool() -> Optional[AgentProcessPool]:
+    """The process pool, or None in in-process mode (AGENT_PROCESS_WORKERS=0)."""
+    global _pool
+    if AGENT_PROCESS_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentProcessPool(AGENT_PROCESS_WORKERS)
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,194 @@
+# app/agents/routing.py
+
+from __future__ import annotations
+import re
+from array import array
+from collections import deque
+from typing import Any, Dict, Iterable, List, Sequence, Set
+
+_WS = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation with shared prefixes factored out, so matching at a
+    position costs O(longest keyword) instead of O(number of keywords).
+    """
+    trie: Dict[str, Any] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        alt = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{alt})?" if "" in node else alt
+
+    return build(trie)
+
+
+class KeywordIndex:
+    """
+    Compiled substring matcher for label -> keywords tables (e.g. CAPABILITIES).
+    One pass over the text reports every label with a keyword in it; the
+    result is identical to `any(k in text for k in keywords)` per label.
+    """
+
+    def __init__(self, table: Dict[str, Iterable[str]]):
+        owners: Dict[str, Set[str]] = {}
+        for label, words in table.items():
+            for w in words:
+                owners.setdefault(w.lower(), set()).add(label)
+
+        # The regex reports the longest keyword at each position; fold in the
+        # labels of keywords that are prefixes of it so none are missed.
+        self._labels: Dict[str, frozenset] = {}
+        for w in owners:
+            labels: Set[str] = set()
+            for i in range(1, len(w) + 1):
+                labels |= owners.get(w[:i], set())
+            self._labels[w] = frozenset(labels)
+
+        self.has_digits = any(ch.isdigit() for w in owners for ch in w)
+        self._pattern = re.compile("(?=(" + _trie_pattern(owners) + "))") if owners else None
+
+    def labels(self, text: str) -> Set[str]:
+        """Labels matched in `text` (expected lowercase)."""
+        found: Set[str] = set()
+        if self._pattern is None:
+            return found
+        for m in self._pattern.finditer(text):
+            found |= self._labels[m.group(1)]
+        return found
+
+    def normalize(self, text: str) -> str:
+        """
+        Cache key for routing: lowercase, collapsed whitespace and, when no
+        keyword contains a digit, numbers masked (alert texts that differ only
+        by host index, counter value or timestamp route identically).
+        """
+        t = _WS.sub(" ", (text or "").lower()).strip()
+        return t if self.has_digits else _DIGITS.sub("0", t)
+
+
+class _ClassTable(dict):
+    """str.translate table: characters outside the alphabet map to class 0."""
+
+    def __missing__(self, key: int) -> int:
+        return 0
+
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton over lowercase terms, flattened into a DFA held in
+    plain integer arrays, so a prebuilt one can be memory-mapped from a
+    bundle (app.agents.bundle) instead of compiled at startup.
+    find(text) returns the ids of every term occurring in `text`: the same
+    set as [i for i, t in enumerate(terms) if t in text].
+
+    Tables:
+      alphabet         characters that occur in some term; any other is class 0
+      delta            states x classes; entries are target state * classes,
+                       i.e. the target's row offset
+      out_ptr/out_idx  term ids per accepting state (CSR); accepting states
+                       are numbered last, from first_out
+    """
+
+    def __init__(self, alphabet: str, delta: Sequence[int], out_ptr: Sequence[int],
+                 out_idx: Sequence[int], first_out: int):
+        self.alphabet = alphabet
+        self._classes = {ch: i + 1 for i, ch in enumerate(alphabet)}
+        # text.translate() to class bytes moves the per-char lookup into C
+        self._translate = _ClassTable({ord(ch): c for ch, c in self._classes.items()}) if len(alphabet) < 256 else None
+        self._width = len(alphabet) + 1
+        self._delta = delta
+        self._out_ptr = out_ptr
+        self._out_idx = out_idx
+        self.first_out = first_out
+
+    @classmethod
+    def build(cls, terms: Sequence[str]) -> "TermAutomaton":
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Set[int]] = [set()]
+        for i, term in enumerate(terms):
+            if not term:
+                continue
+            s = 0
+            for ch in term:
+                if ch not in goto[s]:
+                    goto.append({})
+                    out.append(set())
+                    goto[s][ch] = len(goto) - 1
+                s = goto[s][ch]
+            out[s].add(i)
+
+        alphabet = "".join(sorted({ch for t in terms for ch in t}))
+        classes = {ch: i + 1 for i, ch in enumerate(alphabet)}
+        width = len(alphabet) + 1
+
+        # BFS: fail links, inherited outputs, and full transitions (goto + fail)
+        fail = [0] * len(goto)
+        delta = [0] * (len(goto) * width)
+        order: List[int] = [0]
+        queue = deque()
+        for ch, t in goto[0].items():
+            delta[classes[ch]] = t
+            queue.append(t)
+        while queue:
+            s = queue.popleft()
+            order.append(s)
+            out[s] |= out[fail[s]]
+            row, fail_row = s * width, fail[s] * width
+            delta[row:row + width] = delta[fail_row:fail_row + width]
+            for ch, t in goto[s].items():
+                fail[t] = delta[fail_row + classes[ch]]
+                delta[row + classes[ch]] = t
+                queue.append(t)
+
+        # renumber: the root stays 0, accepting states last
+        ranked = [s for s in order if not out[s]] + [s for s in order if out[s]]
+        new_id = {old: new for new, old in enumerate(ranked)}
+        first_out = sum(1 for s in order if not out[s])
+        table = array("I", bytes(4 * len(delta)))
+        for old in ranked:
+            src, dst = old * width, new_id[old] * width
+            for c in range(width):
+                table[dst + c] = new_id[delta[src + c]] * width
+        out_ptr, out_idx = array("I", [0]), array("I")
+        for old in ranked[first_out:]:
+            out_idx.extend(sorted(out[old]))
+            out_ptr.append(len(out_idx))
+        return cls(alphabet, table, out_ptr, out_idx, first_out)
+
+    def tables(self) -> Dict[str, Sequence[int]]:
+        return {"delta": self._delta, "out_ptr": self._out_ptr, "out_idx": self._out_idx}
+
+    def find(self, text: str) -> List[int]:
+        """Ids of the terms found in `text` (expected lowercase)."""
+        delta, threshold = self._delta, self.first_out * self._width
+        hits = set()
+        s = 0
+        if self._translate is not None:
+            for c in text.translate(self._translate).encode("latin-1"):
+                s = delta[s + c]
+                if s >= threshold:
+                    hits.add(s)
+        else:
+            classes = self._classes
+            for ch in text:
+                s = delta[s + classes.get(ch, 0)]
+                if s >= threshold:
+                    hits.add(s)
+        if not hits:
+            return []
+        found = set()
+        ptr, idx, width, first = self._out_ptr, self._out_idx, self._width, self.first_out
+        for s in hits:
+            o = s // width - first
+            found.update(idx[ptr[o]:ptr[o + 1]])
+        return list(found)
@@ -0,0 +1,1229 @@
+# app/agents/script_syntax.py
+"""
+In-process syntax checkers for the Bash and PowerShell subsets our remediation
+scripts use. No subprocess, no execution: a tokenizer plus a small grammar
+state machine per language, returning line/column diagnostics.
+
+Covered:
+  Bash:       quoting ('', "", $'', backslash), comments, $(...), $((...)),
+              ${...}, backticks, <(...), heredocs (<<, <<-, quoted delimiters),
+              if/then/elif/else/fi, case/in/;;/esac, for/select/while/until/
+              do/done, { }, ( ), [[ ]] (including =~ regexes), (( )), functions,
+              arrays, redirections, pipelines and && / ||.
+  PowerShell: '' and "" strings (backtick escapes, $(...) inside), here-strings
+              @" "@ / @' '@, comments (# and <# #>), backtick continuation,
+              $( ) @( ) @{ } ( ) { } [ ], ${...} variables, if/elseif/else,
+              while/for/foreach/switch conditions, do/while|until, try/catch/
+              finally, function/filter, pipelines and redirections.
+
+Anything outside the subset is accepted rather than flagged; the external
+interpreters remain available as a strict mode (see AutomationAgent).
+"""
+
+from __future__ import annotations
+import bisect
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    line: int      # 1-based
+    column: int    # 1-based
+    message: str
+    severity: str = "error"
+
+    def __str__(self) -> str:
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+
+class _Abort(Exception):
+    """First syntax error found; scanning stops (like `bash -n`)."""
+
+
+class _Source:
+    def __init__(self, code: str):
+        self.code = code
+        self.n = len(code)
+        self.line_starts = [0] + [i + 1 for i, ch in enumerate(code) if ch == "\n"]
+        self.diagnostics: List[Diagnostic] = []
+
+    def position(self, index: int) -> tuple:
+        line = bisect.bisect_right(self.line_starts, index) - 1
+        return line + 1, index - self.line_starts[line] + 1
+
+    def warn(self, index: int, message: str) -> None:
+        line, col = self.position(index)
+        self.diagnostics.append(Diagnostic(line, col, message, "warning"))
+
+    def error(self, index: int, message: str) -> None:
+        line, col = self.position(min(index, max(self.n - 1, 0)) if self.n else 0)
+        self.diagnostics.append(Diagnostic(line, col, message))
+        raise _Abort()
+
+
+def _describe(tok) -> str:
+    if tok.kind == "EOF":
+        return "end of file"
+    if tok.kind == "NEWLINE":
+        return "newline"
+    return tok.text
+
+
+# =============================================================================
+# Bash
+# =============================================================================
+
+class _Tok:
+    __slots__ = ("kind", "text", "start", "literal")
+
+    def __init__(self, kind: str, text: str, start: int, literal: Optional[str] = None):
+        self.kind = kind        # WORD | OP | REDIR | NEWLINE | EOF
+        self.text = text
+        self.start = start
+        self.literal = literal  # unquoted, expansion-free text of a WORD (keywords)
+
+
+_BASH_OPS = (";;&", ";;", ";&", ";", "&&", "&>>", "&>", "&", "||", "|&", "|", "(", ")")
+_BASH_REDIRS = ("<<<", "<<-", "<<", "<>", "<&", "<", ">>", ">&", ">|", ">")
+_BASH_META = set(" \t\n;&|()<>")
+_BASH_CLOSERS = {"then", "elif", "else", "fi", "do", "done", "esac", "}"}
+
+
+class _BashLexer:
+    def __init__(self, src: _Source, start: int = 0, end: Optional[int] = None):
+        self.src = src
+        self.code = src.code
+        self.i = start
+        self.end = src.n if end is None else end
+        self.heredocs: List[tuple] = []   # (delimiter, strip_tabs, start index)
+
+    # -- helpers --------------------------------------------------------------
+    def peek(self, k: int = 0) -> str:
+        j = self.i + k
+        return self.code[j] if j < self.end else ""
+
+    def skip_blanks(self) -> None:
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch in " \t\r":
+                self.i += 1
+            elif ch == "\\" and self.peek(1) == "\n":
+                self.i += 2
+            else:
+                break
+
+    def _read_heredoc_bodies(self) -> None:
+        for delim, strip_tabs, start in self.heredocs:
+            while True:
+                if self.i >= self.end:
+                    self.src.warn(start, f"here-document delimited by end-of-file (wanted `{delim}')")
+                    break
+                nl = self.code.find("\n", self.i, self.end)
+                line_end = self.end if nl == -1 else nl
+                line = self.code[self.i:line_end]
+                self.i = line_end + 1 if nl != -1 else self.end
+                if (line.lstrip("\t") if strip_tabs else line) == delim:
+                    break
+        self.heredocs = []
+
+    # -- tokens ---------------------------------------------------------------
+    def next(self, parser: "_BashParser") -> _Tok:
+        self.skip_blanks()
+        if self.i >= self.end:
+            return _Tok("EOF", "", self.end)
+        start = self.i
+        ch = self.code[self.i]
+
+        if ch == "#":
+            nl = self.code.find("\n", self.i, self.end)
+            self.i = self.end if nl == -1 else nl
+            return self.next(parser)
+
+        if ch == "\n":
+            self.i += 1
+            if self.heredocs:
+                self._read_heredoc_bodies()
+            return _Tok("NEWLINE", "\n", start)
+
+        if ch in "<>" and self.peek(1) == "(":
+            return self._read_word(parser)  # process substitution
+
+        for op in _BASH_REDIRS:
+            if self.code.startswith(op, self.i):
+                self.i += len(op)
+                return _Tok("REDIR", op, start)
+        for op in _BASH_OPS:
+            if self.code.startswith(op, self.i):
+                if op in ("&>", "&>>"):
+                    self.i += len(op)
+                    return _Tok("REDIR", op, start)
+                self.i += len(op)
+                return _Tok("OP", op, start)
+
+        return self._read_word(parser)
+
+    def _read_word(self, parser: "_BashParser") -> _Tok:
+        start = self.i
+        literal = True
+        code = self.code
+        while self.i < self.end:
+            ch = code[self.i]
+            if ch in "<>" and self.peek(1) == "(" and self.i == start:
+                self.i += 2
+                parser.nested(self, start)
+                literal = False
+                continue
+            if ch in _BASH_META:
+                if ch == "(" and self.i > start:
+                    so_far = code[start:self.i]
+                    if so_far.endswith("=") or so_far.endswith("+="):
+                        self._read_balanced(start, "(", ")")   # array assignment
+                        literal = False
+                        continue
+                    if so_far[-1] in "?*+@!":
+                        self._read_balanced(start, "(", ")")   # extglob pattern
+                        literal = False
+                        continue
+                break
+            if ch == "\\":
+                self.i += 2
+                literal = False
+            elif ch == "'":
+                self._read_single(self.i)
+                literal = False
+            elif ch == '"':
+                self._read_double(self.i, parser)
+                literal = False
+            elif ch == "`":
+                self._read_backticks(self.i)
+                literal = False
+            elif ch == "$":
+                self._read_dollar(parser)
+                literal = False
+            else:
+                self.i += 1
+        text = code[start:self.i]
+        return _Tok("WORD", text, start, text if literal else None)
+
+    def _read_single(self, start: int) -> None:
+        j = self.code.find("'", self.i + 1, self.end)
+        if j == -1:
+            self.src.error(start, "unexpected EOF while looking for matching `''")
+        self.i = j + 1
+
+    def _read_ansi_c(self, start: int) -> None:
+        self.i += 1  # opening quote
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "\\":
+                self.i += 2
+            elif ch == "'":
+                self.i += 1
+                return
+            else:
+                self.i += 1
+        self.src.error(start, "unexpected EOF while looking for matching `''")
+
+    def _read_double(self, start: int, parser: "_BashParser") -> None:
+        self.i += 1
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "\\":
+                self.i += 2
+            elif ch == '"':
+                self.i += 1
+                return
+            elif ch == "`":
+                self._read_backticks(self.i)
+            elif ch == "$":
+                self._read_dollar(parser)
+            else:
+                self.i += 1
+        self.src.error(start, "unexpected EOF while looking for matching `\"'")
+
+    def _read_backticks(self, start: int) -> None:
+        self.i += 1
+        body: List[str] = []
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "\\" and self.peek(1) in "`\\$":
+                body.append(self.peek(1))
+                self.i += 2
+            elif ch == "\\":
+                body.append(ch + self.peek(1))
+                self.i += 2
+            elif ch == "`":
+                self.i += 1
+                inner = check_bash("".join(body))
+                errors = [d for d in inner if d.severity == "error"]
+                if errors:
+                    self.src.error(start, f"in `...` command substitution: {errors[0].message}")
+                return
+            else:
+                body.append(ch)
+                self.i += 1
+        self.src.error(start, "unexpected EOF while looking for matching ``'")
+
+    def _read_dollar(self, parser: "_BashParser") -> None:
+        start = self.i
+        nxt = self.peek(1)
+        if nxt == "(" and self.peek(2) == "(":
+            self.i += 3
+            self._read_arith(start)
+        elif nxt == "(":
+            self.i += 2
+            parser.nested(self, start)
+        elif nxt == "{":
+            self.i += 2
+            self._read_param(start, parser)
+        elif nxt == "'":
+            self.i += 1
+            self._read_ansi_c(start)
+        elif nxt == '"':
+            self.i += 1  # locale string: "$"..."" is a normal double-quoted string
+        else:
+            self.i += 1
+
+    def _read_param(self, start: int, parser: "_BashParser") -> None:
+        depth = 1
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "\\":
+                self.i += 2
+            elif ch == "'":
+                self._read_single(self.i)
+            elif ch == '"':
+                self._read_double(self.i, parser)
+            elif ch == "$":
+                self._read_dollar(parser)
+            elif ch == "`":
+                self._read_backticks(self.i)
+            elif ch == "{":
+                depth += 1
+                self.i += 1
+            elif ch == "}":
+                depth -= 1
+                self.i += 1
+                if depth == 0:
+                    return
+            else:
+                self.i += 1
+        self.src.error(start, "unexpected EOF while looking for matching `}'")
+
+    def _read_arith(self, start: int) -> None:
+        """Position is just past `((` / `$((`; consume through the matching `))`."""
+        depth = 0
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                if depth == 0:
+                    if self.peek(1) != ")":
+                        self.src.error(self.i, "syntax error near unexpected token `)' in arithmetic expression")
+                    self.i += 2
+                    return
+                depth -= 1
+            elif ch in "'\"":
+                quote = ch
+                j = self.code.find(quote, self.i + 1, self.end)
+                if j == -1:
+                    self.src.error(self.i, f"unexpected EOF while looking for matching `{quote}'")
+                self.i = j
+            self.i += 1
+        self.src.error(start, "unexpected EOF while looking for matching `))'")
+
+    def read_arith_command(self, start: int) -> None:
+        """Called with position just past the first `(` of `((`."""
+        self.i += 1
+        self._read_arith(start)
+
+    def read_regex(self, parser: "_BashParser") -> None:
+        """
+        Consumes the right-hand side of `=~` inside [[ ]]: one word up to an unquoted
+        blank outside parentheses, so ( ) | < > are part of the pattern.
+        """
+        self.skip_blanks()
+        depth = 0
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch in " \t\r\n" and depth == 0:
+                break
+            if ch == "\\":
+                self.i += 2
+            elif ch == "'":
+                self._read_single(self.i)
+            elif ch == '"':
+                self._read_double(self.i, parser)
+            elif ch == "$":
+                self._read_dollar(parser)
+            else:
+                depth += {"(": 1, ")": -1}.get(ch, 0)
+                self.i += 1
+
+    def _read_balanced(self, start: int, open_ch: str, close_ch: str) -> None:
+        depth = 0
+        while self.i < self.end:
+            ch = self.code[self.i]
+            if ch == "\\":
+                self.i += 2
+                continue
+            if ch == "'":
+                self._read_single(self.i)
+                continue
+            if ch == '"':
+                j = self.i
+                self.i += 1
+                while self.i < self.end and self.code[self.i] != '"':
+                    self.i += 2 if self.code[self.i] == "\\" else 1
+                if self.i >= self.end:
+                    self.src.error(j, "unexpected EOF while looking for matching `\"'")
+                self.i += 1
+                continue
+            if ch == open_ch:
+                depth += 1
+            elif ch == close_ch:
+                depth -= 1
+                if depth == 0:
+                    self.i += 1
+                    return
+            self.i += 1
+        self.src.error(start, f"unexpected EOF while looking for matching `{close_ch}'")
+
+
+class _Frame:
+    __slots__ = ("kind", "state", "has_cmd", "start", "pattern_open")
+
+    def __init__(self, kind: str, state: str, start: int):
+        self.kind = kind
+        self.state = state
+        self.has_cmd = False
+        self.start = start
+        self.pattern_open = False
+
+
+_OPENERS_FOR = {"fi": "if", "done": "do", "esac": "case", "}": "{"}
+
+
+class _BashParser:
+    """
+    Grammar state machine over the token stream. One instance per command
+    list: the script itself, or the inside of a $( ... ) / <( ... ).
+    """
+
+    def __init__(self, src: _Source, terminator: Optional[str] = None, opened_at: int = 0):
+        self.src = src
+        self.terminator = terminator
+        self.opened_at = opened_at
+        self.stack: List[_Frame] = [_Frame("root", "body", 0)]
+        self.cmd_pos = True          # next word is in command position
+        self.can_end = False         # a command precedes (so ; & | && || are valid)
+        self.pending_op: Optional[_Tok] = None
+        self.cmd_words = 0           # words in the current simple command
+        self.expect_fname = False
+
+    def nested(self, lexer: _BashLexer, opened_at: int) -> None:
+        _BashParser(self.src, ")", opened_at).run(lexer)
+
+    # -- helpers --------------------------------------------------------------
+    def _unexpected(self, tok: _Tok) -> None:
+        self.src.error(tok.start, f"syntax error near unexpected token `{_describe(tok)}'")
+
+    def _mark_cmd(self) -> None:
+        self.stack[-1].has_cmd = True
+
+    def _end_compound(self) -> None:
+        self.stack.pop()
+        self._mark_cmd()
+        self.cmd_pos = False
+        self.can_end = True
+        self.pending_op = None
+        self.cmd_words = 1
+
+    def _new_list(self) -> None:
+        self.cmd_pos = True
+        self.can_end = False
+        self.pending_op = None
+        self.cmd_words = 0
+
+    # -- main loop ------------------------------------------------------------
+    def run(self, lexer: _BashLexer) -> None:
+        while True:
+            tok = lexer.next(self)
+            top = self.stack[-1]
+
+            if tok.kind == "EOF":
+                self._eof(tok)
+                return
+
+            if top.kind == "[[":
+                if tok.kind == "WORD" and tok.literal == "]]":
+                    self._end_compound()
+                elif tok.kind == "WORD" and tok.literal == "=~":
+                    lexer.read_regex(self)
+                elif tok.kind == "OP" and tok.text in ("&&", "||", "(", ")"):
+                    pass
+                elif tok.kind in ("OP",) and tok.text in (";", ";;", "&", "|"):
+                    self._unexpected(tok)
+                continue
+
+            if top.kind == "case" and top.state in ("word", "in", "pattern", "pattern_more", "pattern_alt"):
+                self._case_header(tok, top)
+                continue
+
+            if top.kind == "for" and top.state in ("header", "header_in", "header_words", "await_do"):
+                self._for_header(tok, top, lexer)
+                continue
+
+            if tok.kind == "NEWLINE":
+                if self.pending_op is not None:
+                    continue  # a newline may follow | && ||
+                self._new_list()
+                continue
+
+            if tok.kind == "REDIR":
+                nxt = lexer.next(self)
+                if nxt.kind != "WORD":
+                    self._unexpected(nxt)
+                if tok.text in ("<<", "<<-"):
+                    delim = "".join(ch for ch in nxt.text if ch not in "'\"\\")
+                    lexer.heredocs.append((delim, tok.text == "<<-", tok.start))
+                self._mark_cmd()
+                self.cmd_words += 1
+                self.can_end = True
+                self.pending_op = None
+                continue
+
+            if tok.kind == "OP":
+                if self._operator(tok, lexer):
+                    return
+                continue
+
+            self._word(tok, lexer)
+
+    def _eof(self, tok: _Tok) -> None:
+        if self.terminator:
+            self.src.error(self.opened_at, f"unexpected EOF while looking for matching `{self.terminator}'")
+        if self.pending_op is not None:
+            self.src.error(tok.start, "syntax error: unexpected end of file")
+        if len(self.stack) > 1:
+            frame = self.stack[-1]
+            want = {"if": "fi", "while": "done", "until": "done", "for": "done", "case": "esac",
+                    "{": "}", "(": ")"}.get(frame.kind, "end")
+            line, _ = self.src.position(frame.start)
+            self.src.error(tok.start, f"syntax error: unexpected end of file (missing `{want}' "
+                                      f"for `{frame.kind}' on line {line})")
+
+    def _operator(self, tok: _Tok, lexer: _BashLexer) -> bool:
+        """Returns True when this parser's terminator was consumed."""
+        op = tok.text
+        top = self.stack[-1]
+
+        if op == "(":
+            if self.cmd_pos:
+                if lexer.peek() == "(":
+                    lexer.read_arith_command(tok.start)
+                    self._mark_cmd()
+                    self.cmd_pos = False
+                    self.can_end = True
+                    self.pending_op = None
+                    return False
+                self.stack.append(_Frame("(", "body", tok.start))
+                self._new_list()
+                return False
+            if self.cmd_words == 1:
+                # name ( ) compound-command
+                close = lexer.next(self)
+                if close.kind != "OP" or close.text != ")":
+                    self._unexpected(close)
+                self._new_list()
+                self.pending_op = tok  # body must follow (newlines allowed)
+                return False
+            self._unexpected(tok)
+
+        if op == ")":
+            if top.kind == "(":
+                if not top.has_cmd or self.pending_op is not None:
+                    self._unexpected(tok)
+                self._end_compound()
+                return False
+            if top.kind == "root" and self.terminator == ")":
+                if self.pending_op is not None:
+                    self._unexpected(tok)
+                return True
+            self._unexpected(tok)
+
+        if op in (";;", ";&", ";;&"):
+            if top.kind == "case" and top.state == "body" and self.pending_op is None:
+                top.state = "pattern"
+                self._new_list()
+                return False
+            self._unexpected(tok)
+
+        if op in (";", "&"):
+            if not self.can_end or self.pending_op is not None:
+                self._unexpected(tok)
+            self._new_list()
+            return False
+
+        # | |& && ||
+        if not self.can_end or self.pending_op is not None:
+            self._unexpected(tok)
+        self._new_list()
+        self.pending_op = tok
+        return False
+
+    def _word(self, tok: _Tok, lexer: _BashLexer) -> None:
+        top = self.stack[-1]
+        kw = tok.literal if self.cmd_pos else None
+
+        if self.expect_fname:
+            # function NAME [()] compound-command
+            self.expect_fname = False
+            lexer.skip_blanks()
+            if lexer.peek() == "(":
+                lexer.i += 1
+                close = lexer.next(self)
+                if close.kind != "OP" or close.text != ")":
+                    self._unexpected(close)
+            self._new_list()
+            self.pending_op = tok  # a body must follow
+            return
+
+        if kw in _BASH_CLOSERS:
+            self._closer(tok, kw, top)
+            return
+
+        if kw in ("if", "while", "until"):
+            self._open(kw, "cond", tok)
+            return
+        if kw in ("for", "select"):
+            self._open("for", "header", tok)
+            return
+        if kw == "case":
+            self._open("case", "word", tok)
+            return
+        if kw == "{":
+            self._open("{", "body", tok)
+            return
+        if kw == "[[":
+            self._open("[[", "body", tok)
+            return
+        if kw == "function":
+            self._mark_cmd()
+            self.expect_fname = True
+            return
+        if kw in ("!", "time"):
+            self.pending_op = None
+            return
+
+        # plain word
+        self._mark_cmd()
+        self.pending_op = None
+        self.can_end = True
+        self.cmd_words += 1
+        if self.cmd_pos and tok.literal is not None and _is_assignment(tok.literal):
+            return  # prefix assignment: still in command position
+        if self.cmd_pos and tok.literal is None and _is_assignment(tok.text):
+            return
+        self.cmd_pos = False
+
+    def _open(self, kind: str, state: str, tok: _Tok) -> None:
+        self._mark_cmd()
+        self.stack.append(_Frame(kind, state, tok.start))
+        self._new_list()
+
+    def _closer(self, tok: _Tok, kw: str, top: _Frame) -> None:
+        if self.pending_op is not None:
+            self._unexpected(tok)
+        k, s = top.kind, top.state
+        if kw == "then" and k == "if" and s in ("cond", "elif") and top.has_cmd:
+            top.state, top.has_cmd = "then", False
+        elif kw == "elif" and k == "if" and s == "then" and top.has_cmd:
+            top.state, top.has_cmd = "elif", False
+        elif kw == "else" and k == "if" and s == "then" and top.has_cmd:
+            top.state, top.has_cmd = "else", False
+        elif kw == "fi" and k == "if" and s in ("then", "else") and top.has_cmd:
+            self._end_compound()
+            return
+        elif kw == "do" and k in ("while", "until") and s == "cond" and top.has_cmd:
+            top.state, top.has_cmd = "body", False
+        elif kw == "done" and k in ("while", "until", "for") and s == "body" and top.has_cmd:
+            self._end_compound()
+            return
+        elif kw == "esac" and k == "case" and s == "body":
+            self._end_compound()
+            return
+        elif kw == "}" and k == "{" and top.has_cmd:
+            self._end_compound()
+            return
+        else:
+            self._unexpected(tok)
+        self._new_list()
+
+    def _case_header(self, tok: _Tok, top: _Frame) -> None:
+        s = top.state
+        if tok.kind == "NEWLINE" and s in ("in", "pattern"):
+            return
+        if s == "word":
+            if tok.kind != "WORD":
+                self._unexpected(tok)
+            top.state = "in"
+            return
+        if s == "in":
+            if tok.kind == "WORD" and tok.literal == "in":
+                top.state = "pattern"
+                return
+            self._unexpected(tok)
+        if s == "pattern":
+            if tok.kind == "WORD" and tok.literal == "esac":
+                self._end_compound()
+                return
+            if tok.kind == "OP" and tok.text == "(" and not top.pattern_open:
+                top.pattern_open = True
+                return
+            if tok.kind == "WORD":
+                top.state = "pattern_more"
+                return
+            self._unexpected(tok)
+        if s == "pattern_alt":
+            if tok.kind == "WORD":
+                top.state = "pattern_more"
+                return
+            self._unexpected(tok)
+        if s == "pattern_more":
+            if tok.kind == "OP" and tok.text == "|":
+                top.state = "pattern_alt"
+                return
+            if tok.kind == "OP" and tok.text == ")":
+                top.state = "body"
+                top.pattern_open = False
+                self._new_list()
+                return
+            self._unexpected(tok)
+
+    def _for_header(self, tok: _Tok, top: _Frame, lexer: _BashLexer) -> None:
+        # for NAME [in WORDS...] ; do   |   for (( ... )) ; do
+        s = top.state
+        is_sep = tok.kind == "NEWLINE" or (tok.kind == "OP" and tok.text == ";")
+        if s == "header":
+            if tok.kind == "OP" and tok.text == "(" and lexer.peek() == "(":
+                lexer.read_arith_command(tok.start)
+                top.state = "header_in"
+                return
+            if tok.kind == "WORD":
+                top.state = "header_in"
+                return
+            self._unexpected(tok)
+        if s == "header_in":
+            if tok.kind == "WORD" and tok.literal == "in":
+                top.state = "header_words"
+                return
+            if tok.kind == "WORD" and tok.literal == "do":
+                top.state = "body"
+                self._new_list()
+                return
+            if is_sep:
+                top.state = "await_do"
+                return
+            self._unexpected(tok)
+        if s == "header_words":
+            if tok.kind == "WORD":
+                return
+            if is_sep:
+                top.state = "await_do"
+                return
+            self._unexpected(tok)
+        # await_do
+        if tok.kind == "NEWLINE":
+            return
+        if tok.kind == "WORD" and tok.literal == "do":
+            top.state = "body"
+            self._new_list()
+            return
+        self._unexpected(tok)
+
+
+def _is_assignment(text: str) -> bool:
+    name, sep, _ = text.partition("=")
+    if not sep:
+        return False
+    name = name.rstrip("+")
+    if "[" in name:
+        name = name[:name.index("[")]
+    return bool(name) and (name[0].isalpha() or name[0] == "_") and all(c.isalnum() or c == "_" for c in name)
+
+
+def check_bash(code: str) -> List[Diagnostic]:
+    """Syntax-check a Bash script; returns diagnostics (empty when clean)."""
+    src = _Source(code or "")
+    lexer = _BashLexer(src)
+    try:
+        _BashParser(src).run(lexer)
+    except _Abort:
+        pass
+    return src.diagnostics
+
+
+# =============================================================================
+# PowerShell
+# =============================================================================
+
+_PS_COND_KEYWORDS = {"if", "elseif", "while", "for", "foreach", "switch"}
+_PS_BLOCK_KEYWORDS = {"else", "try", "do", "begin", "process", "end"}
+_PS_CLOSE = {"(": ")", "{": "}", "[": "]"}
+_PS_WORD_END = set(" \t\r\n;|(){}[],'\"")
+
+
+class _PsFrame:
+    __slots__ = ("char", "start", "kind", "cond_of", "empty")
+
+    def __init__(self, char: str, start: int, kind: str = "", cond_of: str = ""):
+        self.char = char        # ( { [
+        self.start = start
+        self.kind = kind        # keyword owning a { block, e.g. "if", "try"
+        self.cond_of = cond_of  # keyword owning a ( condition
+        self.empty = True
+
+
+class _PsChecker:
+    def __init__(self, src: _Source):
+        self.src = src
+        self.code = src.code
+        self.n = src.n
+        self.i = 0
+        self.stack: List[_PsFrame] = []
+        self.stmt_start = True
+        self.pending_pipe: Optional[int] = None
+        self.pending_redir: Optional[int] = None
+        # what the next significant token must be: (kind, keyword, start)
+        self.expect: Optional[tuple] = None
+        # what may follow a just-closed block (else/elseif, catch/finally, while/until)
+        self.after_block: Optional[tuple] = None
+        self.pending_block_kind = ""   # keyword whose { block comes next
+
+    # -- driver ---------------------------------------------------------------
+    def run(self, until: Optional[int] = None, stop_depth: Optional[int] = None) -> None:
+        """
+        Scan tokens. When `stop_depth` is given we are inside a $( ) in a
+        string: return once the stack drops back to that depth.
+        """
+        code = self.code
+        while self.i < self.n:
+            ch = code[self.i]
+            start = self.i
+
+            if ch in " \t\r":
+                self.i += 1
+                continue
+            if ch == "`":
+                if self.i + 1 < self.n and code[self.i + 1] == "\r":
+                    self.i += 1
+                if self.i + 1 < self.n and code[self.i + 1] == "\n":
+                    self.i += 2     # line continuation
+                    continue
+                self._word()
+                continue
+            if ch == "\n":
+                self.i += 1
+                self._newline(start)
+                continue
+            if ch == "#":
+                nl = code.find("\n", self.i)
+                self.i = self.n if nl == -1 else nl
+                continue
+            if code.startswith("<#", self.i):
+                end = code.find("#>", self.i + 2)
+                if end == -1:
+                    self.src.error(start, "Missing end of comment block ('#>').")
+                self.i = end + 2
+                continue
+
+            if code.startswith('@"', self.i) or code.startswith("@'", self.i):
+                self._significant(start, "string")
+                self._here_string(start)
+                continue
+            if ch == "'":
+                self._significant(start, "string")
+                self._single_quoted(start)
+                continue
+            if ch == '"':
+                self._significant(start, "string")
+                self._double_quoted(start)
+                continue
+
+            if ch in "$@" and self.i + 1 < self.n and code[self.i + 1] in "({":
+                if ch == "$" and code[self.i + 1] == "{":
+                    self._significant(start, "word")
+                    self._braced_variable(start)
+                    continue
+                self._significant(start, "open")
+                self.i += 2
+                self._push(code[start + 1], start, kind=ch + code[start + 1])
+                continue
+
+            if ch in "({[":
+                self._open_bracket(ch, start)
+                continue
+            if ch in ")}]":
+                self._close_bracket(ch, start)
+                if stop_depth is not None and len(self.stack) == stop_depth:
+                    return
+                continue
+
+            if ch == ";":
+                self.i += 1
+                if self.pending_pipe is not None:
+                    self.src.error(start, "An empty pipe element is not allowed.")
+                self._end_statement()
+                continue
+            if ch == "|":
+                if code.startswith("||", self.i):
+                    self.i += 2
+                    if self.stmt_start:
+                        self.src.error(start, "Unexpected token '||' in expression or statement.")
+                    self.pending_pipe = start
+                    self.stmt_start = False
+                    continue
+                self.i += 1
+                if self.stmt_start or self.pending_pipe is not None:
+                    self.src.error(start, "An empty pipe element is not allowed.")
+                self.pending_pipe = start
+                self._check_expect(start, "pipe")
+                continue
+            if ch == ",":
+                self.i += 1
+                continue
+
+            self._word()
+
+        self._eof()
+
+    # -- token helpers --------------------------------------------------------
+    def _significant(self, start: int, kind: str, text: str = "") -> None:
+        """A token that starts or continues a statement."""
+        self._check_expect(start, kind, text)
+        if self.after_block is not None:
+            if self.after_block[0] == "try":
+                self.src.error(start, "The Try statement is missing its Catch or Finally block.")
+            self.after_block = None
+        if self.stack:
+            self.stack[-1].empty = False
+        self.pending_pipe = None
+        self.pending_redir = None
+        self.stmt_start = False
+
+    def _check_expect(self, start: int, kind: str, text: str = "") -> None:
+        if self.expect is None:
+            return
+        want, kw, kw_start = self.expect
+        if want == "while/until":
+            self.src.error(start, "Missing while or until keyword in do loop.")
+        if want == "(" and kind == "open_paren":
+            self.expect = None
+            return
+        if want == "(" and kw == "switch" and kind == "word" and text.startswith("-"):
+            return  # switch -regex / -wildcard (...)
+        if want == "{" and kind == "open_brace":
+            self.expect = None
+            return
+        if want == "{" and kw == "catch" and kind in ("open_bracket", "word", "comma"):
+            return  # catch [Type1], [Type2] { }
+        if want == "name" and kind == "word":
+            self.expect = ("{", "function", kw_start)
+            self.pending_block_kind = "function"
+            return
+        if want == "(":
+            name = kw[3:] if kw.startswith("do-") else kw
+            self.src.error(start, f"Missing '(' after '{name}' in {name} statement.")
+        if want == "name":
+            self.src.error(start, "Missing name after function keyword.")
+        if kw == "function":
+            self.src.error(start, "Missing function body in function declaration.")
+        if kw in _PS_COND_KEYWORDS:
+            self.src.error(start, f"Missing statement block after {kw} ( condition ).")
+        self.src.error(start, f"Missing statement block after '{kw}'.")
+
+    def _newline(self, start: int) -> None:
+        if self.pending_redir is not None:
+            self.src.error(self.pending_redir, "Missing file specification after redirection operator.")
+        if self.pending_pipe is not None or self.expect is not None:
+            return  # pipelines and keyword headers may continue on the next line
+        if self.stack and (self.stack[-1].char == "[" or self.stack[-1].char == "(" and not self.stack[-1].kind):
+            return  # newlines inside ( ) and [ ] are whitespace; $( ) and @( ) hold statements
+        self._end_statement()
+
+    def _end_statement(self) -> None:
+        if self.expect is not None:
+            self._check_expect(self.i, "end")
+        self.stmt_start = True
+
+    def _push(self, char: str, start: int, kind: str = "", cond_of: str = "") -> None:
+        if self.stack:
+            self.stack[-1].empty = False
+        self.stack.append(_PsFrame(char, start, kind, cond_of))
+        self.stmt_start = True
+
+    def _open_bracket(self, ch: str, start: int) -> None:
+        self.i += 1
+        if ch == "(":
+            expecting_cond = self.expect is not None and self.expect[0] == "("
+            kw = self.expect[1] if expecting_cond else ""
+            if self.expect is not None and self.expect[:2] == ("{", "function"):
+                # function Name($a, $b) { }: the body is still owed after the ( )
+                self.expect = None
+                self._significant(start, "open_paren")
+                self._push("(", start, cond_of="function")
+                return
+            self._significant(start, "open_paren")
+            self._push("(", start, cond_of=kw if expecting_cond else "")
+        elif ch == "{":
+            kind = ""
+            if self.expect is not None and self.expect[0] == "{":
+                kind = self.expect[1]
+            self._significant(start, "open_brace")
+            self._push("{", start, kind=kind or self.pending_block_kind)
+            self.pending_block_kind = ""
+        else:
+            self._significant(start, "open_bracket")
+            self._push("[", start)
+            self.stmt_start = False
+
+    def _close_bracket(self, ch: str, start: int) -> None:
+        self.i += 1
+        if not self.stack:
+            self.src.error(start, f"Unexpected token '{ch}' in expression or statement.")
+        frame = self.stack[-1]
+        if _PS_CLOSE[frame.char] != ch:
+            self.src.error(frame.start, f"Missing closing '{_PS_CLOSE[frame.char]}' in expression.")
+        if self.pending_pipe is not None:
+            self.src.error(self.pending_pipe, "An empty pipe element is not allowed.")
+        self.stack.pop()
+        self.stmt_start = False
+        self.pending_redir = None
+
+        if ch == ")" and frame.cond_of == "function":
+            self.expect = ("{", "function", frame.start)
+            self.pending_block_kind = "function"
+            return
+        if ch == ")" and frame.cond_of:
+            if frame.empty and frame.cond_of != "for":
+                name = frame.cond_of[3:] if frame.cond_of.startswith("do-") else frame.cond_of
+                self.src.error(frame.start, f"Missing condition in {name} statement.")
+            if frame.cond_of.startswith("do-"):
+                self.after_block = None
+                return
+            self.expect = ("{", frame.cond_of, frame.start)
+            return
+        if ch == "}":
+            self.after_block = None
+            if frame.kind in ("if", "elseif"):
+                self.after_block = ("if", frame.start)
+            elif frame.kind in ("try", "catch"):
+                self.after_block = (frame.kind, frame.start)
+            elif frame.kind == "do":
+                self.expect = ("while/until", "do", frame.start)
+            # a keyword's block ends its statement; a bare { } is a script
+            # block value that may still be piped or passed on
+            self.stmt_start = bool(frame.kind) and frame.kind[0] not in "$@"
+        if self.stack:
+            self.stack[-1].empty = False
+
+    def _word(self) -> None:
+        start = self.i
+        code = self.code
+        while self.i < self.n:
+            ch = code[self.i]
+            if ch == "`":
+                self.i += 2
+                continue
+            if ch in _PS_WORD_END:
+                break
+            if ch == "$" and self.i + 1 < self.n and code[self.i + 1] == "(" and self.i > start:
+                break
+            self.i += 1
+        if self.i == start:
+            self.i += 1
+        text = code[start:self.i]
+        low = text.lower()
+
+        # keyword continuations that may follow a closed block
+        if self.after_block is not None:
+            owner, _ = self.after_block
+            if owner == "if" and low in ("else", "elseif"):
+                self.after_block = None
+                self._keyword(low, start)
+                return
+            if owner in ("try", "catch") and low in ("catch", "finally"):
+                self.after_block = None
+                self._keyword(low, start)
+                return
+            if owner == "try":
+                self.src.error(start, "The Try statement is missing its Catch or Finally block.")
+            self.after_block = None
+
+        if self.expect is not None and self.expect[0] == "while/until":
+            if low in ("while", "until"):
+                self.expect = ("(", "do-" + low, start)
+                return
+            self.src.error(start, "Missing while or until keyword in do loop.")
+
+        if self.stmt_start and (low in _PS_COND_KEYWORDS or low in _PS_BLOCK_KEYWORDS
+                                or low in ("function", "filter")):
+            # begin/process/end are keywords only directly inside a function body
+            if low not in ("begin", "process", "end") or (self.stack and self.stack[-1].kind == "function"):
+                self._significant(start, "word", text)
+                self._keyword(low, start)
+                return
+
+        self._significant(start, "word", text)
+        if _is_ps_redirection(text):
+            self.pending_redir = start
+
+    def _keyword(self, kw: str, start: int) -> None:
+        self.stmt_start = False
+        if self.stack:
+            self.stack[-1].empty = False
+        if kw in _PS_COND_KEYWORDS:
+            self.expect = ("(", kw, start)
+        elif kw in ("function", "filter"):
+            self.expect = ("name", kw, start)
+        elif kw == "catch":
+            self.expect = ("{", "catch", start)
+        else:
+            self.expect = ("{", kw, start)
+
+    # -- strings --------------------------------------------------------------
+    def _single_quoted(self, start: int) -> None:
+        self.i += 1
+        code = self.code
+        while self.i < self.n:
+            if code[self.i] == "'":
+                if self.i + 1 < self.n and code[self.i + 1] == "'":
+                    self.i += 2
+                    continue
+                self.i += 1
+                return
+            self.i += 1
+        self.src.error(start, "The string is missing the terminator: '.")
+
+    def _double_quoted(self, start: int) -> None:
+        self.i += 1
+        code = self.code
+        while self.i < self.n:
+            ch = code[self.i]
+            if ch == "`":
+                self.i += 2
+            elif ch == '"':
+                if self.i + 1 < self.n and code[self.i + 1] == '"':
+                    self.i += 2
+                    continue
+                self.i += 1
+                return
+            elif ch == "$" and self.i + 1 < self.n and code[self.i + 1] == "(":
+                self._subexpression()
+            elif ch == "$" and self.i + 1 < self.n and code[self.i + 1] == "{":
+                self._braced_variable(self.i)
+            else:
+                self.i += 1
+        self.src.error(start, 'The string is missing the terminator: ".')
+
+    def _subexpression(self) -> None:
+        """$( ... ) inside an expandable string: parse it as statements."""
+        start = self.i
+        saved = (self.stmt_start, self.pending_pipe, self.pending_redir, self.expect,
+                 self.after_block, self.pending_block_kind)
+        depth = len(self.stack)
+        self.expect = self.after_block = None
+        self.pending_pipe = self.pending_redir = None
+        self.i += 2
+        self.stack.append(_PsFrame("(", start, "$("))
+        self.stmt_start = True
+        self.run(stop_depth=depth)
+        if len(self.stack) > depth:
+            self.src.error(start, "Missing closing ')' in subexpression.")
+        (self.stmt_start, self.pending_pipe, self.pending_redir, self.expect,
+         self.after_block, self.pending_block_kind) = saved
+
+    def _braced_variable(self, start: int) -> None:
+        self.i += 2
+        code = self.code
+        while self.i < self.n:
+            ch = code[self.i]
+            if ch == "`":
+                self.i += 2
+            elif ch == "}":
+                self.i += 1
+                return
+            else:
+                self.i += 1
+        self.src.error(start, "Missing '}' after variable name.")
+
+    def _here_string(self, start: int) -> None:
+        code = self.code
+        quote = code[start + 1]
+        self.i = start + 2
+        # only whitespace may follow the header on its line
+        while self.i < self.n and code[self.i] in " \t\r":
+            self.i += 1
+        if self.i < self.n and code[self.i] != "\n":
+            self.src.error(self.i, "No characters are allowed after a here-string header but before the end of the line.")
+        body_start = self.i + 1
+        terminator = "\n" + quote + "@"
+        end = code.find(terminator, self.i)
+        if end == -1:
+            self.src.error(start, f"The string is missing the terminator: {quote}@.")
+        if quote == '"':
+            # check $( ) subexpressions in the body
+            j = body_start
+            while j < end:
+                if code[j] == "`":
+                    j += 2
+                    continue
+                if code.startswith("$(", j):
+                    self.i = j
+                    self._subexpression()
+                    j = self.i
+                    continue
+                j += 1
+        self.i = end + len(terminator)
+
+    # -- end ------------------------------------------------------------------
+    def _eof(self) -> None:
+        end = self.n
+        if self.pending_pipe is not None:
+            self.src.error(self.pending_pipe, "An empty pipe element is not allowed.")
+        if self.pending_redir is not None:
+            self.src.error(self.pending_redir, "Missing file specification after redirection operator.")
+        if self.stack:
+            frame = self.stack[-1]
+            close = _PS_CLOSE[frame.char]
+            what = "statement block or type definition" if close == "}" else "expression"
+            self.src.error(frame.start, f"Missing closing '{close}' in {what}.")
+        if self.expect is not None:
+            self._check_expect(end, "end")
+        if self.after_block is not None and self.after_block[0] == "try":
+            self.src.error(self.after_block[1], "The Try statement is missing its Catch or Finally block.")
+
+
+def _is_ps_redirection(text: str) -> bool:
+    # >  >>  2>  2>>  *>  (but not 2>&1 / *>&1, which carry their target)
+    t = text
+    if t[:1] in "123456*":
+        t = t[1:]
+    return t in (">", ">>")
+
+
+def check_powershell(code: str) -> List[Diagnostic]:
+    """Syntax-check a PowerShell script; returns diagnostics (empty when clean)."""
+    src = _Source(code or "")
+    try:
+        _PsChecker(src).run()
+    except _Abort:
+        pass
+    return src.diagnostics
+
+
+def errors_only(diagnostics: List[Diagnostic]) -> List[Diagnostic]:
+    return [d for d in diagnostics if d.severity == "error"]
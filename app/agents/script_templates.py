@@ -0,0 +1,324 @@
+# app/agents/script_templates.py
+"""
+Remediation script templates keyed by diagnosis signature.
+
+A template is script source with {{param}} placeholders. Templates are
+compiled (split into literal/placeholder segments) and linted once when the
+library loads; lint results are cached per (template name, version).
+
+Rendering is a substitution of validated values, each emitted as ONE literal
+token (a quoted string, a quoted list / @() array, or a bare integer). As long
+as placeholders sit where a literal is allowed, a render has the same syntax
+as the linted sample render, so per-request output is not re-linted.
+"""
+
+from __future__ import annotations
+import re
+import shlex
+import threading
+from dataclasses import dataclass, field
+from textwrap import dedent
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app.agents import lint_batch
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([a-z_][a-z0-9_]*)\s*\}\}")
+_HOST = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9._-]{0,252})$")
+_KINDS = ("str", "path", "host", "int", "hms", "list")
+
+# (template name, version) -> (lint_passed, lint_error)
+_LINT_CACHE: Dict[Tuple[str, str], Tuple[bool, Optional[str]]] = {}
+_LINT_CACHE_LOCK = threading.Lock()
+
+
+def lint_result(name: str, version: str) -> Tuple[bool, Optional[str]]:
+    """Cached (lint_passed, lint_error) of a loaded template version."""
+    with _LINT_CACHE_LOCK:
+        return _LINT_CACHE[(name, version)]
+
+
+def record_lint(name: str, version: str, passed: bool, error: Optional[str]) -> None:
+    """Seed the cache with a result linted elsewhere (e.g. when a bundle was built)."""
+    with _LINT_CACHE_LOCK:
+        _LINT_CACHE.setdefault((name, version), (passed, error))
+
+
+@dataclass(frozen=True)
+class TemplateParam:
+    """
+    kind: str | path | host | int | hms (seconds rendered as 'HH:MM:SS') | list
+    bounds apply to int and hms.
+    """
+    name: str
+    kind: str = "str"
+    default: Any = None
+    bounds: Tuple[int, int] = (0, 86400)
+
+
+@dataclass(frozen=True)
+class ScriptTemplate:
+    name: str
+    signature: str
+    language: str  # "bash" | "powershell"
+    source: str
+    params: Tuple[TemplateParam, ...] = ()
+    version: str = "1"
+    description: str = ""
+
+
+@dataclass
+class CompiledTemplate:
+    template: ScriptTemplate
+    segments: List[str]                      # even: literal text, odd: param name
+    params: Dict[str, TemplateParam] = field(default_factory=dict)
+    lint_passed: bool = False
+    lint_error: Optional[str] = None
+
+    def render(self, values: Optional[Mapping[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Substitute validated values; returns (code, resolved params)."""
+        values = dict(values or {})
+        unknown = set(values) - set(self.params)
+        if unknown:
+            raise ValueError(f"Unknown template parameter(s) for {self.template.name}: {sorted(unknown)}")
+        resolved = {
+            name: _validate(p, values.get(name, p.default))
+            for name, p in self.params.items()
+        }
+        lang = self.template.language
+        out = []
+        for i, seg in enumerate(self.segments):
+            out.append(_literal(lang, self.params[seg], resolved[seg]) if i % 2 else seg)
+        return "".join(out), resolved
+
+
+def _validate(p: TemplateParam, value: Any) -> Any:
+    if value is None:
+        raise ValueError(f"Missing value for template parameter '{p.name}'")
+    if p.kind in ("int", "hms"):
+        if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).strip().isdigit():
+            raise ValueError(f"Parameter '{p.name}' must be a non-negative integer")
+        value = int(value)
+        lo, hi = p.bounds
+        if not lo <= value <= hi:
+            raise ValueError(f"Parameter '{p.name}' must be between {lo} and {hi}")
+        return value
+    if p.kind == "list":
+        if isinstance(value, str) or not isinstance(value, Iterable):
+            raise ValueError(f"Parameter '{p.name}' must be a list of strings")
+        return [_validate_text(p, v) for v in value]
+    value = _validate_text(p, value)
+    if p.kind == "host" and value and not _HOST.match(value):
+        raise ValueError(f"Parameter '{p.name}' is not a valid host name: {value!r}")
+    return value
+
+
+def _validate_text(p: TemplateParam, value: Any) -> str:
+    if not isinstance(value, str):
+        raise ValueError(f"Parameter '{p.name}' must be a string")
+    if any(ord(c) < 32 or ord(c) == 127 for c in value):
+        raise ValueError(f"Parameter '{p.name}' must not contain control characters")
+    return value
+
+
+def _ps_quote(s: str) -> str:
+    # PowerShell also treats typographic single quotes as quote characters
+    for q in ("'", "\u2018", "\u2019", "\u201a", "\u201b"):
+        s = s.replace(q, q + q)
+    return f"'{s}'"
+
+
+def _literal(lang: str, p: TemplateParam, value: Any) -> str:
+    if p.kind == "int":
+        return str(value)
+    if p.kind == "hms":
+        h, rem = divmod(value, 3600)
+        value = f"{h:02d}:{rem // 60:02d}:{rem % 60:02d}"
+    quote = _ps_quote if lang == "powershell" else shlex.quote
+    if p.kind == "list":
+        items = [quote(v) for v in value]
+        return f"@({', '.join(items)})" if lang == "powershell" else " ".join(items)
+    return quote(value)
+
+
+def compile_template(template: ScriptTemplate) -> CompiledTemplate:
+    if template.language not in ("bash", "powershell"):
+        raise ValueError(f"Template {template.name}: unsupported language {template.language!r}")
+    params = {p.name: p for p in template.params}
+    for p in template.params:
+        if p.kind not in _KINDS:
+            raise ValueError(f"Template {template.name}: parameter '{p.name}' has unknown kind {p.kind!r}")
+    segments = _PLACEHOLDER.split(template.source)
+    missing = set(segments[1::2]) - set(params)
+    if missing:
+        raise ValueError(f"Template {template.name}: undeclared placeholder(s) {sorted(missing)}")
+    return CompiledTemplate(template, segments, params)
+
+
+class TemplateLibrary:
+    """
+    Compiled templates indexed by (signature, language). The first template
+    registered for a signature is its default language.
+    """
+
+    def __init__(self, templates: Sequence[ScriptTemplate] = (), strict: bool = False):
+        self._by_key: Dict[Tuple[str, str], CompiledTemplate] = {}
+        self._default_lang: Dict[str, str] = {}
+        self.load(templates, strict=strict)
+
+    def load(self, templates: Sequence[ScriptTemplate], strict: bool = False) -> None:
+        """Compile and lint `templates` (lint results come from the cache when the version is known)."""
+        compiled = [compile_template(t) for t in templates]
+
+        with _LINT_CACHE_LOCK:
+            todo = [c for c in compiled if (c.template.name, c.template.version) not in _LINT_CACHE]
+        if todo:
+            samples = [c.render()[0] for c in todo]
+            results = lint_batch.lint_many(samples, [c.template.language for c in todo], strict)
+            with _LINT_CACHE_LOCK:
+                for c, res in zip(todo, results):
+                    _LINT_CACHE[(c.template.name, c.template.version)] = res
+
+        for c in compiled:
+            c.lint_passed, c.lint_error = _LINT_CACHE[(c.template.name, c.template.version)]
+            t = c.template
+            self._by_key[(t.signature, t.language)] = c
+            self._default_lang.setdefault(t.signature, t.language)
+
+    def get(self, signature: str, language: Optional[str] = None) -> CompiledTemplate:
+        """Template for a signature; falls back to its default language, then to 'unknown'."""
+        for sig in (signature, "unknown"):
+            if language and (sig, language) in self._by_key:
+                return self._by_key[(sig, language)]
+            if sig in self._default_lang:
+                return self._by_key[(sig, self._default_lang[sig])]
+        raise KeyError(f"No script template for signature {signature!r}")
+
+    def signatures(self) -> List[str]:
+        return list(self._default_lang)
+
+    def render(self, signature: str, params: Optional[Mapping[str, Any]] = None,
+               language: Optional[str] = None) -> Dict[str, Any]:
+        """Render to the AutomationAgent script result shape."""
+        compiled = self.get(signature, language)
+        # only pass the parameters this template declares
+        values = {k: v for k, v in (params or {}).items() if k in compiled.params}
+        code, resolved = compiled.render(values)
+        t = compiled.template
+        return {
+            "language": t.language,
+            "code": code,
+            "lint_passed": compiled.lint_passed,
+            "lint_error": compiled.lint_error,
+            "lint_output": "OK" if compiled.lint_passed else (compiled.lint_error or "lint failed"),
+            "template": t.name,
+            "template_version": t.version,
+            "params": resolved,
+        }
+
+
+# --- Built-in templates ------------------------------------------------------
+_PS_COLLECTOR = dedent(r"""
+    $computer = {{host}}
+    if (-not $computer) { $computer = $env:COMPUTERNAME }
+    New-Item -ItemType Directory -Path {{log_dir}} -Force | Out-Null
+    $setName = 'Processor'
+    try {
+        $null = (Get-Counter -ListSet $setName -ErrorAction Stop)
+    } catch {
+        Write-Host "Perf counter set not found: $setName"
+    }
+    $counters = {{counters}}
+    $logName = {{log_name}}
+    $outDir = Join-Path {{log_dir}} "perf-$computer"
+    try { logman stop $logName -s $computer -ets 2>$null } catch {}
+    try { logman delete $logName -s $computer 2>$null } catch {}
+    logman create counter $logName -s $computer -f csv -o $outDir -si {{interval}} -v mmddhhmm -c $counters -max {{max_mb}} -cnf 01:00:00
+    logman start $logName -s $computer
+""").strip()
+
+_PS_TOP_PROCESSES = dedent(r"""
+    if ($computer -eq $env:COMPUTERNAME) {
+        $procs = Get-Process
+    } else {
+        $procs = Invoke-Command -ComputerName $computer -ScriptBlock { Get-Process }
+    }
+    $procs |
+        Sort-Object CPU -Descending |
+        Select-Object -First {{top}} Name, Id, CPU, WorkingSet |
+        Out-File -FilePath (Join-Path {{log_dir}} "top-$computer.txt")
+""").strip()
+
+_BASH_COLLECTOR = dedent(r"""
+    #!/bin/bash
+    set -euo pipefail
+    host={{host}}
+    log_dir={{log_dir}}
+    interval={{interval}}
+    samples={{samples}}
+    mkdir -p "$log_dir"
+    out="$log_dir/perf-${host:-$(hostname)}.log"
+    {
+      echo "== $(date -u +%Y-%m-%dT%H:%M:%SZ) top processes =="
+      ps -eo pid,comm,%cpu,%mem --sort=-%cpu | head -n "$(( {{top}} + 1 ))"
+      echo "== vmstat ${interval}s x ${samples} =="
+      vmstat "$interval" "$samples"
+    } >> "$out"
+""").strip()
+
+_BASH_DISK = dedent(r"""
+
+    {
+      echo "== disk usage =="
+      df -hP
+      echo "== memory =="
+      free -m
+    } >> "$out"
+""")
+
+_COMMON_PARAMS = (
+    TemplateParam("host", "host", ""),
+    TemplateParam("top", "int", 10, bounds=(1, 100)),
+)
+_PS_PARAMS = _COMMON_PARAMS + (
+    TemplateParam("log_dir", "path", "C:\\logs"),
+    TemplateParam("log_name", "str", "PerfLog"),
+    TemplateParam("interval", "hms", 15, bounds=(1, 3600)),
+    TemplateParam("max_mb", "int", 200, bounds=(1, 10240)),
+)
+_BASH_PARAMS = _COMMON_PARAMS + (
+    TemplateParam("log_dir", "path", "/tmp/logs"),
+    TemplateParam("interval", "int", 15, bounds=(1, 3600)),
+    TemplateParam("samples", "int", 4, bounds=(1, 1000)),
+)
+
+BUILTIN_TEMPLATES: Tuple[ScriptTemplate, ...] = (
+    ScriptTemplate(
+        "windows-wsappx-cpu-collector", "windows_cpu_wsappx", "powershell",
+        _PS_COLLECTOR + "\n" + _PS_TOP_PROCESSES,
+        _PS_PARAMS + (TemplateParam("counters", "list", (
+            "\\Processor(_Total)\\% Processor Time",
+            "\\Process(wsappx)\\% Processor Time",
+        )),),
+        description="Perf counter log for total and wsappx CPU, plus top processes.",
+    ),
+    ScriptTemplate(
+        "linux-cpu-collector", "linux_cpu_high", "bash", _BASH_COLLECTOR, _BASH_PARAMS,
+        description="Top CPU processes and vmstat samples.",
+    ),
+    ScriptTemplate(
+        "generic-perf-collector", "unknown", "powershell",
+        _PS_COLLECTOR + "\n" + _PS_TOP_PROCESSES,
+        _PS_PARAMS + (TemplateParam("counters", "list", (
+            "\\Processor(_Total)\\% Processor Time",
+            "\\Memory\\Available MBytes",
+            "\\PhysicalDisk(_Total)\\% Disk Time",
+        )),),
+        description="Generic CPU/memory/disk counter log, plus top processes.",
+    ),
+    ScriptTemplate(
+        "generic-linux-collector", "unknown", "bash", _BASH_COLLECTOR + _BASH_DISK, _BASH_PARAMS,
+        description="Top processes, vmstat, disk and memory usage.",
+    ),
+)
+
+TEMPLATES = TemplateLibrary(BUILTIN_TEMPLATES)
@@ -0,0 +1,352 @@
+# app/agents/signatures.py
+"""
+Root-cause signatures and a batch scorer for DiagnosticAgent.
+
+Each signature is a set of term groups. A group "hits" when any of its terms
+occurs in the request (substring match, as the original heuristic did). A
+signature is eligible when all its required groups hit and none of its
+excluded terms occur; its score is the summed weight of the groups that hit,
+and confidence is score / total group weight.
+
+Scoring a batch is two sparse matrix products over a binary request x term
+matrix:
+    group hits H = (X @ T) > 0        T: term x group membership
+    scores     S = H @ W              W: group x signature weights
+with scipy.sparse when installed, and an equivalent pure-Python path (the
+same products over inverted indexes) otherwise. Requests hit a handful of
+terms, so both cost O(terms hit), not O(vocabulary x catalog).
+"""
+
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from app.agents.routing import TermAutomaton
+
+try:  # optional: vectorized scoring
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - exercised where scipy is absent
+    np = sparse = None
+
+# Below this many requests the per-call cost of building sparse matrices
+# outweighs the products; score them on the pure-Python path
+_VECTORIZE_MIN = 32
+# Rows per chunk; bounds the dense chunk x signatures score block
+_CHUNK = 4096
+
+
+@dataclass(frozen=True)
+class TermGroup:
+    terms: Tuple[str, ...]
+    weight: float = 1.0
+    required: bool = True
+
+
+@dataclass(frozen=True)
+class Signature:
+    id: str
+    root_cause: str
+    evidence: Tuple[str, ...]
+    solutions: Tuple[Tuple[str, str], ...]   # (title, confidence label)
+    groups: Tuple[TermGroup, ...]
+    exclude: Tuple[str, ...] = ()
+
+    def diagnosis(self) -> Dict:
+        return {
+            "signature": self.id,
+            "root_cause": self.root_cause,
+            "evidence": list(self.evidence),
+            "solutions": [{"title": t, "confidence": c} for t, c in self.solutions],
+        }
+
+
+UNKNOWN = Signature(
+    "unknown",
+    "Unknown — insufficient data",
+    ("No high-confidence signature detected in request text.",),
+    (("Collect perf counters and review top processes", "low"),),
+    (),
+)
+
+_CPU = ("cpu", "95%", "100%")
+_WINDOWS = ("windows", "windows server", "win2019", "win2022", "ws2019", "ws2022")
+_HOST_HINTS = ("server", "vm", "vm-", "vm_", "vmnode", "vm-node", "node", "node1", "vm-node1")
+_LINUX = ("linux", "ubuntu", "rhel", "centos", "debian", "bash")
+_DISK = ("disk full", "disk space", "no space left", "low disk", "filesystem", "inode", "volume full")
+
+SIGNATURES: Tuple[Signature, ...] = (
+    Signature(
+        "linux_cpu_high",
+        "Runaway process consuming abnormal CPU",
+        ("Load average above core count with a single process dominating %CPU",
+         "vmstat shows high user time with low I/O wait"),
+        (("Identify and restart or throttle the top CPU process", "medium"),
+         ("Apply pending package updates for the affected service", "medium")),
+        (TermGroup(_CPU), TermGroup(_LINUX, 2.0),
+         TermGroup(("load average", "runaway", "top shows"), 0.5, required=False)),
+        exclude=_WINDOWS,
+    ),
+    Signature(
+        "windows_cpu_wsappx",
+        "Wsappx process consuming abnormal CPU",
+        ("Task Manager shows high CPU in wsappx during Store operations",
+         "Perfmon counters for \\Process(wsappx)\\% Processor Time spike with disk activity"),
+        (("Apply latest cumulative updates", "high"),
+         ("Disable Microsoft Store auto-updates via policy", "medium"),
+         ("Schedule Store maintenance off-peak", "medium")),
+        (TermGroup(_CPU), TermGroup(_WINDOWS + _HOST_HINTS),
+         TermGroup(("wsappx", "microsoft store", "appx"), 1.0, required=False)),
+    ),
+    Signature(
+        "linux_disk_full",
+        "Filesystem out of space (logs or temp files growing unbounded)",
+        ("df shows the filesystem at or near 100% use",
+         "Large or rapidly growing files under /var/log or /tmp"),
+        (("Rotate and compress logs; clear stale temp files", "high"),
+         ("Extend the volume or move data to a larger mount", "medium")),
+        (TermGroup(_DISK, 2.0), TermGroup(_LINUX), TermGroup(("/var", "/tmp", "log"), 0.5, required=False)),
+        exclude=_WINDOWS,
+    ),
+    Signature(
+        "windows_disk_full",
+        "System volume out of space (WinSxS, temp or log growth)",
+        ("Free space on C: below threshold",
+         "Component store or temp folders account for most recent growth"),
+        (("Run Disk Cleanup / DISM component cleanup", "high"),
+         ("Move logs and page file to a data volume", "medium")),
+        (TermGroup(_DISK, 2.0), TermGroup(_WINDOWS + ("c:", "c drive"))),
+    ),
+    Signature(
+        "memory_pressure",
+        "Memory exhaustion (leak or undersized host)",
+        ("Available memory trending to zero with rising paging/swap",
+         "One process's working set grows without bound"),
+        (("Restart the leaking service and capture a heap/memory dump", "medium"),
+         ("Right-size the host memory", "medium")),
+        # no bare "oom"/"ram": substrings of "room", "zoom", "program"
+        (TermGroup(("memory", "out of memory", "oom killer", "oom-killer", "oomkill", "swap", "paging",
+                    "ram usage", "low ram", "out of ram"), 2.0),
+         TermGroup(("leak", "high", "exhaust", "pressure", "killed"), 1.0, required=False)),
+    ),
+    Signature(
+        "network_latency",
+        "Network path degradation (latency / packet loss)",
+        ("Ping/traceroute show elevated latency or loss on an intermediate hop",
+         "Application timeouts correlate with network retransmits"),
+        (("Check NIC/driver errors and interface counters", "medium"),
+         ("Engage network team with traceroute evidence", "medium")),
+        (TermGroup(("network", "latency", "packet loss", "slowness", "retransmit", "jitter"), 2.0),
+         TermGroup(("timeout", "slow", "dns", "unreachable"), 1.0, required=False)),
+    ),
+    Signature(
+        "service_down",
+        "Service stopped or crashing",
+        ("Service manager reports the service stopped or restarting",
+         "Health checks failing (HTTP 5xx / connection refused)"),
+        (("Restart the service and review its last crash logs", "high"),
+         ("Add a restart policy and alert on crash loops", "medium")),
+        (TermGroup(("service down", "not responding", "crashed", "crash", "stopped", "503",
+                    "connection refused", "unhealthy"), 2.0),),
+    ),
+    Signature(
+        "certificate_expiry",
+        "TLS certificate expired or about to expire",
+        ("Handshake failures citing certificate validity",
+         "Certificate NotAfter date is past or within the renewal window"),
+        (("Renew and deploy the certificate; restart the listener", "high"),
+         ("Automate renewal and expiry monitoring", "medium")),
+        (TermGroup(("certificate", "cert ", "ssl", "tls", "x509"), 1.0),
+         TermGroup(("expired", "expiry", "expiring", "expires", "handshake"), 1.0)),
+    ),
+)
+
+
+def compile_catalog(signatures: Sequence[Signature]) -> Dict[str, Any]:
+    """
+    Flat tables for a catalog: the term vocabulary plus integer/float arrays
+    (CSR pairs *_ptr/*_idx). These are what SignatureIndex scores with and
+    what a bundle stores.
+    """
+    vocab: Dict[str, int] = {}
+
+    def term_id(term: str) -> int:
+        return vocab.setdefault(term.lower(), len(vocab))
+
+    # one group column per (signature, group); a signature's groups are contiguous
+    t: Dict[str, List] = {k: [] for k in ("g_sig", "g_weight", "g_req", "g_term_idx", "ex_idx")}
+    t.update(sig_gptr=[0], g_term_ptr=[0], ex_ptr=[0])
+    for s, sig in enumerate(signatures):
+        for group in sig.groups:
+            t["g_sig"].append(s)
+            t["g_weight"].append(float(group.weight))
+            t["g_req"].append(int(group.required))
+            t["g_term_idx"].extend(dict.fromkeys(term_id(term) for term in group.terms))
+            t["g_term_ptr"].append(len(t["g_term_idx"]))
+        t["sig_gptr"].append(len(t["g_sig"]))
+        t["ex_idx"].extend(dict.fromkeys(term_id(term) for term in sig.exclude))
+        t["ex_ptr"].append(len(t["ex_idx"]))
+
+    def invert(ptr: List[int], idx: List[int], rows_of) -> Tuple[List[int], List[int]]:
+        rows: List[List[int]] = [[] for _ in vocab]
+        for owner in range(len(ptr) - 1):
+            for term in idx[ptr[owner]:ptr[owner + 1]]:
+                rows[term].append(rows_of(owner))
+        out_ptr, out_idx = [0], []
+        for r in rows:
+            out_idx.extend(r)
+            out_ptr.append(len(out_idx))
+        return out_ptr, out_idx
+
+    t["tg_ptr"], t["tg_idx"] = invert(t["g_term_ptr"], t["g_term_idx"], lambda g: g)
+    t["te_ptr"], t["te_idx"] = invert(t["ex_ptr"], t["ex_idx"], lambda s: s)
+    t["total"] = [0.0] * len(signatures)
+    t["required"] = [0] * len(signatures)
+    for g, s in enumerate(t["g_sig"]):
+        t["total"][s] += t["g_weight"][g]
+        t["required"][s] += t["g_req"][g]
+    t["terms"] = list(vocab)
+    return t
+
+
+class SignatureIndex:
+    """
+    Compiled scorer for a signature catalog (see module docstring).
+    Built from Signature objects, or from prebuilt tables and term automaton
+    (from_tables; see app.agents.bundle), which may be memory-mapped.
+    """
+
+    def __init__(self, signatures: Sequence[Signature] = SIGNATURES):
+        tables = compile_catalog(signatures)
+        self._init(tuple(signatures), tables, TermAutomaton.build(tables["terms"]))
+
+    @classmethod
+    def from_tables(cls, signatures: Sequence[Signature], tables: Mapping[str, Sequence],
+                    matcher: TermAutomaton) -> "SignatureIndex":
+        self = cls.__new__(cls)
+        self._init(signatures, tables, matcher)
+        return self
+
+    def _init(self, signatures: Sequence[Signature], tables: Mapping[str, Sequence],
+              matcher: TermAutomaton) -> None:
+        self.signatures = signatures
+        self.terms = tables["terms"]
+        self._matcher = matcher
+        self._tg_ptr, self._tg_idx = tables["tg_ptr"], tables["tg_idx"]
+        self._te_ptr, self._te_idx = tables["te_ptr"], tables["te_idx"]
+        self._group_sig = tables["g_sig"]
+        self._group_weight = tables["g_weight"]
+        self._group_required = tables["g_req"]
+        self._total = tables["total"]
+        self._required = tables["required"]
+        self._matrices = None
+        self._matrices_lock = threading.Lock()
+
+    def _build_matrices(self):
+        V, G, S = len(self.terms), len(self._group_sig), len(self.signatures)
+
+        def csr(ptr, idx, shape):
+            idx = np.asarray(idx, dtype=np.int64)
+            return sparse.csr_matrix((np.ones(len(idx)), idx, np.asarray(ptr, dtype=np.int64)), shape=shape)
+
+        groups = np.arange(G)
+        group_sig = np.asarray(self._group_sig, dtype=np.int64)
+        required = np.asarray(self._group_required, dtype=bool)
+        T = csr(self._tg_ptr, self._tg_idx, (V, G))
+        W = sparse.csr_matrix((np.asarray(self._group_weight, dtype=float), (groups, group_sig)), shape=(G, S))
+        R = sparse.csr_matrix((np.ones(int(required.sum())), (groups[required], group_sig[required])), shape=(G, S))
+        E = csr(self._te_ptr, self._te_idx, (V, S))
+        total = np.asarray(self._total, dtype=float)
+        return T, W, R, E, np.where(total == 0, 1.0, total), np.asarray(self._required, dtype=float)
+
+    def matrices(self):
+        """scipy.sparse scoring matrices, built on first vectorized use."""
+        if self._matrices is None:
+            with self._matrices_lock:
+                if self._matrices is None:
+                    self._matrices = self._build_matrices()
+        return self._matrices
+
+    # -- request vectors -------------------------------------------------------
+    def term_ids(self, text: str) -> List[int]:
+        """Sparse request vector: ids of the vocabulary terms found in `text`."""
+        return self._matcher.find((text or "").lower())
+
+    # -- scoring ----------------------------------------------------------------
+    def score_many(self, texts: Sequence[str], vectorized: Optional[bool] = None) -> List[List[Tuple[int, float, float]]]:
+        """
+        Per text: eligible signatures as (signature index, score, confidence),
+        best first (ties: higher confidence, then catalog order).
+        """
+        vectors = [self.term_ids(t) for t in texts]
+        if vectorized is None:
+            vectorized = len(vectors) >= _VECTORIZE_MIN
+        if sparse is not None and vectorized:
+            return self._score_sparse(vectors)
+        return [sorted(self._score_python(v), key=lambda r: (-r[1], -r[2], r[0])) for v in vectors]
+
+    def _score_sparse(self, vectors: List[List[int]]) -> List[List[Tuple[int, float, float]]]:
+        out: List[List[Tuple[int, float, float]]] = []
+        for start in range(0, len(vectors), _CHUNK):
+            out += self._score_chunk(vectors[start:start + _CHUNK])
+        return out
+
+    def _score_chunk(self, vectors: List[List[int]]) -> List[List[Tuple[int, float, float]]]:
+        T, W, R, E, total, required = self.matrices()
+        rows = [i for i, v in enumerate(vectors) for _ in v]
+        cols = [t for v in vectors for t in v]
+        X = sparse.csr_matrix(([1.0] * len(cols), (rows, cols)), shape=(len(vectors), len(self.terms)))
+
+        H = X @ T
+        H.data[:] = 1.0                      # group hit, however many of its terms matched
+        scores = (H @ W).toarray()           # chunk x signatures; the products stay sparse
+        eligible = (scores > 0) & ((H @ R).toarray() >= required) & ((X @ E).toarray() == 0)
+
+        r, c = np.nonzero(eligible)
+        sc = scores[r, c]
+        conf = sc / total[c]
+        order = np.lexsort((c, -conf, -sc, r))   # per row: best first
+        out: List[List[Tuple[int, float, float]]] = [[] for _ in vectors]
+        for i, s, score, cf in zip(r[order].tolist(), c[order].tolist(), sc[order].tolist(), conf[order].tolist()):
+            out[i].append((s, score, cf))
+        return out
+
+    def _score_python(self, vector: List[int]) -> List[Tuple[int, float, float]]:
+        tg_ptr, tg_idx, te_ptr, te_idx = self._tg_ptr, self._tg_idx, self._te_ptr, self._te_idx
+        hit_groups = {g for t in vector for g in tg_idx[tg_ptr[t]:tg_ptr[t + 1]]}
+        excluded = {s for t in vector for s in te_idx[te_ptr[t]:te_ptr[t + 1]]}
+        scores: Dict[int, float] = {}
+        required: Dict[int, int] = {}
+        for g in hit_groups:
+            s = self._group_sig[g]
+            scores[s] = scores.get(s, 0.0) + self._group_weight[g]
+            required[s] = required.get(s, 0) + self._group_required[g]
+        return [
+            (s, score, score / (self._total[s] or 1.0))
+            for s, score in scores.items()
+            if s not in excluded and required[s] >= self._required[s] and score > 0
+        ]
+
+    def diagnose_many(self, texts: Sequence[str], top_k: int = 3,
+                      vectorized: Optional[bool] = None) -> List[Dict]:
+        """Best signature's diagnosis per text plus a ranked list of candidates."""
+        results = []
+        for ranked in self.score_many(texts, vectorized=vectorized):
+            best = self.signatures[ranked[0][0]] if ranked else UNKNOWN
+            diag = best.diagnosis()
+            diag["confidence"] = round(ranked[0][2], 4) if ranked else 0.0
+            diag["ranked"] = [
+                {
+                    "signature": self.signatures[s].id,
+                    "root_cause": self.signatures[s].root_cause,
+                    "score": round(score, 4),
+                    "confidence": round(conf, 4),
+                }
+                for s, score, conf in ranked[:top_k]
+            ]
+            results.append(diag)
+        return results
+
+
+SIGNATURE_INDEX = SignatureIndex(SIGNATURES)
@@ -0,0 +1,105 @@
+# app/agents/step_registry.py
+
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# callable(incident_sys_id, request_text, results_so_far) -> step result
+StepFunc = Callable[[str, str, Dict[str, Any]], Any]
+
+
+@dataclass(frozen=True)
+class StepSpec:
+    """
+    One plan step and its scheduling contract:
+      depends_on: steps whose results it reads (a dependency that is not in
+                  the plan is ignored; it only orders steps that are)
+      timeout_s:  wall-clock limit for a single attempt
+      retries:    extra attempts after an exception (timeouts are not retried)
+      critical:   when it fails, every step that has not finished is cancelled
+      fallback:   error text -> result recorded when the step fails/is cancelled
+    """
+    name: str
+    func: StepFunc
+    depends_on: tuple = ()
+    timeout_s: float = 30.0
+    retries: int = 0
+    critical: bool = False
+    fallback: Optional[Callable[[str], Any]] = None
+
+    def failed_result(self, error: str) -> Any:
+        if self.fallback is None:
+            return {"error": error}
+        return self.fallback(error)
+
+
+class StepRegistry:
+    """
+    Named steps the coordinator can plan and schedule.
+
+        registry = StepRegistry()
+
+        @registry.register("diagnose", timeout_s=10)
+        def _step_diagnose(incident_sys_id, request_text, results): ...
+    """
+
+    def __init__(self, specs: Iterable[StepSpec] = ()):
+        self._specs: Dict[str, StepSpec] = {}
+        for spec in specs:
+            self.add(spec)
+
+    def add(self, spec: StepSpec) -> StepSpec:
+        self._specs[spec.name] = spec
+        return spec
+
+    def register(self, name: str, **options: Any) -> Callable[[StepFunc], StepFunc]:
+        def deco(func: StepFunc) -> StepFunc:
+            self.add(StepSpec(name=name, func=func, **options))
+            return func
+        return deco
+
+    def get(self, name: str) -> Optional[StepSpec]:
+        return self._specs.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def with_funcs(self, funcs: Dict[str, StepFunc]) -> "StepRegistry":
+        """
+        Copy of this registry with the callables swapped (keeps timeouts,
+        dependencies and fallbacks). Unknown names get a default spec.
+        """
+        out = StepRegistry(self._specs.values())
+        for name, func in funcs.items():
+            spec = self._specs.get(name)
+            out.add(replace(spec, func=func) if spec else StepSpec(name=name, func=func))
+        return out
+
+    def order(self, steps: List[str]) -> List[str]:
+        """
+        Order planned steps so dependencies come first; otherwise keep plan order.
+        Raises ValueError on a dependency cycle.
+        """
+        planned = set(steps)
+        ordered: List[str] = []
+        visiting: set = set()
+
+        def visit(name: str) -> None:
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Step dependency cycle at '{name}'")
+            visiting.add(name)
+            spec = self._specs.get(name)
+            for dep in (spec.depends_on if spec else ()):
+                if dep in planned:
+                    visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in steps:
+            visit(name)
+        return ordered
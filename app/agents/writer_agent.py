@@ -1,7 +1,9 @@
 # app/agents/writer_agent.py
 
 from __future__ import annotations
-from typing import Dict
+from typing import Optional
+
+from app.core.results import Diagnosis, Script
 
 
 class WriterAgent:
@@ -11,11 +13,11 @@ class WriterAgent:
     """
 
     @staticmethod
-    def management_email(diagnosis: Dict, script: Dict) -> str:
-        root = diagnosis.get("root_cause", "unknown")
-        evidence = diagnosis.get("evidence") or []
-        lint = script.get("lint_passed")
-        language = script.get("language", "powershell")
+    def management_email(diagnosis: Optional[Diagnosis], script: Optional[Script]) -> str:
+        root = diagnosis.root_cause if diagnosis else "unknown"
+        evidence = diagnosis.evidence if diagnosis else ()
+        lint = script.lint_passed if script else None
+        language = (script.language if script else None) or "powershell"
 
         lines = [
             "Subject: CPU spike incident - analysis & remediation",
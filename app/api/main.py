@@ -1,23 +1,110 @@
 # app/api/main.py
 
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.agents import process_pool
+from app.api.responses import FastJSONResponse
+from app.core.admission import Rejected
+from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import CircuitOpen, UnknownInstance, registry
 from app.utils.logger import init_logger
+from app.workflows import change_feed, reconciler
 from app.api.routes.execute import router as execute_router
 from app.api.routes.approve import router as approve_router
 from app.api.routes.reject import router as reject_router
 from app.api.routes.tasks import router as tasks_router
+from app.api.routes.diagnose import router as diagnose_router
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes.admin import router as admin_router
 
 
 init_logger()
+logger = logging.getLogger(__name__)
+
+# Discover incident schema + caller sys_id at startup instead of on the first /execute
+SN_WARMUP = os.getenv("SN_WARMUP", "1").lower() in ("1", "true", "yes")
+
+
+async def _warm_servicenow_metadata() -> None:
+    try:
+        found = await run_in_threadpool(ServiceNowClient.warm_metadata)
+        logger.info("ServiceNow metadata warmed: %s", found)
+    except Exception as e:  # startup must not depend on ServiceNow being reachable
+        logger.warning("ServiceNow metadata warm-up failed: %s", e)
+
+
+async def _every(interval_s: float, fn, what: str) -> None:
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            counts = await run_in_threadpool(fn)
+            logger.debug("%s: %s", what, counts)
+        except Exception as e:
+            logger.warning("%s failed: %s", what, e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # in the background: the app serves immediately; requests racing the
+    # warm-up fall back to discovering on demand
+    warmup = asyncio.create_task(_warm_servicenow_metadata()) if SN_WARMUP else None
+    workers = process_pool.agent_pool()
+    if workers is not None:
+        started = await run_in_threadpool(workers.warm)
+        logger.info("Agent process workers ready: %d", started)
+    background = [
+        asyncio.create_task(_every(interval, fn, what))
+        for interval, fn, what in (
+            (reconciler.RECONCILE_INTERVAL_S, reconciler.sweep, "Reconciliation sweep"),
+            (change_feed.CHANGE_FEED_INTERVAL_S, change_feed.change_feed.poll, "Change feed poll"),
+        )
+        if interval > 0
+    ]
+    yield
+    for task in (warmup, *background):
+        if task is not None and not task.done():
+            task.cancel()
+    process_pool.shutdown()
+
 
 app = FastAPI(
     title="Agentic AI DevOps Service",
     version="1.0.0",
     openapi_url="/api/v1/openapi.json",
-    docs_url="/api/v1/docs"
+    docs_url="/api/v1/docs",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 app.include_router(execute_router)  # /api/v1/execute
 app.include_router(approve_router)  # /api/v1/plans/{id}/approve
 app.include_router(reject_router)   # /api/v1/plans/{id}/reject
-app.include_router(tasks_router)    # /api/v1/tasks/{id}
\ No newline at end of file
+app.include_router(tasks_router)    # /api/v1/tasks/{id}
+app.include_router(diagnose_router) # /api/v1/diagnose:batch
+app.include_router(metrics_router)  # /api/v1/metrics
+app.include_router(admin_router)    # /api/v1/admin/profile
+
+
+@app.exception_handler(Rejected)
+async def admission_rejected(request: Request, exc: Rejected):
+    # 429 rate limited / 503 queue full; clients back off for Retry-After seconds
+    return JSONResponse(status_code=exc.status, content={"detail": exc.detail},
+                        headers={"Retry-After": exc.retry_after})
+
+
+@app.exception_handler(UnknownInstance)
+async def unknown_instance(request: Request, exc: UnknownInstance):
+    return JSONResponse(status_code=400, content={
+        "detail": f"Unknown ServiceNow instance '{exc.args[0]}'; configured: {', '.join(registry.names())}"})
+
+
+@app.exception_handler(CircuitOpen)
+async def instance_unavailable(request: Request, exc: CircuitOpen):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(max(1, round(exc.retry_after_s)))})
\ No newline at end of file
@@ -0,0 +1,65 @@
+# app/api/responses.py
+"""
+JSON response encoding. Routes declare their response model (for the OpenAPI
+schema) but return FastJSONResponse themselves, so FastAPI neither
+re-validates the result against the model nor runs jsonable_encoder over it:
+
+  - pydantic models are dumped once by their compiled serializer (unset
+    fields left out, as response_model_exclude_unset did);
+  - everything else (dicts, app.core.results dataclasses, tuples) goes
+    through orjson, or stdlib json where orjson is not installed;
+  - Encoded values inside a top-level dict are spliced in as is, for parts
+    of a response that are cached already encoded.
+"""
+
+import dataclasses
+import json
+from collections.abc import Mapping
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised where orjson is absent
+    orjson = None
+
+
+class Encoded(bytes):
+    """A JSON value that is already encoded."""
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", exclude_unset=True)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _dumps(content: Any) -> bytes:
+    if isinstance(content, BaseModel):
+        return content.model_dump_json(exclude_unset=True).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    """`content` as UTF-8 JSON; Encoded values of a top-level dict are inserted verbatim."""
+    if not isinstance(content, dict) or not any(isinstance(v, Encoded) for v in content.values()):
+        return _dumps(content)
+    plain = {k: v for k, v in content.items() if not isinstance(v, Encoded)}
+    parts = [_dumps(plain)[1:-1]] if plain else []
+    parts += [_dumps(str(k)) + b":" + v for k, v in content.items() if isinstance(v, Encoded)]
+    return b"{" + b",".join(parts) + b"}"
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,49 @@
+# app/api/routes/admin.py
+
+import hmac
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils import profiler
+
+router = APIRouter(prefix="/api/v1", tags=["admin"])
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_MAX_S = float(os.getenv("PROFILE_MAX_S", "60"))
+
+
+def _require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (set ADMIN_TOKEN).")
+    # bytes: compare_digest rejects str with non-ASCII characters
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@router.post("/admin/profile", response_class=PlainTextResponse)
+async def profile(request: Request, seconds: float = 10.0, interval_ms: float = 5.0, idle: bool = False):
+    """
+    Sample every thread of this worker for `seconds` and return the stacks
+    in collapsed format (flamegraph.pl / speedscope), tagged by coordinator
+    step and ServiceNow method. Admin only (X-Admin-Token). Profiles one
+    worker process: with several uvicorn workers, repeat per worker.
+      idle  include threads blocked on locks, queues and sockets
+    """
+    _require_admin(request)
+    if not 0 < seconds <= PROFILE_MAX_S:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {PROFILE_MAX_S:g}].")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=422, detail="interval_ms must be between 1 and 1000.")
+    try:
+        result = await run_in_threadpool(profiler.profile, seconds, interval_ms / 1000, idle)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    return PlainTextResponse(result.collapsed(), headers={
+        "Content-Disposition": 'attachment; filename="profile.collapsed"',
+        "X-Profile-Samples": str(sum(result.samples.values())),
+        "X-Profile-Ticks": str(result.ticks),
+    })
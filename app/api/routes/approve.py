@@ -1,16 +1,47 @@
 # app/api/routes/approve.py
 
-from fastapi import APIRouter, HTTPException
-from requests import HTTPError
+import asyncio
+import dataclasses
+import os
+import time
+from concurrent.futures import Future
 
+from fastapi import APIRouter, HTTPException, Request
+from requests import HTTPError, Timeout
+from starlette.concurrency import run_in_threadpool
+
+from app.api.responses import FastJSONResponse
+from app.core.admission import APPROVED, admission, caller_key
 from app.core.task_store import task_store
+from app.core.correlation import correlator
+from app.core.models import BulkApproveItem, BulkApproveResponse, BulkPlansRequest, ExecuteResponse
+from app.core.results import PlanResult, TaskEntry
 from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import (
+    INSTANCE_HEADER, CircuitOpen, instance_context, resolve_instance, use_instance,
+)
+from app.agents.coordinator_agent import CoordinatorAgent
 from app.agents.incident_report_agent import IncidentReportAgent
-from app.workflows.coordinator_graph import run_agentic_flow
+from app.workflows import speculation
+from app.workflows.coordinator_graph import finish_agentic_flow, run_agentic_flow
 
 router = APIRouter(prefix="/api/v1", tags=["v1"])
 
 _PREFIX = "[AUTOMATION REQUEST]"
+_APPROVAL_NOTE = "Approval received. Executing agentic plan."
+
+_WAITING = {"waiting_approval", "awaiting_approval"}
+_DONE = {"completed", "resolved"}
+_EXECUTING = "executing"
+
+# How long a concurrent approve waits for the caller that owns the execution
+APPROVE_WAIT_S = float(os.getenv("APPROVE_WAIT_S", "180"))
+_POLL_S = 0.1
+# An `executing` claim older than this was left by a worker that died mid-plan: approving again takes it over
+APPROVE_LEASE_S = float(os.getenv("APPROVE_LEASE_S", "900"))
+
+# Executions owned by this process: id -> Future[response]
+_inflight: dict[str, Future] = {}
 
 def _extract_request_from_text(text: str) -> str:
     if not text:
@@ -19,46 +50,300 @@ def _extract_request_from_text(text: str) -> str:
     return t[len(_PREFIX):].strip() if t.lower().startswith(_PREFIX.lower()) else t
 
 
-@router.post("/plans/{id}/approve")
-async def approve_plan(id: str):
+def _response(id: str, result: PlanResult | None) -> ExecuteResponse:
+    result = result or PlanResult(id, "completed")
+    return ExecuteResponse(
+        incident_sys_id=id,
+        status=result.status,
+        diagnosis=result.diagnosis,
+        script=result.script,
+        email_draft=result.email_draft,
+        servicenow_updated=result.servicenow_updated,
+    )
+
+
+def _stale(id: str, entry: TaskEntry) -> bool:
+    """An `executing` claim nobody works on: not in flight in this process, and past its lease."""
+    return id not in _inflight and entry.claimed_at is not None and time.time() - entry.claimed_at > APPROVE_LEASE_S
+
+
+def _claim(id: str, claim: TaskEntry) -> bool:
+    """waiting (or no entry) -> executing; also takes over a stale claim."""
+    return task_store.claim(id, _WAITING | {None, _EXECUTING}, claim,
+                            match=lambda current: current is None or current.status != _EXECUTING or _stale(id, current))
+
+
+async def _await_other_execution(id: str) -> ExecuteResponse:
     """
-    Approve a pending plan and resume execution:
-      1) verify incident exists
-      2) reconstruct original request from description/short_description
-      3) post approval note
-      4) run agentic flow (diagnose/script/email -> resolve)
-      5) persist 'completed' to task_store
+    Another caller claimed this plan. Share its result: await the in-process
+    future, or (claimed by another worker) watch the shared store.
     """
-    # Optional: enforce waiting_approval only if the store has an entry
-    plan_entry = task_store.get(id)
-    if plan_entry and plan_entry.get("status") not in {"waiting_approval", "awaiting_approval"}:
-        raise HTTPException(status_code=400, detail="Plan is not awaiting approval.")
+    fut = _inflight.get(id)
+    if fut is not None:
+        return await asyncio.wrap_future(fut)
 
-    try:
-        inc = ServiceNowClient.get_incident(id)  # Table API read by sys_id
-    except HTTPError as e:
-        raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
+    give_up = time.monotonic() + APPROVE_WAIT_S
+    while time.monotonic() < give_up:
+        entry = task_store.get(id)
+        status = entry.status if entry else None
+        if status in _DONE:
+            return _response(id, entry.result)
+        if status != _EXECUTING or _stale(id, entry):
+            raise HTTPException(status_code=409, detail="Concurrent approval did not complete; retry.")
+        await asyncio.sleep(_POLL_S)
+    raise HTTPException(status_code=504, detail="Timed out waiting for the in-flight approval.")
 
+
+def _request_text(inc: dict) -> str:
     # Prefer long description; fall back to short_description
-    user_request = (
+    return (
         _extract_request_from_text(inc.get("description") or "")
         or _extract_request_from_text(inc.get("short_description") or "")
         or "Run diagnostic & remediation and produce a summary email."
     )
 
-    IncidentReportAgent.post_note(id, "Approval received. Executing agentic plan.")
+
+async def _run_plan(id: str) -> PlanResult:
+    """Read the request back from the incident and run the whole plan."""
+    try:
+        inc = await run_in_threadpool(ServiceNowClient.get_incident, id)  # Table API read by sys_id
+    except HTTPError as e:
+        raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
+    return await _run_request(id, _request_text(inc))
+
+
+async def _run_request(id: str, user_request: str) -> PlanResult:
+    """Post the approval note and run the whole plan for `user_request`."""
+    await run_in_threadpool(IncidentReportAgent.post_note, id, _APPROVAL_NOTE)
 
     # Execute; inside it we PATCH by sys_id and finally resolve with resolution fields.
-    result = run_agentic_flow(id, user_request)
-
-    # Persist terminal state so /tasks reflects completion immediately
-    task_store[id] = {"status": "completed", **result}
-
-    return {
-        "incident_sys_id": id,
-        "status": result.get("status", "completed"),
-        "diagnosis": result.get("diagnosis"),
-        "script": result.get("script"),
-        "email_draft": result.get("email_draft"),
-        "servicenow_updated": result.get("servicenow_updated", True),
-    }
+    return PlanResult.coerce(await asyncio.wrap_future(admission.submit(APPROVED, run_agentic_flow, id, user_request)))
+
+
+async def _approve_one(id: str, request: Request) -> FastJSONResponse:
+    """approve_plan after admission."""
+    # Optional: enforce waiting_approval only if the store has an entry
+    plan_entry = task_store.get(id)
+    instance = use_instance(request.headers.get(INSTANCE_HEADER) or (plan_entry.instance if plan_entry else None))
+    status = plan_entry.status if plan_entry else None
+    if status in _DONE:
+        return FastJSONResponse(_response(id, plan_entry.result))  # already approved: replay, don't re-run
+    if plan_entry and status not in _WAITING | {_EXECUTING}:
+        raise HTTPException(status_code=400, detail="Plan is not awaiting approval.")
+
+    # the incident is about to change: drop the sweeper's snapshot so /tasks reads it live
+    claim = dataclasses.replace(plan_entry or TaskEntry(_EXECUTING, instance=instance),
+                                status=_EXECUTING, claimed_at=time.time(), incident=None)
+    if not _claim(id, claim):
+        return FastJSONResponse(await _await_other_execution(id))
+
+    fut: Future = Future()
+    _inflight[id] = fut
+    try:
+        prepared = await speculation.take(id, plan_entry)
+        request_text = plan_entry.request if plan_entry else None
+        if prepared is not None and request_text:
+            # the steps already ran while the plan waited: only the resolving PATCH is left
+            try:
+                result = PlanResult.coerce(await asyncio.wrap_future(admission.submit(
+                    APPROVED, finish_agentic_flow, id, request_text, prepared, _APPROVAL_NOTE)))
+            except HTTPError as e:
+                raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
+        else:
+            result = await _run_plan(id)
+    except BaseException as e:
+        # Hand the plan back so it can be approved again; wake local waiters
+        if plan_entry:
+            task_store[id] = plan_entry
+        else:
+            task_store.pop(id, None)
+        fut.set_exception(e if isinstance(e, HTTPException)
+                          else HTTPException(status_code=500, detail=f"Approval execution failed: {e}"))
+        fut.exception()  # mark retrieved so an unawaited failure isn't logged
+        raise
+    else:
+        # Persist terminal state so /tasks reflects completion immediately
+        task_store[id] = TaskEntry(result.status, plan=plan_entry.plan if plan_entry else None,
+                                   instance=instance, result=result)
+        correlator.close_incident(id)
+        response = _response(id, result)
+        fut.set_result(response)
+        return FastJSONResponse(response)
+    finally:
+        _inflight.pop(id, None)
+
+
+@router.post("/plans/{id}/approve", response_model=ExecuteResponse, response_class=FastJSONResponse)
+async def approve_plan(id: str, request: Request) -> FastJSONResponse:
+    """
+    Approve a pending plan and resume execution (single-flight per incident):
+      1) atomically claim the plan (waiting_approval -> executing); callers
+         that lose the claim await the winner's result instead of re-running;
+         a claim older than APPROVE_LEASE_S (its worker died) is taken over
+      2) prepared plan (see workflows.speculation): resolve the incident
+         with it in one PATCH that also carries the approval note
+      3) otherwise verify the incident exists, reconstruct the original
+         request from description/short_description, post the approval note
+         and run the agentic flow (diagnose/script/email -> resolve)
+      4) persist 'completed' to task_store
+    Both run on a coordinator worker, ahead of queued auto-remediation.
+    Approvals are rate-limited per caller (429 + Retry-After). ServiceNow
+    calls go to the X-ServiceNow-Instance header's instance, else the one the
+    plan was created on.
+    """
+    admission.admit(caller_key(request.headers.get("X-API-Key"), request.client.host if request.client else None),
+                    APPROVED)
+    try:
+        return await _approve_one(id, request)
+    finally:
+        admission.release(APPROVED)  # the backlog slot, when nothing was queued (replays, 4xx, waits)
+
+
+def upstream_error(e: Exception, incident: bool = True) -> HTTPException:
+    """
+    Per-id result for a failed ServiceNow call: 404 only when the call about
+    this `incident` answered 404, 503 when the instance's breaker is open,
+    504 on timeouts and 502 for anything else (5xx, 403, unserviced).
+    """
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if incident and status == 404:
+        return HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}")
+    if isinstance(e, CircuitOpen):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, Timeout):
+        return HTTPException(status_code=504, detail=f"ServiceNow timed out: {e}")
+    return HTTPException(status_code=502, detail=f"ServiceNow call failed: {e}")
+
+
+async def _approve_claimed(instance: str, claimed: dict[str, TaskEntry | None]) -> dict[str, PlanResult | HTTPException]:
+    """
+    Run the claimed plans of one instance: one sys_idIN query checks they
+    exist, plans not prepared while they waited are prepared concurrently
+    on the coordinator workers, and everything prepared is resolved in
+    Batch API round trips. Plans with a failed step run individually.
+    """
+    outcomes: dict[str, PlanResult | HTTPException] = {}
+    with instance_context(instance):
+        try:
+            found = await run_in_threadpool(ServiceNowClient.get_incidents, list(claimed))
+        except Exception as e:
+            return {id: upstream_error(e, incident=False) for id in claimed}
+        texts: dict[str, str] = {}
+        for id, entry in claimed.items():
+            if id not in found:
+                outcomes[id] = HTTPException(status_code=404, detail="Incident not found or not accessible.")
+            else:
+                texts[id] = (entry.request if entry else None) or _request_text(found[id])
+
+        prepared = dict(zip(texts, await asyncio.gather(*(speculation.take(id, claimed[id]) for id in texts))))
+        todo = [id for id in texts if prepared[id] is None]
+        ran = await asyncio.gather(
+            *(asyncio.wrap_future(admission.submit(APPROVED, CoordinatorAgent.prepare, id, texts[id])) for id in todo),
+            return_exceptions=True)
+        for id, result in zip(todo, ran):
+            prepared[id] = None if isinstance(result, BaseException) else result
+
+        ready = {id: (result, texts[id], _APPROVAL_NOTE) for id, result in prepared.items() if result is not None}
+        try:
+            errors = await asyncio.wrap_future(admission.submit(APPROVED, IncidentReportAgent.resolve_many, ready))
+        except Exception as e:  # the batch call itself failed
+            errors = {id: upstream_error(e, incident=False) for id in ready}
+        for id, error in errors.items():
+            outcomes[id] = (PlanResult.coerce(ready[id][0]) if error is None else
+                            error if isinstance(error, HTTPException) else upstream_error(error))
+
+        # a step failed while preparing: the full run retries it and posts its notes
+        rerun = [id for id, result in prepared.items() if result is None]
+        for id, result in zip(rerun, await asyncio.gather(*(_run_request(id, texts[id]) for id in rerun),
+                                                          return_exceptions=True)):
+            outcomes[id] = (result if not isinstance(result, BaseException) else
+                            result if isinstance(result, HTTPException) else
+                            HTTPException(status_code=500, detail=f"Approval execution failed: {result}"))
+    return outcomes
+
+
+def _item(id: str, outcome: ExecuteResponse | HTTPException) -> BulkApproveItem:
+    if isinstance(outcome, HTTPException):
+        return BulkApproveItem(id=id, status_code=outcome.status_code, error=str(outcome.detail))
+    return BulkApproveItem(id=id, status_code=200, result=outcome)
+
+
+async def _approve_many(body: BulkPlansRequest, request: Request) -> FastJSONResponse:
+    """approve_plans after admission."""
+    header = request.headers.get(INSTANCE_HEADER)
+    outcomes: dict[str, ExecuteResponse | HTTPException] = {}
+    claimed: dict[str, dict[str, TaskEntry | None]] = {}   # instance -> id -> entry before the claim
+    others: list[str] = []
+    for id in dict.fromkeys(body.ids):
+        entry = task_store.get(id)
+        status = entry.status if entry else None
+        if status in _DONE:
+            outcomes[id] = _response(id, entry.result)
+            continue
+        if entry and status not in _WAITING | {_EXECUTING}:
+            outcomes[id] = HTTPException(status_code=400, detail="Plan is not awaiting approval.")
+            continue
+        instance = resolve_instance(header or (entry.instance if entry else None))
+        claim = dataclasses.replace(entry or TaskEntry(_EXECUTING, instance=instance),
+                                    status=_EXECUTING, claimed_at=time.time(), incident=None)
+        if not _claim(id, claim):
+            others.append(id)
+            continue
+        claimed.setdefault(instance, {})[id] = entry
+        _inflight[id] = Future()
+
+    results: dict[str, PlanResult | HTTPException] = {}
+    try:
+        groups = await asyncio.gather(*(_approve_claimed(instance, entries) for instance, entries in claimed.items()),
+                                      return_exceptions=True)
+        for entries, group in zip(claimed.values(), groups):
+            if isinstance(group, Exception):  # one instance failing doesn't fail the others' results
+                group = {id: HTTPException(status_code=500, detail=f"Approval execution failed: {group}")
+                         for id in entries}
+            elif isinstance(group, BaseException):
+                raise group
+            results.update(group)
+    finally:
+        for instance, entries in claimed.items():
+            for id, entry in entries.items():
+                fut = _inflight.pop(id)
+                result = results.get(id) or HTTPException(status_code=500, detail="Approval execution failed.")
+                if isinstance(result, HTTPException):
+                    # Hand the plan back so it can be approved again; wake local waiters
+                    if entry:
+                        task_store[id] = entry
+                    else:
+                        task_store.pop(id, None)
+                    fut.set_exception(result)
+                    fut.exception()
+                    outcomes[id] = result
+                    continue
+                task_store[id] = TaskEntry(result.status, plan=entry.plan if entry else None,
+                                           instance=instance, result=result)
+                correlator.close_incident(id)
+                outcomes[id] = _response(id, result)
+                fut.set_result(outcomes[id])
+
+    for id in others:
+        try:
+            outcomes[id] = await _await_other_execution(id)
+        except HTTPException as e:
+            outcomes[id] = e
+    return FastJSONResponse(BulkApproveResponse(results=[_item(id, outcomes[id]) for id in dict.fromkeys(body.ids)]))
+
+
+@router.post("/plans:approve", response_model=BulkApproveResponse, response_class=FastJSONResponse)
+async def approve_plans(body: BulkPlansRequest, request: Request) -> FastJSONResponse:
+    """
+    Approve many pending plans in one call, with a result per id (the status
+    code /plans/{id}/approve would have answered, and its body or error).
+    Plans are claimed as by the single approve; per instance, existence is
+    checked with one list query and the resolving PATCHes go out through
+    the ServiceNow Batch API. The call takes one admission token.
+    """
+    admission.admit(caller_key(request.headers.get("X-API-Key"), request.client.host if request.client else None),
+                    APPROVED)
+    try:
+        return await _approve_many(body, request)
+    finally:
+        admission.release(APPROVED)  # the backlog slot, when nothing was queued (replays, 4xx, waits)
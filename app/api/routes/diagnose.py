@@ -0,0 +1,41 @@
+# app/api/routes/diagnose.py
+
+import os
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.api.responses import FastJSONResponse
+from app.core.models import DiagnosisResult
+
+router = APIRouter(prefix="/api/v1", tags=["v1"])
+
+DIAGNOSE_BATCH_MAX = int(os.getenv("DIAGNOSE_BATCH_MAX", "10000"))
+
+
+class DiagnoseBatchRequest(BaseModel):
+    items: List[str]
+    top_k: int = 3
+
+
+class DiagnoseBatchResponse(BaseModel):
+    count: int
+    results: List[DiagnosisResult]
+
+
+@router.post("/diagnose:batch", response_model=DiagnoseBatchResponse, response_class=FastJSONResponse)
+async def diagnose_batch(req: DiagnoseBatchRequest):
+    """
+    Diagnose many alert/request texts at once (no incidents are created).
+    Returns one result per item, in order: best root cause plus `ranked`
+    candidates with confidence.
+    """
+    if len(req.items) > DIAGNOSE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {DIAGNOSE_BATCH_MAX} items per batch.")
+    if not 1 <= req.top_k <= 50:
+        raise HTTPException(status_code=422, detail="top_k must be between 1 and 50.")
+    results = await run_in_threadpool(DiagnosticAgent.run_many, req.items, req.top_k)
+    return FastJSONResponse({"count": len(results), "results": results})
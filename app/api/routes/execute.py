@@ -1,49 +1,111 @@
 # app/api/routes/execute.py
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
 from app.agents.incident_report_agent import IncidentReportAgent
+from app.api.responses import FastJSONResponse
+from app.core.admission import AUTO, Rejected, admission, caller_key
+from app.core.correlation import correlator, fingerprint
+from app.core.models import ExecuteRequest, ExecuteResponse
+from app.core.results import Plan, TaskEntry
+from app.core.task_store import task_store
+from app.integrations.servicenow_instances import INSTANCE_HEADER, CircuitOpen, UnknownInstance, use_instance
+from app.workflows import speculation
 from app.workflows.coordinator_graph import run_agentic_flow
 
 router = APIRouter(prefix="/api/v1", tags=["v1"])
 
 
-class ExecuteRequest(BaseModel):
-    request: str
-    require_approval: bool = False
+_PLAN = Plan(
+    ("Run diagnostics", "Generate remediation script", "Draft summary", "Resolve incident"),
+    "Agentic plan prepared. Awaiting approval to execute.",
+)
 
 
-@router.post("/execute")
-async def execute(req: ExecuteRequest):
+async def _attach_duplicate(entry, req: ExecuteRequest) -> ExecuteResponse:
+    """
+    Same request already in flight/open within the correlation window:
+    note it on that incident and hand back the first caller's result.
     """
+    incident_sys_id = await asyncio.wrap_future(entry.incident)
+    await run_in_threadpool(IncidentReportAgent.note_duplicate, incident_sys_id, req.request, entry.duplicates)
+    result = await asyncio.wrap_future(entry.result)
+    return result.model_copy(update={"correlated": True})
+
+
+# the model is encoded once, by FastJSONResponse; unset fields (plan/message on
+# auto-runs, correlated on first callers) are left out
+@router.post("/execute", response_model=ExecuteResponse, response_class=FastJSONResponse)
+async def execute(req: ExecuteRequest, request: Request) -> FastJSONResponse:
+    """
+    Routing:
+      - ServiceNow calls go to `instance` (or the X-ServiceNow-Instance
+        header, or the default instance); unknown names are a 400
+    Admission (first callers only; duplicates attach without a token):
+      - per-caller token bucket (429 + Retry-After when exhausted); auto-run
+        work is queued behind approved plans (503 + Retry-After when full)
+    Correlation:
+      - identical requests (same fingerprint) within the window attach to the
+        existing incident as a note and return its result; no new incident.
+        Only open incidents correlate: an auto-run closes its entry once it
+        has resolved the incident
     Auto-execute path:
       - create incident with mandatory fields
       - run agents with incremental updates
       - resolve with resolution fields
     Approval path:
-      - create incident and return waiting_approval (no automation yet)
+      - create incident and return waiting_approval; the plan's steps are
+        prepared in the background, writing nothing to ServiceNow until
+        it is approved (see workflows.speculation)
     """
+    caller = caller_key(request.headers.get("X-API-Key"), request.client.host if request.client else None)
+    instance = use_instance(req.instance or request.headers.get(INSTANCE_HEADER))
+
+    entry, is_first = correlator.claim(fingerprint(req.request, req.require_approval, instance))
     try:
+        if not is_first:
+            # attaching starts no work: no token spent, never turned away by a full queue
+            return FastJSONResponse(await _attach_duplicate(entry, req))
+        admission.admit(caller, AUTO, queued=not req.require_approval)
+
         # 1) create & capture authoritative sys_id
-        incident_sys_id = IncidentReportAgent.create_incident(req.request)
+        incident_sys_id = await run_in_threadpool(IncidentReportAgent.create_incident, req.request)
+        correlator.bind_incident(entry, incident_sys_id)
 
         # 2) approval or auto-run
         if req.require_approval:
             # in your approve/reject routes, call IncidentReportAgent.* using this sys_id
-            plan = {
-                "steps": ["Run diagnostics", "Generate remediation script", "Draft summary", "Resolve incident"],
-                "summary": "Agentic plan prepared. Awaiting approval to execute.",
-            }
-            return {
-                "incident_sys_id": incident_sys_id,
-                "status": "waiting_approval",
-                "plan": plan,
-                "message": "The incident has been reported. Awaiting approval before initiating automation.",
-            }
-
-        # 3) auto execute in-process (first test case)
-        result = run_agentic_flow(incident_sys_id, req.request)
-        return result
+            task_store[incident_sys_id] = TaskEntry("waiting_approval", plan=_PLAN, instance=instance,
+                                                    request=req.request)
+            speculation.start(incident_sys_id, req.request)
+            result = ExecuteResponse(
+                incident_sys_id=incident_sys_id,
+                status="waiting_approval",
+                plan=_PLAN,
+                message="The incident has been reported. Awaiting approval before initiating automation.",
+            )
+        else:
+            # 3) auto execute on a coordinator worker (duplicates can attach meanwhile)
+            flow = await asyncio.wrap_future(admission.submit(AUTO, run_agentic_flow, incident_sys_id, req.request))
+            # the one serialization of the plan result, shared with correlated duplicates
+            result = ExecuteResponse.model_validate(flow)
+
+        entry.result.set_result(result)
+        if not req.require_approval:
+            correlator.close_incident(incident_sys_id)  # resolved: only open incidents correlate
+        return FastJSONResponse(result)
 
+    except (Rejected, CircuitOpen, UnknownInstance, HTTPException) as e:
+        # these have their own handlers (429/503 + Retry-After, 400, ...)
+        if is_first:
+            correlator.fail(entry, e)  # duplicates that attached meanwhile are turned away with it
+        raise
     except Exception as e:
+        if is_first:
+            correlator.fail(entry, e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission.release(AUTO)  # the backlog slot, if the request failed before queueing its run
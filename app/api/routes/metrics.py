@@ -0,0 +1,34 @@
+# app/api/routes/metrics.py
+
+from fastapi import APIRouter
+
+from app.agents.coordinator_agent import PLAN_CACHE
+from app.api.responses import FastJSONResponse
+from app.core import memory
+from app.core.admission import admission
+from app.integrations.servicenow_instances import registry
+from app.workflows import reconciler, speculation
+from app.workflows.change_feed import change_feed
+
+router = APIRouter(prefix="/api/v1", tags=["v1"])
+
+
+@router.get("/metrics", response_class=FastJSONResponse)
+def metrics():
+    """
+    Process-local counters: admission per priority class (admitted/rejected,
+    queue depth, queue-wait latency percentiles), the plan cache, per
+    ServiceNow instance latency/throughput and breaker state, the last
+    reconciliation sweep, the change feed's counters and watermarks, plans
+    prepared ahead of approval, and the bytes held by each cache and the
+    task store.
+    """
+    return FastJSONResponse({
+        "admission": admission.stats(),
+        "plan_cache": PLAN_CACHE.stats(),
+        "servicenow": registry.stats(),
+        "reconciler": reconciler.stats(),
+        "change_feed": change_feed.stats(),
+        "speculation": speculation.stats(),
+        "memory": memory.report(),
+    })
@@ -1,34 +1,55 @@
 # app/api/routes/reject.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from requests import HTTPError
+from starlette.concurrency import run_in_threadpool
 
+from app.api.responses import FastJSONResponse
+from app.api.routes.approve import upstream_error
+from app.core.models import BulkPlansRequest, BulkRejectItem, BulkRejectResponse, RejectResponse
 from app.core.task_store import task_store
+from app.core.correlation import correlator
+from app.core.results import TaskEntry
 from app.agents.incident_report_agent import IncidentReportAgent
 from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import INSTANCE_HEADER, instance_context, resolve_instance, use_instance
 
 # Keep routes grouped and documented under /api/v1
 router = APIRouter(prefix="/api/v1", tags=["v1"])
 
-@router.post("/plans/{id}/reject")
-async def reject_plan(id: str):
+_WAITING = {"waiting_approval", "awaiting_approval"}
+_MESSAGE = "Plan rejected. Incident flagged for manual investigation."
+
+@router.post("/plans/{id}/reject", response_model=RejectResponse, response_class=FastJSONResponse)
+async def reject_plan(id: str, request: Request):
     """
     Reject a pending automation plan (id must be the incident sys_id).
     Behavior:
       - Validates the incident exists by sys_id (Table API read)
       - Posts a work note and leaves the incident open for humans
-      - Persists status in task_store so GET /api/v1/tasks/{id} shows
-        'manual_intervention_required' immediately
+      - Claims the plan in task_store (only while it waits for approval),
+        so GET /api/v1/tasks/{id} shows 'manual_intervention_required'
+        immediately and a concurrent approve cannot run it
+      - Talks to the X-ServiceNow-Instance header's instance, else the one
+        the plan was created on
     """
+    plan_entry = task_store.get(id)
+    instance = use_instance(request.headers.get(INSTANCE_HEADER) or (plan_entry.instance if plan_entry else None))
+
     # 1) Verify the incident exists (read by sys_id is the canonical pattern)
     try:
         _ = ServiceNowClient.get_incident(id)
     except HTTPError as e:
         raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
 
-    # 2) Check any stored plan state (if present)
-    plan_entry = task_store.get(id)
-    if plan_entry and plan_entry.get("status") not in {"waiting_approval", "awaiting_approval"}:
+    # 2) Claim straight to the terminal status (so /tasks reflects it), only
+    #    while the plan still waits: a concurrent approve can't run it meanwhile
+    if not task_store.claim(id, _WAITING | {None}, TaskEntry(
+            "manual_intervention_required",
+            plan=plan_entry.plan if plan_entry else None,
+            reason="rejected",
+            instance=instance,
+    )):
         raise HTTPException(status_code=400, detail="Plan is not waiting for approval.")
 
     # 3) Post note & keep incident open for human follow-up
@@ -36,17 +57,77 @@ async def reject_plan(id: str):
         # This method should add a work_note and set state=1 (New) or leave as-is.
         IncidentReportAgent.mark_manual_intervention(id)
     except Exception as e:
+        # hand the plan back so it can still be approved or rejected
+        if plan_entry:
+            task_store[id] = plan_entry
+        else:
+            task_store.pop(id, None)
         raise HTTPException(status_code=500, detail=f"Failed to mark manual intervention: {e}")
+    correlator.close_incident(id)
 
-    # 4) Persist terminal status in your local store so /tasks reflects it
-    task_store[id] = {
-        "status": "manual_intervention_required",
-        "plan": plan_entry.get("plan") if plan_entry else None,
-        "reason": "rejected",
-    }
-
-    return {
+    return FastJSONResponse({
         "id": id,
         "status": "manual_intervention_required",
-        "message": "Plan rejected. Incident flagged for manual investigation.",
-    }
+        "message": _MESSAGE,
+    })
+
+
+def _reject_group(instance: str, entries: dict[str, TaskEntry | None]) -> dict[str, BulkRejectItem]:
+    """Reject the plans of one instance: one sys_idIN query, then one batched PATCH."""
+    out: dict[str, BulkRejectItem] = {}
+    with instance_context(instance):
+        try:
+            found = ServiceNowClient.get_incidents(list(entries))
+        except Exception as e:
+            error = upstream_error(e, incident=False)
+            return {id: BulkRejectItem(id=id, status_code=error.status_code, error=error.detail) for id in entries}
+        # claim straight to the terminal entry so a concurrent approve can't run the plan meanwhile
+        claimed = {}
+        for id, entry in entries.items():
+            if id not in found:
+                out[id] = BulkRejectItem(id=id, status_code=404, error="Incident not found or not accessible.")
+            elif not task_store.claim(id, _WAITING | {None}, TaskEntry(
+                    "manual_intervention_required", plan=entry.plan if entry else None,
+                    reason="rejected", instance=instance)):
+                out[id] = BulkRejectItem(id=id, status_code=400, error="Plan is not waiting for approval.")
+            else:
+                claimed[id] = entry
+        try:
+            errors = {id: e and upstream_error(e) for id, e in
+                      IncidentReportAgent.mark_manual_intervention_many(list(claimed)).items()}
+        except Exception as e:  # the batch call itself failed
+            errors = {id: upstream_error(e, incident=False) for id in claimed}
+        for id, entry in claimed.items():
+            if errors[id] is not None:
+                if entry:
+                    task_store[id] = entry
+                else:
+                    task_store.pop(id, None)
+                out[id] = BulkRejectItem(id=id, status_code=errors[id].status_code, error=errors[id].detail)
+                continue
+            correlator.close_incident(id)
+            out[id] = BulkRejectItem(id=id, status_code=200, result=RejectResponse(
+                id=id, status="manual_intervention_required", message=_MESSAGE))
+    return out
+
+
+@router.post("/plans:reject", response_model=BulkRejectResponse, response_class=FastJSONResponse)
+async def reject_plans(body: BulkPlansRequest, request: Request):
+    """
+    Reject many pending plans in one call, with a result per id (the status
+    code /plans/{id}/reject would have answered, and its body or error).
+    Per instance, existence is checked with one list query and the work
+    notes go out in ServiceNow Batch API round trips.
+    """
+    header = request.headers.get(INSTANCE_HEADER)
+    items: dict[str, BulkRejectItem] = {}
+    groups: dict[str, dict[str, TaskEntry | None]] = {}
+    for id in dict.fromkeys(body.ids):
+        entry = task_store.get(id)
+        if entry and entry.status not in _WAITING:
+            items[id] = BulkRejectItem(id=id, status_code=400, error="Plan is not waiting for approval.")
+            continue
+        groups.setdefault(resolve_instance(header or (entry.instance if entry else None)), {})[id] = entry
+    for instance, entries in groups.items():
+        items.update(await run_in_threadpool(_reject_group, instance, entries))
+    return FastJSONResponse(BulkRejectResponse(results=[items[id] for id in dict.fromkeys(body.ids)]))
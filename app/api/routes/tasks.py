@@ -1,14 +1,52 @@
 # app/api/routes/tasks.py
 
-from fastapi import APIRouter, HTTPException
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from requests import HTTPError
-import requests
 
+from app.api.responses import Encoded, FastJSONResponse, dumps
+from app.core import memory
+from app.core.memory import BoundedCache
+from app.core.models import TaskView
 from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import INSTANCE_HEADER, use_instance
+from app.core.results import TaskEntry
 from app.core.task_store import task_store
+from app.workflows import reconciler
+from app.workflows.change_feed import JOURNAL, Change, change_feed
 
 router = APIRouter(prefix="/api/v1", tags=["v1"])
 
+# Bulk export: incidents per sys_idIN batch, journal rows per page, and how
+# many SN pages may be in flight at once
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "100"))
+EXPORT_JOURNAL_PAGE = int(os.getenv("EXPORT_JOURNAL_PAGE", "1000"))
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "4"))
+
+# Incidents whose encoded `updates` list GET /tasks/{id} keeps (0 disables), their
+# total bytes, and how long one is kept (0: until evicted or invalidated)
+TASK_UPDATES_CACHE_SIZE = int(os.getenv("TASK_UPDATES_CACHE_SIZE", "1024"))
+TASK_UPDATES_CACHE_MAX_BYTES = int(os.getenv("TASK_UPDATES_CACHE_MAX_BYTES", str(16 << 20)))
+TASK_UPDATES_CACHE_TTL_S = float(os.getenv("TASK_UPDATES_CACHE_TTL_S", "3600"))
+
+_SYS_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # ids are spliced into sys_idIN queries
+_INCIDENT_FIELDS = "sys_id,number,state,incident_state,short_description"
+_JOURNAL_FIELDS = "documentkey,sys_created_on,sys_created_by,element,value"
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# (instance, sys_id) -> (journal version, encoded updates, journal)
+_updates = BoundedCache(TASK_UPDATES_CACHE_SIZE, TASK_UPDATES_CACHE_MAX_BYTES, TASK_UPDATES_CACHE_TTL_S)
+memory.register("task_updates", lambda: _updates.stats())
+
 # map numeric incident_state to human-ish label (SN core states)
 _STATE_LABEL = {
     "1": "New",
@@ -42,62 +80,33 @@ def _fetch_journal_entries(incident_sys_id: str) -> list[dict]:
     Fetch work notes + comments from sys_journal_field for this incident.
     Requires read ACLs to that table; if not available, returns [].
     """
-    base = ServiceNowClient.INSTANCE_URL
-    url = f"{base}/api/now/table/sys_journal_field"
-
     # Only notes for this record; order oldest->newest
     query = f"name=incident^elementINcomments,work_notes^documentkey={incident_sys_id}^ORDERBYsys_created_on"
-    params = {
-        "sysparm_query": query,
-        "sysparm_fields": "sys_created_on,sys_created_by,element,value",
-        "sysparm_display_value": "true",
-        "sysparm_limit": "100",
-    }
-
     try:
-        r = requests.get(
-            url,
-            headers=ServiceNowClient.HEADERS,
-            auth=ServiceNowClient._get_auth(),
-            params=params,
-            timeout=30,
+        rows, _ = ServiceNowClient.query_table(
+            "sys_journal_field", query, "sys_created_on,sys_created_by,element,value",
+            limit=100, display_value=True,
         )
-        r.raise_for_status()
-        rows = r.json().get("result", [])
-        return [
-            {
-                "timestamp": row.get("sys_created_on"),
-                "author": row.get("sys_created_by"),
-                "type": row.get("element"),  # "work_notes" or "comments"
-                "text": row.get("value", "") or "",
-            }
-            for row in rows
-        ]
+        return [_journal_entry(row) for row in rows]
     except Exception:
         # If ACLs block access, degrade gracefully
         return []
 
 
-@router.get("/tasks/{id}")
-async def get_task(id: str):
-    """
-    Return current task/incident status and a simple timeline of updates.
-    Approval workflow status prefers task_store; otherwise derive from SN.
-    """
-    # Load any stored approval/workflow status
-    store = task_store.get(id) or {}
-    store_status = store.get("status")
+def _journal_entry(row: dict) -> dict:
+    return {
+        "timestamp": row.get("sys_created_on"),
+        "author": row.get("sys_created_by"),
+        "type": row.get("element"),  # "work_notes" or "comments"
+        "text": row.get("value", "") or "",
+    }
 
-    try:
-        inc = ServiceNowClient.get_incident(id)   # READ by sys_id
-    except HTTPError as e:
-        raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
 
+def _task_view(id: str, inc: dict, journal: list[dict], store: Optional[TaskEntry]) -> dict:
+    """Task/incident status and timeline, as returned by GET /tasks/{id}."""
+    store_status = store.status if store else None
     state = str(inc.get("state") or inc.get("incident_state") or "")
     state_label = _STATE_LABEL.get(state, f"State {state or 'unknown'}")
-
-    # Timeline from journal (work notes + comments)
-    journal = _fetch_journal_entries(id)
     updates_texts = [j.get("text", "") for j in journal if j.get("text")]
 
     # Precedence rules:
@@ -122,6 +131,208 @@ async def get_task(id: str):
         "state_label": state_label,
         "status": status,                # active | waiting_approval | completed | manual_intervention_required
         "updates": journal,              # [{timestamp,author,type,text}, ...]
-        "plan": store.get("plan"),
-        "result": store.get("result"),
+        "plan": store.plan if store else None,        # encoded straight from the result dataclasses
+        "result": store.result if store else None,
     }
+
+
+def _encoded_updates(instance: str, id: str, journal: list[dict]) -> Encoded:
+    """
+    `journal` encoded, reusing the previous encoding while the incident's
+    journal is unchanged. Journal entries are append-only, so the entry
+    count and the newest entry identify a version.
+    """
+    version = (len(journal), tuple(journal[-1].values()) if journal else None)
+    key = (instance, id)
+    hit = _updates.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    encoded = Encoded(dumps(journal))
+    _updates.put(key, (version, encoded, journal))
+    return encoded
+
+
+def _cached_journal(instance: str, id: str) -> Optional[Tuple[list, Encoded]]:
+    """The journal and its encoding as last fetched, while the change feed vouches it is current."""
+    if not change_feed.live(instance):
+        return None
+    hit = _updates.get((instance, id))
+    return (hit[2], hit[1]) if hit is not None else None
+
+
+@change_feed.subscribe
+def _journal_changed(change: Change) -> None:
+    # a new note or comment: the next GET /tasks/{id} reads the journal again
+    if change.table == JOURNAL:
+        _updates.pop((change.instance, change.sys_id), None)
+
+
+# --- Bulk export ---------------------------------------------------------------
+def _export_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=EXPORT_CONCURRENCY, thread_name_prefix="export")
+        return _pool
+
+
+def _submit(fn, *args) -> Future:
+    # pool threads don't inherit contextvars; carry the caller's (instance routing)
+    return _export_pool().submit(contextvars.copy_context().run, fn, *args)
+
+
+def _fetch_journals(ids: List[str]) -> dict[str, list[dict]]:
+    """
+    Journal entries for a batch of incidents, grouped by documentkey. The
+    first page reports X-Total-Count; the remaining pages are fetched
+    concurrently (bounded by the export pool).
+    """
+    query = (
+        f"name=incident^elementINcomments,work_notes^documentkeyIN{','.join(ids)}"
+        "^ORDERBYdocumentkey^ORDERBYsys_created_on"
+    )
+
+    def page(offset: int) -> list[dict]:
+        rows, _ = ServiceNowClient.query_table(
+            "sys_journal_field", query, _JOURNAL_FIELDS,
+            limit=EXPORT_JOURNAL_PAGE, offset=offset, display_value=True,
+        )
+        return rows
+
+    grouped: dict[str, list[dict]] = {i: [] for i in ids}
+    try:
+        rows, total = ServiceNowClient.query_table(
+            "sys_journal_field", query, _JOURNAL_FIELDS,
+            limit=EXPORT_JOURNAL_PAGE, offset=0, display_value=True,
+        )
+        pages = [rows]
+        if total is not None:
+            offsets = range(EXPORT_JOURNAL_PAGE, total, EXPORT_JOURNAL_PAGE)
+            pages += [f.result() for f in [_submit(page, o) for o in offsets]]
+        else:
+            # no count header: walk pages until a short one
+            while len(pages[-1]) == EXPORT_JOURNAL_PAGE:
+                pages.append(page(EXPORT_JOURNAL_PAGE * len(pages)))
+    except Exception:
+        # If ACLs block access, degrade gracefully (as GET /tasks/{id} does)
+        return grouped
+
+    for rows in pages:
+        for row in rows:
+            key = row.get("documentkey")
+            if key in grouped:
+                grouped[key].append(_journal_entry(row))
+    return grouped
+
+
+def _incident_batches(ids: Optional[List[str]], query: Optional[str]) -> Iterator[Future]:
+    """Futures of incident-row batches, in export order."""
+
+    def by_ids(chunk: List[str]) -> List[dict]:
+        rows, _ = ServiceNowClient.query_table(
+            ServiceNowClient.TABLE, f"sys_idIN{','.join(chunk)}", _INCIDENT_FIELDS, limit=len(chunk),
+        )
+        found = {r.get("sys_id"): r for r in rows}
+        # keep the caller's order; report ids SN did not return
+        return [found.get(i) or {"sys_id": i, "_missing": True} for i in chunk]
+
+    def by_query(offset: int) -> List[dict]:
+        rows, _ = ServiceNowClient.query_table(
+            ServiceNowClient.TABLE, f"{query}^ORDERBYsys_created_on^ORDERBYsys_id", _INCIDENT_FIELDS,
+            limit=EXPORT_BATCH_SIZE, offset=offset,
+        )
+        return rows
+
+    if ids is not None:
+        for start in range(0, len(ids), EXPORT_BATCH_SIZE):
+            yield _submit(by_ids, ids[start:start + EXPORT_BATCH_SIZE])
+        return
+    offset = 0
+    while True:
+        fut = _submit(by_query, offset)
+        yield fut
+        if len(fut.result()) < EXPORT_BATCH_SIZE:
+            return
+        offset += EXPORT_BATCH_SIZE
+
+
+def iter_task_export(ids: Optional[List[str]] = None, query: Optional[str] = None) -> Iterator[bytes]:
+    """
+    NDJSON lines, one task view per incident. One batch is exported while the
+    next is being fetched, so memory is bounded by two batches regardless of
+    how many incidents match.
+    """
+    batches = _incident_batches(ids, query)
+    try:
+        current = next(batches, None)
+        while current is not None:
+            following = next(batches, None)  # prefetch while this batch is written out
+            incidents = current.result()
+            present = [inc["sys_id"] for inc in incidents if not inc.get("_missing")]
+            journals = _fetch_journals(present) if present else {}
+            for inc in incidents:
+                sys_id = inc["sys_id"]
+                if inc.get("_missing"):
+                    line = {"incident_sys_id": sys_id, "error": "Incident not found or not accessible"}
+                else:
+                    line = _task_view(sys_id, inc, journals.get(sys_id, []), task_store.get(sys_id))
+                yield dumps(line) + b"\n"
+            current = following
+    except Exception as e:
+        # headers are already sent: report the failure in-band and stop
+        yield dumps({"error": f"Export aborted: {e}"}) + b"\n"
+
+
+@router.get("/tasks/export")
+async def export_tasks(request: Request, ids: Optional[str] = None, query: Optional[str] = None):
+    """
+    Stream task timelines as NDJSON (declared before /tasks/{id} so "export"
+    is not taken for an id).
+      ids    comma-separated incident sys_ids (output keeps this order)
+      query  encoded query on the incident table, e.g. "active=true^priority=1"
+             (ignored when ids are given)
+    Async so the instance chosen by X-ServiceNow-Instance stays set while the
+    response streams.
+    """
+    use_instance(request.headers.get(INSTANCE_HEADER))
+    id_list = [i.strip() for i in (ids or "").split(",") if i.strip()] or None
+    if not id_list and not query:
+        raise HTTPException(status_code=400, detail="Provide ids or query.")
+    if id_list and not all(_SYS_ID.match(i) for i in id_list):
+        raise HTTPException(status_code=400, detail="ids must be comma-separated sys_ids.")
+    return StreamingResponse(iter_task_export(id_list, None if id_list else query),
+                             media_type="application/x-ndjson")
+
+
+@router.get("/tasks/{id}", response_model=TaskView, response_class=FastJSONResponse)
+async def get_task(id: str, request: Request) -> FastJSONResponse:
+    """
+    Return current task/incident status and a simple timeline of updates.
+    Approval workflow status prefers task_store; otherwise derive from SN.
+    Incident fields come from the reconciler's snapshot while it is fresh.
+    The encoded `updates` list is cached per incident until its journal
+    changes; while the change feed is live, tracked incidents are served
+    from that cache without a journal query.
+    """
+    # Load any stored approval/workflow status
+    store = task_store.get(id)
+    instance = use_instance(request.headers.get(INSTANCE_HEADER) or (store.instance if store else None))
+
+    # incident fields from a recent reconciliation sweep, else read by sys_id
+    inc = reconciler.snapshot(store)
+    if inc is None:
+        try:
+            inc = ServiceNowClient.get_incident(id)
+        except HTTPError as e:
+            raise HTTPException(status_code=404, detail=f"Incident not found or not accessible: {e}") from e
+
+    # Timeline from journal (work notes + comments)
+    cached = _cached_journal(instance, id) if store is not None else None
+    if cached is not None:
+        journal, updates = cached
+    else:
+        journal = _fetch_journal_entries(id)
+        updates = _encoded_updates(instance, id, journal)
+    view = _task_view(id, inc, journal, store)
+    view["updates"] = updates
+    return FastJSONResponse(view)
@@ -0,0 +1,315 @@
+# app/core/admission.py
+"""
+Admission control in front of the coordinator.
+
+  1) Token buckets per (caller, priority class): a caller over its rate is
+     rejected with a Retry-After hint instead of queueing more work.
+  2) One priority-ordered work queue feeds a fixed set of coordinator
+     workers: approved human plans run ahead of auto-remediation, which
+     runs ahead of speculative preparation, FIFO within a class. A class
+     whose backlog is full is rejected too.
+  3) Per-class counters and queue-wait latency for /api/v1/metrics.
+
+Rates are per caller (API key, else client address) and configured per class:
+ADMISSION_<CLASS>_RATE tokens/s (0 disables limiting) and
+ADMISSION_<CLASS>_BURST bucket size; ADMISSION_<CLASS>_QUEUE_MAX bounds the
+backlog. COORDINATOR_WORKERS sets how many plans run at once.
+
+The backlog check and the enqueue are one step: admit() reserves a slot
+that the caller's submit() (same context) takes over, or that release()
+hands back when the caller ends up not queueing anything, so concurrent
+callers cannot overshoot the bound between the two.
+"""
+
+from __future__ import annotations
+import contextvars
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Lower runs first
+APPROVED = "approved"      # a human approved this plan
+AUTO = "auto"              # auto-remediation from /execute
+SPECULATIVE = "speculative"  # preparing a plan that awaits approval (see workflows.speculation)
+PRIORITIES: Dict[str, int] = {APPROVED: 0, AUTO: 1, SPECULATIVE: 2}
+
+COORDINATOR_WORKERS = int(os.getenv("COORDINATOR_WORKERS", "8"))
+# Distinct callers tracked per class; the least recently seen are forgotten
+_MAX_CALLERS = int(os.getenv("ADMISSION_MAX_CALLERS", "10000"))
+# Recent waits kept per class for percentiles
+_WAIT_SAMPLES = 1024
+
+# Slots this context's admit() reserved: (controller, class) -> [still open]
+_reserved: contextvars.ContextVar[Dict[Tuple[Any, str], List[bool]]] = contextvars.ContextVar(
+    "admission_reserved", default={})
+
+
+@dataclass(frozen=True)
+class ClassPolicy:
+    rate: float        # tokens/s per caller; 0 = unlimited
+    burst: float
+    queue_max: int     # queued (not yet running) items; 0 = unbounded
+
+
+def _policy(klass: str, rate: str, burst: str, queue_max: str) -> ClassPolicy:
+    prefix = f"ADMISSION_{klass.upper()}_"
+    return ClassPolicy(
+        float(os.getenv(prefix + "RATE", rate)),
+        float(os.getenv(prefix + "BURST", burst)),
+        int(os.getenv(prefix + "QUEUE_MAX", queue_max)),
+    )
+
+
+POLICIES: Dict[str, ClassPolicy] = {
+    APPROVED: _policy(APPROVED, "2", "30", "0"),   # humans: never turned away by a full queue
+    AUTO: _policy(AUTO, "1", "20", "200"),
+    SPECULATIVE: _policy(SPECULATIVE, "0", "0", "100"),  # internal work: dropped, not retried, when full
+}
+
+
+class Rejected(Exception):
+    """Admission refused; `status` is 429 (rate limited) or 503 (queue full)."""
+
+    def __init__(self, status: int, retry_after_s: float, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.retry_after_s = retry_after_s
+        self.detail = detail
+
+    @property
+    def retry_after(self) -> str:
+        """Retry-After header value (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after_s)))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic() if now is None else now
+
+    def take(self, now: float, n: float = 1.0) -> float:
+        """Take n tokens; returns 0 on success, else seconds until they are available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+
+class _ClassStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.completed = 0
+        self.failed = 0
+        self.queued = 0
+        self.reserved = 0      # admitted, not submitted yet
+        self.running = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self.run_total = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        done = self.completed + self.failed
+        return {
+            "admitted": self.admitted,
+            "rejected_rate_limited": self.rate_limited,
+            "rejected_queue_full": self.queue_full,
+            "queued": self.queued,
+            "reserved": self.reserved,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_wait_s": {
+                "count": self.wait_count,
+                "mean": round(self.wait_total / self.wait_count, 4) if self.wait_count else 0.0,
+                "max": round(self.wait_max, 4),
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+            },
+            "run_s_mean": round(self.run_total / done, 4) if done else 0.0,
+        }
+
+
+def caller_key(api_key: Optional[str], client_host: Optional[str]) -> str:
+    """Bucket identity: a digest of the API key (never kept verbatim), else the client address."""
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (client_host or "unknown")
+
+
+class AdmissionController:
+    """Token buckets plus the priority work queue (see module docstring)."""
+
+    def __init__(self, policies: Dict[str, ClassPolicy] = POLICIES, workers: int = COORDINATOR_WORKERS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.policies = dict(policies)
+        self.workers = max(1, workers)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stats: Dict[str, _ClassStats] = {k: _ClassStats() for k in self.policies}
+
+    # -- admission ------------------------------------------------------------
+    def admit(self, caller: str, klass: str, queued: bool = True) -> None:
+        """
+        Spend one token of the caller's bucket for `klass`; raises Rejected(429)
+        when it is empty, or Rejected(503) when `queued` work would find the
+        class backlog full. Admitted `queued` work holds a backlog slot until
+        this context's next submit() of the class, or release().
+        """
+        policy = self.policies[klass]
+        with self._lock:
+            stats = self._stats[klass]
+            bounded = queued and policy.queue_max > 0
+            if bounded and stats.queued + stats.reserved >= policy.queue_max:
+                stats.queue_full += 1
+                raise Rejected(503, self._retry_estimate(klass), f"Too many queued {klass} requests; retry later.")
+            if policy.rate > 0:
+                self._take_token(caller, klass, policy, stats)
+            if bounded:
+                self._take_slot(klass)  # admitted twice without submitting: one slot
+                stats.reserved += 1
+                _reserved.set({**_reserved.get(), (self, klass): [True]})
+
+    def release(self, klass: str) -> None:
+        """Hand back the slot this context's admit() reserved, if submit() has not taken it."""
+        with self._lock:
+            self._take_slot(klass)
+
+    def _take_token(self, caller: str, klass: str, policy: ClassPolicy, stats: _ClassStats) -> None:
+        # caller holds self._lock
+        now = self._clock()
+        key = (klass, caller)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(policy.rate, policy.burst, now)
+            while len(self._buckets) > _MAX_CALLERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take(now)
+        if wait:
+            stats.rate_limited += 1
+            raise Rejected(429, wait, f"Rate limit exceeded for {klass} requests; retry later.")
+
+    def _take_slot(self, klass: str) -> None:
+        # caller holds self._lock: the reservation made by this context's admit(), if still open
+        slot = _reserved.get().get((self, klass))
+        if slot and slot[0]:
+            slot[0] = False
+            self._stats[klass].reserved -= 1
+
+    # -- queue ------------------------------------------------------------------
+    def _start_workers(self) -> None:
+        # caller holds self._lock
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"coordinator-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _retry_estimate(self, klass: str) -> float:
+        # caller holds self._lock: time for the backlog ahead to drain
+        stats = self._stats[klass]
+        done = stats.completed + stats.failed
+        per_item = stats.run_total / done if done else 1.0
+        ahead = sum(1 for item in self._heap if item[0] <= PRIORITIES[klass])
+        return per_item * (ahead + 1) / self.workers
+
+    def submit(self, klass: str, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Queue fn(*args) for a coordinator worker; returns its Future. Capacity
+        is checked by admit(), before the caller does any work, so submit never
+        rejects; it takes over the slot admit() reserved in this context. The
+        caller's contextvars travel with the work item.
+        """
+        fut: Future = Future()
+        ctx = contextvars.copy_context()
+        with self._lock:
+            self._take_slot(klass)
+            stats = self._stats[klass]
+            stats.admitted += 1
+            stats.queued += 1
+            heapq.heappush(self._heap, (PRIORITIES[klass], next(self._seq), self._clock(), klass, ctx, fn, args, fut))
+            self._start_workers()
+            self._ready.notify()
+        return fut
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                while not self._heap:
+                    self._ready.wait()
+                _, _, enqueued, klass, ctx, fn, args, fut = heapq.heappop(self._heap)
+                stats = self._stats[klass]
+                stats.queued -= 1
+                started = self._clock()
+                wait = started - enqueued
+                stats.wait_count += 1
+                stats.wait_total += wait
+                stats.wait_max = max(stats.wait_max, wait)
+                stats.waits.append(wait)
+                stats.running += 1
+            ok = False
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(ctx.run(fn, *args))
+                    ok = True
+                except BaseException as e:
+                    fut.set_exception(e)
+            with self._lock:
+                stats = self._stats[klass]  # reset() may have swapped it
+                stats.running -= 1
+                stats.run_total += self._clock() - started
+                if ok:
+                    stats.completed += 1
+                else:
+                    stats.failed += 1
+
+    # -- metrics ------------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "callers_tracked": len(self._buckets),
+                "classes": {
+                    k: {**self._stats[k].snapshot(), "rate": p.rate, "burst": p.burst, "queue_max": p.queue_max}
+                    for k, p in self.policies.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """Forget buckets and counters (queued work is kept)."""
+        with self._lock:
+            self._buckets.clear()
+            for k, s in self._stats.items():
+                fresh = _ClassStats()
+                fresh.queued, fresh.reserved, fresh.running = s.queued, s.reserved, s.running
+                self._stats[k] = fresh
+
+
+admission = AdmissionController()
@@ -0,0 +1,149 @@
+# app/core/correlation.py
+
+from __future__ import annotations
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+CORRELATION_WINDOW_S = float(os.getenv("CORRELATION_WINDOW_S", "600"))
+
+_TIMESTAMP = re.compile(r"\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?\b")
+# clock times and durations (10am, 10:30pm, 2h, 500ms, 15min): noise, and never hosts
+_TIME = re.compile(r"(?<![\w.-])\d+(?::\d{2})?(?:am|pm|ms|min|s|m|h|d)(?![\w-]|\.\w)")
+_IPV4 = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?:/\d{1,2})?\b")
+# host-ish tokens: letters and digits mixed, optionally dotted/dashed (vm-node1, web01.prod.local, win2019)
+_HOST = re.compile(r"\b(?=[\w.-]*[a-z])(?=[\w.-]*\d)[a-z0-9][\w-]*(?:\.[a-z0-9][\w-]*)*\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WS = re.compile(r"\s+")
+
+
+def _masked(text: str) -> str:
+    return _TIME.sub(" ", _TIMESTAMP.sub(" ", (text or "").lower()))
+
+
+def extract_entities(text: str) -> List[str]:
+    """Hosts, IPs/CIDRs named in a request (lowercased, sorted, unique)."""
+    t = _masked(text)
+    entities = set(_IPV4.findall(t))
+    entities.update(_HOST.findall(_IPV4.sub(" ", t)))
+    return sorted(entities)
+
+
+def fingerprint(text: str, *qualifiers: object) -> str:
+    """
+    Stable key for "the same request": entities are kept verbatim (a different
+    host is a different incident) while timestamps, clock times, durations
+    and other numbers - CPU percentages, counts - are masked. `qualifiers` (e.g. require_approval)
+    are folded in as-is.
+    """
+    entities = extract_entities(text)
+    t = _IPV4.sub(" ", _masked(text))
+    t = _HOST.sub(" ", t)
+    t = _WS.sub(" ", _NUMBER.sub("0", t)).strip()
+    raw = "\x1f".join([t, ",".join(entities), *map(str, qualifiers)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CorrelationEntry:
+    """
+    One open incident that identical requests attach to.
+    `incident` resolves to the sys_id once created; `result` to the response
+    the first caller produced.
+    """
+    key: str
+    created_at: float
+    incident: Future = field(default_factory=Future)
+    result: Future = field(default_factory=Future)
+    duplicates: int = 0
+
+
+class IncidentCorrelator:
+    """
+    Recent-fingerprint index (dict: O(1) lookups) with a time window.
+    Entries are kept in creation order so expiry pops from the front.
+    """
+
+    def __init__(self, window_s: float = CORRELATION_WINDOW_S):
+        self.window_s = window_s
+        self._entries: "OrderedDict[str, CorrelationEntry]" = OrderedDict()
+        self._by_incident: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.created_at < self.window_s:
+                break
+            self._entries.popitem(last=False)
+            self._forget_incident(entry)
+
+    def _forget_incident(self, entry: CorrelationEntry) -> None:
+        if entry.incident.done() and not entry.incident.exception():
+            self._by_incident.pop(entry.incident.result(), None)
+
+    def claim(self, key: str) -> Tuple[CorrelationEntry, bool]:
+        """
+        Return (entry, True) if the caller is first and must create the
+        incident, or (existing entry, False) for a duplicate within the window.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.duplicates += 1
+                return entry, False
+            entry = CorrelationEntry(key=key, created_at=now)
+            self._entries[key] = entry
+            return entry, True
+
+    def bind_incident(self, entry: CorrelationEntry, incident_sys_id: str) -> None:
+        """Creator made the incident: publish its sys_id to waiting duplicates."""
+        with self._lock:
+            self._by_incident[incident_sys_id] = entry.key
+        entry.incident.set_result(incident_sys_id)
+
+    def close_incident(self, incident_sys_id: str) -> None:
+        """
+        The incident left the open state (approved/rejected): later identical
+        requests should open a new one rather than attach to it.
+        """
+        with self._lock:
+            key = self._by_incident.pop(incident_sys_id, None)
+            if key is not None:
+                self._entries.pop(key, None)
+
+    def fail(self, entry: CorrelationEntry, exc: BaseException) -> None:
+        """Creator failed: forget the entry and wake any waiting duplicates."""
+        with self._lock:
+            if self._entries.get(entry.key) is entry:
+                del self._entries[entry.key]
+                self._forget_incident(entry)
+        for fut in (entry.incident, entry.result):
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def get(self, key: str) -> Optional[CorrelationEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry.created_at < self.window_s:
+                return entry
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_incident.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+correlator = IncidentCorrelator()
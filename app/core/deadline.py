@@ -0,0 +1,41 @@
+# app/core/deadline.py
+
+from __future__ import annotations
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Set by the coordinator for the duration of one step attempt. Code running
+# inside a step (subprocess lint, ServiceNow calls) reads them to shrink its own
+# timeouts and to notice that its result is no longer wanted.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("step_deadline", default=None)
+_cancel: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("step_cancel", default=None)
+
+
+def remaining(default: float, floor: float = 0.05) -> float:
+    """
+    Seconds left before the current step's deadline, capped at `default`.
+    Outside a step this is just `default`. Never returns less than `floor`
+    so it can be passed straight to requests/subprocess timeouts.
+    """
+    d = _deadline.get()
+    if d is None:
+        return default
+    return max(floor, min(default, d - time.monotonic()))
+
+
+def cancelled() -> bool:
+    """True once the coordinator has given up on the current step."""
+    ev = _cancel.get()
+    return bool(ev and ev.is_set())
+
+
+def run_with_deadline(deadline: float, cancel: threading.Event, fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run fn(*args) with the deadline/cancel token bound. Meant to be called
+    through contextvars.copy_context().run() so the binding stays local.
+    """
+    _deadline.set(deadline)
+    _cancel.set(cancel)
+    return fn(*args)
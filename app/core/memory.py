@@ -0,0 +1,237 @@
+# app/core/memory.py
+"""
+Memory accounting and bounds for what a long-running process keeps.
+
+  - BoundedCache: thread-safe LRU map bounded by entries, by bytes
+    (sizeof of each value, measured once on put) and optionally by age
+    (ttl_s). It replaces the hand-rolled LRU maps the caches used.
+  - SpillArea: large immutable values written to files and read back on
+    demand (InMemoryTaskStore keeps script code and email drafts there when
+    MEMORY_SPILL_DIR is set).
+  - register()/report(): every cache and store registers a stats callable
+    under a name; GET /metrics serves report(), bytes included.
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+MEMORY_SPILL_DIR = os.getenv("MEMORY_SPILL_DIR")                       # unset: nothing is spilled
+MEMORY_SPILL_MIN_BYTES = int(os.getenv("MEMORY_SPILL_MIN_BYTES", "1024"))
+
+_ATOMIC = (str, bytes, bytearray, int, float, bool, type(None))
+_SHARED = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)  # not owned by a value
+_slots: Dict[type, Tuple[str, ...]] = {}
+
+
+def _slot_names(cls: type) -> Tuple[str, ...]:
+    names = _slots.get(cls)
+    if names is None:
+        found = []
+        for klass in cls.__mro__:
+            slots = klass.__dict__.get("__slots__", ())
+            found += [slots] if isinstance(slots, str) else [s for s in slots if s not in ("__dict__", "__weakref__")]
+        names = _slots[cls] = tuple(found)
+    return names
+
+
+def sizeof(obj: Any) -> int:
+    """Approximate bytes retained by `obj` and what it references, each object counted once."""
+    seen, total, todo = set(), 0, [obj]
+    while todo:
+        o = todo.pop()
+        if id(o) in seen or isinstance(o, _SHARED):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, _ATOMIC):
+            continue
+        if isinstance(o, Mapping):
+            todo.extend(o.keys())
+            todo.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            todo.extend(o)
+        else:
+            if hasattr(o, "__dict__"):
+                todo.append(o.__dict__)
+            todo.extend(getattr(o, name) for name in _slot_names(type(o)) if hasattr(o, name))
+    return total
+
+
+class BoundedCache:
+    """
+    LRU map with hit/miss/eviction counters. Bounded by `maxsize` entries
+    (<= 0 disables caching), `max_bytes` of values (0: no byte bound) and
+    `ttl_s` since the value was stored (0: no expiry). A value larger than
+    the whole byte budget is not stored.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, max_bytes: int = 0, ttl_s: float = 0.0):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()  # value, bytes, stored at
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _drop(self, key: Hashable) -> None:
+        self.bytes -= self._data.pop(key)[1]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is not self._MISSING and self.ttl_s > 0 and time.monotonic() - item[2] > self.ttl_s:
+                self._drop(key)
+                self.expired += 1
+                item = self._MISSING
+            if item is self._MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        size = sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            if self.max_bytes and size > self.max_bytes:
+                return
+            self._data[key] = (value, size, time.monotonic())
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self.bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][0]
+            self._drop(key)
+            return value
+
+    def __getitem__(self, key: Hashable) -> Any:
+        """The stored value (expired or not), without counting a lookup or refreshing its position."""
+        with self._lock:
+            return self._data[key][0]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SpillArea:
+    """
+    Values written to files under `directory`/<pid> and read back on
+    demand. Files belong to this process's in-memory state, so directories
+    left by processes that are gone are removed on start.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.isdigit() and not _alive(int(name)):
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        self.directory = os.path.join(directory, str(os.getpid()))
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+
+    def write(self, values: Dict[str, str]) -> str:
+        """Store `values` in a new file; returns its name."""
+        name = uuid.uuid4().hex
+        data = json.dumps(values).encode("utf-8")
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        with self._lock:
+            self._sizes[name] = len(data)
+        return name
+
+    def read(self, name: str) -> Dict[str, str]:
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return json.loads(f.read())
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self._sizes.pop(name, None)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"files": len(self._sizes), "bytes": sum(self._sizes.values())}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def spill_area() -> Optional[SpillArea]:
+    """The process's spill area, or None when MEMORY_SPILL_DIR is unset."""
+    return SpillArea(MEMORY_SPILL_DIR) if MEMORY_SPILL_DIR else None
+
+
+_reporters: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """Report `stats()` (which should include "bytes") under `name` in report()."""
+    _reporters[name] = stats
+
+
+def report() -> Dict[str, Any]:
+    """Stats of every registered cache and store, plus their total bytes."""
+    out = {name: stats() for name, stats in list(_reporters.items())}
+    return {"total_bytes": sum(s.get("bytes", 0) for s in out.values()), **out}
@@ -1,7 +1,9 @@
 # app/core/models.py
 
-from pydantic import BaseModel, Field
-from typing import Optional, List, Literal, Dict
+import os
+
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Optional, List, Literal, Dict
 
 
 # ===== EXECUTE API SCHEMA =====
@@ -9,38 +11,142 @@ from typing import Optional, List, Literal, Dict
 class ExecuteRequest(BaseModel):
     request: str = Field(..., description="Natural-language request")
     require_approval: bool = Field(False, description="If true, pause for approval before automation")
+    instance: Optional[str] = Field(None, description="ServiceNow instance (default: X-ServiceNow-Instance header)")
+
+
+class _FromResult(BaseModel):
+    # validated straight from the app.core.results dataclasses (by attribute)
+    model_config = ConfigDict(from_attributes=True)
 
 
-class ScriptResult(BaseModel):
-    language: Literal["bash", "powershell"]
+class ScriptResult(_FromResult):
+    language: Optional[Literal["bash", "powershell"]]
     code: str
     lint_passed: bool
     lint_error: Optional[str] = None
+    lint_output: Optional[str] = None
+    template: Optional[str] = None
+    template_version: Optional[int] = None
+    params: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
 
 
-class DiagnosisSolution(BaseModel):
+class DiagnosisSolution(_FromResult):
     title: str
     confidence: Literal["low", "medium", "high"]
+    source: Optional[str] = None
 
 
-class DiagnosisResult(BaseModel):
+class RankedCause(_FromResult):
+    signature: str
     root_cause: str
-    evidence: List[str]
-    solutions: List[DiagnosisSolution]
+    score: float
+    confidence: float
+
+
+class SimilarIncident(_FromResult):
+    sys_id: str
+    number: Optional[str] = None
+    signature: Optional[str] = None
+    root_cause: Optional[str] = None
+    similarity: float
+
+
+class DiagnosisResult(_FromResult):
+    root_cause: str
+    evidence: List[str] = []
+    solutions: List[DiagnosisSolution] = []
+    signature: Optional[str] = None
+    confidence: Optional[float] = None
+    ranked: List[RankedCause] = []
+    similar_incidents: List[SimilarIncident] = []
+    error: Optional[str] = None
+
 
+class PlanSummary(_FromResult):
+    steps: List[str]
+    summary: str
 
-class ExecuteResponse(BaseModel):
+
+class ExecuteResponse(_FromResult):
     incident_sys_id: str
-    status: Literal["awaiting_approval", "resolved", "manual_intervention_required"]
+    status: Literal["waiting_approval", "awaiting_approval", "resolved", "completed", "manual_intervention_required"]
     message: Optional[str] = None
+    plan: Optional[PlanSummary] = None
     diagnosis: Optional[DiagnosisResult] = None
     script: Optional[ScriptResult] = None
     email_draft: Optional[str] = None
     servicenow_updated: Optional[bool] = None
+    correlated: Optional[bool] = None
+
+
+class RejectResponse(BaseModel):
+    id: str
+    status: Literal["manual_intervention_required"]
+    message: str
+
+
+# ===== BULK APPROVE / REJECT =====
+
+PLANS_BULK_MAX = int(os.getenv("PLANS_BULK_MAX", "500"))
+
+
+class BulkPlansRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=PLANS_BULK_MAX, description="Incident sys_ids")
+
+
+class BulkApproveItem(BaseModel):
+    id: str
+    status_code: int                      # what POST /plans/{id}/approve would have answered
+    result: Optional[ExecuteResponse] = None
+    error: Optional[str] = None
+
+
+class BulkApproveResponse(BaseModel):
+    results: List[BulkApproveItem]
+
+
+class BulkRejectItem(BaseModel):
+    id: str
+    status_code: int
+    result: Optional[RejectResponse] = None
+    error: Optional[str] = None
+
+
+class BulkRejectResponse(BaseModel):
+    results: List[BulkRejectItem]
 
 
 # ===== PLAN STATUS / TASK TRACKING =====
 
+class JournalEntry(BaseModel):
+    timestamp: Optional[str] = None
+    author: Optional[str] = None
+    type: Optional[str] = None            # "work_notes" or "comments"
+    text: str = ""
+
+
+class TaskResult(_FromResult):
+    incident_sys_id: Optional[str] = None
+    status: str
+    diagnosis: Optional[DiagnosisResult] = None
+    script: Optional[ScriptResult] = None
+    email_draft: str = ""
+    servicenow_updated: bool = True
+
+
+class TaskView(BaseModel):
+    incident_sys_id: str
+    number: Optional[str] = None
+    short_description: Optional[str] = None
+    state: str
+    state_label: str
+    status: Literal["active", "waiting_approval", "completed", "manual_intervention_required"]
+    updates: List[JournalEntry] = []
+    plan: Optional[PlanSummary] = None
+    result: Optional[TaskResult] = None
+
+
 class TaskStatus(str):
     ACTIVE = "active"
     WAITING_APPROVAL = "awaiting_approval"
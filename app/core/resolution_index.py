@@ -0,0 +1,318 @@
+# app/core/resolution_index.py
+"""
+Similarity index over resolved incidents (MinHash + LSH).
+
+Each resolved incident is stored as a fixed-width MinHash signature of its
+request text plus a JSON record (root cause, evidence, solutions). Lookups
+estimate Jaccard similarity between word shingles, so "CPU 100% on web01"
+finds past "CPU spike on web07" incidents without scanning their text.
+
+On disk (RESOLUTION_INDEX_DIR), three append-only files:
+  signatures.bin   num_perm uint32 per incident, memory-mapped for lookups
+  records.jsonl    one JSON record per incident, read on demand
+  records.idx      uint64 byte offset of each record in records.jsonl
+plus meta.json with the MinHash parameters. Without a directory the index
+lives in memory only.
+
+Several worker processes can share a directory: appends hold an flock on
+index.lock and go records.jsonl -> records.idx -> signatures.bin, so a row
+present in both idx and signatures is complete. Each process picks up rows
+appended elsewhere before its own appends and, on lookups, at most every
+RESOLUTION_INDEX_REFRESH_S.
+"""
+
+from __future__ import annotations
+import json
+import logging
+import mmap
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:  # POSIX; elsewhere appends are serialized within the process only
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9._/-]*")
+_NUMBER = re.compile(r"\d+")
+_STOPWORDS = frozenset("a an and are at be by for from in is it of on or the to with".split())
+_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+
+# Below this many incidents a full scan is as fast as bucket lookups and
+# never misses a weak match
+_SCAN_MAX = int(os.getenv("RESOLUTION_INDEX_SCAN_MAX", "2000"))
+
+# Repetitive alerts share buckets with thousands of rows; only the rows that
+# collide in the most bands get an exact signature comparison
+_MAX_CANDIDATES = int(os.getenv("RESOLUTION_INDEX_MAX_CANDIDATES", "256"))
+
+# How often lookups check the files for rows other processes appended
+_REFRESH_S = float(os.getenv("RESOLUTION_INDEX_REFRESH_S", "5"))
+
+# Evidence lines DiagnosticAgent derives from this index; never re-indexed
+HISTORY_EVIDENCE_PREFIX = "Similar past incident "
+
+
+def shingles(text: str) -> set:
+    """Word unigrams and bigrams; numbers masked so host/index variants match."""
+    words = [_NUMBER.sub("0", w) for w in _TOKEN.findall((text or "").lower())]
+    words = [w for w in words if w not in _STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class ResolutionIndex:
+    """
+    MinHash signatures banded into LSH buckets (bands x rows = num_perm).
+    Thread-safe; add() appends, query() returns the top-k most similar.
+    """
+
+    def __init__(self, path: Optional[str] = None, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        self.path = path
+        self._lock = threading.RLock()
+        meta = self._read_meta(path) if path else None
+        if meta:
+            num_perm, bands, seed = meta["num_perm"], meta["bands"], meta["seed"]
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm, self.bands, self.seed = num_perm, bands, seed
+        self._rows_per_band = num_perm // bands
+        rnd = random.Random(seed)
+        self._perms = [(rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._count = 0
+        self._mem_sigs = array("I")        # in-memory mode
+        self._mem_records: List[dict] = []
+        self._map: Optional[mmap.mmap] = None
+        self._sigs: Optional[memoryview] = None
+        self._offsets = array("Q")
+        self._checked = 0.0
+        if path:
+            self._open(path, write_meta=meta is None)
+
+    # -- persistence ------------------------------------------------------------
+    @staticmethod
+    def _read_meta(path: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open(self, path: str, write_meta: bool) -> None:
+        os.makedirs(path, exist_ok=True)
+        if write_meta:
+            with open(self._file("meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"num_perm": self.num_perm, "bands": self.bands, "seed": self.seed}, f)
+        for name in ("signatures.bin", "records.jsonl", "records.idx"):
+            open(self._file(name), "ab").close()
+        with self._locked():
+            self._sync(repair=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """The in-process lock plus, on disk, an exclusive flock shared with other processes."""
+        with self._lock:
+            if not self.path or fcntl is None:
+                yield
+                return
+            with open(self._file("index.lock"), "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self, repair: bool = False) -> None:
+        """
+        Load the rows appended since this process last looked (all of them
+        on open). Only rows the three files agree on count; with `repair`
+        (file lock held) the torn tail of a crashed append is cut so the
+        next append lines up.
+        """
+        row_bytes = 4 * self.num_perm
+        with open(self._file("records.idx"), "rb") as f:
+            f.seek(8 * self._count)
+            raw = f.read()
+        tail = array("Q")
+        tail.frombytes(raw[:len(raw) - len(raw) % 8])
+        sig_rows = os.path.getsize(self._file("signatures.bin")) // row_bytes
+        records_size = os.path.getsize(self._file("records.jsonl"))
+        new = list(tail[:max(0, sig_rows - self._count)])
+        while new and new[-1] >= records_size:   # records.jsonl lost its tail
+            new.pop()
+        count = self._count + len(new)
+        if repair:
+            for name, width in (("records.idx", 8), ("signatures.bin", row_bytes)):
+                if os.path.getsize(self._file(name)) > count * width:
+                    os.truncate(self._file(name), count * width)
+        self._checked = time.monotonic()
+        if not new:
+            return
+        first = self._count
+        self._offsets.extend(new)
+        self._count = count
+        self._remap()
+        for row in range(first, count):
+            self._bucket(row, self._row(row))
+
+    def _remap(self) -> None:
+        if self._sigs is not None:
+            self._sigs.release()
+            self._sigs = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        size = self._count * 4 * self.num_perm
+        if size:
+            with open(self._file("signatures.bin"), "rb") as f:
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._sigs = memoryview(self._map).cast("I")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sigs is not None:
+                self._sigs.release()
+                self._sigs = None
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+    # -- signatures -------------------------------------------------------------
+    def minhash(self, text: str) -> Optional[List[int]]:
+        bases = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+        if not bases:
+            return None
+        return [min(((a * x + b) % _PRIME) & _MAX_HASH for x in bases) for a, b in self._perms]
+
+    def _row(self, row: int):
+        sigs = self._sigs if self.path else self._mem_sigs
+        return sigs[row * self.num_perm:(row + 1) * self.num_perm]
+
+    def _bands(self, sig) -> List[Tuple[int, Tuple[int, ...]]]:
+        r = self._rows_per_band
+        return [(b, tuple(sig[b * r:(b + 1) * r])) for b in range(self.bands)]
+
+    def _bucket(self, row: int, sig) -> None:
+        for key in self._bands(sig):
+            self._buckets.setdefault(key, []).append(row)
+
+    def _record(self, row: int) -> dict:
+        if not self.path:
+            return self._mem_records[row]
+        start = self._offsets[row]
+        end = self._offsets[row + 1] if row + 1 < self._count else None
+        with open(self._file("records.jsonl"), "rb") as f:
+            f.seek(start)
+            raw = f.read(end - start) if end is not None else f.readline()
+        return json.loads(raw)
+
+    # -- public API -------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, sys_id: str, text: str, diagnosis: dict, number: Optional[str] = None) -> bool:
+        """
+        Index one resolved incident. Returns False when there is nothing to
+        index: no words in the text, or no known signature in the diagnosis.
+        """
+        if diagnosis.get("signature") == "unknown":
+            return False
+        sig = self.minhash(text)
+        if sig is None:
+            return False
+        record = {
+            "sys_id": sys_id,
+            "number": number,
+            "text": text,
+            "signature": diagnosis.get("signature"),
+            "root_cause": diagnosis.get("root_cause"),
+            # keep only this incident's own findings, not ones borrowed from history
+            "evidence": [e for e in diagnosis.get("evidence") or [] if not e.startswith(HISTORY_EVIDENCE_PREFIX)],
+            "solutions": [s for s in diagnosis.get("solutions") or [] if "source" not in s],
+            "resolved_at": time.time(),
+        }
+        with self._locked():
+            if self.path:
+                self._sync(repair=True)
+            row = self._count
+            if self.path:
+                line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+                with open(self._file("records.jsonl"), "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(line)
+                with open(self._file("records.idx"), "ab") as f:
+                    f.write(array("Q", [offset]).tobytes())
+                with open(self._file("signatures.bin"), "ab") as f:
+                    f.write(array("I", sig).tobytes())
+                self._offsets.append(offset)
+                self._count += 1
+                self._remap()
+            else:
+                self._mem_sigs.extend(sig)
+                self._mem_records.append(record)
+                self._count += 1
+            self._bucket(row, sig)
+        return True
+
+    def query(self, text: str, k: int = 3, min_similarity: float = 0.2) -> List[dict]:
+        """
+        Top-k past incidents by estimated Jaccard similarity (best first), as
+        their records plus "similarity". One entry per incident sys_id.
+        """
+        sig = self.minhash(text)
+        if sig is None or k <= 0:
+            return []
+        with self._lock:
+            if self.path and time.monotonic() - self._checked >= _REFRESH_S:
+                self._sync()
+            if self._count <= _SCAN_MAX:
+                candidates = range(self._count)
+            else:
+                hits = Counter(row for key in self._bands(sig) for row in self._buckets.get(key, ()))
+                candidates = [row for row, _ in hits.most_common(max(_MAX_CANDIDATES, k))]
+            scored = []
+            for row in candidates:
+                same = sum(1 for x, y in zip(sig, self._row(row)) if x == y)
+                similarity = same / self.num_perm
+                if similarity >= min_similarity:
+                    scored.append((similarity, row))
+            scored.sort(key=lambda s: (-s[0], -s[1]))  # ties: most recent first
+
+            results, seen = [], set()
+            for similarity, row in scored:
+                record = self._record(row)
+                if record["sys_id"] in seen:
+                    continue
+                seen.add(record["sys_id"])
+                results.append({**record, "similarity": round(similarity, 4)})
+                if len(results) == k:
+                    break
+            return results
+
+
+def _index_from_env() -> ResolutionIndex:
+    # Set RESOLUTION_INDEX_DIR to persist history across restarts.
+    path = os.getenv("RESOLUTION_INDEX_DIR")
+    try:
+        return ResolutionIndex(path) if path else ResolutionIndex()
+    except OSError as e:
+        logger.warning("Resolution index at %s unavailable (%s); using in-memory index", path, e)
+        return ResolutionIndex()
+
+
+resolution_index = _index_from_env()
@@ -0,0 +1,222 @@
+# app/core/results.py
+"""
+Internal result types for one incident's plan: what the steps produce, what
+CoordinatorAgent.run returns and what task_store retains.
+
+Frozen, slotted dataclasses: no per-instance __dict__, so a retained task
+entry costs a few small objects instead of a tree of dicts, and nothing
+downstream can mutate a result another request is still reading. They are
+serialized once, at the API edge, through the response models in
+app.core.models (which read them by attribute). to_dict()/from_dict() are
+for persistence (SQLite task store, resolution index) and for agents and
+tests that still produce plain dicts.
+"""
+
+from __future__ import annotations
+import dataclasses
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple, Type, TypeVar
+
+R = TypeVar("R", bound="_Result")
+
+
+class _Result:
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls: Type[R], d: Mapping[str, Any]) -> R:
+        raise NotImplementedError
+
+    @classmethod
+    def coerce(cls: Type[R], value: Any) -> Optional[R]:
+        """`value` as this type: instances pass through, mappings are converted, None stays None."""
+        if value is None or isinstance(value, cls):
+            return value
+        return cls.from_dict(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class Solution(_Result):
+    title: str
+    confidence: str
+    source: Optional[str] = None        # past incident this fix was borrowed from
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "Solution":
+        return cls(d.get("title", ""), d.get("confidence", "low"), d.get("source"))
+
+
+@dataclass(frozen=True, slots=True)
+class RankedCause(_Result):
+    signature: str
+    root_cause: str
+    score: float
+    confidence: float
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "RankedCause":
+        return cls(d.get("signature", ""), d.get("root_cause", ""), d.get("score", 0.0), d.get("confidence", 0.0))
+
+
+@dataclass(frozen=True, slots=True)
+class SimilarIncident(_Result):
+    sys_id: str
+    number: Optional[str]
+    signature: Optional[str]
+    root_cause: Optional[str]
+    similarity: float
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "SimilarIncident":
+        return cls(d.get("sys_id", ""), d.get("number"), d.get("signature"), d.get("root_cause"),
+                   d.get("similarity", 0.0))
+
+
+@dataclass(frozen=True, slots=True)
+class Diagnosis(_Result):
+    root_cause: str
+    evidence: Tuple[str, ...] = ()
+    solutions: Tuple[Solution, ...] = ()
+    signature: Optional[str] = None
+    confidence: Optional[float] = None
+    ranked: Tuple[RankedCause, ...] = ()
+    similar_incidents: Tuple[SimilarIncident, ...] = ()
+    error: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "Diagnosis":
+        return cls(
+            root_cause=d.get("root_cause") or "",
+            evidence=tuple(d.get("evidence") or ()),
+            solutions=tuple(Solution.coerce(s) for s in d.get("solutions") or ()),
+            signature=d.get("signature"),
+            confidence=d.get("confidence"),
+            ranked=tuple(RankedCause.coerce(r) for r in d.get("ranked") or ()),
+            similar_incidents=tuple(SimilarIncident.coerce(s) for s in d.get("similar_incidents") or ()),
+            error=d.get("error"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Script(_Result):
+    language: Optional[str]
+    code: str
+    lint_passed: bool
+    lint_error: Optional[str] = None
+    lint_output: Optional[str] = None
+    template: Optional[str] = None
+    template_version: Optional[int] = None
+    params: Optional[Mapping[str, Any]] = None   # resolved template parameters; never mutated
+    error: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "Script":
+        return cls(
+            language=d.get("language"),
+            code=d.get("code") or "",
+            lint_passed=bool(d.get("lint_passed")),
+            lint_error=d.get("lint_error"),
+            lint_output=d.get("lint_output"),
+            template=d.get("template"),
+            template_version=d.get("template_version"),
+            params=d.get("params"),
+            error=d.get("error"),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class Plan(_Result):
+    steps: Tuple[str, ...]
+    summary: str
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "Plan":
+        return cls(tuple(d.get("steps") or ()), d.get("summary", ""))
+
+
+@dataclass(frozen=True, slots=True)
+class PlanResult(_Result):
+    """What running a plan produced (CoordinatorAgent.run)."""
+    incident_sys_id: Optional[str]
+    status: str
+    diagnosis: Optional[Diagnosis] = None
+    script: Optional[Script] = None
+    email_draft: str = ""
+    servicenow_updated: bool = True
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "PlanResult":
+        return cls(
+            incident_sys_id=d.get("incident_sys_id"),
+            status=d.get("status", "completed"),
+            diagnosis=Diagnosis.coerce(d.get("diagnosis")),
+            script=Script.coerce(d.get("script")),
+            email_draft=d.get("email_draft") or "",
+            servicenow_updated=d.get("servicenow_updated", True),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class IncidentState(_Result):
+    """The incident's ServiceNow fields as of the last reconciliation sweep."""
+    number: Optional[str]
+    state: str
+    short_description: Optional[str]
+    synced_at: float                            # epoch seconds
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "IncidentState":
+        return cls(d.get("number"), str(d.get("state") or ""), d.get("short_description"), d.get("synced_at", 0.0))
+
+
+# PlanResult fields a task entry keeps flattened next to its status (the
+# stored JSON shape predates these types)
+_RESULT_KEYS = ("incident_sys_id", "diagnosis", "script", "email_draft", "servicenow_updated")
+
+
+@dataclass(frozen=True, slots=True)
+class TaskEntry(_Result):
+    """One task_store value: approval-workflow state plus the finished result, if any."""
+    status: str
+    plan: Optional[Plan] = None
+    instance: Optional[str] = None              # ServiceNow instance the incident lives on
+    result: Optional[PlanResult] = None
+    reason: Optional[str] = None
+    claimed_at: Optional[float] = None
+    incident: Optional[IncidentState] = None
+    request: Optional[str] = None               # the request text the incident was opened with
+    prepared: Optional[PlanResult] = None       # speculative result of the side-effect-free steps
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "TaskEntry":
+        return cls(
+            status=d.get("status"),
+            plan=Plan.coerce(d.get("plan")),
+            instance=d.get("instance"),
+            result=PlanResult.from_dict(d) if any(k in d for k in _RESULT_KEYS) else None,
+            reason=d.get("reason"),
+            claimed_at=d.get("claimed_at"),
+            incident=IncidentState.coerce(d.get("incident")),
+            request=d.get("request"),
+            prepared=PlanResult.coerce(d.get("prepared")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"status": self.status}
+        if self.plan is not None:
+            out["plan"] = self.plan.to_dict()
+        if self.incident is not None:
+            out["incident"] = self.incident.to_dict()
+        if self.prepared is not None:
+            out["prepared"] = self.prepared.to_dict()
+        for key in ("instance", "reason", "claimed_at", "request"):
+            value = getattr(self, key)
+            if value is not None:
+                out[key] = value
+        if self.result is not None:
+            result = self.result.to_dict()
+            out.update({k: result[k] for k in _RESULT_KEYS})
+        return out
@@ -1,3 +1,304 @@
 # app/core/task_store.py
 
-task_store: dict[str, dict] = {}
\ No newline at end of file
+from __future__ import annotations
+import dataclasses
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from app.core import memory
+from app.core.memory import SpillArea
+from app.core.results import TaskEntry
+
+# Stores hold TaskEntry values; plain dicts are converted on the way in
+EntryLike = Union[TaskEntry, Dict[str, Any]]
+# claim() condition on the current entry (None: no entry yet), checked atomically with the write
+Match = Callable[[Optional[TaskEntry]], bool]
+
+# Statuses no workflow moves on from: entries the retention sweep and the byte budget may drop
+TERMINAL = ("completed", "resolved", "manual_intervention_required")
+
+# Bytes of in-memory entries to keep (0: no bound); past it the oldest terminal entries go first
+TASK_STORE_MAX_BYTES = int(os.getenv("TASK_STORE_MAX_BYTES", "0"))
+
+
+def _spill_out(entry: TaskEntry, spill: SpillArea) -> Tuple[TaskEntry, Optional[str]]:
+    """`entry` with its large text fields (script code, email drafts) moved to `spill`, and their file."""
+    fields, changes = {}, {}
+    for name in ("result", "prepared"):
+        result = getattr(entry, name)
+        if result is None:
+            continue
+        script, email = result.script, result.email_draft
+        if script is not None and len(script.code) >= memory.MEMORY_SPILL_MIN_BYTES:
+            fields[f"{name}.code"], script = script.code, dataclasses.replace(script, code="")
+        if len(email) >= memory.MEMORY_SPILL_MIN_BYTES:
+            fields[f"{name}.email_draft"], email = email, ""
+        if script is not result.script or email is not result.email_draft:
+            changes[name] = dataclasses.replace(result, script=script, email_draft=email)
+    if not fields:
+        return entry, None
+    return dataclasses.replace(entry, **changes), spill.write(fields)
+
+
+def _spill_in(entry: TaskEntry, fields: Dict[str, str]) -> TaskEntry:
+    changes = {}
+    for name in ("result", "prepared"):
+        result = getattr(entry, name)
+        code, email = fields.get(f"{name}.code"), fields.get(f"{name}.email_draft")
+        if result is None or (code is None and email is None):
+            continue
+        script = result.script if code is None else dataclasses.replace(result.script, code=code)
+        changes[name] = dataclasses.replace(result, script=script,
+                                            email_draft=result.email_draft if email is None else email)
+    return dataclasses.replace(entry, **changes)
+
+
+class InMemoryTaskStore(MutableMapping):
+    """
+    Per-process task state (the default). Behaves like a dict of
+    incident_sys_id -> TaskEntry, plus an atomic claim() for state transitions.
+    Entries are immutable, so readers share them without copying.
+
+    Each entry's size is measured when it is written. Past `max_bytes`, the
+    least recently written terminal entries are dropped (in-flight ones never
+    are). With a `spill` area, script code and email drafts (of results and
+    speculative results) of at least MEMORY_SPILL_MIN_BYTES are kept on disk
+    and read back when the entry is.
+    """
+
+    def __init__(self, max_bytes: int = 0, spill: Optional[SpillArea] = None):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self._data: Dict[str, TaskEntry] = {}
+        self._written: Dict[str, float] = {}        # in write order
+        self._sizes: Dict[str, int] = {}
+        self._spilled: Dict[str, str] = {}          # key -> spill file
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+
+    def _load(self, entry: TaskEntry, spilled: Optional[str]) -> TaskEntry:
+        return entry if spilled is None else _spill_in(entry, self.spill.read(spilled))
+
+    def __getitem__(self, key: str) -> TaskEntry:
+        while True:
+            with self._lock:
+                entry, spilled = self._data[key], self._spilled.get(key)
+            try:
+                return self._load(entry, spilled)
+            except FileNotFoundError:  # rewritten while we read; read the new entry
+                continue
+
+    def _prepare(self, value: EntryLike) -> Tuple[TaskEntry, Optional[str], int]:
+        value = TaskEntry.coerce(value)
+        spilled = None
+        if self.spill is not None:
+            value, spilled = _spill_out(value, self.spill)
+        return value, spilled, memory.sizeof(value)
+
+    def _put(self, key: str, value: TaskEntry, spilled: Optional[str], size: int) -> List[str]:
+        """Store under the lock; returns spill files no entry refers to any more."""
+        orphans = self._forget(key) if key in self._data else []
+        self._data[key] = value
+        self._written[key] = time.time()
+        self._sizes[key] = size
+        self.bytes += size
+        if spilled is not None:
+            self._spilled[key] = spilled
+        if self.max_bytes and self.bytes > self.max_bytes:
+            for old in [k for k in self._written if self._data[k].status in TERMINAL]:
+                if self.bytes <= self.max_bytes:
+                    break
+                if old != key:
+                    orphans += self._forget(old)
+                    self.evictions += 1
+        return orphans
+
+    def _forget(self, key: str) -> List[str]:
+        del self._data[key]
+        self._written.pop(key, None)
+        self.bytes -= self._sizes.pop(key, 0)
+        spilled = self._spilled.pop(key, None)
+        return [spilled] if spilled is not None else []
+
+    def _delete_files(self, names: List[str]) -> None:
+        for name in names:
+            self.spill.delete(name)
+
+    def __setitem__(self, key: str, value: EntryLike) -> None:
+        value, spilled, size = self._prepare(value)
+        with self._lock:
+            orphans = self._put(key, value, spilled, size)
+        self._delete_files(orphans)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            orphans = self._forget(key)
+        self._delete_files(orphans)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def claim(self, key: str, expected: Iterable[Optional[str]], value: EntryLike,
+              match: Optional[Match] = None) -> bool:
+        """
+        Compare-and-set: store `value` only if the current status is one of
+        `expected` (None in `expected` means "no entry yet") and, when given,
+        `match(current entry)` holds. Returns True when this caller won the
+        transition.
+        """
+        expected = set(expected)
+        value, spilled, size = self._prepare(value)
+        with self._lock:
+            current = self._data.get(key)
+            status = current.status if current else None
+            won = status in expected and (match is None or match(
+                current and self._load(current, self._spilled.get(key))))
+            orphans = self._put(key, value, spilled, size) if won else [spilled] if spilled else []
+        self._delete_files(orphans)
+        return won
+
+    def scan(self, exclude: Iterable[str] = ()) -> List[Tuple[str, TaskEntry]]:
+        """(key, entry) pairs whose status is not in `exclude`."""
+        exclude = set(exclude)
+        with self._lock:
+            found = [(k, v, self._spilled.get(k)) for k, v in self._data.items() if v.status not in exclude]
+        out = []
+        for k, v, spilled in found:
+            try:
+                out.append((k, self._load(v, spilled)))
+            except FileNotFoundError:  # rewritten or deleted meanwhile
+                continue
+        return out
+
+    def evict(self, statuses: Iterable[str], written_before: float) -> int:
+        """Delete entries in one of `statuses` last written before `written_before` (epoch s)."""
+        statuses = set(statuses)
+        with self._lock:
+            stale = [k for k, v in self._data.items()
+                     if v.status in statuses and self._written.get(k, 0.0) < written_before]
+            orphans = [name for k in stale for name in self._forget(k)]
+        self._delete_files(orphans)
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"entries": len(self._data), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                   "evictions": self.evictions, "spilled": len(self._spilled)}
+        if self.spill is not None:
+            out["spill"] = self.spill.stats()
+        return out
+
+
+class SqliteTaskStore(MutableMapping):
+    """
+    Task state in a SQLite file, shared by every uvicorn worker on the host.
+    claim() runs in a write transaction, so exactly one process wins. Rows
+    hold TaskEntry.to_dict() as JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY, status TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __getitem__(self, key: str) -> TaskEntry:
+        row = self._conn().execute("SELECT data FROM tasks WHERE id = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return TaskEntry.from_dict(json.loads(row[0]))
+
+    def __setitem__(self, key: str, value: EntryLike) -> None:
+        value = TaskEntry.coerce(value)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO tasks (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+            (key, value.status, json.dumps(value.to_dict(), default=str), time.time()),
+        )
+
+    def __delitem__(self, key: str) -> None:
+        cur = self._conn().execute("DELETE FROM tasks WHERE id = ?", (key,))
+        if cur.rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([r[0] for r in self._conn().execute("SELECT id FROM tasks")])
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def claim(self, key: str, expected: Iterable[Optional[str]], value: EntryLike,
+              match: Optional[Match] = None) -> bool:
+        """Same contract as InMemoryTaskStore.claim, atomic across processes."""
+        expected = set(expected)
+        value = TaskEntry.coerce(value)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, data FROM tasks WHERE id = ?", (key,)).fetchone()
+            status = row[0] if row else None
+            if status not in expected or (match is not None and not match(
+                    row and TaskEntry.from_dict(json.loads(row[1])))):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (key, value.status, json.dumps(value.to_dict(), default=str), time.time()),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def scan(self, exclude: Iterable[str] = ()) -> List[Tuple[str, TaskEntry]]:
+        """Same contract as InMemoryTaskStore.scan."""
+        exclude = list(exclude)
+        marks = ",".join("?" * len(exclude))
+        rows = self._conn().execute(
+            f"SELECT id, data FROM tasks WHERE status IS NULL OR status NOT IN ({marks})", exclude)
+        return [(key, TaskEntry.from_dict(json.loads(data))) for key, data in rows]
+
+    def evict(self, statuses: Iterable[str], written_before: float) -> int:
+        """Same contract as InMemoryTaskStore.evict."""
+        statuses = list(statuses)
+        marks = ",".join("?" * len(statuses))
+        cur = self._conn().execute(
+            f"DELETE FROM tasks WHERE status IN ({marks}) AND updated_at < ?", [*statuses, written_before])
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Rows live in the file, not in process memory."""
+        return {"entries": len(self), "bytes": 0, "file_bytes": os.path.getsize(self.path)}
+
+
+def _store_from_env() -> MutableMapping:
+    # Set TASK_STORE_PATH to share state across uvicorn workers (--workers N).
+    path = os.getenv("TASK_STORE_PATH")
+    return SqliteTaskStore(path) if path else InMemoryTaskStore(TASK_STORE_MAX_BYTES, memory.spill_area())
+
+
+task_store = _store_from_env()
+memory.register("task_store", lambda: task_store.stats())
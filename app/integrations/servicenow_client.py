@@ -1,13 +1,95 @@
 # app/integrations/servicenow_client.py
 
+import base64
+import json
+import logging
 import os
+import threading
+import time
+import uuid
 import requests
-from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union
 from dotenv import load_dotenv
 
+from app.core import memory
+from app.integrations.servicenow_instances import instance_context, registry
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_RESOLUTION_CODE = os.getenv("DEFAULT_RESOLUTION_CODE", "Resolved by caller")
+DEFAULT_CALLER = os.getenv("SERVICENOW_CALLER", "integration.incidentuser")
+# Discovered schema / caller ids are refreshed in the background once older than this
+METADATA_TTL_S = float(os.getenv("SN_METADATA_TTL_S", "3600"))
+
+# Sub-requests per Batch API call (POST /api/now/v1/batch)
+SN_BATCH_MAX = int(os.getenv("SN_BATCH_MAX", "100"))
+
+# Candidate "Resolution code" columns; which one an instance uses is discovered
+_RESOLUTION_FIELDS = ("close_code", "u_resolution_code", "resolution_code")
+_PATCH_PARAMS = "sysparm_input_display_value=true"  # as update_incident sends them
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class IncidentSchema:
+    """What the warm-up learns about the incident table on this instance."""
+    resolution_field: Optional[str]          # column labeled "Resolution code"; None if there is none
+    mandatory_fields: tuple = ()
+    choices: Dict[str, Dict[str, str]] = field(default_factory=dict)  # element -> {value: label}
+
+
+class _Refreshing(Generic[T]):
+    """
+    One value loaded on first use and kept for `ttl_s`. A stale value is still
+    served while a single background refresh runs; a failed refresh keeps it.
+    """
+
+    def __init__(self, loader: Callable[[], T], ttl_s: float):
+        self._loader = loader
+        self._ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    def _load(self) -> Optional[T]:
+        try:
+            value = self._loader()
+        except Exception as e:
+            logger.warning("ServiceNow metadata refresh failed: %s", e)
+            return None
+        with self._lock:
+            self._value, self._loaded_at = value, time.monotonic()
+        return value
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self._load()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self, load: bool = True) -> Optional[T]:
+        """
+        Cached value, refreshed in the background when stale. With nothing
+        cached yet, loads inline, or returns None when `load` is False.
+        """
+        with self._lock:
+            value, age = self._value, time.monotonic() - self._loaded_at
+            if value is not None and age >= self._ttl_s and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, name="sn-metadata", daemon=True).start()
+        if value is not None or not load:
+            return value
+        return self._load()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value, self._loaded_at = None, 0.0
 
 class ServiceNowClient:
     """
@@ -16,59 +98,127 @@ class ServiceNowClient:
     and (c) satisfy resolution data policies when moving to state=6.
     """
 
-    INSTANCE_URL = os.getenv("SERVICENOW_INSTANCE_URL")
-    USERNAME = os.getenv("SERVICENOW_USERNAME")
-    PASSWORD = os.getenv("SERVICENOW_PASSWORD")
     TABLE = "incident"
 
-    HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
-
-    @classmethod
-    def _get_auth(cls):
-        if not all([cls.INSTANCE_URL, cls.USERNAME, cls.PASSWORD]):
-            raise ValueError("Missing ServiceNow credentials in .env file.")
-        return (cls.USERNAME, cls.PASSWORD)
-
     # --------------------- helpers ---------------------
 
+    @staticmethod
+    def _request(method: str, path: str, **kwargs) -> requests.Response:
+        """Send through the instance this request is routed to (see servicenow_instances)."""
+        return registry.current().request(method, path, **kwargs)
+
     @classmethod
     def _get_user_sys_id(cls, username: str) -> str | None:
         """
         Resolve a username -> sys_id for caller_id.
         """
-        url = f"{cls.INSTANCE_URL}/api/now/table/sys_user"
         params = {"sysparm_query": f"user_name={username}", "sysparm_fields": "sys_id", "sysparm_limit": 1}
-        r = requests.get(url, headers=cls.HEADERS, auth=cls._get_auth(), params=params, timeout=30)
+        r = cls._request("GET", "/api/now/table/sys_user", params=params)
         r.raise_for_status()
         rows = r.json().get("result", [])
         return rows[0]["sys_id"] if rows else None
 
+    # ------------------- metadata --------------------
+
     @classmethod
-    @lru_cache(maxsize=1)
-    def _resolution_field(cls) -> str:
+    def _discover_schema(cls) -> IncidentSchema:
         """
-        Discover which column is labeled 'Resolution code' on incident.
-        Many PDIs use u_resolution_code; fallback to 'close_code' otherwise.
+        Two list queries: sys_dictionary (mandatory columns and the column
+        labeled 'Resolution code'; many PDIs use u_resolution_code) and
+        sys_choice for its (else close_code's) and state's choice values.
         """
-        url = f"{cls.INSTANCE_URL}/api/now/table/sys_dictionary"
-        params = {
-            "sysparm_query": "name=incident^label=Resolution code",
-            "sysparm_fields": "element",
-            "sysparm_limit": 1,
-        }
-        r = requests.get(url, headers=cls.HEADERS, auth=cls._get_auth(), params=params, timeout=30)
-        r.raise_for_status()
-        res = r.json().get("result", [])
-        return res[0]["element"] if res else "close_code"
+        rows, _ = cls.query_table(
+            "sys_dictionary", "name=incident^mandatory=true^ORlabel=Resolution code",
+            "element,label,mandatory", limit=200,
+        )
+        resolution = next((r["element"] for r in rows if r.get("label") == "Resolution code"), None)
+        mandatory = tuple(sorted({r["element"] for r in rows if str(r.get("mandatory")).lower() == "true"}))
+
+        choices: Dict[str, Dict[str, str]] = {}
+        rows, _ = cls.query_table(
+            "sys_choice", f"name=incident^elementIN{resolution or 'close_code'},state^inactive=false",
+            "element,value,label", limit=500,
+        )
+        for r in rows:
+            choices.setdefault(r["element"], {})[r["value"]] = r.get("label", r["value"])
+        return IncidentSchema(resolution, mandatory, choices)
+
+    @classmethod
+    def incident_schema(cls) -> Optional[IncidentSchema]:
+        """Discovered incident schema of the current instance, or None if discovery has not succeeded."""
+        return _schema_cache().get()
+
+    @classmethod
+    def caller_sys_id(cls, username: str) -> Optional[str]:
+        """Cached username -> sys_id on the current instance (refreshed after SN_METADATA_TTL_S)."""
+        instance = registry.current().name
+        with _cache_lock:
+            cached = _callers.get((instance, username))
+            if cached is None:
+                cached = _callers[(instance, username)] = _Refreshing(
+                    _on(instance, lambda: cls._get_user_sys_id(username) or ""), METADATA_TTL_S)
+        return cached.get() or None
+
+    @classmethod
+    def warm_metadata(cls, usernames: List[str] = (DEFAULT_CALLER,)) -> Dict[str, object]:
+        """
+        Load the schema and caller ids of every configured instance now
+        (startup warm-up); returns what was found, keyed by instance.
+        """
+        found: Dict[str, object] = {}
+        for name in registry.names():
+            with instance_context(name):
+                schema = cls.incident_schema()
+                found[name] = {
+                    "resolution_field": schema.resolution_field if schema else None,
+                    "callers": {u: cls.caller_sys_id(u) for u in usernames},
+                }
+        return found
 
     @classmethod
     def get_incident(cls, sys_id: str) -> dict:
-        url = f"{cls.INSTANCE_URL}/api/now/table/{cls.TABLE}/{sys_id}"
         params = {"sysparm_fields": "sys_id,number,state,incident_state,short_description"}
-        r = requests.get(url, headers=cls.HEADERS, auth=cls._get_auth(), params=params, timeout=30)
+        r = cls._request("GET", f"/api/now/table/{cls.TABLE}/{sys_id}", params=params)
         r.raise_for_status()
         return r.json()["result"]
 
+    @classmethod
+    def query_table(
+        cls,
+        table: str,
+        query: str,
+        fields: str,
+        limit: int = 100,
+        offset: int = 0,
+        display_value: bool = False,
+    ) -> tuple[list[dict], int | None]:
+        """
+        One page of a Table API list query. Returns (rows, total) where total
+        comes from the X-Total-Count header (None if the instance omits it).
+        """
+        params = {
+            "sysparm_query": query,
+            "sysparm_fields": fields,
+            "sysparm_limit": str(limit),
+            "sysparm_offset": str(offset),
+            "sysparm_display_value": "true" if display_value else "false",
+            "sysparm_exclude_reference_link": "true",
+        }
+        r = cls._request("GET", f"/api/now/table/{table}", params=params)
+        r.raise_for_status()
+        total = r.headers.get("X-Total-Count")
+        return r.json().get("result", []), (int(total) if total and total.isdigit() else None)
+
+    @classmethod
+    def get_incidents(cls, sys_ids: List[str], fields: str = "sys_id,short_description,description") -> Dict[str, dict]:
+        """Incidents by sys_id, one sys_idIN list query per 100 ids; ids that don't exist are absent."""
+        out: Dict[str, dict] = {}
+        for start in range(0, len(sys_ids), 100):
+            chunk = sys_ids[start:start + 100]
+            rows, _ = cls.query_table(cls.TABLE, "sys_idIN" + ",".join(chunk), fields, limit=len(chunk))
+            out.update((row["sys_id"], row) for row in rows)
+        return out
+
     # ---------------------- CRUD ----------------------
 
     @classmethod
@@ -81,7 +231,7 @@ class ServiceNowClient:
         """
         Create the incident with mandatory fields and return {'sys_id','number'}.
         """
-        caller_id = cls._get_user_sys_id(caller_username)
+        caller_id = cls.caller_sys_id(caller_username)
         payload = {
             "short_description": short_description,  # mandatory in your PDI
             "description": description,              # request-specific
@@ -91,27 +241,25 @@ class ServiceNowClient:
             "category": "inquiry",
         }
 
-        url = f"{cls.INSTANCE_URL}/api/now/table/{cls.TABLE}"
-        r = requests.post(url, json=payload, headers=cls.HEADERS, auth=cls._get_auth(), timeout=30)
-        print("CREATE status:", r.status_code, "body:", r.text)  # debug
+        r = cls._request("POST", f"/api/now/table/{cls.TABLE}", json=payload)
+        if not r.ok:
+            logger.warning("CREATE incident failed: status=%s body=%.500s", r.status_code, r.text)
         r.raise_for_status()
 
         res = r.json()["result"]
+        logger.debug("CREATE incident status=%s sys_id=%s number=%s",
+                     r.status_code, res.get("sys_id"), res.get("number"))
         return {"sys_id": res["sys_id"], "number": res["number"]}
 
-    @classmethod
-    def update_incident(cls, sys_id: str, work_notes: str = None,
-                        state: str | int = None,
-                        close_code: str = None,
-                        close_notes: str = None) -> dict:
+    @staticmethod
+    def _incident_patch(work_notes: str = None, state: str | int = None,
+                        close_code: str = None, close_notes: str = None) -> dict:
         """
-        PATCH by sys_id. If moving to Resolved (6), include multiple resolution
-        fields so we don't need sys_dictionary access. Unknown fields are ignored.
+        PATCH body. If moving to Resolved (6), set close_code plus the
+        instance's "Resolution code" column once the warm-up has found it;
+        until then (or if it found none) send every candidate (unknown fields
+        are ignored).
         """
-        if not sys_id:
-            raise ValueError("update_incident called without sys_id")
-
-        url = f"{cls.INSTANCE_URL}/api/now/table/{cls.TABLE}/{sys_id}"
         payload: dict = {}
 
         if work_notes:
@@ -127,16 +275,121 @@ class ServiceNowClient:
                 code = close_code or DEFAULT_RESOLUTION_CODE
                 notes = close_notes or "Automated remediation applied. See work notes."
                 payload["close_notes"] = notes
-                payload["close_code"] = code           # OOB field
-                payload["u_resolution_code"] = code    # common custom field
-                payload["resolution_code"] = code      # some PDIs use this
+                schema = _schema_cache().get(load=False)  # never a discovery round trip on this path
+                found = schema.resolution_field if schema else None
+                for name in ("close_code", found) if found else _RESOLUTION_FIELDS:
+                    payload[name] = code
+        return payload
+
+    @classmethod
+    def update_incident(cls, sys_id: str, work_notes: str = None,
+                        state: str | int = None,
+                        close_code: str = None,
+                        close_notes: str = None) -> dict:
+        """PATCH by sys_id (body from _incident_patch)."""
+        if not sys_id:
+            raise ValueError("update_incident called without sys_id")
 
+        payload = cls._incident_patch(work_notes, state, close_code, close_notes)
         params = {"sysparm_input_display_value": "true"}  # Table API accepts display labels for choices
-        print("PATCH payload ->", payload, "sys_id:", sys_id)
+        # field names only: work notes/close notes can be large and sensitive
+        logger.debug("PATCH incident sys_id=%s fields=%s", sys_id, list(payload))
 
-        r = requests.patch(url, headers=cls.HEADERS, auth=cls._get_auth(),
-                        json=payload, params=params, timeout=30)
+        r = cls._request("PATCH", f"/api/now/table/{cls.TABLE}/{sys_id}", json=payload, params=params)
         if not r.ok:
-            print("PATCH failed:", r.status_code, r.text)
+            logger.warning("PATCH incident failed: sys_id=%s status=%s body=%.500s",
+                           sys_id, r.status_code, r.text)
             r.raise_for_status()
         return r.json()
+
+    # ---------------------- Batch API ----------------------
+
+    @classmethod
+    def batch(cls, calls: List[Tuple[str, str, Optional[dict]]]) -> List[Tuple[int, Any]]:
+        """
+        Send (method, url, JSON body) Table API calls through the Batch API,
+        SN_BATCH_MAX per round trip. Returns (status, decoded body) per call,
+        in order; status 0 for calls the instance left unserviced.
+        """
+        out: List[Tuple[int, Any]] = []
+        for start in range(0, len(calls), SN_BATCH_MAX):
+            chunk = calls[start:start + SN_BATCH_MAX]
+            rest_requests = [
+                {
+                    "id": str(i),
+                    "method": method,
+                    "url": url,
+                    "headers": [{"name": "Content-Type", "value": "application/json"},
+                                {"name": "Accept", "value": "application/json"}],
+                    "body": base64.b64encode(json.dumps(body).encode("utf-8")).decode("ascii") if body else "",
+                    "exclude_response_headers": True,
+                }
+                for i, (method, url, body) in enumerate(chunk)
+            ]
+            r = cls._request("POST", "/api/now/v1/batch",
+                             json={"batch_request_id": uuid.uuid4().hex, "rest_requests": rest_requests})
+            r.raise_for_status()
+            served = {s["id"]: s for s in r.json().get("serviced_requests", [])}
+            for i in range(len(chunk)):
+                s = served.get(str(i))
+                if s is None:
+                    out.append((0, None))
+                    continue
+                raw = base64.b64decode(s.get("body") or "")
+                out.append((int(s.get("status_code", 0)), json.loads(raw) if raw else None))
+        return out
+
+    @classmethod
+    def update_incidents(cls, updates: Dict[str, dict]) -> Dict[str, Union[dict, requests.HTTPError]]:
+        """
+        update_incident for many incidents in Batch API round trips. `updates`
+        maps sys_id -> update_incident keyword arguments; returns sys_id -> the
+        PATCH response body, or the HTTPError it failed with (its response's
+        status_code is the sub-request's, 0 when unserviced).
+        """
+        ids = list(updates)
+        calls = [("PATCH", f"/api/now/table/{cls.TABLE}/{sys_id}?{_PATCH_PARAMS}",
+                  cls._incident_patch(**updates[sys_id])) for sys_id in ids]
+        out: Dict[str, Union[dict, requests.HTTPError]] = {}
+        for sys_id, (status, body) in zip(ids, cls.batch(calls)):
+            if 200 <= status < 300:
+                out[sys_id] = body
+            else:
+                logger.warning("Batched PATCH incident failed: sys_id=%s status=%s body=%.500s", sys_id, status, body)
+                response = requests.Response()
+                response.status_code = status  # 0: left unserviced
+                out[sys_id] = requests.HTTPError(f"{status or 'Unserviced'} PATCH incident {sys_id}", response=response)
+        return out
+
+
+def _on(instance: str, loader: Callable[[], T]) -> Callable[[], T]:
+    # background refreshes run on plain threads, which do not inherit the routing context
+    def load() -> T:
+        with instance_context(instance):
+            return loader()
+    return load
+
+
+def _schema_cache() -> _Refreshing[IncidentSchema]:
+    instance = registry.current().name
+    with _cache_lock:
+        cached = _schemas.get(instance)
+        if cached is None:
+            cached = _schemas[instance] = _Refreshing(_on(instance, ServiceNowClient._discover_schema), METADATA_TTL_S)
+    return cached
+
+
+# Per instance: discovered schema, and (instance, username) -> caller sys_id
+_schemas: Dict[str, _Refreshing[IncidentSchema]] = {}
+_callers: Dict[Tuple[str, str], _Refreshing[str]] = {}
+_cache_lock = threading.Lock()
+
+
+def _metadata_stats() -> Dict[str, object]:
+    # one small value per instance (and caller); bounded by configuration, refreshed every METADATA_TTL_S
+    with _cache_lock:
+        cached = [*_schemas.values(), *_callers.values()]
+    return {"entries": len(cached), "bytes": sum(memory.sizeof(c._value) for c in cached), "ttl_s": METADATA_TTL_S}
+
+
+memory.register("servicenow_metadata", _metadata_stats)
@@ -0,0 +1,315 @@
+# app/integrations/servicenow_instances.py
+"""
+Registry of ServiceNow instances (regional instances, tenants) served by one
+deployment. Each entry has its own connection pool (requests.Session),
+credentials, request-rate limit, circuit breaker and latency/throughput
+metrics.
+
+The instance a request talks to is carried in a context variable: routes
+call use_instance(name) and every ServiceNowClient call made while handling
+the request, including from threadpools and coordinator workers that copy
+the context, goes to that instance.
+
+Configuration: the un-prefixed SERVICENOW_INSTANCE_URL / _USERNAME /
+_PASSWORD register an instance named "default". SERVICENOW_INSTANCES=emea,apac
+adds more, each read from SERVICENOW_<NAME>_INSTANCE_URL, _USERNAME,
+_PASSWORD, and optional _RATE (requests/s, 0 = unlimited), _BURST,
+_POOL_SIZE. SERVICENOW_DEFAULT_INSTANCE picks the instance used when a
+request names none.
+"""
+
+from __future__ import annotations
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core import deadline
+from app.core.admission import TokenBucket
+
+# A breaker opens after this many consecutive failures and lets one trial
+# request through after the cool-down
+BREAKER_FAILURES = int(os.getenv("SN_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("SN_BREAKER_RESET_S", "30"))
+_LATENCY_SAMPLES = 1024
+_THROUGHPUT_WINDOW_S = 60.0
+
+# Request header naming the instance (ExecuteRequest.instance takes precedence)
+INSTANCE_HEADER = "X-ServiceNow-Instance"
+
+current_instance: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("servicenow_instance", default=None)
+
+
+class UnknownInstance(KeyError):
+    """A request named an instance that is not configured."""
+
+
+class CircuitOpen(requests.ConnectionError):
+    """The instance's breaker is open; the call was not attempted."""
+
+    def __init__(self, message: str, retry_after_s: float):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+@dataclass(frozen=True)
+class InstanceConfig:
+    name: str
+    url: Optional[str]
+    username: Optional[str]
+    password: Optional[str]
+    rate: float = 0.0          # requests/s; 0 = unlimited
+    burst: float = 10.0
+    pool_size: int = 10
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open after `reset_s` (one trial)."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_s: float = BREAKER_RESET_S):
+        self.failures = failures
+        self.reset_s = reset_s
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened_at >= self.reset_s else "open"
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial request is let through (0 when closed)."""
+        opened_at = self._opened_at
+        return 0.0 if opened_at is None else max(0.0, self.reset_s - (time.monotonic() - opened_at))
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_s or self._trial:
+                return False
+            self._trial = True  # half-open: exactly one request probes the instance
+            return True
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._consecutive = 0
+                self._opened_at = None
+                return
+            self._consecutive += 1
+            if self._opened_at is not None or self._consecutive >= self.failures:
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+
+
+class _InstanceStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected_open = 0
+        self.throttled_s = 0.0
+        self.status: Dict[str, int] = {}
+        self.latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.latency_total = 0.0
+        self._recent: Deque[float] = deque()
+
+    def record(self, status: Optional[int], latency: float) -> None:
+        now = time.monotonic()
+        key = f"{status // 100}xx" if status else "error"
+        with self._lock:
+            self.requests += 1
+            self.errors += status is None or status >= 500
+            self.status[key] = self.status.get(key, 0) + 1
+            self.latencies.append(latency)
+            self.latency_total += latency
+            self._recent.append(now)
+            while self._recent and now - self._recent[0] > _THROUGHPUT_WINDOW_S:
+                self._recent.popleft()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > _THROUGHPUT_WINDOW_S:
+                self._recent.popleft()
+            lat = sorted(self.latencies)
+            recent = len(self._recent)
+
+        def pct(p: float) -> float:
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))], 4) if lat else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rejected_circuit_open": self.rejected_open,
+            "throttled_s": round(self.throttled_s, 3),
+            "status": dict(self.status),
+            "throughput_rps": round(recent / _THROUGHPUT_WINDOW_S, 3),
+            "latency_s": {
+                "mean": round(self.latency_total / self.requests, 4) if self.requests else 0.0,
+                "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+            },
+        }
+
+
+class InstanceClient:
+    """Connection pool, limiter, breaker and metrics for one instance."""
+
+    HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+    def __init__(self, config: InstanceConfig, breaker: Optional[CircuitBreaker] = None):
+        self.config = config
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.HEADERS)
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = _InstanceStats()
+        self._bucket = TokenBucket(config.rate, config.burst) if config.rate > 0 else None
+        self._bucket_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    def auth(self) -> tuple:
+        c = self.config
+        if not all([c.url, c.username, c.password]):
+            raise ValueError(f"Missing ServiceNow credentials for instance '{c.name}'.")
+        return (c.username, c.password)
+
+    def _throttle(self) -> None:
+        """Wait for a rate-limit token, within the current step's deadline."""
+        if self._bucket is None:
+            return
+        while True:
+            with self._bucket_lock:
+                wait = self._bucket.take(time.monotonic())
+            if not wait:
+                return
+            if wait >= deadline.remaining(wait + 1, floor=0.0):
+                raise requests.Timeout(f"ServiceNow instance '{self.name}' rate limit: deadline reached")
+            self.stats.throttled_s += wait
+            time.sleep(wait)
+
+    def request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        """
+        One Table API call against this instance (path like "/api/now/table/incident").
+        5xx responses and connection errors count against the breaker; 4xx do not.
+        """
+        auth = self.auth()
+        if not self.breaker.allow():
+            self.stats.rejected_open += 1
+            raise CircuitOpen(f"ServiceNow instance '{self.name}' is unavailable (circuit open)",
+                              self.breaker.retry_in())
+        self._throttle()
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, f"{self.config.url}{path}", auth=auth,
+                                     timeout=deadline.remaining(30), **kwargs)
+        except requests.RequestException:
+            self.stats.record(None, time.perf_counter() - start)
+            self.breaker.record(False)
+            raise
+        self.stats.record(r.status_code, time.perf_counter() - start)
+        self.breaker.record(r.status_code < 500)
+        return r
+
+
+class InstanceRegistry:
+    def __init__(self, configs: List[InstanceConfig], default: Optional[str] = None):
+        self._clients: Dict[str, InstanceClient] = {c.name: InstanceClient(c) for c in configs}
+        self.default = default or (configs[0].name if configs else "default")
+
+    def names(self) -> List[str]:
+        return list(self._clients)
+
+    def get(self, name: Optional[str] = None) -> InstanceClient:
+        name = name or self.default
+        client = self._clients.get(name)
+        if client is None:
+            raise UnknownInstance(name)
+        return client
+
+    def add(self, client: InstanceClient) -> None:
+        """Register an instance, replacing (and closing) any client of the same name."""
+        old = self._clients.get(client.name)
+        self._clients[client.name] = client
+        if old is not None and old is not client:
+            old.session.close()
+
+    def current(self) -> InstanceClient:
+        return self.get(current_instance.get())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "instances": {
+                name: {**c.stats.snapshot(), "breaker": c.breaker.state, "breaker_opened": c.breaker.opened,
+                       "rate": c.config.rate, "pool_size": c.config.pool_size}
+                for name, c in self._clients.items()
+            },
+        }
+
+
+def _config(name: str, prefix: str) -> InstanceConfig:
+    def env(key: str, default: Optional[str] = None) -> Optional[str]:
+        return os.getenv(f"{prefix}{key}", default)
+
+    return InstanceConfig(
+        name=name,
+        url=(env("INSTANCE_URL") or "").rstrip("/") or None,
+        username=env("USERNAME"),
+        password=env("PASSWORD"),
+        rate=float(env("RATE", "0")),
+        burst=float(env("BURST", "10")),
+        pool_size=int(env("POOL_SIZE", "10")),
+    )
+
+
+def _registry_from_env() -> InstanceRegistry:
+    configs = [_config("default", "SERVICENOW_")]
+    for name in filter(None, (n.strip().lower() for n in os.getenv("SERVICENOW_INSTANCES", "").split(","))):
+        if name != "default":
+            configs.append(_config(name, f"SERVICENOW_{name.upper()}_"))
+    return InstanceRegistry(configs, os.getenv("SERVICENOW_DEFAULT_INSTANCE") or "default")
+
+
+registry = _registry_from_env()
+
+
+def resolve_instance(name: Optional[str]) -> str:
+    """Configured instance name for `name` (None = the default); raises UnknownInstance."""
+    return registry.get((name or "").strip().lower() or None).name
+
+
+def use_instance(name: Optional[str]) -> str:
+    """Route this context's ServiceNow calls to `name` (None = the default); returns the name."""
+    resolved = resolve_instance(name)
+    current_instance.set(resolved)
+    return resolved
+
+
+@contextmanager
+def instance_context(name: Optional[str]) -> Iterator[str]:
+    """Temporarily route ServiceNow calls made in this context to `name`."""
+    token = current_instance.set(resolve_instance(name))
+    try:
+        yield current_instance.get()
+    finally:
+        current_instance.reset(token)
@@ -0,0 +1,280 @@
+# app/integrations/servicenow_standin.py
+"""
+Local stand-in for the ServiceNow Table API (and the Batch API over it),
+mounted as a requests transport adapter on the registry's instance sessions. Everything above the socket is
+real: ServiceNowClient, per-instance pools, rate limits, breakers and
+metrics. Only the tables the agents touch are modelled: incident (create,
+read, patch, list), sys_journal_field, sys_user, sys_dictionary and
+sys_choice.
+
+Upstream calls are counted per (instance, method, table), and per tag: code
+that sets `call_tag` (the replay harness sets one per request) gets the calls
+made on its behalf, including from the worker threads the context is copied
+to. Optional latency and a 503 error rate simulate a slow or failing
+instance.
+
+    standin = install(registry, latency_s=0.05)
+"""
+
+from __future__ import annotations
+import base64
+import contextvars
+import dataclasses
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from app.integrations.servicenow_instances import InstanceClient, InstanceRegistry
+
+_TABLE_PREFIX = "/api/now/table/"
+_BATCH_PATH = "/api/now/v1/batch"
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
+
+# Upstream calls made while this is set are also counted under its value
+call_tag: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("standin_call_tag", default=None)
+
+_DICTIONARY = [
+    {"element": "caller_id", "label": "Caller", "mandatory": "true"},
+    {"element": "short_description", "label": "Short description", "mandatory": "true"},
+    {"element": "close_code", "label": "Resolution code", "mandatory": "false"},
+]
+_CHOICES = [
+    {"element": "close_code", "value": "Resolved by caller", "label": "Resolved by caller"},
+    {"element": "close_code", "value": "Solved (Permanently)", "label": "Solved (Permanently)"},
+    {"element": "state", "value": "1", "label": "New"},
+    {"element": "state", "value": "2", "label": "In Progress"},
+    {"element": "state", "value": "6", "label": "Resolved"},
+]
+
+
+def _terms(query: str) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """
+    The equality/IN terms of an encoded query, and its `field>=value` lower
+    bounds; other operators match everything.
+    """
+    found: Dict[str, List[str]] = {}
+    since: Dict[str, str] = {}
+    for term in (query or "").split("^"):
+        if term.startswith("ORDERBY"):
+            continue
+        field, sep, value = term.partition(">=")
+        if sep and field.isidentifier():
+            since[field] = value
+            continue
+        for op in ("IN", "="):
+            field, sep, value = term.partition(op)
+            if sep and field.isidentifier():
+                found[field] = value.split(",") if op == "IN" else [value]
+                break
+    return found, since
+
+
+def _ordered(rows: List[dict], query: str) -> List[dict]:
+    """`rows` sorted by the query's ORDERBY / ORDERBYDESC terms, first term first."""
+    for term in reversed((query or "").split("^")):
+        if term.startswith("ORDERBY"):
+            desc = term.startswith("ORDERBYDESC")
+            field = term[len("ORDERBYDESC" if desc else "ORDERBY"):]
+            rows.sort(key=lambda r: str(r.get(field, "")), reverse=desc)
+    return rows
+
+
+def _matches(row: dict, terms: Dict[str, List[str]], since: Dict[str, str]) -> bool:
+    return (all(str(row.get(f, "")) in values for f, values in terms.items())
+            and all(str(row.get(f, "")) >= value for f, value in since.items()))
+
+
+class StandInServiceNow:
+    """In-memory incident tables shared by every instance the stand-in is mounted on."""
+
+    def __init__(self, latency_s: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._numbers = itertools.count(1)
+        self.incidents: Dict[str, dict] = {}
+        self.journal: List[dict] = []
+        self.calls: Counter = Counter()                 # (instance, method, table) -> n
+        self._tagged: Dict[str, Counter] = {}           # tag -> (method, table) -> n
+
+    # -- accounting -------------------------------------------------------------
+    def _count(self, instance: str, method: str, table: str) -> None:
+        tag = call_tag.get()
+        with self._lock:
+            self.calls[(instance, method, table)] += 1
+            if tag is not None:
+                self._tagged.setdefault(tag, Counter())[(method, table)] += 1
+
+    def pop_calls(self, tag: str) -> Dict[str, int]:
+        """Calls made under `tag` as {"METHOD table": n}; forgets them."""
+        with self._lock:
+            calls = self._tagged.pop(tag, Counter())
+        return {f"{method} {table}": n for (method, table), n in sorted(calls.items())}
+
+    # -- Table API ----------------------------------------------------------------
+    def handle(self, instance: str, method: str, path: str, params: Dict[str, str],
+               body: Optional[dict], user: str = "integration") -> Tuple[int, dict, Dict[str, str]]:
+        """One Table API (or Batch API) call made as `user`: returns (status, JSON body, extra headers)."""
+        batch = path == _BATCH_PATH and method == "POST"
+        if not batch and not path.startswith(_TABLE_PREFIX):
+            return 404, {"error": {"message": "Not found"}}, {}
+        table, _, sys_id = ("batch", "", "") if batch else path[len(_TABLE_PREFIX):].partition("/")
+        self._count(instance, method, table)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        with self._lock:
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if failed:
+            return 503, {"error": {"message": "Stand-in injected failure"}}, {}
+        if batch:
+            return 200, self._batch(body or {}, user), {}
+        return self._table(method, table, sys_id, params, body, user)
+
+    def _batch(self, body: dict, user: str) -> dict:
+        """Batch API: every rest_request served in one round trip (counted as one "batch" call)."""
+        served = []
+        for sub in body.get("rest_requests", []):
+            url = urlsplit(sub.get("url", ""))
+            raw = base64.b64decode(sub.get("body") or "")
+            if url.path.startswith(_TABLE_PREFIX):
+                table, _, sys_id = url.path[len(_TABLE_PREFIX):].partition("/")
+                status, payload, _ = self._table(sub.get("method", "GET"), table, sys_id, dict(parse_qsl(url.query)),
+                                                 json.loads(raw) if raw else None, user)
+            else:
+                status, payload = 404, {"error": {"message": "Not found"}}
+            served.append({"id": sub.get("id"), "status_code": status, "status_text": _REASONS.get(status, ""),
+                           "body": base64.b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")})
+        return {"batch_request_id": body.get("batch_request_id"), "serviced_requests": served,
+                "unserviced_requests": []}
+
+    def _table(self, method: str, table: str, sys_id: str, params: Dict[str, str],
+               body: Optional[dict], user: str) -> Tuple[int, dict, Dict[str, str]]:
+        with self._lock:
+            if table == "incident" and method == "POST":
+                return 201, {"result": self._create(body or {}, user)}, {}
+            if table == "incident" and sys_id:
+                inc = self.incidents.get(sys_id)
+                if inc is None:
+                    return 404, {"error": {"message": "No Record found"}}, {}
+                if method == "PATCH":
+                    self._patch(inc, body or {}, user)
+                return 200, {"result": self._fields(inc, params)}, {}
+            if method != "GET":
+                return 400, {"error": {"message": f"{method} not supported on {table}"}}, {}
+            query = params.get("sysparm_query", "")
+            rows = _ordered(self._rows(table, *_terms(query)), query)
+        offset = int(params.get("sysparm_offset", 0))
+        limit = int(params.get("sysparm_limit", 10000))
+        page = [self._fields(r, params) for r in rows[offset:offset + limit]]
+        return 200, {"result": page}, {"X-Total-Count": str(len(rows))}
+
+    def _create(self, body: dict, user: str) -> dict:
+        sys_id, now = uuid.uuid4().hex, self._now()
+        inc = {**body, "sys_id": sys_id, "number": f"INC{next(self._numbers):07d}", "state": "1",
+               "incident_state": "1", "sys_created_by": user, "sys_created_on": now, "sys_updated_on": now,
+               "sys_mod_count": "0"}
+        self.incidents[sys_id] = inc
+        return dict(inc)
+
+    def _patch(self, inc: dict, body: dict, user: str) -> None:
+        now = self._now()
+        for element in ("work_notes", "comments"):
+            if body.get(element):
+                self.journal.append({
+                    "sys_id": uuid.uuid4().hex, "name": "incident", "documentkey": inc["sys_id"],
+                    "element": element, "value": body[element], "sys_created_by": user, "sys_created_on": now,
+                })
+        inc.update({k: str(v) for k, v in body.items() if k not in ("work_notes", "comments")})
+        inc["sys_updated_on"] = now
+        inc["sys_mod_count"] = str(int(inc.get("sys_mod_count", 0)) + 1)
+
+    def _rows(self, table: str, terms: Dict[str, List[str]], since: Dict[str, str]) -> List[dict]:
+        if table == "incident":
+            ids = terms.get("sys_id")
+            rows = [self.incidents[i] for i in ids if i in self.incidents] if ids else self.incidents.values()
+            return [dict(inc) for inc in rows if _matches(inc, terms, since)]
+        if table == "sys_journal_field":
+            return [dict(j) for j in self.journal if _matches(j, terms, since)]
+        if table == "sys_user":
+            return [{"sys_id": uuid.uuid5(uuid.NAMESPACE_OID, name).hex, "user_name": name}
+                    for name in terms.get("user_name", ())]
+        if table == "sys_dictionary":
+            return [dict(r) for r in _DICTIONARY]
+        if table == "sys_choice":
+            elements = set(terms.get("element", ())) or {r["element"] for r in _CHOICES}
+            return [dict(r) for r in _CHOICES if r["element"] in elements]
+        return []
+
+    @staticmethod
+    def _fields(row: dict, params: Dict[str, str]) -> dict:
+        fields = [f for f in params.get("sysparm_fields", "").split(",") if f]
+        return {f: row.get(f, "") for f in fields} if fields else dict(row)
+
+    @staticmethod
+    def _now() -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+
+def _user(request: requests.PreparedRequest) -> str:
+    scheme, _, credentials = (request.headers.get("Authorization") or "").partition(" ")
+    if scheme.lower() != "basic":
+        return "integration"
+    return base64.b64decode(credentials).decode("utf-8", "replace").partition(":")[0]
+
+
+class StandInAdapter(BaseAdapter):
+    """requests transport that answers from a StandInServiceNow instead of the network."""
+
+    def __init__(self, standin: StandInServiceNow, instance: str):
+        super().__init__()
+        self.standin = standin
+        self.instance = instance
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout: Any = None,
+             verify: Any = True, cert: Any = None, proxies: Any = None) -> requests.Response:
+        url = urlsplit(request.url)
+        body = json.loads(request.body) if request.body else None
+        status, payload, headers = self.standin.handle(
+            self.instance, request.method, url.path, dict(parse_qsl(url.query)), body, _user(request))
+        resp = requests.Response()
+        resp.status_code = status
+        resp.reason = _REASONS.get(status, "")
+        resp.headers = CaseInsensitiveDict({"Content-Type": "application/json", **headers})
+        resp._content = json.dumps(payload).encode("utf-8")
+        resp.encoding = "utf-8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self) -> None:
+        pass
+
+
+def install(registry: InstanceRegistry, standin: Optional[StandInServiceNow] = None,
+            **options: Any) -> StandInServiceNow:
+    """
+    Point every instance in `registry` at the stand-in (fresh clients: same
+    rate limits and pool sizes, placeholder URL/credentials where unset).
+    `options` are StandInServiceNow arguments when no stand-in is given.
+    """
+    standin = standin or StandInServiceNow(**options)
+    for name in registry.names():
+        config = registry.get(name).config
+        config = dataclasses.replace(config, url=f"https://{name}.standin.invalid",
+                                     username=config.username or "standin",
+                                     password=config.password or "standin")
+        client = InstanceClient(config)
+        client.session.mount("https://", StandInAdapter(standin, name))
+        registry.add(client)
+    return standin
@@ -1,31 +1,174 @@
 # app/utils/logger.py
 
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+from typing import Dict, Optional
 
-def init_logger(level: str = "INFO") -> None:
+# Background listener that owns the real (blocking) stdout handler.
+_listener: Optional[logging.handlers.QueueListener] = None
+
+_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord carries; anything else came in through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg plus any `extra=` fields.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG (and lower) records; INFO and above always pass.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
     """
-    Initialize root logger and Uvicorn loggers to output to stdout
-    with a consistent timestamped format.
+    QueueHandler that never blocks the caller:
+      - message interpolation is deferred to the listener thread
+      - when the queue is full the record is dropped and counted
     """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Stock QueueHandler formats on the caller thread; the queue is
+        # in-process, so hand the record over untouched.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop() waits for room instead of failing on a full queue."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    Parse "app.integrations=DEBUG,uvicorn.access=WARNING" into {logger: level}.
+    """
+    levels: Dict[str, str] = {}
+    for item in (spec or "").split(","):
+        name, sep, lvl = item.strip().partition("=")
+        if sep and name.strip() and lvl.strip():
+            levels[name.strip()] = lvl.strip().upper()
+    return levels
+
+
+def stop_logger() -> None:
+    """Flush and stop the background listener (safe to call more than once)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def init_logger(
+    level: str = None,
+    fmt: str = None,
+    levels: Dict[str, str] = None,
+    debug_sample_rate: float = None,
+    queue_size: int = None,
+) -> NonBlockingQueueHandler:
+    """
+    Initialize root and Uvicorn loggers with a queue-based pipeline:
+    callers only enqueue records; a QueueListener thread formats and writes
+    them to stdout, so slow stdout never stalls a request.
+
+    Defaults come from the environment:
+      LOG_LEVEL               root level (INFO)
+      LOG_FORMAT              "json" (default) or "text"
+      LOG_LEVELS              per-logger overrides, e.g. "app.integrations=DEBUG"
+      LOG_DEBUG_SAMPLE_RATE   fraction of DEBUG records kept (1.0)
+      LOG_QUEUE_SIZE          records buffered before new ones are dropped (10000)
+    """
+    global _listener
+    stop_logger()
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    fmt = (fmt or os.getenv("LOG_FORMAT", "json")).lower()
+    if levels is None:
+        levels = parse_levels(os.getenv("LOG_LEVELS", ""))
+    if debug_sample_rate is None:
+        debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
     log_level = getattr(logging, level.upper(), logging.INFO)
 
-    # Configure root logger
-    root = logging.getLogger()
-    root.setLevel(log_level)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == "text":
+        stream_handler.setFormatter(logging.Formatter(
+            fmt="%(asctime)s %(levelname)s [%(name)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        ))
+    else:
+        stream_handler.setFormatter(JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S"))
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(log_level)
-    handler.setFormatter(logging.Formatter(
-        fmt="%(asctime)s %(levelname)s [%(name)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    ))
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size or _QUEUE_SIZE))
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
 
-    # Replace any existing handlers
-    root.handlers = [handler]
+    _listener = _DrainingQueueListener(
+        queue_handler.queue, stream_handler, respect_handler_level=True
+    )
+    _listener.start()
+
+    # Configure root logger; handlers stay at NOTSET so per-logger levels decide
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.handlers = [queue_handler]
 
-    # Also route Uvicorn logs through our handler/formatter
+    # Also route Uvicorn logs through the same queue (once: no propagation
+    # up to a parent that holds the same handler)
     for uv_logger in ("uvicorn", "uvicorn.error", "uvicorn.access"):
         logger = logging.getLogger(uv_logger)
-        logger.handlers = [handler]
+        logger.handlers = [queue_handler]
         logger.setLevel(log_level)
+        logger.propagate = False
+
+    for name, lvl in (levels or {}).items():
+        logging.getLogger(name).setLevel(getattr(logging, lvl, log_level))
+
+    return queue_handler
+
+
+atexit.register(stop_logger)
@@ -0,0 +1,136 @@
+# app/utils/profiler.py
+"""
+On-demand sampling profiler for a live process (stdlib only).
+
+While a profile runs, the thread that asked for it reads every other
+thread's Python stack (sys._current_frames) every `interval_s` and counts
+identical stacks. When no profile is running nothing is installed: no
+trace/profile hooks, no per-call bookkeeping, no extra thread.
+
+Samples are tagged from the stack itself: a frame whose code object is
+registered in `tags` (coordinator step functions, ServiceNowClient methods;
+see default_tags) adds "category:value" (outermost per category) ahead of
+the frames. Output is the collapsed-stack format read by flamegraph.pl,
+speedscope and inferno:
+
+    plan-step;step:diagnose;servicenow:query_table;app/agents/...:run;... 42
+"""
+
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType
+from typing import Dict, Optional, Tuple
+
+# A leaf frame in one of these files is a thread blocked on a lock, queue or socket
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+_THREAD_SUFFIX = re.compile(r"[_-]\d+(?: \(.*\))?$")  # "plan-step_3", "Thread-4 (worker)"
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Tag = Tuple[str, str]  # (category, value)
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running in this process."""
+
+
+def _functions(cls) -> Dict[str, CodeType]:
+    found = {}
+    for name, attr in vars(cls).items():
+        func = getattr(attr, "__func__", attr)  # staticmethod/classmethod
+        if not name.startswith("_") and inspect.isfunction(func):
+            found[name] = func.__code__
+    return found
+
+
+def default_tags() -> Dict[CodeType, Tag]:
+    """Coordinator steps and ServiceNowClient methods, by code object."""
+    from app.agents.coordinator_agent import STEP_REGISTRY
+    from app.integrations.servicenow_client import ServiceNowClient
+
+    tags: Dict[CodeType, Tag] = {}
+    for name, code in _functions(ServiceNowClient).items():
+        tags[code] = ("servicenow", name)
+    for step in STEP_REGISTRY.names():
+        func = STEP_REGISTRY.get(step).func
+        if hasattr(func, "__code__"):
+            tags[func.__code__] = ("step", step)
+    return tags
+
+
+class SamplingProfiler:
+    def __init__(self, interval_s: float = 0.005, tags: Optional[Dict[CodeType, Tag]] = None,
+                 include_idle: bool = False):
+        self.interval_s = interval_s
+        self.tags = tags or {}
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.ticks = 0
+        self._labels: Dict[CodeType, str] = {}
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            if path.startswith(_ROOT):
+                path = os.path.relpath(path, _ROOT)
+            else:
+                path = os.path.basename(path)
+            name = getattr(code, "co_qualname", code.co_name)    # co_qualname is new in 3.11
+            label = self._labels[code] = f"{path}:{name}".replace(";", ",").replace(" ", "_")
+        return label
+
+    def _sample(self, own: int, names: Dict[int, str]) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                continue
+            stack, tags, seen = [], [], set()
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self._label(code))
+                tag = self.tags.get(code)
+                if tag is not None:
+                    tags.append(tag)
+                frame = frame.f_back
+            outermost = []
+            for category, value in reversed(tags):
+                if category not in seen:
+                    seen.add(category)
+                    outermost.append(f"{category}:{value}")
+            thread = _THREAD_SUFFIX.sub("", names.get(ident, "thread"))
+            self.samples[";".join([thread, *outermost, *reversed(stack)])] += 1
+
+    def run(self, seconds: float) -> "SamplingProfiler":
+        """Sample for `seconds` on the calling thread."""
+        own = threading.get_ident()
+        end = time.monotonic() + seconds
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self._sample(own, names)
+            self.ticks += 1
+            left = end - time.monotonic()
+            if left <= 0:
+                return self
+            time.sleep(min(self.interval_s, left))
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+
+_running = threading.Lock()
+
+
+def profile(seconds: float, interval_s: float = 0.005, include_idle: bool = False) -> SamplingProfiler:
+    """Profile the whole process for `seconds`; one profile at a time (ProfilerBusy otherwise)."""
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        return SamplingProfiler(interval_s, default_tags(), include_idle).run(seconds)
+    finally:
+        _running.release()
@@ -0,0 +1,228 @@
+# app/workflows/change_feed.py
+"""
+Incremental change feed from ServiceNow.
+
+Instead of reading every tracked incident and its journal on each poll,
+every CHANGE_FEED_INTERVAL_S the feed runs one query per table and
+instance for what changed since the last watermark:
+
+  incident           sys_updated_on >= watermark, created by this service's
+                     integration user (sys_created_by)
+  sys_journal_field  sys_created_on >= watermark (journal rows are append-
+                     only), for the incidents task_store tracks on that
+                     instance (documentkeyIN, 100 ids per query)
+
+Changes are applied to task_store (same rules as the reconciliation
+sweeper) and published to subscribers (subscribe(fn)), e.g. caches keyed
+by incident. Upstream load is two queries per interval per instance
+(more only when a page fills up or over 100 incidents are tracked).
+
+Watermarks are compared inclusively, and rows already seen at the
+watermark second are skipped, so updates sharing a timestamp are not lost.
+With CHANGE_FEED_STATE_PATH set they are persisted (JSON, replaced
+atomically) and a restart resumes where it stopped. Otherwise the first
+poll seeds both watermarks from the instance's own clock: the newest
+sys_updated_on among the integration user's incidents (every journal row
+also touches its incident), so a host clock running ahead of the instance
+cannot skip changes.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.task_store import task_store
+from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import instance_context, registry
+from app.workflows import reconciler
+
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_INTERVAL_S = float(os.getenv("CHANGE_FEED_INTERVAL_S", "15"))  # 0 disables the feed
+CHANGE_FEED_PAGE = int(os.getenv("CHANGE_FEED_PAGE", "500"))
+CHANGE_FEED_STATE_PATH = os.getenv("CHANGE_FEED_STATE_PATH")
+
+INCIDENT, JOURNAL = "incident", "sys_journal_field"
+_INCIDENT_FIELDS = f"{reconciler.FIELDS},sys_updated_on,sys_mod_count"
+_JOURNAL_FIELDS = "sys_id,documentkey,element,sys_created_on"
+_TIME_FIELD = {INCIDENT: "sys_updated_on", JOURNAL: "sys_created_on"}
+_EPOCH = "1970-01-01 00:00:00"    # ServiceNow's internal (UTC) format
+_IDS_PER_QUERY = 100
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    instance: str
+    table: str          # INCIDENT or JOURNAL
+    sys_id: str         # the incident's sys_id (documentkey for journal rows)
+    row: Dict[str, Any]
+
+
+Subscriber = Callable[[Change], None]
+
+
+class _Cursor:
+    """
+    Watermark of one table on one instance, plus the rows already seen at it:
+    sys_id, and for records that change (incidents) also sys_mod_count, so a
+    second update within the same second is still delivered.
+    """
+
+    __slots__ = ("watermark", "seen")
+
+    def __init__(self, watermark: str, seen: Optional[Set[str]] = None):
+        self.watermark = watermark
+        self.seen = seen or set()
+
+    def advance(self, rows: List[dict], field: str) -> List[dict]:
+        """The rows not delivered before; moves the watermark past them."""
+        fresh = []
+        for row in rows:
+            stamp, row_id = row.get(field) or "", f"{row.get('sys_id')}:{row.get('sys_mod_count', '')}"
+            if stamp < self.watermark or (stamp == self.watermark and row_id in self.seen):
+                continue
+            if stamp > self.watermark:
+                self.watermark, self.seen = stamp, set()
+            self.seen.add(row_id)
+            fresh.append(row)
+        return fresh
+
+
+class ChangeFeed:
+    def __init__(self, state_path: Optional[str] = CHANGE_FEED_STATE_PATH):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+        self._cursors: Dict[Tuple[str, str], _Cursor] = self._load()
+        self._polled: Dict[str, float] = {}         # instance -> monotonic time of last good poll
+        self.counts = {"polls": 0, "queries": 0, "changes": 0, "applied": 0, "errors": 0}
+
+    # -- state ------------------------------------------------------------------
+    def _load(self) -> Dict[Tuple[str, str], _Cursor]:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Change feed state unreadable (%s); starting from now", e)
+            return {}
+        return {(instance, table): _Cursor(c["watermark"], set(c.get("seen", ())))
+                for instance, tables in state.items() for table, c in tables.items()}
+
+    def _save(self) -> None:
+        if not self.state_path:
+            return
+        state: Dict[str, Dict[str, Any]] = {}
+        for (instance, table), cursor in self._cursors.items():
+            state.setdefault(instance, {})[table] = {"watermark": cursor.watermark, "seen": sorted(cursor.seen)}
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def watermarks(self) -> Dict[str, Dict[str, str]]:
+        out: Dict[str, Dict[str, str]] = {}
+        for (instance, table), cursor in self._cursors.items():
+            out.setdefault(instance, {})[table] = cursor.watermark
+        return out
+
+    # -- subscribers ----------------------------------------------------------------
+    def subscribe(self, fn: Subscriber) -> Subscriber:
+        """Call `fn(change)` for every change the feed delivers (from the polling thread)."""
+        self._subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn: Subscriber) -> None:
+        self._subscribers.remove(fn)
+
+    def _publish(self, change: Change) -> None:
+        for fn in list(self._subscribers):
+            try:
+                fn(change)
+            except Exception as e:  # a broken subscriber must not stall the feed
+                logger.warning("Change feed subscriber %r failed: %s", fn, e)
+
+    # -- polling --------------------------------------------------------------------
+    def live(self, instance: str) -> bool:
+        """True while `instance` was polled successfully within two intervals."""
+        polled = self._polled.get(instance)
+        return (CHANGE_FEED_INTERVAL_S > 0 and polled is not None
+                and time.monotonic() - polled <= 2 * CHANGE_FEED_INTERVAL_S)
+
+    def _seed(self, instance: str, ours: str) -> None:
+        """First watermarks of `instance`, read from its newest incident rather than the local clock."""
+        newest, _ = ServiceNowClient.query_table(INCIDENT, f"{ours}^ORDERBYDESCsys_updated_on",
+                                                 _INCIDENT_FIELDS, limit=1)
+        self.counts["queries"] += 1
+        incidents = _Cursor(_EPOCH)
+        incidents.advance(newest, _TIME_FIELD[INCIDENT])
+        self._cursors.setdefault((instance, INCIDENT), incidents)
+        self._cursors.setdefault((instance, JOURNAL), _Cursor(incidents.watermark))
+
+    def _changed(self, instance: str, table: str, queries: List[str], fields: str) -> Tuple[_Cursor, List[dict]]:
+        """Rows changed since the table's watermark, and the cursor to keep once they are handled."""
+        current = self._cursors[(instance, table)]
+        cursor = _Cursor(current.watermark, set(current.seen))
+        field = _TIME_FIELD[table]
+        rows: List[dict] = []
+        for query in queries:
+            base = f"{field}>={cursor.watermark}^{query}^ORDERBY{field}^ORDERBYsys_id"
+            found = 0
+            while True:
+                page, _ = ServiceNowClient.query_table(table, base, fields, limit=CHANGE_FEED_PAGE, offset=found)
+                self.counts["queries"] += 1
+                rows += page
+                found += len(page)
+                if len(page) < CHANGE_FEED_PAGE:
+                    break
+        if len(queries) > 1:
+            rows.sort(key=lambda r: (r.get(field) or "", r.get("sys_id") or ""))
+        return cursor, cursor.advance(rows, field)
+
+    def _poll_instance(self, instance: str) -> None:
+        ours = f"sys_created_by={registry.get(instance).config.username}"
+        tracked = sorted(key for key, entry in task_store.scan() if entry.instance == instance)
+        notes = [f"name=incident^elementINcomments,work_notes^documentkeyIN{','.join(tracked[i:i + _IDS_PER_QUERY])}"
+                 for i in range(0, len(tracked), _IDS_PER_QUERY)]
+        with instance_context(instance):
+            if (instance, INCIDENT) not in self._cursors or (instance, JOURNAL) not in self._cursors:
+                self._seed(instance, ours)
+            incident_cursor, incidents = self._changed(instance, INCIDENT, [ours], _INCIDENT_FIELDS)
+            journal_cursor, journal = self._changed(instance, JOURNAL, notes, _JOURNAL_FIELDS)
+        for row in incidents:
+            key = row.get("sys_id")
+            entry = task_store.get(key)
+            if entry is not None and reconciler.apply(key, entry, row) is not None:
+                self.counts["applied"] += 1
+            self._publish(Change(instance, INCIDENT, key, row))
+        for row in journal:
+            self._publish(Change(instance, JOURNAL, row.get("documentkey"), row))
+        self.counts["changes"] += len(incidents) + len(journal)
+        self._cursors[(instance, INCIDENT)] = incident_cursor
+        self._cursors[(instance, JOURNAL)] = journal_cursor
+
+    def poll(self) -> Dict[str, Any]:
+        """One pass over every configured instance; returns the feed counters."""
+        with self._lock:
+            for instance in registry.names():
+                try:
+                    self._poll_instance(instance)
+                    self._polled[instance] = time.monotonic()
+                except Exception as e:  # keep the watermark; the next poll retries from it
+                    logger.warning("Change feed poll of instance '%s' failed: %s", instance, e)
+                    self.counts["errors"] += 1
+            self.counts["polls"] += 1
+            self._save()
+            return dict(self.counts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"interval_s": CHANGE_FEED_INTERVAL_S, **self.counts, "watermarks": self.watermarks(),
+                "live": {name: self.live(name) for name in registry.names()}}
+
+
+change_feed = ChangeFeed()
@@ -1,8 +1,11 @@
 # app/workflows/coordinator_graph.py
 
+from typing import Optional
+
 from app.agents.coordinator_agent import CoordinatorAgent
+from app.core.results import PlanResult
 
-def run_agentic_flow(incident_sys_id: str, user_request: str) -> dict:
+def run_agentic_flow(incident_sys_id: str, user_request: str) -> PlanResult:
     """
     Delegates to CoordinatorAgent, which:
       1) builds a plan from the free-form request
@@ -10,3 +13,11 @@ def run_agentic_flow(incident_sys_id: str, user_request: str) -> dict:
       3) posts incremental notes and resolves the incident
     """
     return CoordinatorAgent.run(incident_sys_id, user_request)
+
+def finish_agentic_flow(incident_sys_id: str, user_request: str, prepared: PlanResult,
+                        lead: Optional[str] = None) -> PlanResult:
+    """
+    Applies a plan prepared ahead of approval (see workflows.speculation):
+    the steps already ran, so only the resolving PATCH is left.
+    """
+    return CoordinatorAgent.finish(incident_sys_id, user_request, prepared, lead=lead)
@@ -0,0 +1,141 @@
+# app/workflows/reconciler.py
+"""
+Reconciliation sweeper between task_store and ServiceNow.
+
+Incidents resolved or canceled by people in the ServiceNow UI would stay
+waiting_approval locally. Every RECONCILE_INTERVAL_S the sweeper reads all
+locally non-terminal incidents back from ServiceNow, one `sys_idIN` Table
+API call per RECONCILE_BATCH_SIZE incidents and instance, and updates their
+entries in place:
+
+  - Resolved/Closed in ServiceNow    -> status "completed"
+  - Canceled                         -> "manual_intervention_required" (reason "canceled")
+  - otherwise                        -> only the incident snapshot is refreshed
+
+Entries are written with task_store.claim() against the entry that was
+read, so a sweep never overwrites an approval that claimed the plan, or a
+prepared result stored, in the meantime; plans being executed are skipped
+altogether. GET /tasks/{id}
+serves the incident fields from a snapshot younger than RECONCILE_MAX_AGE_S
+instead of reading the incident. Terminal entries are evicted
+TASK_RETENTION_S after their last write.
+"""
+
+import dataclasses
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.correlation import correlator
+from app.core.results import IncidentState, TaskEntry
+from app.core.task_store import TERMINAL, task_store
+from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import UnknownInstance, instance_context, registry
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL_S = float(os.getenv("RECONCILE_INTERVAL_S", "60"))  # 0 disables the sweeper
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "100"))
+RECONCILE_MAX_AGE_S = float(os.getenv("RECONCILE_MAX_AGE_S", str(2 * RECONCILE_INTERVAL_S)))
+TASK_RETENTION_S = float(os.getenv("TASK_RETENTION_S", "86400"))
+
+_EXECUTING = "executing"                  # owned by the approval running the plan
+FIELDS = "sys_id,number,state,short_description"   # what a snapshot needs
+_RESOLVED_STATES = {"6", "7"}
+_CANCELED_STATE = "8"
+_COUNTERS = ("checked", "queries", "updated", "completed", "manual_intervention_required", "missing", "errors",
+             "evicted")
+
+_lock = threading.Lock()                  # one sweep at a time per process
+_last: Dict[str, Any] = {}
+
+
+def snapshot(entry: Optional[TaskEntry]) -> Optional[dict]:
+    """The entry's incident fields if the last sweep saw them recently enough, else None."""
+    incident = entry.incident if entry else None
+    if incident is None or time.time() - incident.synced_at > RECONCILE_MAX_AGE_S:
+        return None
+    return incident.to_dict()
+
+
+def _reconciled(entry: TaskEntry, row: dict, now: float) -> TaskEntry:
+    incident = IncidentState(row.get("number"), str(row.get("state") or ""), row.get("short_description"), now)
+    if incident.state in _RESOLVED_STATES:
+        return dataclasses.replace(entry, status="completed", incident=incident, prepared=None)
+    if incident.state == _CANCELED_STATE:
+        return dataclasses.replace(entry, status="manual_intervention_required", reason="canceled",
+                                   incident=incident, prepared=None)
+    return dataclasses.replace(entry, incident=incident)
+
+
+def apply(key: str, entry: TaskEntry, row: dict, now: Optional[float] = None) -> Optional[TaskEntry]:
+    """
+    Bring `entry` (as read from task_store) in line with the incident `row`.
+    Returns the stored entry, or None when the entry was terminal, being
+    executed, or changed since it was read.
+    """
+    if entry.status in TERMINAL or entry.status == _EXECUTING:
+        return None
+    updated = _reconciled(entry, row, time.time() if now is None else now)
+    if not task_store.claim(key, {entry.status}, updated, match=lambda current: current == entry):
+        return None  # changed since it was read (approved/rejected/prepared meanwhile)
+    if updated.status != entry.status:
+        correlator.close_incident(key)
+    return updated
+
+
+def _sweep_instance(entries: List[Tuple[str, TaskEntry]], counts: Dict[str, int]) -> None:
+    for start in range(0, len(entries), RECONCILE_BATCH_SIZE):
+        batch = dict(entries[start:start + RECONCILE_BATCH_SIZE])
+        rows, _ = ServiceNowClient.query_table(
+            ServiceNowClient.TABLE, f"sys_idIN{','.join(batch)}", FIELDS, limit=len(batch))
+        counts["queries"] += 1
+        now = time.time()
+        seen = set()
+        for row in rows:
+            key = row.get("sys_id")
+            entry = batch.get(key)
+            if entry is None:
+                continue
+            seen.add(key)
+            updated = apply(key, entry, row, now)
+            if updated is None:
+                continue
+            counts["updated"] += 1
+            if updated.status != entry.status:
+                counts[updated.status] += 1
+        counts["missing"] += len(batch) - len(seen)
+
+
+def sweep() -> Dict[str, Any]:
+    """One reconciliation pass plus retention eviction; returns its counters."""
+    with _lock:
+        started = time.perf_counter()
+        counts = dict.fromkeys(_COUNTERS, 0)
+        by_instance: Dict[str, List[Tuple[str, TaskEntry]]] = defaultdict(list)
+        for key, entry in task_store.scan(exclude=(*TERMINAL, _EXECUTING)):
+            by_instance[entry.instance or registry.default].append((key, entry))
+        for name, entries in by_instance.items():
+            counts["checked"] += len(entries)
+            try:
+                with instance_context(name):
+                    _sweep_instance(entries, counts)
+            except UnknownInstance:
+                logger.warning("Reconcile: %d task(s) on unconfigured instance '%s'", len(entries), name)
+                counts["errors"] += 1
+            except Exception as e:  # one instance being down must not stop the others
+                logger.warning("Reconcile of instance '%s' failed: %s", name, e)
+                counts["errors"] += 1
+        if TASK_RETENTION_S > 0:
+            counts["evicted"] = task_store.evict(TERMINAL, time.time() - TASK_RETENTION_S)
+        result = {**counts, "finished_at": time.time(), "duration_s": round(time.perf_counter() - started, 3)}
+        _last.clear()
+        _last.update(result)
+        return result
+
+
+def stats() -> Dict[str, Any]:
+    return {"interval_s": RECONCILE_INTERVAL_S, "last_sweep": dict(_last)}
@@ -0,0 +1,112 @@
+# app/workflows/speculation.py
+"""
+Speculative preparation of plans that await approval.
+
+Right after /execute stores a plan as waiting_approval, the plan's steps
+(diagnosis, script generation and lint, email draft) run in the background
+through CoordinatorAgent.prepare, which writes nothing to ServiceNow. The
+result is stashed on the task entry (TaskEntry.prepared, next to the
+request text), so /approve only has to apply it: one PATCH that carries the
+approval note and resolves the incident, with no incident read and no steps
+to run.
+
+Preparation runs on the coordinator workers in the lowest admission class
+(behind approved plans and auto-remediation); when that backlog is full the
+plan is simply not prepared. A result is kept only while the entry still
+awaits approval and when no step failed; otherwise approval runs the plan
+as before. SPECULATIVE_PREPARE=0 turns this off.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+
+from app.agents.coordinator_agent import CoordinatorAgent
+from app.core.admission import SPECULATIVE, Rejected, admission
+from app.core.results import PlanResult, TaskEntry
+from app.core.task_store import task_store
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_PREPARE = os.getenv("SPECULATIVE_PREPARE", "1").lower() not in ("0", "false", "no")
+
+WAITING = ("waiting_approval", "awaiting_approval")
+_CALLER = "speculation"
+
+# Preparations running in this process, by incident
+_running: Dict[str, Future] = {}
+_lock = threading.Lock()
+counts = {"started": 0, "skipped": 0, "stored": 0, "discarded": 0, "failed": 0, "used": 0}
+
+
+def _prepare(incident_sys_id: str, request_text: str) -> Optional[PlanResult]:
+    result = CoordinatorAgent.prepare(incident_sys_id, request_text)
+    if result is None:
+        counts["failed"] += 1
+        return None
+    entry = task_store.get(incident_sys_id)
+    if entry is None or entry.status not in WAITING or not task_store.claim(
+            incident_sys_id, {entry.status}, dataclasses.replace(entry, prepared=result)):
+        counts["discarded"] += 1  # approved, rejected or closed meanwhile
+        return result
+    counts["stored"] += 1
+    return result
+
+
+def start(incident_sys_id: str, request_text: str) -> Optional[Future]:
+    """Prepare the plan of a task that awaits approval in the background; None if not started."""
+    if not SPECULATIVE_PREPARE:
+        return None
+    try:
+        admission.admit(_CALLER, SPECULATIVE)
+    except Rejected:
+        counts["skipped"] += 1
+        return None
+    fut = admission.submit(SPECULATIVE, _prepare, incident_sys_id, request_text)
+    with _lock:
+        _running[incident_sys_id] = fut
+    counts["started"] += 1
+
+    def done(f: Future) -> None:
+        with _lock:
+            if _running.get(incident_sys_id) is f:
+                del _running[incident_sys_id]
+        if f.exception() is not None:
+            logger.warning("Preparing the plan of %s failed: %s", incident_sys_id, f.exception())
+
+    fut.add_done_callback(done)
+    return fut
+
+
+def running(incident_sys_id: str) -> Optional[Future]:
+    """The preparation of `incident_sys_id` still running in this process, if any."""
+    with _lock:
+        return _running.get(incident_sys_id)
+
+
+async def take(incident_sys_id: str, entry: Optional[TaskEntry]) -> Optional[PlanResult]:
+    """
+    The prepared result to approve `entry` with: the one stashed on it, or
+    that of a preparation still running in this process (awaited). None
+    when there is none; the caller then runs the plan.
+    """
+    prepared = entry.prepared if entry is not None else None
+    fut = running(incident_sys_id) if prepared is None else None
+    if fut is not None:
+        try:
+            prepared = await asyncio.wrap_future(fut)
+        except Exception:
+            prepared = None
+    if prepared is not None:
+        counts["used"] += 1
+    return prepared
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        in_flight = len(_running)
+    return {"enabled": SPECULATIVE_PREPARE, "running": in_flight, **counts}
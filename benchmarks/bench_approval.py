@@ -0,0 +1,64 @@
+# benchmarks/bench_approval.py
+"""
+Approve-to-resolved latency: POST /plans/{id}/approve for `n` plans created
+with require_approval, with speculative preparation on (steps already ran
+while the plan waited; approval is one PATCH) and off (approval reads the
+incident and runs every step, posting its progress notes). ServiceNow is the
+local stand-in with `latency_ms` per call, so the difference is mostly the
+upstream round trips saved.
+
+    python -m benchmarks.bench_approval [plans] [latency_ms]
+"""
+
+import statistics
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.core.admission import ClassPolicy, admission
+from app.integrations.servicenow_instances import registry
+from app.integrations.servicenow_standin import install
+from app.workflows import speculation
+
+_ALERTS = [
+    "disk full on linux db-{i:02d}: no space left on /var",
+    "CPU 100% on ubuntu web{i:02d}, load average 40",
+    "ssl certificate expired on api-gw-{i}",
+    "out of memory: oom killer hit java on node{i}",
+]
+
+
+def _approve_latencies(client: TestClient, n: int, prepare: bool) -> list:
+    speculation.SPECULATIVE_PREPARE = prepare
+    ids = [client.post("/api/v1/execute", json={"request": _ALERTS[i % len(_ALERTS)].format(i=i) + f" ({prepare})",
+                                                "require_approval": True}).json()["incident_sys_id"]
+           for i in range(n)]
+    for sys_id in ids:  # let the preparations finish: the approver shows up later
+        fut = speculation.running(sys_id)
+        if fut is not None:
+            fut.result()
+    out = []
+    for sys_id in ids:
+        start = time.perf_counter()
+        r = client.post(f"/api/v1/plans/{sys_id}/approve")
+        out.append(time.perf_counter() - start)
+        assert r.status_code == 200, r.text
+    return out
+
+
+def main(n: int = 50, latency_ms: int = 20) -> None:
+    install(registry, latency_s=latency_ms / 1000)
+    for klass in admission.policies:  # one caller sends everything
+        admission.policies[klass] = ClassPolicy(0, 0, 0)
+    client = TestClient(app)
+    print(f"plans: {n}  upstream latency: {latency_ms} ms")
+    for label, prepare in (("full run", False), ("prepared", True)):
+        lat = sorted(_approve_latencies(client, n, prepare))
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        print(f"{label:9s} p50 {statistics.median(lat) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
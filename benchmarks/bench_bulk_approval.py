@@ -0,0 +1,70 @@
+# benchmarks/bench_bulk_approval.py
+"""
+Approval throughput: `n` plans created with require_approval and prepared
+while they waited (see workflows.speculation), approved with `n` calls to
+POST /plans/{id}/approve, then with one POST /plans:approve (one list
+query plus Batch API round trips). ServiceNow is the local stand-in with
+`latency_ms` per call; upstream calls are counted for each approach.
+
+    python -m benchmarks.bench_bulk_approval [plans] [latency_ms]
+"""
+
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.core.admission import ClassPolicy, admission
+from app.integrations.servicenow_instances import registry
+from app.integrations.servicenow_standin import install
+from app.workflows import speculation
+
+_ALERTS = [
+    "disk full on linux db-{i:02d}: no space left on /var",
+    "CPU 100% on ubuntu web{i:02d}, load average 40",
+    "ssl certificate expired on api-gw-{i}",
+    "out of memory: oom killer hit java on node{i}",
+]
+
+
+def _waiting(client: TestClient, n: int, label: str) -> list:
+    ids = [client.post("/api/v1/execute", json={"request": _ALERTS[i % len(_ALERTS)].format(i=i) + f" ({label})",
+                                                "require_approval": True}).json()["incident_sys_id"]
+           for i in range(n)]
+    for sys_id in ids:  # let the preparations finish: the approver shows up later
+        fut = speculation.running(sys_id)
+        if fut is not None:
+            fut.result()
+    return ids
+
+
+def _one_by_one(client: TestClient, ids: list) -> None:
+    for sys_id in ids:
+        r = client.post(f"/api/v1/plans/{sys_id}/approve")
+        assert r.status_code == 200, r.text
+
+
+def _bulk(client: TestClient, ids: list) -> None:
+    r = client.post("/api/v1/plans:approve", json={"ids": ids})
+    assert r.status_code == 200 and all(i["status_code"] == 200 for i in r.json()["results"]), r.text
+
+
+def main(n: int = 100, latency_ms: int = 20) -> None:
+    standin = install(registry, latency_s=latency_ms / 1000)
+    for klass in admission.policies:  # one caller sends everything
+        admission.policies[klass] = ClassPolicy(0, 0, 0)
+    client = TestClient(app)
+    print(f"plans: {n}  upstream latency: {latency_ms} ms")
+    for label, approve in (("one by one", _one_by_one), ("bulk", _bulk)):
+        ids = _waiting(client, n, label)
+        calls = sum(standin.calls.values())
+        start = time.perf_counter()
+        approve(client, ids)
+        elapsed = time.perf_counter() - start
+        print(f"{label:10s} {elapsed * 1000:8.1f} ms   {n / elapsed:8.1f} plans/s   "
+              f"upstream calls {sum(standin.calls.values()) - calls}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,55 @@
+# benchmarks/bench_bundle.py
+"""
+Worker startup cost of the signature catalog: compiling a SignatureIndex
+from Signature objects (what every worker does at import) versus mapping a
+prebuilt bundle, each measured to the first diagnosis. Uses a synthetic
+catalog of `signatures` entries on top of the built-in one.
+
+    python -m benchmarks.bench_bundle [signatures]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from app.agents import signatures
+from app.agents.bundle import Bundle, build_bundle
+from app.agents.signatures import SignatureIndex
+from benchmarks.bench_diagnose import _synthetic, _synthetic_alerts
+
+
+def _first_diagnosis(make) -> float:
+    start = time.perf_counter()
+    make().diagnose_many(["CPU 100% on ubuntu web01"])
+    return time.perf_counter() - start
+
+
+def main(n_sigs: int = 20000) -> None:
+    catalog = _synthetic(n_sigs).signatures
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.bundle")
+        start = time.perf_counter()
+        build_bundle(path, signatures=catalog)
+        build_s = time.perf_counter() - start
+
+        compile_s = _first_diagnosis(lambda: SignatureIndex(catalog))
+        map_s = _first_diagnosis(lambda: Bundle(path).signature_index)
+
+        items = _synthetic_alerts(5000, n_sigs)
+        rates = {}
+        for label, index in (("compiled", SignatureIndex(catalog)), ("bundle", Bundle(path).signature_index)):
+            start = time.perf_counter()
+            index.diagnose_many(items, vectorized=False)
+            rates[label] = len(items) / (time.perf_counter() - start)
+
+        print(f"signatures: {len(catalog)}  bundle: {os.path.getsize(path) / 1e6:.1f} MB (built in {build_s:.2f}s)")
+        print(f"startup, compile in worker  {compile_s * 1000:10.1f} ms")
+        print(f"startup, map bundle         {map_s * 1000:10.1f} ms")
+        for label, rate in rates.items():
+            print(f"diagnose, {label:18s}{rate:10.0f} items/s")
+        print(f"scipy: {'yes' if signatures.sparse is not None else 'no'}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,86 @@
+# benchmarks/bench_diagnose.py
+"""
+Items/second for batch diagnosis: looping DiagnosticAgent.run versus one
+run_many call (scipy.sparse matrix products, and the pure-Python path).
+
+Two catalogs are measured: the built-in one, and a synthetic catalog of
+several hundred signatures to show how scoring scales with catalog size.
+
+    python -m benchmarks.bench_diagnose [items] [synthetic_signatures]
+"""
+
+import random
+import sys
+import time
+
+from app.agents import signatures
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.signatures import Signature, SignatureIndex, TermGroup
+
+_ALERTS = [
+    "High CPU usage on VM-node{i} win2019, wsappx at 95%",
+    "CPU 100% on ubuntu web{i:02d}, load average 40",
+    "disk full on linux db-{i:02d}: no space left on /var",
+    "out of memory: oom killer hit java on node{i}",
+    "network latency and packet loss between app{i} and db",
+    "service down: payments-{i} not responding (503)",
+    "ssl certificate expired on api-gw-{i}",
+    "user cannot log in to portal {i}",
+]
+
+
+def _alerts(n: int) -> list:
+    return [_ALERTS[i % len(_ALERTS)].format(i=i) for i in range(n)]
+
+
+def _synthetic(n_sigs: int, seed: int = 7) -> SignatureIndex:
+    rnd = random.Random(seed)
+    words = [f"term{i}" for i in range(n_sigs * 4)]
+    sigs = list(signatures.SIGNATURES)
+    for s in range(n_sigs):
+        picks = rnd.sample(words, 6)
+        sigs.append(Signature(
+            f"synthetic_{s}", f"Synthetic root cause {s}", (), (),
+            (TermGroup(tuple(picks[:3]), 2.0), TermGroup(tuple(picks[3:]), 1.0, required=False)),
+        ))
+    return SignatureIndex(sigs)
+
+
+def _synthetic_alerts(n: int, n_sigs: int, seed: int = 11) -> list:
+    # each alert names a few catalog terms so many signatures are candidates
+    rnd = random.Random(seed)
+    return [" ".join(f"term{rnd.randrange(n_sigs * 4)}" for _ in range(8)) + f" on host{i}" for i in range(n)]
+
+
+def _rate(fn, items) -> float:
+    start = time.perf_counter()
+    fn(items)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main(n: int = 20000, n_sigs: int = 300) -> None:
+    items = _alerts(n)
+    rows = [
+        ("builtin", "loop DiagnosticAgent.run", _rate(lambda xs: [DiagnosticAgent.run(x) for x in xs], items)),
+        ("builtin", "run_many, pure Python",
+         _rate(lambda xs: signatures.SIGNATURE_INDEX.diagnose_many(xs, vectorized=False), items)),
+    ]
+    if signatures.sparse is not None:
+        rows.append(("builtin", "run_many, scipy.sparse", _rate(DiagnosticAgent.run_many, items)))
+
+    big = _synthetic(n_sigs)
+    big_items = _synthetic_alerts(n, n_sigs)
+    label = f"{len(big.signatures)} sigs"
+    rows.append((label, "loop diagnose_many([x])", _rate(lambda xs: [big.diagnose_many([x]) for x in xs], big_items)))
+    rows.append((label, "batch, pure Python", _rate(lambda xs: big.diagnose_many(xs, vectorized=False), big_items)))
+    if signatures.sparse is not None:
+        rows.append((label, "batch, scipy.sparse", _rate(lambda xs: big.diagnose_many(xs, vectorized=True), big_items)))
+
+    print(f"items: {n}  scipy: {'yes' if signatures.sparse is not None else 'no'}")
+    for catalog, name, rate in rows:
+        print(f"{catalog:10s} {name:28s} {rate:12.0f} items/s")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,90 @@
+# benchmarks/bench_lint.py
+"""
+Scripts/second for validating a batch of generated remediation scripts:
+
+  - lint_script per script, strict (one bash/pwsh process per script; the
+    previous behaviour)
+  - lint_many, strict (one interpreter process per language for the batch)
+  - lint_many, in-process only, inline and on the process pool
+
+The batch mixes bash and PowerShell and includes a few broken scripts.
+
+    python -m benchmarks.bench_lint [scripts]
+"""
+
+import sys
+import time
+
+from app.agents import lint_batch
+from app.agents.automation_agent import AutomationAgent
+
+_BASH = """#!/bin/bash
+set -euo pipefail
+LOG_DIR=/tmp/logs/{i}
+mkdir -p "$LOG_DIR"
+for svc in nginx sshd cron; do
+  if systemctl is-active --quiet "$svc"; then
+    echo "$svc ok" >> "$LOG_DIR/status.log"
+  else
+    echo "$svc down: $(date +%s)" >> "$LOG_DIR/status.log"
+  fi
+done
+case "${{1:-}}" in
+  restart) systemctl restart nginx ;;
+  *) uptime > "$LOG_DIR/uptime.log" ;;
+esac
+"""
+
+_PS = """New-Item -ItemType Directory -Path C:\\logs\\{i} -Force | Out-Null
+$setName = 'Processor'
+try {{
+    $null = (Get-Counter -ListSet $setName -ErrorAction Stop)
+}} catch {{
+    Write-Host "Perf counter set not found: $setName"
+}}
+$counters = @("\\Processor(_Total)\\% Processor Time")
+Get-Process | Where-Object {{ $_.CPU -gt 10 }} | Select-Object -First 5
+logman start "PerfLog{i}"
+"""
+
+
+def _batch(n: int) -> list:
+    scripts = []
+    for i in range(n):
+        code = (_BASH if i % 2 else _PS).format(i=i)
+        if i % 25 == 0:
+            code = code.rsplit("\n", 3)[0]  # truncate: unterminated block
+        scripts.append(code)
+    return scripts
+
+
+def _rate(fn, scripts) -> float:
+    start = time.perf_counter()
+    fn(scripts)
+    return len(scripts) / (time.perf_counter() - start)
+
+
+def main(n: int = 1000) -> None:
+    scripts = _batch(n)
+    rows = []
+
+    # one process per script gets slow fast; measure it on a slice
+    few = scripts[: min(n, 100)]
+    rows.append(("lint_script x N, strict", len(few),
+                  _rate(lambda s: [AutomationAgent.lint_script(c, strict=True) for c in s], few)))
+    rows.append(("lint_many, strict", n, _rate(lambda s: AutomationAgent.lint_many(s, strict=True), scripts)))
+
+    lint_batch.LINT_POOL_MIN = n + 1
+    rows.append(("lint_many, in-process inline", n,
+                  _rate(lambda s: AutomationAgent.lint_many(s, strict=False), scripts)))
+    lint_batch.LINT_POOL_MIN = 1
+    lint_batch._lint_pool().submit(int).result()  # start workers outside the timing
+    rows.append((f"lint_many, in-process pool x{lint_batch.LINT_WORKERS}", n,
+                  _rate(lambda s: AutomationAgent.lint_many(s, strict=False), scripts)))
+
+    for label, count, rate in rows:
+        print(f"{label:36s} {count:6d} scripts {rate:10.1f} scripts/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,92 @@
+# benchmarks/bench_logging.py
+"""
+Logging overhead per request on the caller thread: the previous synchronous
+StreamHandler vs. the queue pipeline from app.utils.logger.
+
+A "request" emits the log calls one /execute makes (1 CREATE + 8 PATCH lines
+at DEBUG, plus one INFO access line). Two sinks are measured: /dev/null, and
+a "slow" stdout that takes 50us per write (a backed-up pipe or log driver).
+
+    python -m benchmarks.bench_logging [requests]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from app.utils import logger as app_logger
+
+_SN = logging.getLogger("app.integrations.servicenow_client")
+_ACCESS = logging.getLogger("uvicorn.access")
+
+
+class _SlowStream:
+    def __init__(self, inner, delay_s: float):
+        self.inner = inner
+        self.delay_s = delay_s
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay_s)
+        return self.inner.write(s)
+
+    def flush(self) -> None:
+        self.inner.flush()
+
+
+def _one_request(i: int) -> None:
+    _SN.debug("CREATE incident status=%s sys_id=%s number=%s", 201, f"sys{i}", f"INC{i:07d}")
+    for _ in range(8):
+        _SN.debug("PATCH incident sys_id=%s fields=%s", f"sys{i}", ["work_notes"])
+    _ACCESS.info('%s - "%s %s HTTP/1.1" %d', "127.0.0.1", "POST", "/api/v1/execute", 200)
+
+
+def _run(n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        _one_request(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _sync(n: int) -> float:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(logging.DEBUG)
+    _ACCESS.handlers = []
+    _ACCESS.propagate = True
+    return _run(n)
+
+
+def _queued(n: int, **kwargs) -> tuple[float, int]:
+    handler = app_logger.init_logger(fmt="json", levels={}, queue_size=n * 10, **kwargs)
+    us = _run(n)
+    app_logger.stop_logger()
+    return us, handler.dropped
+
+
+def main(n: int = 5000) -> None:
+    devnull = open(os.devnull, "w")
+    real_stdout = sys.stdout
+    rows = []
+    try:
+        for sink_name, sink in (("devnull", devnull), ("slow 50us", _SlowStream(devnull, 50e-6))):
+            sys.stdout = sink  # handlers bind sys.stdout at creation time
+            rows.append((sink_name, "sync StreamHandler, DEBUG", _sync(n), 0))
+            rows.append((sink_name, "queue + JSON, DEBUG", *_queued(n, level="DEBUG")))
+            rows.append((sink_name, "queue + JSON, DEBUG 10% sampled",
+                         *_queued(n, level="DEBUG", debug_sample_rate=0.1)))
+            rows.append((sink_name, "queue + JSON, INFO", *_queued(n, level="INFO")))
+    finally:
+        logging.getLogger().handlers = []
+        sys.stdout = real_stdout
+        devnull.close()
+
+    print(f"requests: {n}")
+    for sink_name, label, us, dropped in rows:
+        print(f"{sink_name:10s} {label:34s} {us:9.2f} us/request  dropped={dropped}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,47 @@
+# benchmarks/bench_resolution_index.py
+"""
+Lookup latency of the historical-resolution index: top-k similar past
+incidents for a new request, over a persisted (memory-mapped) index of
+`incidents` synthetic resolutions. Also reports open time and add rate.
+
+    python -m benchmarks.bench_resolution_index [incidents] [queries]
+"""
+
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_diagnose import _alerts
+from app.core.resolution_index import ResolutionIndex
+
+
+def main(n: int = 20000, queries: int = 500) -> None:
+    texts = _alerts(n)
+    with tempfile.TemporaryDirectory() as path:
+        idx = ResolutionIndex(path)
+        start = time.perf_counter()
+        for i, text in enumerate(texts):
+            idx.add(f"id{i}", f"{text} (ticket {i})", {"root_cause": f"cause {i % 8}"})
+        add_s = time.perf_counter() - start
+        idx.close()
+
+        start = time.perf_counter()
+        idx = ResolutionIndex(path)
+        open_s = time.perf_counter() - start
+
+        probes = _alerts(queries)
+        start = time.perf_counter()
+        for text in probes:
+            idx.query(text, k=3)
+        query_s = time.perf_counter() - start
+        idx.close()
+
+    print(f"incidents: {n}")
+    print(f"add      {n / add_s:10.0f} /s")
+    print(f"open     {open_s * 1000:10.1f} ms")
+    print(f"query    {query_s / queries * 1000:10.2f} ms each (top-3)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,84 @@
+# benchmarks/bench_serialization.py
+"""
+Serialization time per response, for the bodies the routes return most:
+an /execute result, a /tasks/{id} view carrying `updates` journal entries,
+and a diagnose:batch of 500 items. "before" is what FastAPI did with the
+routes' plain returns (validate against the response model or run
+jsonable_encoder, then stdlib json); "after" is FastJSONResponse, with the
+/tasks updates list encoded once and reused.
+
+    python -m benchmarks.bench_serialization [updates]
+"""
+
+import json
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.api import responses
+from app.api.responses import Encoded, dumps
+from app.core.models import ExecuteResponse
+from app.core.results import Diagnosis, Plan, PlanResult, Script, TaskEntry
+
+
+def _stdlib(content) -> bytes:
+    # starlette JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _per_call(fn, target_s: float = 0.5) -> float:
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < target_s:
+        fn()
+        n += 1
+    return (time.perf_counter() - start) / n
+
+
+def main(n_updates: int = 100) -> None:
+    text = "disk full on linux db01: no space left on /var"
+    diagnosis = DiagnosticAgent.run(text)
+    script = AutomationAgent.generate_and_lint(text, diagnosis)
+    result = PlanResult("a" * 32, "completed", Diagnosis.from_dict(diagnosis), Script.from_dict(script), "mail " * 80)
+    entry = TaskEntry("completed", plan=Plan(("diagnose", "script"), "summary"), instance="default", result=result)
+    journal = [{"timestamp": f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}", "author": "integration",
+                "type": "work_notes", "text": f"Step {i}: " + "progress detail " * 8} for i in range(n_updates)]
+    view = {"incident_sys_id": "a" * 32, "number": "INC0000001", "short_description": text, "state": "6",
+            "state_label": "Resolved", "status": "completed"}
+    items = DiagnosticAgent.run_many([f"CPU 100% on ubuntu web{i:03d}" for i in range(500)], 3)
+
+    adapter = TypeAdapter(ExecuteResponse)
+    model = ExecuteResponse.model_validate(result)
+    cached = Encoded(dumps(journal))
+    cases = {
+        "execute": (
+            lambda: _stdlib(adapter.dump_python(adapter.validate_python(model), mode="json", exclude_unset=True)),
+            lambda: dumps(model),
+        ),
+        f"tasks ({n_updates} updates)": (
+            lambda: _stdlib(jsonable_encoder({**view, "updates": journal, "plan": entry.plan.to_dict(),
+                                              "result": entry.result.to_dict()})),
+            lambda: dumps({**view, "updates": cached, "plan": entry.plan, "result": entry.result}),
+        ),
+        "tasks, updates not cached": (
+            None,
+            lambda: dumps({**view, "updates": Encoded(dumps(journal)), "plan": entry.plan, "result": entry.result}),
+        ),
+        "diagnose:batch (500)": (
+            lambda: _stdlib(jsonable_encoder({"count": len(items), "results": items})),
+            lambda: dumps({"count": len(items), "results": items}),
+        ),
+    }
+    print(f"orjson: {'yes' if responses.orjson is not None else 'no (stdlib json)'}")
+    print(f"{'response':28s}{'before us':>12s}{'after us':>12s}{'bytes':>10s}")
+    for label, (before, after) in cases.items():
+        before_us = f"{_per_call(before) * 1e6:12.1f}" if before else f"{'-':>12s}"
+        print(f"{label:28s}{before_us}{_per_call(after) * 1e6:12.1f}{len(after()):10d}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
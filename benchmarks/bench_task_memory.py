@@ -0,0 +1,93 @@
+# benchmarks/bench_task_memory.py
+"""
+Memory retained by `n` finished task entries (approval path: plan plus
+result), stored the way task_store used to hold them (the agents' nested
+dicts flattened into one dict per entry) versus as TaskEntry/PlanResult
+objects. Diagnoses and scripts come from the real agents over a pool of
+alerts; every entry gets its own copy of them and its own script text and
+email, as separate requests would. Strings are counted on both sides, so
+the difference is the container overhead.
+
+    python -m benchmarks.bench_task_memory [entries]
+"""
+
+import copy
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.writer_agent import WriterAgent
+from app.core.results import Diagnosis, Plan, PlanResult, Script, TaskEntry
+
+_ALERTS = [
+    "disk full on linux db-{i}: no space left on device /var",
+    "CPU 100% on ubuntu web-{i}",
+    "service down: payments-{i} not responding",
+    "ssl certificate expired on gw-{i}",
+    "high memory usage on windows app-{i}",
+    "IIS app pool crashed on win-{i}",
+]
+_STEPS = ["diagnose", "generate_script", "lint_script", "draft_email", "update_servicenow"]
+_SUMMARY = "Agentic plan prepared. Awaiting approval to execute."
+
+
+def _outputs(pool: int):
+    out = []
+    for i in range(pool):
+        text = _ALERTS[i % len(_ALERTS)].format(i=i)
+        diagnosis = DiagnosticAgent.run(text)
+        out.append((diagnosis, AutomationAgent.generate_and_lint(text, diagnosis)))
+    return out
+
+
+def _pipeline(outputs, i: int):
+    """One request's agent outputs: fresh dicts, per-request script text and email."""
+    diagnosis, script = outputs[i % len(outputs)]
+    diagnosis, script = copy.deepcopy(diagnosis), copy.deepcopy(script)
+    script["code"] = f"{script['code']}\n# incident {i:08d}\n"
+    email = WriterAgent.management_email(Diagnosis.from_dict(diagnosis), Script.from_dict(script)) + f"\nRef {i:08d}"
+    return diagnosis, script, email
+
+
+def _legacy(outputs, i: int) -> dict:
+    diagnosis, script, email = _pipeline(outputs, i)
+    plan = {"steps": list(_STEPS), "summary": _SUMMARY}
+    return {"status": "completed", "plan": plan, "instance": "default", "incident_sys_id": f"{i:032x}",
+            "diagnosis": diagnosis, "script": script, "email_draft": email, "servicenow_updated": True}
+
+
+def _typed(outputs, i: int) -> TaskEntry:
+    diagnosis, script, email = _pipeline(outputs, i)
+    result = PlanResult(f"{i:032x}", "completed", Diagnosis.from_dict(diagnosis), Script.from_dict(script), email)
+    return TaskEntry("completed", plan=Plan(tuple(_STEPS), _SUMMARY), instance="default", result=result)
+
+
+def _retained(make, outputs, n: int):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    store = {i: make(outputs, i) for i in range(n)}
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del store
+    return size, elapsed
+
+
+def main(n: int = 100_000) -> None:
+    outputs = _outputs(min(n, 600))
+    results = {label: _retained(make, outputs, n) for label, make in (("dicts", _legacy), ("slotted", _typed))}
+    print(f"entries: {n}")
+    for label, (size, elapsed) in results.items():
+        print(f"{label:8s} {size / 1e6:9.1f} MB  {size / n:8.0f} B/entry  (built in {elapsed:.1f}s)")
+    saved = 1 - results["slotted"][0] / results["dicts"][0]
+    print(f"saved: {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
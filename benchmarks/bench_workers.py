@@ -0,0 +1,66 @@
+# benchmarks/bench_workers.py
+"""
+Incidents/second through the CPU-bound plan stages (diagnosis, then script
+rendering) with the work in-process on a thread pool, as the coordinator
+runs it by default, versus on AgentProcessPool with 1, 2, 4 ... workers.
+Each configuration submits every incident at once from as many threads as
+it has workers; pools are warmed before the clock starts.
+
+Process workers only pay off with more than one core: on a single-CPU host
+the pool adds pickling and IPC to the same amount of CPU work.
+
+    python -m benchmarks.bench_workers [incidents]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.process_pool import AgentProcessPool
+from app.core.results import Diagnosis, Script
+
+_ALERTS = [
+    "High CPU usage on VM-node{i} win2019, wsappx at 95%",
+    "disk full on linux db-{i:02d}: no space left on /var",
+    "out of memory: oom killer hit java on node{i}",
+    "service down: payments-{i} not responding (503)",
+    "ssl certificate expired on api-gw-{i}",
+    "IIS app pool crashed on win-{i}",
+]
+
+
+def _in_process(text: str):
+    return Diagnosis.from_dict(DiagnosticAgent.run(text)), Script.from_dict(AutomationAgent.generate_and_lint(text))
+
+
+def _rate(stage, items, threads: int) -> float:
+    with ThreadPoolExecutor(threads) as ex:
+        start = time.perf_counter()
+        list(ex.map(stage, items))
+        return len(items) / (time.perf_counter() - start)
+
+
+def main(n: int = 2000) -> None:
+    items = [_ALERTS[i % len(_ALERTS)].format(i=i) for i in range(n)]
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, 2, *(w for w in (4, 8, 16) if w <= cpus), cpus})
+
+    rows = [("in-process", _rate(_in_process, items, max(counts)))]
+    for workers in counts:
+        pool = AgentProcessPool(workers)
+        try:
+            pool.warm()
+            rows.append((f"{workers} worker(s)", _rate(lambda t: (pool.diagnose(t), pool.script(t)), items, workers)))
+        finally:
+            pool.shutdown()
+
+    print(f"incidents: {n}  cpus: {cpus}")
+    for label, rate in rows:
+        print(f"{label:12s} {rate:10.0f} incidents/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,225 @@
+# benchmarks/replay.py
+"""
+Replay a recorded log of /execute requests against the service, for
+capacity planning and build-to-build comparison on real traffic shapes.
+
+The log is JSONL, one ExecuteRequest per line plus its arrival time:
+
+    {"ts": 1760000000.25, "request": "disk full on db01", "require_approval": false,
+     "instance": "emea", "headers": {"X-API-Key": "..."}}
+
+`ts` is epoch seconds or ISO-8601; the ExecuteRequest fields may also be
+nested under "body". Entries are sent open-loop (a slow response never
+delays the next send) either on the recorded schedule, compressed by
+--speed, or at a fixed --rps ignoring the timestamps.
+
+By default the app runs in-process on top of the ServiceNow stand-in
+(app/integrations/servicenow_standin.py), so every request's upstream Table
+API calls are counted. --url replays against a running deployment instead;
+upstream totals then come from its /api/v1/metrics.
+
+    python -m benchmarks.replay LOG [--speed N | --rps R] [--limit N] [--out results.jsonl]
+                                    [--standin-latency-ms MS] [--standin-error-rate P] [--url URL]
+
+Admission limits apply as configured; set ADMISSION_AUTO_RATE=0 to measure
+raw capacity rather than the limiter.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import httpx
+
+_BODY_FIELDS = ("request", "require_approval", "instance")
+
+
+@dataclass
+class LoggedRequest:
+    offset_s: float                 # arrival time relative to the first entry
+    body: dict
+    headers: dict = field(default_factory=dict)
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_log(path: str, limit: Optional[int] = None) -> List[LoggedRequest]:
+    """Parse a request log; entries are ordered by arrival time."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            body = entry.get("body") or {k: entry[k] for k in _BODY_FIELDS if k in entry}
+            if not body.get("request"):
+                raise ValueError(f"{path}:{n}: entry has no request text")
+            rows.append((_timestamp(entry.get("ts", 0)), body, entry.get("headers") or {}))
+    rows.sort(key=lambda r: r[0])
+    rows = rows[:limit] if limit else rows
+    first = rows[0][0] if rows else 0.0
+    return [LoggedRequest(ts - first, body, headers) for ts, body, headers in rows]
+
+
+def schedule(entries: List[LoggedRequest], speed: float = 1.0, rps: Optional[float] = None) -> List[float]:
+    """Send time of each entry, in seconds from the start of the replay."""
+    if rps:
+        return [i / rps for i in range(len(entries))]
+    return [e.offset_s / speed for e in entries]
+
+
+async def _send(client: httpx.AsyncClient, index: int, entry: LoggedRequest, at: float,
+                started: float, standin) -> dict:
+    from app.integrations.servicenow_standin import call_tag
+
+    tag = f"replay-{index}"
+    call_tag.set(tag)  # this task's own context; the in-process app inherits it
+    sent = time.perf_counter()
+    try:
+        r = await client.post("/api/v1/execute", json=entry.body, headers=entry.headers)
+        status, error = r.status_code, "" if r.status_code < 400 else f"http_{r.status_code}"
+    except Exception as e:  # transport failures are results too
+        status, error = None, type(e).__name__
+    record = {
+        "index": index,
+        "scheduled_s": round(at, 4),
+        "lag_s": round(sent - started - at, 4),       # > 0: the replayer fell behind
+        "latency_s": round(time.perf_counter() - sent, 4),
+        "status": status,
+        "error": error,
+    }
+    if standin is not None:
+        record["upstream"] = standin.pop_calls(tag)
+    return record
+
+
+async def _replay(entries: List[LoggedRequest], times: List[float], client: httpx.AsyncClient,
+                  standin) -> Tuple[List[dict], float]:
+    started = time.perf_counter()
+    tasks = []
+    for index, (entry, at) in enumerate(zip(entries, times)):
+        delay = started + at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_send(client, index, entry, at, started, standin)))
+    records = await asyncio.gather(*tasks)
+    return list(records), time.perf_counter() - started
+
+
+def replay(entries: List[LoggedRequest], speed: float = 1.0, rps: Optional[float] = None,
+           url: Optional[str] = None, standin=None) -> Tuple[List[dict], float]:
+    """
+    Replay `entries`; returns (per-request records, elapsed seconds). Without
+    `url` the in-process app is used and `standin` (if given) counts its
+    upstream calls per request.
+    """
+    times = schedule(entries, speed, rps)
+
+    async def run() -> Tuple[List[dict], float]:
+        if url:
+            transport, base = None, url
+        else:
+            from app.api.main import app
+            transport, base = httpx.ASGITransport(app=app, raise_app_exceptions=False), "http://replay"
+        async with httpx.AsyncClient(transport=transport, base_url=base, timeout=httpx.Timeout(300)) as client:
+            return await _replay(entries, times, client, standin if not url else None)
+
+    return asyncio.run(run())
+
+
+def summarize(records: List[dict], elapsed: float) -> dict:
+    latencies = sorted(r["latency_s"] for r in records)
+    lags = [max(0.0, r["lag_s"]) for r in records]
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+    upstream: Counter = Counter()
+    for r in records:
+        upstream.update(r.get("upstream") or {})
+    n = len(records)
+    return {
+        "requests": n,
+        "elapsed_s": round(elapsed, 3),
+        "achieved_rps": round(n / elapsed, 2) if elapsed else 0.0,
+        "latency_s": {
+            "mean": round(sum(latencies) / n, 4) if n else 0.0,
+            "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "results": dict(Counter(r["error"] or "ok" for r in records)),
+        "lag_s": {"mean": round(sum(lags) / n, 4) if n else 0.0, "max": round(max(lags, default=0.0), 4)},
+        "upstream_calls": {
+            "total": sum(upstream.values()),
+            "per_request": round(sum(upstream.values()) / n, 2) if n else 0.0,
+            "by_call": dict(sorted(upstream.items())),
+        },
+    }
+
+
+def _servicenow_requests(url: str) -> dict:
+    r = httpx.get(f"{url.rstrip('/')}/api/v1/metrics", timeout=30)
+    r.raise_for_status()
+    return {name: s["requests"] for name, s in r.json().get("servicenow", {}).get("instances", {}).items()}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description=__doc__.split("\n\n")[0])
+    parser.add_argument("log")
+    pace = parser.add_mutually_exclusive_group()
+    pace.add_argument("--speed", type=float, default=1.0, help="replay N x faster than recorded (default 1)")
+    pace.add_argument("--rps", type=float, help="open-loop at this rate, ignoring timestamps")
+    parser.add_argument("--limit", type=int, help="replay only the first N entries")
+    parser.add_argument("--out", help="write per-request records here (JSONL)")
+    parser.add_argument("--url", help="replay against a running deployment instead of in-process")
+    parser.add_argument("--standin-latency-ms", type=float, default=0.0, help="stand-in latency per Table API call")
+    parser.add_argument("--standin-error-rate", type=float, default=0.0, help="fraction of Table API calls failing 503")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    entries = load_log(args.log, args.limit)
+    standin, before = None, {}
+    if args.url:
+        before = _servicenow_requests(args.url)
+    else:
+        from app.integrations.servicenow_client import ServiceNowClient
+        from app.integrations.servicenow_instances import registry
+        from app.integrations.servicenow_standin import install
+
+        standin = install(registry, latency_s=args.standin_latency_ms / 1000, error_rate=args.standin_error_rate)
+        ServiceNowClient.warm_metadata()  # as the app's startup does; keeps discovery out of the first requests
+
+    records, elapsed = replay(entries, args.speed, args.rps, args.url, standin)
+    summary = summarize(records, elapsed)
+    if args.url:
+        after = _servicenow_requests(args.url)
+        summary["upstream_calls"]["by_instance"] = {k: v - before.get(k, 0) for k, v in after.items()}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+
+    pace = f"{args.rps} rps" if args.rps else f"{args.speed}x"
+    lat, up = summary["latency_s"], summary["upstream_calls"]
+    print(f"requests: {summary['requests']}  pace: {pace}  elapsed: {summary['elapsed_s']}s  "
+          f"achieved: {summary['achieved_rps']} rps")
+    print(f"latency s: mean {lat['mean']}  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"results: {summary['results']}  send lag s: {summary['lag_s']}")
+    print(f"upstream calls: {up['total']} ({up['per_request']}/request)")
+    for call, n in (up.get("by_call") or up.get("by_instance") or {}).items():
+        print(f"  {call:32s} {n}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,115 @@
+# tests/conftest.py
+
+import itertools
+import threading
+import uuid
+
+import pytest
+from requests import HTTPError, Response
+
+from app.integrations.servicenow_client import ServiceNowClient
+
+
+def _not_found(sys_id):
+    response = Response()
+    response.status_code = 404
+    return HTTPError(f"404 Not Found: {sys_id}", response=response)
+
+
+class FakeServiceNow:
+    """In-memory stand-in for the incident Table API calls the agents make."""
+
+    def __init__(self):
+        self.incidents: dict[str, dict] = {}
+        self.notes: dict[str, list[str]] = {}
+        self.calls = {"create": 0, "update": 0, "get": 0, "query": 0, "batch": 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_incident(self, short_description, description, caller_username="integration.incidentuser"):
+        with self._lock:
+            self.calls["create"] += 1
+            n = next(self._ids)
+            sys_id = uuid.uuid4().hex  # task_store outlives the fake; never reuse ids
+            self.incidents[sys_id] = {
+                "sys_id": sys_id,
+                "number": f"INC{n:07d}",
+                "state": "1",
+                "short_description": short_description,
+                "description": description,
+            }
+            self.notes[sys_id] = []
+            return {"sys_id": sys_id, "number": self.incidents[sys_id]["number"]}
+
+    def update_incident(self, sys_id, work_notes=None, state=None, close_code=None, close_notes=None):
+        with self._lock:
+            self.calls["update"] += 1
+            return self._patch(sys_id, work_notes, state)
+
+    def _patch(self, sys_id, work_notes=None, state=None, close_code=None, close_notes=None):
+        inc = self.incidents.get(sys_id)
+        if inc is None:
+            raise _not_found(sys_id)
+        if work_notes:
+            self.notes[sys_id].append(work_notes)
+        if state is not None:
+            inc["state"] = str(state)
+        return {"result": dict(inc)}
+
+    def update_incidents(self, updates):
+        """Batch API PATCHes: one call, a result (or HTTPError) per sys_id."""
+        out = {}
+        with self._lock:
+            self.calls["batch"] += 1
+            for sys_id, kwargs in updates.items():
+                try:
+                    out[sys_id] = self._patch(sys_id, **kwargs)
+                except HTTPError as e:
+                    out[sys_id] = e
+        return out
+
+    def get_incident(self, sys_id):
+        with self._lock:
+            self.calls["get"] += 1
+            inc = self.incidents.get(sys_id)
+            if inc is None:
+                raise _not_found(sys_id)
+            return dict(inc)
+
+    def query_table(self, table, query, fields, limit=100, offset=0, display_value=False):
+        """Table API list query; understands the sys_idIN/documentkeyIN terms we send."""
+        terms = dict(t.split("IN", 1) for t in query.split("^") if t.startswith(("sys_idIN", "documentkeyIN")))
+        terms.update(t.split("=", 1) for t in query.split("^") if t.startswith("documentkey="))
+        with self._lock:
+            self.calls["query"] += 1
+            if table == "incident":
+                ids = terms["sys_id"].split(",") if "sys_id" in terms else list(self.incidents)
+                rows = [dict(self.incidents[i]) for i in ids if i in self.incidents]
+            elif table == "sys_journal_field":
+                keys = terms.get("documentkey", "").split(",")
+                rows = [
+                    {"documentkey": k, "sys_created_on": f"2025-01-01 00:00:{n:02d}",
+                     "sys_created_by": "automation", "element": "work_notes", "value": note}
+                    for k in sorted(keys) for n, note in enumerate(self.notes.get(k, []))
+                ]
+            else:
+                rows = []
+            return rows[offset:offset + limit], len(rows)
+
+
+@pytest.fixture
+def fake_servicenow(monkeypatch):
+    """Route ServiceNowClient CRUD to an in-memory FakeServiceNow."""
+    from app.core.admission import admission
+    from app.core.correlation import correlator
+
+    fake = FakeServiceNow()
+    monkeypatch.setattr(ServiceNowClient, "create_incident", staticmethod(fake.create_incident))
+    monkeypatch.setattr(ServiceNowClient, "update_incident", staticmethod(fake.update_incident))
+    monkeypatch.setattr(ServiceNowClient, "update_incidents", staticmethod(fake.update_incidents))
+    monkeypatch.setattr(ServiceNowClient, "get_incident", staticmethod(fake.get_incident))
+    monkeypatch.setattr(ServiceNowClient, "query_table", staticmethod(fake.query_table))
+    correlator.clear()
+    admission.reset()
+    yield fake
+    correlator.clear()
@@ -0,0 +1,135 @@
+# tests/test_admission.py
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.api.routes import execute as execute_route
+from app.core import admission as admission_mod
+from app.core.admission import APPROVED, AUTO, AdmissionController, ClassPolicy, Rejected, TokenBucket, admission
+
+client = TestClient(app)
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == 0.5           # one token every 0.5s
+    assert bucket.take(0.5) == 0
+
+
+def test_rate_limit_is_per_caller_and_class():
+    clock = [0.0]
+    ctl = AdmissionController({AUTO: ClassPolicy(1.0, 1, 0), APPROVED: ClassPolicy(1.0, 1, 0)},
+                              workers=1, clock=lambda: clock[0])
+    ctl.admit("ip:a", AUTO)
+    ctl.admit("ip:b", AUTO)            # other caller has its own bucket
+    ctl.admit("ip:a", APPROVED)        # and so does the other class
+    try:
+        ctl.admit("ip:a", AUTO)
+        raise AssertionError("expected Rejected")
+    except Rejected as e:
+        assert e.status == 429 and e.retry_after == "1"
+    clock[0] = 1.0
+    ctl.admit("ip:a", AUTO)
+    assert ctl.stats()["classes"][AUTO]["rejected_rate_limited"] == 1
+
+
+def test_approved_plans_run_before_queued_auto_work():
+    ctl = AdmissionController({AUTO: ClassPolicy(0, 0, 0), APPROVED: ClassPolicy(0, 0, 0)}, workers=1)
+    gate, order = threading.Event(), []
+    blocker = ctl.submit(AUTO, gate.wait)
+    futures = [ctl.submit(AUTO, order.append, "auto-1"), ctl.submit(AUTO, order.append, "auto-2"),
+               ctl.submit(APPROVED, order.append, "approved")]
+    gate.set()
+    for f in [blocker] + futures:
+        f.result(timeout=5)
+
+    assert order == ["approved", "auto-1", "auto-2"]
+    stats = ctl.stats()["classes"]
+    assert stats[AUTO]["completed"] == 3 and stats[APPROVED]["queue_wait_s"]["count"] == 1
+
+
+def test_full_queue_rejects_before_work_is_done():
+    ctl = AdmissionController({AUTO: ClassPolicy(0, 0, 1)}, workers=1)
+    gate = threading.Event()
+    ctl.submit(AUTO, gate.wait)
+    ctl.submit(AUTO, lambda: None)     # queued behind the blocker
+    try:
+        ctl.admit("ip:a", AUTO)
+        raise AssertionError("expected Rejected")
+    except Rejected as e:
+        assert e.status == 503
+    ctl.admit("ip:a", AUTO, queued=False)  # e.g. approval-only requests still get in
+    gate.set()
+
+
+def test_concurrent_admits_cannot_overshoot_the_queue_bound():
+    ctl = AdmissionController({AUTO: ClassPolicy(0, 0, 2)}, workers=1)
+    admitted, start = [], threading.Barrier(20)
+
+    def caller(i):
+        start.wait()
+        try:
+            ctl.admit(f"ip:{i}", AUTO)
+            admitted.append(i)
+        except Rejected:
+            pass
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(admitted) == 2
+    stats = ctl.stats()["classes"][AUTO]
+    assert stats["reserved"] == 2 and stats["rejected_queue_full"] == 18
+
+
+def test_submit_takes_the_reserved_slot_and_release_returns_an_unused_one():
+    ctl = AdmissionController({AUTO: ClassPolicy(0, 0, 5)}, workers=1)
+    ctl.admit("ip:a", AUTO)
+    assert ctl.stats()["classes"][AUTO]["reserved"] == 1
+    ctl.submit(AUTO, lambda: None).result(timeout=5)
+    ctl.release(AUTO)                                   # already taken: no-op
+    assert ctl.stats()["classes"][AUTO]["reserved"] == 0
+
+    ctl.admit("ip:a", AUTO)
+    ctl.release(AUTO)                                   # e.g. the request failed before queueing
+    assert ctl.stats()["classes"][AUTO]["reserved"] == 0
+
+
+def test_duplicates_attach_without_spending_a_token(fake_servicenow, monkeypatch):
+    monkeypatch.setitem(admission.policies, AUTO, ClassPolicy(0.001, 1, 0))
+    payload = {"request": "Block SSH access on all production servers.", "require_approval": True}
+    headers = {"X-API-Key": "dup-caller"}
+    first = client.post("/api/v1/execute", json=payload, headers=headers)
+    dup = client.post("/api/v1/execute", json=payload, headers=headers)
+    assert first.status_code == dup.status_code == 200 and dup.json()["correlated"] is True
+
+    other = client.post("/api/v1/execute", json=dict(payload, request="Block RDP on web01"), headers=headers)
+    assert other.status_code == 429                     # the one token went to the first call only
+
+
+def test_execute_returns_429_with_retry_after(fake_servicenow, monkeypatch):
+    monkeypatch.setitem(admission.policies, AUTO, ClassPolicy(0.1, 1, 0))
+    monkeypatch.setattr(execute_route, "run_agentic_flow", lambda sys_id, text: {"incident_sys_id": sys_id,
+                                                                                 "status": "resolved"})
+    headers = {"X-API-Key": "monitoring-1"}
+    first = client.post("/api/v1/execute", json={"request": "cpu high on web01"}, headers=headers)
+    assert first.status_code == 200 and first.json()["status"] == "resolved"
+
+    second = client.post("/api/v1/execute", json={"request": "cpu high on web02"}, headers=headers)
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert len(fake_servicenow.incidents) == 1   # rejected before touching ServiceNow
+
+    # a different caller is unaffected
+    other = client.post("/api/v1/execute", json={"request": "cpu high on web03"}, headers={"X-API-Key": "human"})
+    assert other.status_code == 200
+
+    stats = client.get("/api/v1/metrics").json()["admission"]["classes"][AUTO]
+    assert stats["rejected_rate_limited"] == 1 and stats["completed"] == 2
+    assert "monitoring-1" not in str(client.get("/api/v1/metrics").json())
+    assert admission_mod.caller_key("monitoring-1", None).startswith("key:")
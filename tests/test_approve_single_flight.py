@@ -0,0 +1,130 @@
+# tests/test_approve_single_flight.py
+
+import asyncio
+import dataclasses
+import threading
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.agents.incident_report_agent import IncidentReportAgent
+from app.api.routes import approve as approve_route
+from app.core.task_store import SqliteTaskStore, task_store
+
+client = TestClient(app)
+
+PAYLOAD = {"request": "Limit inbound RDP traffic on production VMs to 10.0.0.0/24", "require_approval": True}
+
+
+def _counting_flow(monkeypatch, delay=0.2):
+    runs = []
+    real_flow = approve_route.run_agentic_flow
+
+    def flow(sys_id, text):
+        runs.append(sys_id)
+        time.sleep(delay)  # keep the first execution in flight while others arrive
+        return real_flow(sys_id, text)
+
+    monkeypatch.setattr(approve_route, "run_agentic_flow", flow)
+    return runs
+
+
+async def _approve_concurrently(sys_id, n):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        return await asyncio.gather(*[ac.post(f"/api/v1/plans/{sys_id}/approve") for _ in range(n)])
+
+
+def test_concurrent_approves_execute_plan_once(fake_servicenow, monkeypatch):
+    runs = _counting_flow(monkeypatch)
+    sys_id = client.post("/api/v1/execute", json=PAYLOAD).json()["incident_sys_id"]
+
+    responses = asyncio.run(_approve_concurrently(sys_id, 8))
+
+    assert runs == [sys_id]
+    assert [r.status_code for r in responses] == [200] * 8
+    bodies = [r.json() for r in responses]
+    assert all(b == bodies[0] for b in bodies)
+    approval_notes = [n for n in fake_servicenow.notes[sys_id] if n.startswith("Approval received")]
+    assert len(approval_notes) == 1
+
+    # a late retry replays the stored result instead of executing again
+    again = client.post(f"/api/v1/plans/{sys_id}/approve")
+    assert again.status_code == 200 and runs == [sys_id]
+
+
+def test_sqlite_claim_has_one_winner(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    SqliteTaskStore(path)["inc1"] = {"status": "waiting_approval"}
+    wins = []
+
+    def worker():
+        store = SqliteTaskStore(path)  # own connection, like a separate worker
+        wins.append(store.claim("inc1", {"waiting_approval"}, {"status": "executing"}))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert wins.count(True) == 1
+    assert SqliteTaskStore(path)["inc1"].status == "executing"
+
+
+def test_follower_waits_for_other_worker_via_shared_store(fake_servicenow, monkeypatch, tmp_path):
+    store = SqliteTaskStore(str(tmp_path / "tasks.db"))
+    monkeypatch.setattr(approve_route, "task_store", store)
+    runs = _counting_flow(monkeypatch, delay=0)
+
+    # another worker already claimed the plan
+    store["inc42"] = {"status": "executing"}
+
+    def other_worker_finishes():
+        time.sleep(0.3)
+        store["inc42"] = {"status": "resolved", "diagnosis": {"root_cause": "x"}, "servicenow_updated": True}
+
+    threading.Thread(target=other_worker_finishes).start()
+    resp = client.post("/api/v1/plans/inc42/approve")
+
+    assert resp.status_code == 200
+    assert resp.json()["diagnosis"]["root_cause"] == "x"
+    assert runs == []
+
+
+def _claimed(sys_id, age_s):
+    """Make the plan look claimed `age_s` ago by another worker."""
+    task_store[sys_id] = dataclasses.replace(task_store[sys_id], status="executing", claimed_at=time.time() - age_s)
+
+
+def test_stale_claim_is_taken_over(fake_servicenow, monkeypatch):
+    runs = _counting_flow(monkeypatch, delay=0)
+    monkeypatch.setattr(approve_route, "APPROVE_WAIT_S", 0.2)
+    sys_id = client.post("/api/v1/execute", json=PAYLOAD).json()["incident_sys_id"]
+
+    _claimed(sys_id, 1)                                   # owner still within its lease: wait for it
+    assert client.post(f"/api/v1/plans/{sys_id}/approve").status_code == 504
+    assert runs == []
+
+    _claimed(sys_id, approve_route.APPROVE_LEASE_S + 1)   # its worker died mid-plan
+    resp = client.post(f"/api/v1/plans/{sys_id}/approve")
+    assert resp.status_code == 200 and runs == [sys_id]
+    assert task_store[sys_id].status == resp.json()["status"]
+
+
+def test_reject_cannot_overwrite_a_running_plan(fake_servicenow, monkeypatch):
+    sys_id = client.post("/api/v1/execute", json=PAYLOAD).json()["incident_sys_id"]
+    _claimed(sys_id, 0)
+    assert client.post(f"/api/v1/plans/{sys_id}/reject").status_code == 400
+    assert task_store[sys_id].status == "executing"
+
+    other = {**PAYLOAD, "request": "Disk full on linux db-01"}
+    sys_id = client.post("/api/v1/execute", json=other).json()["incident_sys_id"]
+
+    def unavailable(sys_id):
+        raise RuntimeError("ServiceNow unavailable")
+
+    monkeypatch.setattr(IncidentReportAgent, "mark_manual_intervention", staticmethod(unavailable))
+    assert client.post(f"/api/v1/plans/{sys_id}/reject").status_code == 500
+    assert task_store[sys_id].status == "waiting_approval"     # handed back
@@ -0,0 +1,149 @@
+# tests/test_bulk_plans.py
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.core.results import TaskEntry
+from app.core.task_store import task_store
+from app.integrations import servicenow_client as sn
+from app.integrations.servicenow_instances import registry
+from app.integrations.servicenow_standin import install
+from app.workflows import speculation
+
+client = TestClient(app)
+
+ALERTS = [
+    "disk full on linux db-01: no space left on /var",
+    "CPU 100% on ubuntu web01, load average 40",
+    "ssl certificate expired on api-gw-3",
+]
+
+
+def _waiting(text):
+    return client.post("/api/v1/execute", json={"request": text, "require_approval": True}).json()["incident_sys_id"]
+
+
+def _settled(ids):
+    for sys_id in ids:
+        fut = speculation.running(sys_id)
+        if fut is not None:
+            fut.result(timeout=10)
+
+
+def test_bulk_approve_checks_and_resolves_in_two_upstream_calls(fake_servicenow):
+    ids = [_waiting(text) for text in ALERTS]
+    _settled(ids)
+    calls = dict(fake_servicenow.calls)
+
+    r = client.post("/api/v1/plans:approve", json={"ids": ids})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [i["id"] for i in results] == ids
+    assert all(i["status_code"] == 200 and i["result"]["status"] == "resolved" for i in results)
+    assert fake_servicenow.calls["query"] == calls["query"] + 1      # one sys_idIN existence check
+    assert fake_servicenow.calls["batch"] == calls["batch"] + 1      # one batched resolve
+    assert fake_servicenow.calls["update"] == calls["update"]
+    for sys_id in ids:
+        assert fake_servicenow.incidents[sys_id]["state"] == "6"
+        [note] = fake_servicenow.notes[sys_id]
+        assert note.startswith("Approval received")
+        assert task_store[sys_id].status == "resolved"
+
+
+def test_bulk_approve_reports_each_id(fake_servicenow, monkeypatch):
+    monkeypatch.setattr(speculation, "SPECULATIVE_PREPARE", False)  # prepared during the call instead
+    waiting, done, rejected = (_waiting(text) for text in ALERTS)
+    assert client.post(f"/api/v1/plans/{done}/approve").status_code == 200
+    assert client.post(f"/api/v1/plans/{rejected}/reject").status_code == 200
+    notes = len(fake_servicenow.notes[done])
+    ghost = "0" * 32
+    task_store[ghost] = TaskEntry("waiting_approval", instance="default")
+
+    r = client.post("/api/v1/plans:approve", json={"ids": [waiting, done, rejected, ghost, waiting]})
+    by_id = {i["id"]: i for i in r.json()["results"]}
+    assert len(r.json()["results"]) == 4                           # duplicates answered once
+    assert by_id[waiting]["status_code"] == 200 and by_id[waiting]["result"]["diagnosis"]["root_cause"]
+    assert by_id[done]["status_code"] == 200                        # replayed, not re-run
+    assert by_id[rejected]["status_code"] == 400
+    assert by_id[ghost]["status_code"] == 404 and by_id[ghost].get("result") is None
+    assert task_store.pop(ghost).status == "waiting_approval"       # handed back
+    assert len(fake_servicenow.notes[done]) == notes
+
+
+def test_plan_with_a_failed_step_runs_individually(fake_servicenow):
+    rdp = _waiting("Limit inbound RDP traffic on production VMs to 10.0.0.0/24")  # the script step fails
+    disk = _waiting(ALERTS[0])
+    _settled([rdp, disk])
+
+    results = client.post("/api/v1/plans:approve", json={"ids": [rdp, disk]}).json()["results"]
+    assert [i["status_code"] for i in results] == [200, 200]
+    assert any(n.startswith("Step 'script' failed") for n in fake_servicenow.notes[rdp])
+    assert len(fake_servicenow.notes[disk]) == 1
+
+
+def _failed(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status or 'Unserviced'} PATCH incident", response=response)
+
+
+def test_failed_batched_patches_keep_their_status(fake_servicenow, monkeypatch):
+    ids = [_waiting(text) for text in ALERTS]
+    _settled(ids)
+    statuses = dict(zip(ids, (503, 0, 404)))
+    monkeypatch.setattr(sn.ServiceNowClient, "update_incidents",
+                        staticmethod(lambda updates: {i: _failed(statuses[i]) for i in updates}))
+
+    results = client.post("/api/v1/plans:approve", json={"ids": ids}).json()["results"]
+    assert [i["status_code"] for i in results] == [502, 502, 404]
+    assert all(task_store[i].status == "waiting_approval" for i in ids)   # handed back
+
+
+def test_lookup_failure_is_reported_per_id(fake_servicenow, monkeypatch):
+    ids = [_waiting(text) for text in ALERTS[:2]]
+
+    def timeout(*args, **kwargs):
+        raise requests.Timeout("read timed out")
+
+    monkeypatch.setattr(sn.ServiceNowClient, "get_incidents", staticmethod(timeout))
+    for action in ("approve", "reject"):
+        r = client.post(f"/api/v1/plans:{action}", json={"ids": ids})
+        assert r.status_code == 200 and [i["status_code"] for i in r.json()["results"]] == [504, 504]
+    assert all(task_store[i].status == "waiting_approval" for i in ids)
+
+
+def test_bulk_reject(fake_servicenow):
+    ids = [_waiting(text) for text in ALERTS[:2]]
+    approved = _waiting(ALERTS[2])
+    client.post(f"/api/v1/plans/{approved}/approve")
+    batches = fake_servicenow.calls["batch"]
+
+    results = client.post("/api/v1/plans:reject", json={"ids": ids + [approved, "f" * 32]}).json()["results"]
+    assert [i["status_code"] for i in results] == [200, 200, 400, 404]
+    assert fake_servicenow.calls["batch"] == batches + 1
+    for sys_id in ids:
+        assert task_store[sys_id].status == "manual_intervention_required" and task_store[sys_id].reason == "rejected"
+        assert fake_servicenow.notes[sys_id] == ["Automation was rejected. Flagged for manual investigation."]
+    assert client.post("/api/v1/plans:reject", json={"ids": []}).status_code == 422
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    monkeypatch.setattr(registry, "_clients", dict(registry._clients))
+    monkeypatch.setattr(sn, "_schemas", {})
+    monkeypatch.setattr(sn, "_callers", {})
+    return install(registry)
+
+
+def test_updates_go_through_the_batch_api(standin):
+    ids = [sn.ServiceNowClient.create_incident(text, text)["sys_id"] for text in ALERTS]
+    before = dict(standin.calls)
+
+    out = sn.ServiceNowClient.update_incidents({**{i: {"work_notes": "bulk", "state": 6} for i in ids},
+                                                "missing": {"work_notes": "x"}})
+    assert sum(standin.calls.values()) - sum(before.values()) == 1
+    assert all(out[i]["result"]["state"] == "6" for i in ids)
+    assert out["missing"].response.status_code == 404
+    assert set(sn.ServiceNowClient.get_incidents(ids + ["missing"])) == set(ids)
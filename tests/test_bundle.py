@@ -0,0 +1,83 @@
+# tests/test_bundle.py
+
+import os
+
+import pytest
+
+from app.agents import bundle, script_templates
+from app.agents.bundle import Bundle, BundleError, BundleWatcher, build_bundle
+from app.agents.script_templates import ScriptTemplate, TemplateParam
+from app.agents.signatures import SIGNATURE_INDEX, SIGNATURES, Signature, TermGroup
+
+_TEXTS = [
+    "High CPU usage on VM-node1 win2019, wsappx at 95%",
+    "CPU 100% on ubuntu web01, load average 40",
+    "disk full on linux db-02: no space left on /var",
+    "ssl certificate expired on api-gw-3",
+    "user cannot log in",
+    "",
+]
+
+
+def test_bundle_scores_like_the_builtin_index(tmp_path):
+    path = str(tmp_path / "catalog.bundle")
+    meta = build_bundle(path)
+    assert meta["signatures"] == len(SIGNATURES)
+
+    index = Bundle(path).signature_index
+    assert index.diagnose_many(_TEXTS, vectorized=False) == SIGNATURE_INDEX.diagnose_many(_TEXTS, vectorized=False)
+    assert index.diagnose_many(_TEXTS * 20) == SIGNATURE_INDEX.diagnose_many(_TEXTS * 20)
+    assert list(index.signatures) == [
+        Signature(s.id, s.root_cause, s.evidence, s.solutions,
+                  tuple(TermGroup(tuple(t.lower() for t in g.terms), g.weight, g.required) for g in s.groups),
+                  s.exclude)
+        for s in SIGNATURES
+    ]
+
+
+def test_bundle_templates_render_without_relinting(tmp_path, monkeypatch):
+    path = str(tmp_path / "catalog.bundle")
+    tpl = ScriptTemplate("bundle-only", "linux_cpu_high", "bash", "echo {{msg}}",
+                         (TemplateParam("msg", "str", "hi"),), version="7")
+    build_bundle(path, templates=(tpl,))
+
+    script_templates._LINT_CACHE.pop(("bundle-only", "7"))
+    monkeypatch.setattr(script_templates.lint_batch, "lint_many",
+                        lambda *a, **k: pytest.fail("bundle templates must not be linted on load"))
+    out = Bundle(path).templates.render("linux_cpu_high", {"msg": "a b"})
+    assert out["code"] == "echo 'a b'" and out["lint_passed"] is True and out["template_version"] == "7"
+
+
+def test_rejects_non_bundles(tmp_path):
+    bad = tmp_path / "x.bundle"
+    bad.write_bytes(b"not a bundle at all")
+    with pytest.raises(BundleError):
+        Bundle(str(bad))
+
+
+def test_watcher_hot_reloads_changed_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "catalog.bundle")
+    build_bundle(path)
+    watcher = BundleWatcher(path, check_interval_s=0)
+    monkeypatch.setattr(bundle, "_watcher", watcher)
+    first = bundle.signature_index()
+    assert bundle.signature_index() is first and watcher.reloads == 1
+
+    extra = Signature("printer_jam", "Paper jam in tray", ("Tray sensor reports a jam",),
+                      (("Clear the paper path", "high"),), (TermGroup(("printer",)), TermGroup(("jam",))))
+    build_bundle(path, signatures=SIGNATURES + (extra,))
+    assert first.diagnose_many(["printer jam on floor 3"])[0]["signature"] == "unknown"  # old mapping still usable
+    assert bundle.signature_index().diagnose_many(["printer jam on floor 3"])[0]["signature"] == "printer_jam"
+    assert watcher.reloads == 2
+
+    # a broken replacement keeps serving the last good bundle
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"garbage")
+    os.replace(path + ".tmp", path)
+    assert bundle.signature_index().diagnose_many(["printer jam"])[0]["signature"] == "printer_jam"
+
+
+def test_without_bundle_path_uses_builtins(monkeypatch):
+    monkeypatch.setattr(bundle, "_watcher", None)
+    assert bundle.signature_index() is SIGNATURE_INDEX
+    assert bundle.template_library() is script_templates.TEMPLATES
@@ -0,0 +1,136 @@
+# tests/test_change_feed.py
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.api.routes import tasks
+from app.core.results import TaskEntry
+from app.core.task_store import InMemoryTaskStore
+from app.integrations import servicenow_client as sn
+from app.integrations.servicenow_instances import registry
+from app.integrations.servicenow_standin import install
+from app.workflows import change_feed as feed_module
+from app.workflows import reconciler
+from app.workflows.change_feed import JOURNAL, ChangeFeed
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    monkeypatch.setattr(registry, "_clients", dict(registry._clients))
+    monkeypatch.setattr(sn, "_schemas", {})
+    monkeypatch.setattr(sn, "_callers", {})
+    return install(registry)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryTaskStore()
+    for module in (feed_module, reconciler, tasks):
+        monkeypatch.setattr(module, "task_store", store)
+    return store
+
+
+def _incident(store, text="disk full on web01"):
+    sys_id = sn.ServiceNowClient.create_incident(text, text)["sys_id"]
+    store[sys_id] = TaskEntry("waiting_approval", instance="default")
+    return sys_id
+
+
+def test_feed_applies_changes_with_two_queries_per_poll(standin, store, tmp_path):
+    feed = ChangeFeed(str(tmp_path / "feed.json"))
+    feed.poll()
+    ids = [_incident(store, f"cpu high on web{i}") for i in range(5)]
+    sn.ServiceNowClient.update_incident(ids[0], state=6, close_code="Solved (Permanently)", close_notes="done")
+    sn.ServiceNowClient.update_incident(ids[1], state=8)
+    before = sum(standin.calls.values())
+
+    counts = feed.poll()
+    assert sum(standin.calls.values()) - before == 2      # one incident + one journal query, for 5 incidents
+    assert store[ids[0]].status == "completed"
+    assert store[ids[1]].status == "manual_intervention_required"
+    assert store[ids[2]].incident.number.startswith("INC")
+    assert counts["applied"] == 5
+
+    # nothing new: delivered rows at the watermark second are not delivered again
+    applied = feed.poll()["applied"]
+    assert applied == counts["applied"]
+
+    # a second update within the same second is still seen
+    sn.ServiceNowClient.update_incident(ids[2], state=6, close_code="Solved (Permanently)", close_notes="done")
+    feed.poll()
+    assert store[ids[2]].status == "completed"
+
+    # the watermark survives a restart
+    assert ChangeFeed(feed.state_path).watermarks() == feed.watermarks()
+
+
+def test_only_incidents_created_by_the_integration_user_are_read(standin, store):
+    feed = ChangeFeed(None)
+    feed.poll()
+    ours = _incident(store)
+    standin.handle("default", "POST", "/api/now/table/incident", {}, {"short_description": "x"}, user="someone")
+    seen = []
+    feed.subscribe(seen.append)
+    feed.poll()
+    assert {c.sys_id for c in seen if c.table == "incident"} == {ours}
+
+
+def test_first_watermark_comes_from_the_instance_clock(standin, store, monkeypatch):
+    monkeypatch.setattr(type(standin), "_now", staticmethod(lambda: "2020-01-01 00:00:00"))  # host runs ahead
+    before = _incident(store)
+    feed = ChangeFeed(None)
+    feed.poll()
+    assert feed.watermarks()["default"] == {"incident": "2020-01-01 00:00:00", JOURNAL: "2020-01-01 00:00:00"}
+
+    seen = []
+    feed.subscribe(seen.append)
+    sn.ServiceNowClient.update_incident(before, state=8, work_notes="escalated")
+    feed.poll()
+    assert store[before].status == "manual_intervention_required"
+    assert [(c.table, c.sys_id) for c in seen] == [("incident", before), (JOURNAL, before)]
+
+
+def test_journal_is_read_only_for_tracked_incidents(standin, store, monkeypatch):
+    queries = []
+    query_table = sn.ServiceNowClient.query_table
+
+    def recording(table, query, *args, **kwargs):
+        queries.append((table, query))
+        return query_table(table, query, *args, **kwargs)
+
+    monkeypatch.setattr(sn.ServiceNowClient, "query_table", staticmethod(recording))
+    feed = ChangeFeed(None)
+    feed.poll()
+    assert JOURNAL not in {table for table, _ in queries}      # nothing tracked, nothing to read
+
+    ids = [_incident(store, f"cpu high on web{i}") for i in range(3)]
+    del queries[:]
+    feed.poll()
+    [journal] = [query for table, query in queries if table == JOURNAL]
+    assert f"documentkeyIN{','.join(sorted(ids))}" in journal
+
+
+def test_task_journal_is_served_from_cache_while_the_feed_is_live(standin, store, monkeypatch):
+    feed = ChangeFeed(None)
+    monkeypatch.setattr(tasks, "change_feed", feed)
+    monkeypatch.setattr(tasks, "_updates", type(tasks._updates)())
+    feed.subscribe(tasks._journal_changed)
+    feed.poll()
+    sys_id = _incident(store)
+    sn.ServiceNowClient.update_incident(sys_id, work_notes="first")
+    feed.poll()
+
+    def journal_reads():
+        return sum(n for (_, method, table), n in standin.calls.items() if table == JOURNAL)
+
+    assert [u["text"] for u in client.get(f"/api/v1/tasks/{sys_id}").json()["updates"]] == ["first"]
+    reads = journal_reads()
+    client.get(f"/api/v1/tasks/{sys_id}")
+    assert journal_reads() == reads                       # cached: no journal query
+
+    sn.ServiceNowClient.update_incident(sys_id, work_notes="second")
+    feed.poll()                                           # delivers the note, dropping the cached journal
+    assert [u["text"] for u in client.get(f"/api/v1/tasks/{sys_id}").json()["updates"]] == ["first", "second"]
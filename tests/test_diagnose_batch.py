@@ -0,0 +1,84 @@
+# tests/test_diagnose_batch.py
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.agents import signatures
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.signatures import Signature, SignatureIndex, TermGroup
+from app.api.main import app
+
+client = TestClient(app)
+
+_TEXTS = [
+    "Diagnose high CPU usage on VM-node1 and generate a mitigation script.",
+    "CPU 100% on ubuntu web01",
+    "cpu at 100% on linux vm-node1 server",
+    "disk 95% full on linux db-02: no space left on /var",
+    "ssl certificate expired on api gateway",
+    "Limit inbound RDP on prod VMs to 10.0.0.0/24",
+]
+
+
+def test_run_many_matches_run():
+    batch = DiagnosticAgent.run_many(_TEXTS)
+    assert batch == [DiagnosticAgent.run(t) for t in _TEXTS]
+    assert [r["signature"] for r in batch] == [
+        "windows_cpu_wsappx", "linux_cpu_high", "linux_cpu_high",
+        "linux_disk_full", "certificate_expiry", "unknown",
+    ]
+
+
+def test_ranked_candidates_with_confidence():
+    result = DiagnosticAgent.run("disk 95% full on linux db-02: no space left on /var")
+    assert [r["signature"] for r in result["ranked"]] == ["linux_disk_full", "linux_cpu_high"]
+    assert result["confidence"] == 1.0
+    assert 0 < result["ranked"][1]["confidence"] < 1
+    unknown = DiagnosticAgent.run("hello")
+    assert unknown["ranked"] == [] and unknown["confidence"] == 0.0
+
+
+@pytest.mark.parametrize("text", [
+    "Diagnose high CPU usage on VM-node1 in the payroll program",
+    "High CPU on the zoom room server",
+])
+def test_short_memory_terms_do_not_match_inside_words(text):
+    assert DiagnosticAgent.run(text)["signature"] == "windows_cpu_wsappx"
+
+
+def test_memory_pressure_terms():
+    for text in ("oom-killer hit java on node4", "ram usage at 98% on db01", "out of memory on app02"):
+        assert DiagnosticAgent.run(text)["signature"] == "memory_pressure"
+
+
+def test_required_and_excluded_groups():
+    index = SignatureIndex([
+        Signature("a", "A", (), (), (TermGroup(("alpha",)), TermGroup(("beta",), required=False)), exclude=("nope",)),
+    ])
+    assert index.diagnose_many(["beta only"])[0]["signature"] == "unknown"
+    assert index.diagnose_many(["alpha nope"])[0]["signature"] == "unknown"
+    assert index.diagnose_many(["alpha"])[0]["confidence"] == 0.5
+    assert index.diagnose_many(["alpha beta"])[0]["confidence"] == 1.0
+
+
+@pytest.mark.skipif(signatures.sparse is None, reason="scipy not installed")
+def test_sparse_and_python_paths_agree():
+    texts = _TEXTS * 50
+    index = signatures.SIGNATURE_INDEX
+    assert index.diagnose_many(texts, vectorized=True) == index.diagnose_many(texts, vectorized=False)
+
+
+def test_diagnose_batch_endpoint():
+    r = client.post("/api/v1/diagnose:batch", json={"items": _TEXTS, "top_k": 1})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["count"] == len(_TEXTS)
+    assert data["results"][1]["signature"] == "linux_cpu_high"
+    assert all(len(item["ranked"]) <= 1 for item in data["results"])
+
+
+def test_diagnose_batch_limits(monkeypatch):
+    from app.api.routes import diagnose
+    monkeypatch.setattr(diagnose, "DIAGNOSE_BATCH_MAX", 2)
+    assert client.post("/api/v1/diagnose:batch", json={"items": _TEXTS}).status_code == 413
+    assert client.post("/api/v1/diagnose:batch", json={"items": ["x"], "top_k": 0}).status_code == 422
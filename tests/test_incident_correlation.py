@@ -0,0 +1,93 @@
+# tests/test_incident_correlation.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.api.routes import execute as execute_route
+from app.core.correlation import IncidentCorrelator, extract_entities, fingerprint
+
+client = TestClient(app)
+
+
+def _until(condition, timeout=10):
+    give_up = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < give_up
+        time.sleep(0.01)
+
+
+def test_fingerprint_keeps_hosts_and_masks_noise():
+    a = fingerprint("High CPU 95% on VM-node1 at 2024-05-01T10:00:00Z", False)
+    b = fingerprint("high cpu 97%  on vm-node1 at 2024-05-01T10:05:00Z", False)
+    assert a == b
+    assert a != fingerprint("High CPU 95% on VM-node2", False)
+    assert a != fingerprint("High CPU 95% on VM-node1 at 2024-05-01T10:00:00Z", True)
+    assert extract_entities("Limit RDP on web01.prod.local to 10.0.0.0/24") == ["10.0.0.0/24", "web01.prod.local"]
+
+
+def test_times_and_durations_are_not_hosts():
+    assert extract_entities("High CPU on web01 since 10am, fix script") == ["web01"]
+    assert extract_entities("CPU at 95% on vm-node1 for 2h, retry in 500ms or 10:30pm") == ["vm-node1"]
+    assert extract_entities("disk full on 10d-store1 and web2.") == ["10d-store1", "web2"]
+    assert fingerprint("High CPU on web01 since 10am", False) == fingerprint("High CPU on web01 since 11am", False)
+
+
+def test_window_expiry():
+    c = IncidentCorrelator(window_s=0)
+    first, is_new = c.claim("k")
+    assert is_new
+    _, is_new = c.claim("k")
+    assert is_new  # previous entry already outside the window
+
+
+def test_duplicate_execute_attaches_to_open_incident(fake_servicenow, monkeypatch):
+    runs, release = [], threading.Event()
+    real_flow = execute_route.run_agentic_flow
+
+    def held_flow(sys_id, text):
+        runs.append(sys_id)
+        release.wait(10)
+        return real_flow(sys_id, text)
+
+    monkeypatch.setattr(execute_route, "run_agentic_flow", held_flow)
+
+    payload = {"request": "Diagnose high CPU usage on VM-node1 and generate a mitigation script.",
+               "require_approval": False}
+    with ThreadPoolExecutor(2) as pool:
+        first_f = pool.submit(lambda: client.post("/api/v1/execute", json=payload).json())
+        _until(lambda: runs)
+        dup_f = pool.submit(lambda: client.post("/api/v1/execute", json=payload).json())
+        _until(lambda: any(n.startswith("Duplicate request correlated") for n in fake_servicenow.notes[runs[0]]))
+        release.set()
+        first, dup = first_f.result(), dup_f.result()
+
+    assert fake_servicenow.calls["create"] == 1
+    assert len(runs) == 1
+    assert dup["incident_sys_id"] == first["incident_sys_id"]
+    assert dup["correlated"] is True and dup["diagnosis"] == first["diagnosis"]
+
+    # another host is another incident
+    other = client.post("/api/v1/execute", json=dict(payload, request=payload["request"].replace("node1", "node2")))
+    assert other.json()["incident_sys_id"] != first["incident_sys_id"]
+
+
+def test_resolved_auto_run_is_no_longer_correlated(fake_servicenow):
+    payload = {"request": "ssl certificate expired on api-gw-7", "require_approval": False}
+    first = client.post("/api/v1/execute", json=payload).json()
+    assert first["status"] == "resolved"
+    again = client.post("/api/v1/execute", json=payload).json()
+    assert again["incident_sys_id"] != first["incident_sys_id"]
+    assert "correlated" not in again and fake_servicenow.calls["create"] == 2
+
+
+def test_rejected_incident_is_no_longer_correlated(fake_servicenow):
+    payload = {"request": "Block SSH access on all production servers.", "require_approval": True}
+    first = client.post("/api/v1/execute", json=payload).json()
+    client.post(f"/api/v1/plans/{first['incident_sys_id']}/reject")
+    again = client.post("/api/v1/execute", json=payload).json()
+    assert again["incident_sys_id"] != first["incident_sys_id"]
+    assert "correlated" not in again
@@ -0,0 +1,52 @@
+# tests/test_logger.py
+
+import json
+import logging
+import queue
+
+from app.utils.logger import (
+    DebugSamplingFilter,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    parse_levels,
+)
+
+
+def _record(level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    rec = logging.makeLogRecord({"name": "app.test", "levelno": level,
+                                 "levelname": logging.getLevelName(level),
+                                 "msg": msg, "args": args})
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(_record(sys_id="abc123"))
+    data = json.loads(line)
+    assert data["level"] == "INFO"
+    assert data["logger"] == "app.test"
+    assert data["msg"] == "hello world"
+    assert data["sys_id"] == "abc123"
+
+
+def test_sampling_filter_only_drops_debug():
+    f = DebugSamplingFilter(rate=0.0)
+    assert f.filter(_record(level=logging.DEBUG)) is False
+    assert f.filter(_record(level=logging.INFO)) is True
+    assert DebugSamplingFilter(rate=1.0).filter(_record(level=logging.DEBUG)) is True
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(_record())
+    handler.handle(_record())  # queue full -> dropped, no exception
+    assert handler.dropped == 1
+    # interpolation is left to the listener thread
+    assert handler.queue.get_nowait().args == ("world",)
+
+
+def test_parse_levels():
+    assert parse_levels("app.integrations=debug, uvicorn.access=WARNING,bad") == {
+        "app.integrations": "DEBUG",
+        "uvicorn.access": "WARNING",
+    }
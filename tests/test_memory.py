@@ -0,0 +1,91 @@
+# tests/test_memory.py
+
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.core import memory
+from app.core.memory import BoundedCache, SpillArea, sizeof
+from app.core.results import Diagnosis, PlanResult, Script, TaskEntry
+from app.core.task_store import InMemoryTaskStore
+
+client = TestClient(app)
+
+
+def _finished(code: str = "echo ok", email: str = "Done.", status: str = "completed") -> TaskEntry:
+    script = Script("bash", code, True)
+    return TaskEntry(status, instance="default", result=PlanResult("sys1", status, Diagnosis("disk full"), script, email))
+
+
+def test_sizeof_counts_what_a_value_references():
+    small, large = _finished(), _finished(code="x" * 10_000)
+    assert sizeof(large) - sizeof(small) > 9_900
+    shared = "y" * 1000
+    assert sizeof((shared, shared)) < sizeof(("y" * 1000, "z" * 1000))
+
+
+def test_cache_evicts_least_recently_used_past_its_byte_budget():
+    cache = BoundedCache(maxsize=100, max_bytes=3 * sizeof("a" * 1000))
+    for key in "abc":
+        cache.put(key, key * 1000)
+    assert cache.get("a")                       # now most recently used
+    cache.put("d", "d" * 1000)
+    assert "b" not in cache and {"a", "c", "d"} <= {k for k in "abcd" if k in cache}
+    assert cache.stats()["bytes"] <= cache.max_bytes and cache.stats()["evictions"] == 1
+
+    cache.put("huge", "h" * 10_000)             # larger than the whole budget: not kept
+    assert "huge" not in cache and len(cache) == 3
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = BoundedCache(ttl_s=0.05)
+    cache.put("k", "v")
+    assert cache.get("k") == "v"
+    time.sleep(0.06)
+    assert cache.get("k") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["bytes"] == 0
+
+
+def test_large_fields_are_spilled_and_read_back(tmp_path):
+    spill = SpillArea(str(tmp_path))
+    store, plain = InMemoryTaskStore(spill=spill), InMemoryTaskStore()
+    entry = _finished(code="echo step\n" * 500, email="Hello,\n" + "details " * 500)
+    store["a"] = plain["a"] = entry
+
+    assert store["a"] == entry
+    assert store.stats()["spilled"] == 1 and spill.stats()["files"] == 1
+    assert store.stats()["bytes"] < plain.stats()["bytes"] - 8000
+    assert [e for _, e in store.scan()] == [entry]
+
+    store["a"] = _finished()                    # small: kept in memory, old file removed
+    assert spill.stats()["files"] == 0 and not os.listdir(spill.directory)
+    store["b"] = entry
+    del store["b"]
+    assert not os.listdir(spill.directory)
+
+
+def test_spill_area_removes_files_of_dead_processes(tmp_path):
+    stale = tmp_path / "999999999"
+    stale.mkdir()
+    (stale / "x").write_text("{}")
+    SpillArea(str(tmp_path))
+    assert not stale.exists()
+
+
+def test_store_byte_budget_drops_oldest_terminal_entries_only():
+    one = sizeof(_finished())
+    store = InMemoryTaskStore(max_bytes=int(3.5 * one))
+    store["pending"] = _finished(status="waiting_approval")
+    for key in ("c1", "c2", "c3"):
+        store[key] = _finished()
+    assert "pending" in store and "c1" not in store
+    assert store.stats()["bytes"] <= store.max_bytes and store.stats()["evictions"] == 1
+
+
+def test_metrics_report_bytes_per_cache():
+    body = client.get("/api/v1/metrics").json()["memory"]
+    assert {"plan_cache", "task_updates", "task_store", "servicenow_metadata"} <= set(body)
+    assert body["total_bytes"] == sum(s["bytes"] for name, s in body.items() if name != "total_bytes")
+    assert memory.report().keys() == body.keys()
@@ -0,0 +1,40 @@
+# tests/test_plan_routing.py
+
+import random
+
+from app.agents.coordinator_agent import CAPABILITIES, PLAN_CACHE, plan_from_request
+from app.agents.routing import KeywordIndex
+
+
+def _naive_labels(text, table):
+    t = text.lower()
+    return {label for label, words in table.items() if any(w in t for w in words)}
+
+
+def test_keyword_index_matches_naive_substring_scan():
+    table = dict(CAPABILITIES, extra=["fi", "fix", "fixture", "prefix"])
+    index = KeywordIndex(table)
+    vocab = [w for words in table.values() for w in words] + ["cpu", "vm-node1", "the", "and", "x"]
+    rng = random.Random(7)
+    for _ in range(300):
+        text = "".join(rng.choice(vocab) + rng.choice(["", " "]) for _ in range(rng.randint(0, 8)))
+        assert index.labels(text) == _naive_labels(text, table), text
+
+
+def test_plan_cache_reuses_normalized_requests():
+    PLAN_CACHE.clear()
+    first = plan_from_request("Diagnose high CPU usage on VM-node1 and generate a mitigation script.")
+    again = plan_from_request("diagnose  high CPU usage on VM-node7 and generate a mitigation script.")
+    assert first == again == ["diagnose", "script", "email"]
+
+    stats = PLAN_CACHE.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+    # callers get their own list; the cached plan can't be mutated through it
+    first.append("bogus")
+    assert plan_from_request("Diagnose high CPU usage on VM-node2 and generate a mitigation script.")[-1] == "email"
+
+
+def test_default_plan_when_nothing_matches():
+    assert plan_from_request("Limit inbound RDP traffic on production VMs") == ["diagnose", "script", "email"]
+    assert plan_from_request("please write an email", always_add_email=False) == ["email"]
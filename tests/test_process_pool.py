@@ -0,0 +1,39 @@
+# tests/test_process_pool.py
+
+import pytest
+
+from app.agents import coordinator_agent, process_pool
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.core.results import Diagnosis, Script
+
+ALERT = "disk full on linux db-01: no space left on /var"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = process_pool.AgentProcessPool(1)
+    assert pool.warm() == 1
+    yield pool
+    pool.shutdown()
+
+
+def test_workers_return_what_the_agents_return_in_process(pool):
+    assert pool.diagnose(ALERT) == Diagnosis.from_dict(DiagnosticAgent.run(ALERT))
+    assert pool.script(ALERT) == Script.from_dict(AutomationAgent.generate_and_lint(ALERT))
+
+
+def test_in_process_by_default():
+    assert process_pool.AGENT_PROCESS_WORKERS == 0
+    assert process_pool.agent_pool() is None
+
+
+def test_plan_steps_run_on_the_pool_when_configured(pool, monkeypatch):
+    expected = Diagnosis.from_dict(DiagnosticAgent.run(ALERT)), Script.from_dict(AutomationAgent.run(ALERT))
+    monkeypatch.setattr(process_pool, "AGENT_PROCESS_WORKERS", 1)
+    monkeypatch.setattr(process_pool, "_pool", pool)
+    monkeypatch.setattr(DiagnosticAgent, "score", staticmethod(lambda text: pytest.fail("scored in-process")))
+    monkeypatch.setattr(coordinator_agent.IncidentReportAgent, "post_note", staticmethod(lambda *a, **k: None))
+
+    assert coordinator_agent._step_diagnose("sys1", ALERT, {}) == expected[0]
+    assert coordinator_agent._step_script("sys1", ALERT, {}) == expected[1]
@@ -0,0 +1,90 @@
+# tests/test_profiler.py
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.agents.coordinator_agent import STEP_REGISTRY
+from app.api.main import app
+from app.api.routes import admin
+from app.integrations.servicenow_client import ServiceNowClient
+from app.utils import profiler
+
+client = TestClient(app)
+
+
+def _busy_step(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def _in_background(target, *args):
+    thread = threading.Thread(target=target, args=args, name="plan-step_7", daemon=True)
+    thread.start()
+    return thread
+
+
+def test_samples_are_tagged_and_idle_threads_skipped():
+    stop = threading.Event()
+    busy = _in_background(_busy_step, stop)
+    idle = _in_background(threading.Event().wait, 5)
+    try:
+        result = profiler.SamplingProfiler(0.002, {_busy_step.__code__: ("step", "diagnose")}).run(0.2)
+    finally:
+        stop.set()
+        busy.join()
+
+    lines = result.collapsed().splitlines()
+    assert result.ticks > 10 and lines
+    busy_lines = [l for l in lines if "_busy_step" in l]
+    assert busy_lines and all(l.startswith("plan-step;step:diagnose;") for l in busy_lines)
+    assert not any("Event.wait" in l for l in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and " " not in stack
+    assert idle.is_alive()
+
+
+def test_labels_without_co_qualname():
+    class Code:  # a Python 3.10 code object has no co_qualname
+        co_filename, co_name = "/elsewhere/jobs.py", "poll"
+
+    assert profiler.SamplingProfiler()._label(Code()) == "jobs.py:poll"
+
+
+def test_default_tags_cover_steps_and_servicenow_methods():
+    tags = set(profiler.default_tags().values())
+    assert {("step", name) for name in STEP_REGISTRY.names()} <= tags
+    assert {("servicenow", "query_table"), ("servicenow", "update_incident")} <= tags
+
+
+def test_profile_endpoint_is_admin_only_and_returns_collapsed_stacks(monkeypatch):
+    assert client.post("/api/v1/admin/profile", params={"seconds": 0.1}).status_code == 404
+
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    assert client.post("/api/v1/admin/profile", headers={"X-Admin-Token": "nope"}).status_code == 403
+    assert client.post("/api/v1/admin/profile", headers={"X-Admin-Token": "sécret".encode()}).status_code == 403
+
+    def slow_request(method, path, **kwargs):
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            pass
+        raise RuntimeError("done")
+
+    monkeypatch.setattr(ServiceNowClient, "_request", staticmethod(slow_request))
+    call = _in_background(lambda: pytest.raises(RuntimeError, ServiceNowClient.query_table, "incident", "", "sys_id"))
+    r = client.post("/api/v1/admin/profile", params={"seconds": 0.2, "interval_ms": 2},
+                    headers={"X-Admin-Token": "secret"})
+    call.join()
+
+    assert r.status_code == 200 and int(r.headers["X-Profile-Samples"]) > 0
+    assert "profile.collapsed" in r.headers["Content-Disposition"]
+    assert any(l.startswith("plan-step;servicenow:query_table;") for l in r.text.splitlines())
+
+
+def test_one_profile_at_a_time(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "secret")
+    with profiler._running:
+        r = client.post("/api/v1/admin/profile", params={"seconds": 0.1}, headers={"X-Admin-Token": "secret"})
+    assert r.status_code == 409
@@ -0,0 +1,99 @@
+# tests/test_reconciler.py
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.api.routes import tasks
+from app.core.results import PlanResult, TaskEntry
+from app.core.task_store import InMemoryTaskStore
+from app.workflows import reconciler
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryTaskStore()
+    monkeypatch.setattr(reconciler, "task_store", store)
+    monkeypatch.setattr(tasks, "task_store", store)
+    return store
+
+
+def _waiting(fake, store, n):
+    ids = [fake.create_incident(f"disk full on web{i:02d}", "desc")["sys_id"] for i in range(n)]
+    for sys_id in ids:
+        store[sys_id] = TaskEntry("waiting_approval")
+    return ids
+
+
+def test_sweep_applies_servicenow_state_in_one_bulk_query(fake_servicenow, store):
+    resolved, canceled, open_ = _waiting(fake_servicenow, store, 3)
+    fake_servicenow.incidents[resolved]["state"] = "6"
+    fake_servicenow.incidents[canceled]["state"] = "8"
+    store["running"] = TaskEntry("executing")
+    store["old"] = TaskEntry("completed")
+    store._written["old"] = 0.0  # finished long before the retention window
+
+    counts = reconciler.sweep()
+
+    assert counts["checked"] == 3 and counts["queries"] == 1 and counts["updated"] == 3
+    assert counts["evicted"] == 1 and "old" not in store
+    assert fake_servicenow.calls["get"] == 0
+    assert store[resolved].status == "completed"
+    assert (store[canceled].status, store[canceled].reason) == ("manual_intervention_required", "canceled")
+    assert store[open_].status == "waiting_approval" and store[open_].incident.state == "1"
+    assert store["running"] == TaskEntry("executing")  # owned by the approval, never touched
+
+
+def test_sweep_pages_ids_and_reports_missing(fake_servicenow, store, monkeypatch):
+    monkeypatch.setattr(reconciler, "RECONCILE_BATCH_SIZE", 2)
+    _waiting(fake_servicenow, store, 5)
+    store["gone"] = TaskEntry("waiting_approval")
+
+    counts = reconciler.sweep()
+    assert counts["queries"] == 3 and counts["missing"] == 1 and counts["updated"] == 5
+    assert reconciler.stats()["last_sweep"]["queries"] == 3
+
+
+def test_sweep_does_not_overwrite_a_concurrent_approval(fake_servicenow, store, monkeypatch):
+    (sys_id,) = _waiting(fake_servicenow, store, 1)
+    query = fake_servicenow.query_table
+
+    def approved_meanwhile(*args, **kwargs):
+        store[sys_id] = TaskEntry("executing")
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(reconciler.ServiceNowClient, "query_table", staticmethod(approved_meanwhile))
+    assert reconciler.sweep()["updated"] == 0
+    assert store[sys_id] == TaskEntry("executing")
+
+
+def test_sweep_does_not_drop_a_plan_prepared_meanwhile(fake_servicenow, store, monkeypatch):
+    (sys_id,) = _waiting(fake_servicenow, store, 1)
+    prepared = TaskEntry("waiting_approval", prepared=PlanResult(sys_id, "completed"))
+    query = fake_servicenow.query_table
+
+    def prepared_meanwhile(*args, **kwargs):
+        store[sys_id] = prepared               # same status, new prepared result
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(reconciler.ServiceNowClient, "query_table", staticmethod(prepared_meanwhile))
+    assert reconciler.sweep()["updated"] == 0
+    assert store[sys_id] == prepared
+
+    assert reconciler.sweep()["updated"] == 1      # next sweep applies on top of it
+    assert store[sys_id].prepared == prepared.prepared and store[sys_id].incident.state == "1"
+
+
+def test_task_polls_are_served_from_a_fresh_snapshot(fake_servicenow, store, monkeypatch):
+    (sys_id,) = _waiting(fake_servicenow, store, 1)
+    reconciler.sweep()
+
+    view = client.get(f"/api/v1/tasks/{sys_id}").json()
+    assert view["status"] == "waiting_approval" and view["number"] == fake_servicenow.incidents[sys_id]["number"]
+    assert fake_servicenow.calls["get"] == 0
+
+    monkeypatch.setattr(reconciler, "RECONCILE_MAX_AGE_S", -1)  # snapshot too old: read the incident
+    client.get(f"/api/v1/tasks/{sys_id}")
+    assert fake_servicenow.calls["get"] == 1
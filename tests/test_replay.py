@@ -0,0 +1,90 @@
+# tests/test_replay.py
+
+import json
+
+import pytest
+
+from app.core.admission import admission
+from app.core.correlation import correlator
+from app.integrations import servicenow_client as sn
+from app.integrations.servicenow_instances import registry
+from app.integrations.servicenow_standin import StandInServiceNow, install
+from benchmarks import replay
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """The stand-in mounted on a private copy of the registry's clients."""
+    monkeypatch.setattr(registry, "_clients", dict(registry._clients))
+    monkeypatch.setattr(sn, "_schemas", {})
+    monkeypatch.setattr(sn, "_callers", {})
+    correlator.clear()
+    admission.reset()
+    standin = install(registry)
+    sn.ServiceNowClient.warm_metadata()
+    yield standin
+    correlator.clear()
+    admission.reset()
+
+
+def _log(tmp_path, entries):
+    path = tmp_path / "log.jsonl"
+    path.write_text("".join(json.dumps(e) + "\n" for e in entries))
+    return str(path)
+
+
+def test_log_is_ordered_and_timestamps_are_relative(tmp_path):
+    path = _log(tmp_path, [
+        {"ts": "2025-01-01T00:00:02Z", "request": "b", "headers": {"X-API-Key": "k"}},
+        {"ts": "2025-01-01T00:00:00Z", "body": {"request": "a", "require_approval": True}},
+    ])
+    entries = replay.load_log(path)
+    assert [e.body["request"] for e in entries] == ["a", "b"]
+    assert [e.offset_s for e in entries] == [0.0, 2.0]
+    assert entries[0].body["require_approval"] is True and entries[1].headers == {"X-API-Key": "k"}
+
+    assert replay.schedule(entries, speed=4) == [0.0, 0.5]
+    assert replay.schedule(entries, rps=10) == [0.0, 0.1]
+
+
+def test_entry_without_request_text_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="no request text"):
+        replay.load_log(_log(tmp_path, [{"ts": 0, "instance": "emea"}]))
+
+
+def test_replay_records_latency_errors_and_upstream_calls(standin, tmp_path):
+    entries = replay.load_log(_log(tmp_path, [
+        {"ts": 0.00, "request": "disk full on db01", "require_approval": True},
+        {"ts": 0.01, "request": "service down: payments-1 not responding"},
+        {"ts": 0.02, "request": "ssl certificate expired on gw1", "instance": "nowhere"},
+    ]))
+    records, elapsed = replay.replay(entries, rps=100, standin=standin)
+
+    assert [r["status"] for r in records] == [200, 200, 400]
+    assert [r["error"] for r in records] == ["", "", "http_400"]
+    assert records[0]["upstream"] == {"POST incident": 1}                 # approval: create only
+    assert records[1]["upstream"]["POST incident"] == 1 and records[1]["upstream"]["PATCH incident"] >= 2
+    assert records[2]["upstream"] == {}
+
+    summary = replay.summarize(records, elapsed)
+    assert summary["results"] == {"ok": 2, "http_400": 1}
+    assert summary["upstream_calls"]["total"] == sum(sum(r["upstream"].values()) for r in records)
+    assert len(standin.incidents) == 2
+
+
+def test_standin_serves_the_client_table_api(standin):
+    created = sn.ServiceNowClient.create_incident("cpu high", "cpu high on web01")
+    sn.ServiceNowClient.update_incident(created["sys_id"], work_notes="looking", state=6)
+
+    assert sn.ServiceNowClient.get_incident(created["sys_id"])["state"] == "6"
+    rows, total = sn.ServiceNowClient.query_table(
+        "sys_journal_field", f"name=incident^elementINcomments,work_notes^documentkey={created['sys_id']}",
+        "element,value")
+    assert rows == [{"element": "work_notes", "value": "looking"}] and total == 1
+    assert sn.ServiceNowClient.incident_schema().resolution_field == "close_code"
+
+
+def test_standin_injects_failures():
+    standin = StandInServiceNow(error_rate=1.0)
+    status, _, _ = standin.handle("default", "GET", "/api/now/table/incident", {}, None)
+    assert status == 503 and standin.calls[("default", "GET", "incident")] == 1
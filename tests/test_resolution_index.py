@@ -0,0 +1,147 @@
+# tests/test_resolution_index.py
+
+import pytest
+
+from app.agents import diagnostic_agent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.incident_report_agent import IncidentReportAgent
+from app.core import resolution_index as ri
+from app.core.resolution_index import ResolutionIndex
+
+_DISK = {
+    "signature": "linux_disk_full",
+    "root_cause": "Filesystem full: /var filled by rotated logs",
+    "evidence": ["df shows /var at 100%"],
+    "solutions": [{"title": "Compress and prune /var/log", "confidence": "high"}],
+}
+_CPU = {
+    "signature": "windows_cpu_wsappx",
+    "root_cause": "wsappx Store updates pinning the CPU",
+    "evidence": ["wsappx > 80% CPU"],
+    "solutions": [{"title": "Pause Store auto-updates", "confidence": "medium"}],
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    idx = ResolutionIndex()
+    monkeypatch.setattr(ri, "resolution_index", idx)
+    monkeypatch.setattr(diagnostic_agent, "resolution_index", idx)
+    monkeypatch.setattr("app.agents.incident_report_agent.resolution_index", idx)
+    return idx
+
+
+def test_query_ranks_similar_incidents_first():
+    idx = ResolutionIndex()
+    idx.add("a1", "disk full on linux db-01: no space left on /var", _DISK)
+    idx.add("b1", "High CPU on VM-node7 win2019, wsappx at 95%", _CPU)
+
+    hits = idx.query("no space left on /var, disk full on linux db-09", k=2)
+    assert hits[0]["sys_id"] == "a1"
+    assert hits[0]["root_cause"] == _DISK["root_cause"]
+    assert all(h["sys_id"] != "b1" for h in hits)
+    assert idx.query("completely unrelated words here") == []
+
+
+def test_persisted_index_reopens_memory_mapped(tmp_path):
+    idx = ResolutionIndex(str(tmp_path))
+    idx.add("a1", "disk full on linux db-01: no space left on /var", _DISK)
+    idx.add("b1", "High CPU on VM-node7 win2019, wsappx at 95%", _CPU)
+    idx.close()
+
+    reopened = ResolutionIndex(str(tmp_path))
+    assert len(reopened) == 2
+    hit = reopened.query("wsappx at 99% CPU on VM-node2 win2019", k=1)[0]
+    assert hit["sys_id"] == "b1" and hit["solutions"] == _CPU["solutions"]
+
+    # incremental add after reopen is visible immediately and on the next open
+    reopened.add("a2", "disk full on linux db-03: /var at 100%", _DISK)
+    assert {h["sys_id"] for h in reopened.query("disk full on linux db-05", k=5)} == {"a1", "a2"}
+    reopened.close()
+    assert len(ResolutionIndex(str(tmp_path))) == 3
+
+
+def test_torn_append_is_ignored_on_open(tmp_path):
+    idx = ResolutionIndex(str(tmp_path))
+    idx.add("a1", "disk full on linux db-01", _DISK)
+    idx.close()
+    with open(tmp_path / "records.idx", "ab") as f:
+        f.write(b"\0" * 8)  # crashed after the offset, before the signature
+
+    assert len(ResolutionIndex(str(tmp_path))) == 1
+
+
+def test_torn_append_is_cut_before_the_next_append(tmp_path):
+    idx = ResolutionIndex(str(tmp_path))
+    idx.add("a1", "disk full on linux db-01", _DISK)
+    with open(tmp_path / "records.idx", "ab") as f:
+        f.write(b"\0" * 8)  # another worker crashed after the offset, before the signature
+
+    idx.add("b1", "High CPU on VM-node7 win2019, wsappx at 95%", _CPU)
+    idx.close()
+    reopened = ResolutionIndex(str(tmp_path))
+    assert len(reopened) == 2
+    assert reopened.query("wsappx at 99% CPU on VM-node2 win2019", k=1)[0]["sys_id"] == "b1"
+
+
+def test_workers_sharing_a_directory_see_each_others_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(ri, "_REFRESH_S", 0)
+    one, two = ResolutionIndex(str(tmp_path)), ResolutionIndex(str(tmp_path))
+    one.add("a1", "disk full on linux db-01: no space left on /var", _DISK)
+    two.add("b1", "High CPU on VM-node7 win2019, wsappx at 95%", _CPU)   # appended after a1, not over it
+    one.add("a2", "disk full on linux db-03: /var at 100%", _DISK)
+
+    assert two.query("wsappx at 99% CPU on VM-node2 win2019", k=1)[0]["sys_id"] == "b1"
+    assert {h["sys_id"] for h in two.query("disk full on linux db-05", k=5)} == {"a1", "a2"}
+    assert len(one) == len(two) == 3
+    one.close()
+    two.close()
+    assert len(ResolutionIndex(str(tmp_path))) == 3
+
+
+def test_unknown_signature_is_not_indexed():
+    idx = ResolutionIndex()
+    assert not idx.add("u1", "something odd happened on web01",
+                       {"signature": "unknown", "root_cause": "Unknown — insufficient data"})
+    assert len(idx) == 0
+
+
+def test_lsh_buckets_find_matches_in_large_index(monkeypatch):
+    monkeypatch.setattr(ri, "_SCAN_MAX", 0)
+    idx = ResolutionIndex()
+    for i in range(200):
+        idx.add(f"n{i}", f"ticket {i} printer jam tray {i % 7} paper feed", {"root_cause": "Paper jam"})
+    idx.add("a1", "disk full on linux db-01: no space left on /var", _DISK)
+
+    assert idx.query("disk full on linux db-77: no space left on /var", k=1)[0]["sys_id"] == "a1"
+
+
+def test_resolve_indexes_and_diagnosis_uses_history(index, fake_servicenow):
+    sys_id = fake_servicenow.create_incident("s", "d")["sys_id"]
+    first = DiagnosticAgent.run("disk full on linux db-01: no space left on /var")
+    assert first["similar_incidents"] == []
+
+    IncidentReportAgent.resolve_incident(
+        sys_id, {"diagnosis": first, "script": {}}, request_text="disk full on linux db-01: no space left on /var"
+    )
+    assert len(index) == 1
+
+    later = DiagnosticAgent.run("disk full on linux db-02: no space left on /var")
+    assert later["similar_incidents"][0]["sys_id"] == sys_id
+    assert any(e.startswith(f"Similar past incident {sys_id}") for e in later["evidence"])
+    assert later == DiagnosticAgent.run_many(["disk full on linux db-02: no space left on /var"])[0]
+
+    # history-derived evidence is not fed back into the index
+    IncidentReportAgent.resolve_incident(
+        sys_id, {"diagnosis": later}, request_text="disk full on linux db-02: no space left on /var"
+    )
+    assert all(not e.startswith("Similar past incident") for h in index.query("disk full linux", k=5)
+               for e in h["evidence"])
+
+
+def test_failed_diagnosis_is_not_indexed(index, fake_servicenow):
+    sys_id = fake_servicenow.create_incident("s", "d")["sys_id"]
+    IncidentReportAgent.resolve_incident(
+        sys_id, {"diagnosis": {"root_cause": "Unknown — error", "error": "boom"}}, request_text="disk full"
+    )
+    assert len(index) == 0
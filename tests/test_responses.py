@@ -0,0 +1,52 @@
+# tests/test_responses.py
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api import responses
+from app.api.main import app
+from app.api.responses import Encoded, dumps
+from app.api.routes import tasks
+from app.core.models import ExecuteResponse
+from app.core.results import Diagnosis, Plan, Solution
+
+client = TestClient(app)
+
+
+def test_dumps_models_dataclasses_and_encoded_parts(monkeypatch):
+    model = ExecuteResponse(incident_sys_id="x", status="completed")
+    assert json.loads(dumps(model)) == {"incident_sys_id": "x", "status": "completed"}  # unset fields left out
+
+    content = {"plan": Plan(("a", "b"), "s"), "updates": Encoded(b'[{"text":"n"}]'), "n": 1}
+    expected = {"plan": {"steps": ["a", "b"], "summary": "s"}, "updates": [{"text": "n"}], "n": 1}
+    assert json.loads(dumps(content)) == expected
+
+    monkeypatch.setattr(responses, "orjson", None)  # stdlib fallback encodes the same values
+    assert json.loads(dumps(content)) == expected
+    diagnosis = Diagnosis("r", solutions=(Solution("fix", "high"),))
+    assert json.loads(dumps(diagnosis))["solutions"] == [{"title": "fix", "confidence": "high", "source": None}]
+
+
+def test_task_updates_are_encoded_once_per_journal_version(fake_servicenow, monkeypatch):
+    monkeypatch.setattr(tasks, "_updates", type(tasks._updates)())
+    sys_id = fake_servicenow.create_incident("disk full on web01", "desc")["sys_id"]
+    fake_servicenow.update_incident(sys_id, work_notes="first")
+
+    first = client.get(f"/api/v1/tasks/{sys_id}")
+    assert first.status_code == 200 and [u["text"] for u in first.json()["updates"]] == ["first"]
+    cached = tasks._updates[("default", sys_id)][1]
+    assert client.get(f"/api/v1/tasks/{sys_id}").json() == first.json()
+    assert tasks._updates[("default", sys_id)][1] is cached
+
+    fake_servicenow.update_incident(sys_id, work_notes="second")
+    assert [u["text"] for u in client.get(f"/api/v1/tasks/{sys_id}").json()["updates"]] == ["first", "second"]
+    assert tasks._updates[("default", sys_id)][1] is not cached
+
+
+def test_routes_document_their_response_models():
+    paths = client.get("/api/v1/openapi.json").json()["paths"]
+    for path, method in (("/api/v1/execute", "post"), ("/api/v1/tasks/{id}", "get"),
+                         ("/api/v1/plans/{id}/reject", "post")):
+        schema = paths[path][method]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert "$ref" in schema
@@ -0,0 +1,49 @@
+# tests/test_results.py
+
+import dataclasses
+
+import pytest
+
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.core.models import DiagnosisResult, ScriptResult
+from app.core.results import Diagnosis, Plan, PlanResult, Script, TaskEntry
+from app.core.task_store import InMemoryTaskStore, SqliteTaskStore
+
+
+def _result() -> PlanResult:
+    text = "disk full on linux db01: no space left on /var"
+    diagnosis = DiagnosticAgent.run(text)
+    script = AutomationAgent.generate_and_lint(text, diagnosis)
+    return PlanResult("abc123", "completed", Diagnosis.from_dict(diagnosis), Script.from_dict(script), "mail")
+
+
+def test_agent_dicts_convert_and_are_immutable():
+    result = _result()
+    assert result.diagnosis.root_cause and isinstance(result.diagnosis.solutions, tuple)
+    assert not hasattr(result, "__dict__") and not hasattr(result.diagnosis, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        result.diagnosis.root_cause = "other"
+    assert PlanResult.coerce(result) is result and PlanResult.coerce(None) is None
+    assert PlanResult.coerce(result.to_dict()) == result
+
+
+def test_response_models_read_result_objects():
+    result = _result()
+    diagnosis = DiagnosisResult.model_validate(result.diagnosis)
+    assert diagnosis.root_cause == result.diagnosis.root_cause
+    assert diagnosis.solutions[0].title == result.diagnosis.solutions[0].title
+    assert ScriptResult.model_validate(result.script).code == result.script.code
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_task_entries_round_trip_through_stores(backend, tmp_path):
+    store = InMemoryTaskStore() if backend == "memory" else SqliteTaskStore(str(tmp_path / "tasks.db"))
+    entry = TaskEntry("completed", plan=Plan(("diagnose",), "s"), instance="emea", result=_result())
+    store["abc123"] = entry
+    assert store["abc123"] == entry
+
+    # entries written as dicts (older rows, tests) come back typed, same flattened shape
+    store["legacy"] = {"status": "waiting_approval", "plan": {"steps": ["diagnose"], "summary": "s"}}
+    assert store["legacy"] == TaskEntry("waiting_approval", plan=Plan(("diagnose",), "s"))
+    assert entry.to_dict()["diagnosis"]["root_cause"] == entry.result.diagnosis.root_cause
@@ -0,0 +1,121 @@
+# tests/test_script_syntax.py
+
+import shutil
+
+import pytest
+
+from app.agents.automation_agent import AutomationAgent
+from app.agents.script_syntax import check_bash, check_powershell, errors_only
+
+
+@pytest.mark.parametrize("code", [
+    "mkdir -p /tmp/logs\nuptime > /tmp/logs/sys_status.log\n",
+    'if [ -f "$f" ]; then\n  echo "$(basename "$f")"\nelif true; then :; else echo no; fi\n',
+    'case "$1" in\n  start|run) echo go ;;\n  *) echo "usage: $0" ;;\nesac\n',
+    "for i in 1 2 3; do echo $((i * 2)); done\n",
+    "cat <<'EOF' > /tmp/x\nif ( unbalanced `quote\nEOF\necho done\n",
+    "f() { local x=${1:-default}; echo \"${x%/*}\"; }\n",
+    "while read -r line; do [[ $line == *x* ]] && echo hit; done < <(ls)\n",
+    "[[ $x =~ ^(a|b)$ ]] && echo match\n",
+    'if [[ "$v" =~ ^v([0-9]+)\\.(x|y)$ ]]; then echo "${BASH_REMATCH[1]}"; fi\n',
+])
+def test_bash_valid(code):
+    assert errors_only(check_bash(code)) == []
+
+
+@pytest.mark.parametrize("code, fragment", [
+    ("if true; then echo hi\n", "missing `fi'"),
+    ("case x in\n  a) echo a ;;\n", "missing `esac'"),
+    ("for i in 1 2; echo $i; done\n", "unexpected token `echo'"),
+    ('echo "unterminated\n', 'matching `"\''),
+    ("echo $(date\n", "matching `)'"),
+    ("then echo x\n", "unexpected token `then'"),
+])
+def test_bash_invalid(code, fragment):
+    diags = errors_only(check_bash(code))
+    assert diags and fragment in diags[0].message
+
+
+def test_bash_diagnostic_position():
+    diags = check_bash("echo ok\nfi\n")
+    assert (diags[0].line, diags[0].column) == (2, 1)
+    assert str(diags[0]).startswith("line 2, column 1:")
+
+
+def test_bash_unterminated_heredoc_is_warning():
+    diags = check_bash("cat <<EOF\nbody\n")
+    assert diags and errors_only(diags) == []
+
+
+@pytest.mark.parametrize("code", [
+    '$h = @"\nHello $($env:USERNAME) "quoted"\n"@\nWrite-Host $h',
+    "$h = @'\nliteral $(not parsed\n'@",
+    'Get-Process `\n  -Name x',
+    '$x = "a `"b`" c" + \'it\'\'s\'',
+    'try { 1 } catch [System.IO.IOException] { 2 } finally { 3 }',
+    'if ($x)\n{\n  1\n}\nelseif ($y) { 2 }\nelse\n{\n  3\n}',
+    'do { $i++ } until ($i -gt 3)',
+    'function Get-Thing($a, $b) { $a + $b }',
+    'Get-Process |\n  Where-Object { $_.CPU -gt 10 } |\n  Select-Object -First 5',
+    '$hash = @{ a = 1; b = @(1, 2, 3) }',
+    '<# block\ncomment #>\n$x = 1',
+])
+def test_powershell_valid(code):
+    assert check_powershell(code) == []
+
+
+@pytest.mark.parametrize("code, fragment", [
+    ("try { 1 }\n$x = 2", "Catch or Finally"),
+    ('$h = @"\nbody', 'terminator: "@'),
+    ('$h = @" trailing\nbody\n"@', "No characters are allowed"),
+    ("if ($x) { 1", "Missing closing '}'"),
+    ("if $x { 1 }", "Missing '('"),
+    ('$x = "abc', "terminator"),
+    ("Get-Process | | Out-Null", "empty pipe"),
+    ("do { 1 } 2", "while or until"),
+])
+def test_powershell_invalid(code, fragment):
+    diags = check_powershell(code)
+    assert diags and fragment in diags[0].message
+
+
+def test_powershell_collector_lints_without_interpreter():
+    out = AutomationAgent.generate_and_lint("collect perf")
+    assert out["lint_passed"] is True
+    assert out["lint_output"] == "OK"
+
+
+def test_lint_script_reports_line_and_column():
+    ok, err = AutomationAgent.lint_script("$x = 1\nif ($x) { 1", "powershell", strict=False)
+    assert ok is False
+    assert err.startswith("line 2, column 9:")
+
+
+_BATCH = [
+    "mkdir -p /tmp/logs\n",
+    "if true; then echo hi\n",
+    'New-Item -Path "C:\\Logs" -ItemType Directory -Force\nlogman start MyLog',
+    "try { 1 }\n$x = 2 # new-item",
+]
+
+
+def test_lint_many_results_in_input_order():
+    results = AutomationAgent.lint_many(_BATCH, strict=False)
+    assert [ok for ok, _ in results] == [True, False, True, False]
+    assert results[0][1] is None and "missing `fi'" in results[1][1]
+    assert results == [AutomationAgent.lint_script(s, strict=False) for s in _BATCH]
+
+
+def test_lint_many_process_pool(monkeypatch):
+    from app.agents import lint_batch
+    monkeypatch.setattr(lint_batch, "LINT_POOL_MIN", 1)
+    monkeypatch.setattr(lint_batch, "LINT_WORKERS", 2)
+    assert AutomationAgent.lint_many(_BATCH * 10, strict=False) == AutomationAgent.lint_many(_BATCH, strict=False) * 10
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash not installed")
+def test_lint_many_strict_uses_bash_messages():
+    # extglob syntax is accepted in-process but rejected by `bash -n`
+    results = AutomationAgent.lint_many(["echo ok\n", "echo ok\n\necho @(a|b)\n"], "bash", strict=True)
+    assert results[0] == (True, None)
+    assert results[1][0] is False and results[1][1].startswith("line 3: syntax error")
@@ -0,0 +1,93 @@
+# tests/test_script_templates.py
+
+import pytest
+
+from app.agents import lint_batch, script_templates
+from app.agents.automation_agent import AutomationAgent
+from app.agents.diagnostic_agent import DiagnosticAgent
+from app.agents.script_syntax import check_bash, check_powershell, errors_only
+from app.agents.script_templates import (
+    ScriptTemplate, TemplateLibrary, TemplateParam, TEMPLATES, compile_template,
+)
+
+
+def test_builtin_templates_are_prelinted():
+    for sig in TEMPLATES.signatures():
+        for lang in ("bash", "powershell"):
+            assert TEMPLATES.get(sig, lang).lint_passed is True
+
+
+def test_signature_selects_template_and_language():
+    linux = AutomationAgent.generate_and_lint("CPU at 100% on ubuntu host web01, every 2 minutes")
+    assert linux["template"] == "linux-cpu-collector"
+    assert linux["language"] == "bash"
+    assert linux["params"]["host"] == "web01" and linux["params"]["interval"] == 120
+    assert "host=web01" in linux["code"] and "interval=120" in linux["code"]
+
+    win = AutomationAgent.generate_and_lint("High CPU on vm-node1 win2019")
+    assert DiagnosticAgent.run("High CPU on vm-node1 win2019")["signature"] == "windows_cpu_wsappx"
+    assert win["template"] == "windows-wsappx-cpu-collector"
+    assert win["params"]["host"] == "vm-node1"
+    assert "-si '00:00:15'" in win["code"]
+
+
+@pytest.mark.parametrize("request_text, host", [
+    ("High CPU on web01 since 10am, fix script", "web01"),
+    ("CPU at 95% on vm-node1 for 2h generate bash script", "vm-node1"),
+    ("app01 reports disk full on db-02", "db-02"),
+    ("app01 and app00 report disk full", "app01"),
+])
+def test_host_is_the_named_machine(request_text, host):
+    params, _ = AutomationAgent._request_params(request_text)
+    assert params["host"] == host
+
+
+def test_script_step_scores_without_a_history_lookup(monkeypatch):
+    def no_history(*args, **kwargs):
+        raise AssertionError("script step ran a full diagnosis")
+
+    monkeypatch.setattr(DiagnosticAgent, "run", staticmethod(no_history))
+    assert AutomationAgent.run("CPU at 100% on ubuntu host web01")["template"] == "linux-cpu-collector"
+
+
+@pytest.mark.parametrize("language, check", [("bash", check_bash), ("powershell", check_powershell)])
+def test_hostile_values_render_as_literals(language, check):
+    compiled = TEMPLATES.get("unknown", language)
+    code, _ = compiled.render({"log_dir": "x'; rm -rf / #\"$(reboot)`", "top": 5})
+    assert errors_only(check(code)) == []
+    assert "rm -rf" in code and "$(reboot)" in code  # present only inside a quoted literal
+
+
+@pytest.mark.parametrize("values", [
+    {"host": "bad host;reboot"},
+    {"top": "5; reboot"},
+    {"top": 1000},
+    {"log_dir": "line\nbreak"},
+    {"nope": 1},
+])
+def test_invalid_parameters_rejected(values):
+    with pytest.raises(ValueError):
+        TEMPLATES.get("linux_cpu_high", "bash").render(values)
+
+
+def test_undeclared_placeholder_rejected():
+    with pytest.raises(ValueError):
+        compile_template(ScriptTemplate("t", "sig", "bash", "echo {{missing}}"))
+
+
+def test_lint_results_cached_by_version(monkeypatch):
+    calls = []
+    real = lint_batch.lint_many
+    monkeypatch.setattr(lint_batch, "lint_many", lambda s, l, strict: calls.append(len(s)) or real(s, l, strict))
+    monkeypatch.setattr(script_templates, "_LINT_CACHE", {})
+
+    v1 = ScriptTemplate("cache-test", "sig", "bash", "echo {{msg}}", (TemplateParam("msg", default="hi"),))
+    TemplateLibrary([v1])
+    TemplateLibrary([v1])
+    assert calls == [1]
+
+    v2 = ScriptTemplate("cache-test", "sig", "bash", "if true; then echo {{msg}}",
+                        (TemplateParam("msg", default="hi"),), version="2")
+    lib = TemplateLibrary([v2])
+    assert calls == [1, 1]
+    assert lib.render("sig")["lint_passed"] is False
@@ -0,0 +1,142 @@
+# tests/test_servicenow_instances.py
+
+import time
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.core.task_store import task_store
+from app.integrations.servicenow_client import ServiceNowClient
+from app.integrations.servicenow_instances import (
+    CircuitBreaker, CircuitOpen, InstanceClient, InstanceConfig, current_instance, instance_context, registry,
+)
+
+client = TestClient(app)
+
+
+class _Response:
+    ok = True
+
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {"result": {"sys_id": "abc"}}
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+    def json(self):
+        return self._payload
+
+
+def _instance(name, monkeypatch, rate=0.0, burst=10.0, statuses=None):
+    """An InstanceClient whose session records URLs instead of sending them."""
+    inst = InstanceClient(InstanceConfig(name, f"https://{name}.example.com", "u", "p", rate=rate, burst=burst),
+                          breaker=CircuitBreaker(failures=2, reset_s=0.05))
+    inst.sent = []
+    statuses = iter(statuses or [])
+
+    def send(method, url, **kw):
+        inst.sent.append((method, url))
+        status = next(statuses, 200)
+        if status is None:
+            raise requests.ConnectionError("unreachable")
+        return _Response(status)
+
+    monkeypatch.setattr(inst.session, "request", send)
+    return inst
+
+
+def test_calls_go_to_the_routed_instance(monkeypatch):
+    emea, apac = _instance("emea", monkeypatch), _instance("apac", monkeypatch)
+    monkeypatch.setitem(registry._clients, "emea", emea)
+    monkeypatch.setitem(registry._clients, "apac", apac)
+
+    with instance_context("EMEA"):
+        ServiceNowClient.get_incident("abc")
+    with instance_context("apac"):
+        ServiceNowClient.update_incident("abc", work_notes="hi")
+
+    assert emea.sent == [("GET", "https://emea.example.com/api/now/table/incident/abc")]
+    assert apac.sent == [("PATCH", "https://apac.example.com/api/now/table/incident/abc")]
+    assert current_instance.get() is None
+
+
+def test_breaker_opens_after_consecutive_failures_and_half_opens(monkeypatch):
+    inst = _instance("emea", monkeypatch, statuses=[503, None, 200])
+    assert inst.request("GET", "/x").status_code == 503
+    with pytest.raises(requests.ConnectionError):
+        inst.request("GET", "/x")
+    assert inst.breaker.state == "open"
+
+    with pytest.raises(CircuitOpen) as exc:
+        inst.request("GET", "/x")        # not sent
+    assert len(inst.sent) == 2 and exc.value.retry_after_s > 0
+
+    time.sleep(0.06)
+    assert inst.request("GET", "/x").status_code == 200   # the half-open trial succeeds
+    assert inst.breaker.state == "closed"
+    snap = inst.stats.snapshot()
+    assert snap["requests"] == 3 and snap["errors"] == 2 and snap["rejected_circuit_open"] == 1
+
+
+def test_client_errors_do_not_trip_the_breaker(monkeypatch):
+    inst = _instance("emea", monkeypatch, statuses=[404, 404, 404])
+    for _ in range(3):
+        inst.request("GET", "/x")
+    assert inst.breaker.state == "closed"
+
+
+def test_rate_limit_paces_requests(monkeypatch):
+    inst = _instance("emea", monkeypatch, rate=50.0, burst=1)
+    for _ in range(3):
+        inst.request("GET", "/x")
+    assert len(inst.sent) == 3 and inst.stats.throttled_s > 0.02
+
+
+def test_execute_routes_by_payload_then_header(fake_servicenow, monkeypatch):
+    monkeypatch.setitem(registry._clients, "emea", _instance("emea", monkeypatch))
+    seen = []
+    create = ServiceNowClient.create_incident
+    monkeypatch.setattr(ServiceNowClient, "create_incident",
+                        staticmethod(lambda *a, **kw: seen.append(current_instance.get()) or create(*a, **kw)))
+
+    r = client.post("/api/v1/execute", json={"request": "disk full on db01", "require_approval": True,
+                                             "instance": "emea"})
+    assert r.status_code == 200
+    assert task_store[r.json()["incident_sys_id"]].instance == "emea"
+
+    r = client.post("/api/v1/execute", json={"request": "disk full on db02", "require_approval": True},
+                    headers={"X-ServiceNow-Instance": "emea"})
+    assert r.status_code == 200
+    r = client.post("/api/v1/execute", json={"request": "disk full on db03", "require_approval": True})
+    assert r.status_code == 200
+    assert seen == ["emea", "emea", registry.default]
+
+
+def test_unknown_instance_is_rejected(fake_servicenow):
+    r = client.post("/api/v1/execute", json={"request": "disk full on db01", "instance": "nowhere"})
+    assert r.status_code == 400 and "nowhere" in r.json()["detail"]
+    assert fake_servicenow.calls["create"] == 0
+
+
+def test_execute_with_the_breaker_open_is_a_503(fake_servicenow, monkeypatch):
+    def breaker_open(*args, **kwargs):
+        raise CircuitOpen("ServiceNow instance 'default' is unavailable", 7.2)
+
+    monkeypatch.setattr(ServiceNowClient, "create_incident", staticmethod(breaker_open))
+    r = client.post("/api/v1/execute", json={"request": "disk full on db09", "require_approval": True})
+    assert r.status_code == 503 and r.headers["Retry-After"] == "7"
+
+
+def test_metrics_report_each_instance(monkeypatch):
+    inst = _instance("emea", monkeypatch)
+    monkeypatch.setitem(registry._clients, "emea", inst)
+    inst.request("GET", "/x")
+    body = client.get("/api/v1/metrics").json()["servicenow"]
+    emea = body["instances"]["emea"]
+    assert emea["requests"] == 1 and emea["status"] == {"2xx": 1} and emea["breaker"] == "closed"
+    assert set(emea["latency_s"]) == {"mean", "p50", "p95", "p99"}
@@ -0,0 +1,134 @@
+# tests/test_servicenow_metadata.py
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import main
+from app.integrations import servicenow_client as sn
+from app.integrations.servicenow_client import ServiceNowClient, _Refreshing
+
+_DICTIONARY = [
+    {"element": "u_resolution_code", "label": "Resolution code", "mandatory": "false"},
+    {"element": "caller_id", "label": "Caller", "mandatory": "true"},
+    {"element": "short_description", "label": "Short description", "mandatory": "true"},
+]
+_CHOICES = [
+    {"element": "u_resolution_code", "value": "solved_caller", "label": "Resolved by caller"},
+    {"element": "state", "value": "6", "label": "Resolved"},
+]
+
+
+class _Response:
+    ok = True
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def instance(monkeypatch):
+    """Metadata endpoints of a fake instance; counts discovery round trips."""
+    calls = {"sys_dictionary": 0, "sys_choice": 0, "sys_user": 0}
+
+    def query_table(table, query, fields, limit=100, offset=0, display_value=False):
+        calls[table] += 1
+        return {"sys_dictionary": _DICTIONARY, "sys_choice": _CHOICES}[table], None
+
+    def user_sys_id(username):
+        calls["sys_user"] += 1
+        return f"user-{username}"
+
+    patched = []
+    monkeypatch.setattr(ServiceNowClient, "query_table", staticmethod(query_table))
+    monkeypatch.setattr(ServiceNowClient, "_get_user_sys_id", staticmethod(user_sys_id))
+    monkeypatch.setattr(ServiceNowClient, "_request",
+                        staticmethod(lambda method, path, **kw: patched.append(kw["json"]) or _Response({"result": {}})))
+    sn._schemas.clear()
+    sn._callers.clear()
+    yield calls, patched
+    sn._schemas.clear()
+    sn._callers.clear()
+
+
+def test_warm_up_discovers_schema_and_caller_once(instance):
+    calls, _ = instance
+    found = ServiceNowClient.warm_metadata(["integration.incidentuser"])
+    assert found == {"default": {"resolution_field": "u_resolution_code",
+                                 "callers": {"integration.incidentuser": "user-integration.incidentuser"}}}
+
+    schema = ServiceNowClient.incident_schema()
+    assert schema.mandatory_fields == ("caller_id", "short_description")
+    assert schema.choices["u_resolution_code"] == {"solved_caller": "Resolved by caller"}
+
+    for _ in range(3):
+        ServiceNowClient.incident_schema()
+        ServiceNowClient.caller_sys_id("integration.incidentuser")
+    assert calls == {"sys_dictionary": 1, "sys_choice": 1, "sys_user": 1}
+
+
+def test_resolve_sends_close_code_and_the_discovered_resolution_field(instance):
+    _, patched = instance
+    ServiceNowClient.update_incident("abc", state=6)          # not warmed: every candidate
+    assert {"close_code", "u_resolution_code", "resolution_code"} <= set(patched[-1])
+
+    ServiceNowClient.warm_metadata([])
+    ServiceNowClient.update_incident("abc", state=6, close_code="Resolved by caller")
+    body = patched[-1]
+    assert body["u_resolution_code"] == body["close_code"] == "Resolved by caller"
+    assert "resolution_code" not in body
+
+
+def test_resolve_sends_every_candidate_when_no_resolution_column_is_found(instance, monkeypatch):
+    _, patched = instance
+    monkeypatch.setattr(f"{__name__}._DICTIONARY", _DICTIONARY[1:])   # no column labeled "Resolution code"
+    assert ServiceNowClient.warm_metadata([])["default"]["resolution_field"] is None
+
+    ServiceNowClient.update_incident("abc", state=6)
+    assert {"close_code", "u_resolution_code", "resolution_code"} <= set(patched[-1])
+
+
+def test_stale_value_is_served_while_refreshing():
+    release, loads = threading.Event(), []
+
+    def loader():
+        loads.append(1)
+        if len(loads) > 1:
+            release.wait(5)
+        return len(loads)
+
+    value = _Refreshing(loader, ttl_s=0)
+    assert value.get() == 1
+    assert value.get() == 1              # stale: returned at once, refresh started
+    release.set()
+    deadline = time.monotonic() + 5
+    while value.get(load=False) != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert value.get(load=False) == 2
+
+
+def test_failed_refresh_keeps_last_value():
+    results = iter([{"ok": 1}])
+
+    def loader():
+        return next(results)             # StopIteration on the second load
+
+    value = _Refreshing(loader, ttl_s=3600)
+    assert value.get() == {"ok": 1}
+    value._loaded_at -= 7200
+    value.get()
+    time.sleep(0.05)
+    assert value.get(load=False) == {"ok": 1}
+
+
+def test_lifespan_runs_the_warm_up(monkeypatch):
+    warmed = threading.Event()
+    monkeypatch.setattr(ServiceNowClient, "warm_metadata", staticmethod(lambda: warmed.set() or {}))
+    monkeypatch.setattr(main, "SN_WARMUP", True)
+    with TestClient(main.app):
+        assert warmed.wait(5)
@@ -0,0 +1,82 @@
+# tests/test_speculation.py
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app.agents.coordinator_agent import CoordinatorAgent
+from app.api.main import app
+from app.core.task_store import task_store
+from app.workflows import speculation
+
+client = TestClient(app)
+
+REQUEST = "disk full on linux db-01: no space left on /var"
+
+
+def _execute(text=REQUEST):
+    return client.post("/api/v1/execute", json={"request": text, "require_approval": True}).json()["incident_sys_id"]
+
+
+def _prepared(sys_id):
+    fut = speculation.running(sys_id)
+    if fut is not None:
+        fut.result(timeout=10)
+    return task_store[sys_id].prepared
+
+
+def test_approval_applies_the_prepared_plan_in_one_patch(fake_servicenow):
+    sys_id = _execute()
+    prepared = _prepared(sys_id)
+    assert prepared is not None and prepared.diagnosis.root_cause.startswith("Filesystem out of space")
+    assert fake_servicenow.notes[sys_id] == []           # nothing written while it waits
+
+    reads, updates = fake_servicenow.calls["get"], fake_servicenow.calls["update"]
+    r = client.post(f"/api/v1/plans/{sys_id}/approve")
+    assert r.status_code == 200 and r.json()["status"] == "resolved"
+    assert r.json()["diagnosis"]["root_cause"] == prepared.diagnosis.root_cause
+    assert fake_servicenow.calls["get"] == reads          # no incident read to rebuild the request
+    assert fake_servicenow.calls["update"] == updates + 1
+    [note] = fake_servicenow.notes[sys_id]
+    assert note.startswith("Approval received") and "Root Cause:" in note
+    assert fake_servicenow.incidents[sys_id]["state"] == "6"
+    assert task_store[sys_id].prepared is None
+
+
+def test_approval_waits_for_a_preparation_still_running(fake_servicenow, monkeypatch):
+    real = CoordinatorAgent.prepare
+
+    def slow(*args):
+        time.sleep(0.3)
+        return real(*args)
+
+    monkeypatch.setattr(CoordinatorAgent, "prepare", staticmethod(slow))
+    used = speculation.counts["used"]
+    sys_id = _execute("CPU 100% on ubuntu web01")
+    assert speculation.running(sys_id) is not None
+
+    r = client.post(f"/api/v1/plans/{sys_id}/approve")
+    assert r.status_code == 200 and speculation.counts["used"] == used + 1
+    assert len(fake_servicenow.notes[sys_id]) == 1
+
+
+def test_failed_step_leaves_the_plan_to_a_full_run(fake_servicenow):
+    sys_id = _execute("Limit inbound RDP traffic on production VMs to 10.0.0.0/24")  # the script step fails
+    assert _prepared(sys_id) is None
+
+    assert client.post(f"/api/v1/plans/{sys_id}/approve").status_code == 200
+    notes = fake_servicenow.notes[sys_id]
+    assert notes[0].startswith("Approval received") and any(n.startswith("Step 'script' failed") for n in notes)
+
+
+def test_rejection_drops_the_prepared_plan(fake_servicenow):
+    sys_id = _execute("ssl certificate expired on api-gw-3")
+    assert _prepared(sys_id) is not None
+    assert client.post(f"/api/v1/plans/{sys_id}/reject").status_code == 200
+    assert task_store[sys_id].prepared is None
+
+
+def test_switched_off(fake_servicenow, monkeypatch):
+    monkeypatch.setattr(speculation, "SPECULATIVE_PREPARE", False)
+    sys_id = _execute("out of memory: oom killer hit java on node4")
+    assert speculation.running(sys_id) is None and task_store[sys_id].prepared is None
@@ -0,0 +1,119 @@
+# tests/test_step_registry.py
+
+import threading
+import time
+
+import pytest
+
+from app.agents.coordinator_agent import STEP_REGISTRY, execute_plan
+from app.agents.incident_report_agent import IncidentReportAgent
+from app.agents.step_registry import StepRegistry, StepSpec
+from app.core import deadline
+
+
+@pytest.fixture
+def notes(monkeypatch):
+    posted = []
+    monkeypatch.setattr(IncidentReportAgent, "post_note", staticmethod(lambda sys_id, text: posted.append(text)))
+    return posted
+
+
+def _registry(**funcs):
+    return STEP_REGISTRY.with_funcs(funcs)
+
+
+def test_order_puts_dependencies_first():
+    reg = StepRegistry([
+        StepSpec("email", lambda *a: "", depends_on=("diagnose",)),
+        StepSpec("diagnose", lambda *a: {}),
+    ])
+    assert reg.order(["email", "diagnose"]) == ["diagnose", "email"]
+    assert reg.order(["email"]) == ["email"]  # unplanned dependency is ignored
+
+
+def test_hung_step_times_out_with_fallback(notes):
+    release = threading.Event()
+    saw_cancel = []
+
+    def hung_script(sys_id, text, results):
+        release.wait(5)
+        saw_cancel.append(deadline.cancelled())
+        return {"language": "bash", "lint_passed": True}
+
+    reg = STEP_REGISTRY.with_funcs({"script": hung_script})
+    reg.add(StepSpec("script", hung_script, timeout_s=0.2,
+                     fallback=STEP_REGISTRY.get("script").fallback))
+
+    start = time.monotonic()
+    results = execute_plan("sys1", "Diagnose CPU and generate a fix script.", reg)
+    elapsed = time.monotonic() - start
+    release.set()
+    for _ in range(100):
+        if saw_cancel:
+            break
+        time.sleep(0.01)
+
+    assert elapsed < 2
+    assert saw_cancel == [True]  # the abandoned thread was told to stand down
+    assert results["script"].lint_passed is False
+    assert "timed out" in results["script"].error
+    assert results["diagnose"].root_cause  # other steps still complete
+    assert isinstance(results["email"], str) and results["email"]
+    assert any("Step 'script' failed: timed out" in n for n in notes)
+
+
+def test_budget_exhaustion_returns_partial_result(notes):
+    def slow(sys_id, text, results):
+        time.sleep(0.5)
+        return {"root_cause": "late"}
+
+    results = execute_plan("sys1", "Diagnose CPU", _registry(diagnose=slow), budget_s=0.1)
+    assert results["diagnose"].root_cause == "Unknown — error"
+    assert results["email"] == ""
+
+
+def test_retry_budget_and_critical_step(notes):
+    calls = []
+
+    def flaky(sys_id, text, results):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return {"root_cause": "ok"}
+
+    results = execute_plan("sys1", "Diagnose CPU", _registry(diagnose=flaky))
+    assert len(calls) == 2 and results["diagnose"]["root_cause"] == "ok"
+
+    def boom(sys_id, text, results):
+        raise RuntimeError("boom")
+
+    reg = StepRegistry([
+        StepSpec("diagnose", boom, critical=True),
+        StepSpec("email", lambda *a: "never", depends_on=("diagnose",)),
+    ])
+    results = execute_plan("sys1", "Diagnose CPU", reg)
+    assert results["diagnose"] == {"error": "boom"}
+    assert results["email"] == {"error": "cancelled: critical step 'diagnose' failed"}
+
+
+def test_failure_notes_are_bounded_by_the_budget(monkeypatch):
+    posted = []
+
+    def hung_note(sys_id, text):
+        timeout = deadline.remaining(30)    # what the ServiceNow call would wait for
+        time.sleep(timeout)
+        posted.append((text, timeout))
+
+    monkeypatch.setattr(IncidentReportAgent, "post_note", staticmethod(hung_note))
+    monkeypatch.setattr("app.agents.coordinator_agent.FAILURE_NOTE_GRACE_S", 0.3)
+
+    def slow(sys_id, text, results):
+        time.sleep(0.5)
+        return {"root_cause": "late"}
+
+    start = time.monotonic()
+    results = execute_plan("sys1", "Diagnose CPU and generate a fix script.",
+                           _registry(diagnose=slow), budget_s=0.1)
+    assert time.monotonic() - start < 1
+    assert results["diagnose"].root_cause == "Unknown — error"
+    assert posted and all(timeout <= 0.4 for _, timeout in posted)
@@ -0,0 +1,62 @@
+# tests/test_tasks_export.py
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.main import app
+from app.api.routes import tasks
+
+client = TestClient(app)
+
+
+def _seed(fake, n, notes=3):
+    ids = []
+    for i in range(n):
+        sys_id = fake.create_incident(f"disk full on web{i:02d}", "desc")["sys_id"]
+        for k in range(notes):
+            fake.update_incident(sys_id, work_notes=f"note {k} for {i}")
+        ids.append(sys_id)
+    return ids
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_export_by_ids_streams_ndjson_in_order(fake_servicenow, monkeypatch):
+    monkeypatch.setattr(tasks, "EXPORT_BATCH_SIZE", 4)
+    monkeypatch.setattr(tasks, "EXPORT_JOURNAL_PAGE", 5)
+    ids = _seed(fake_servicenow, 10)
+    wanted = list(reversed(ids)) + ["0" * 32]
+
+    r = client.get("/api/v1/tasks/export", params={"ids": ",".join(wanted)})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = _lines(r)
+    assert [l["incident_sys_id"] for l in lines] == wanted
+    assert "error" in lines[-1]
+    first = lines[0]
+    assert first["number"] == fake_servicenow.incidents[wanted[0]]["number"]
+    assert [u["text"] for u in first["updates"]] == ["note 0 for 9", "note 1 for 9", "note 2 for 9"]
+
+    # bulk: 3 incident batches, each with journal pages of 5 rows (12 rows per full batch)
+    assert fake_servicenow.calls["get"] == 0
+    assert fake_servicenow.calls["query"] == 3 + (3 + 3 + 2)
+
+    # same view as the single-task endpoint
+    assert first == client.get(f"/api/v1/tasks/{wanted[0]}").json()
+
+
+def test_export_by_query_pages_until_short_page(fake_servicenow, monkeypatch):
+    monkeypatch.setattr(tasks, "EXPORT_BATCH_SIZE", 3)
+    ids = _seed(fake_servicenow, 7, notes=1)
+    lines = _lines(client.get("/api/v1/tasks/export", params={"query": "active=true"}))
+    assert sorted(l["incident_sys_id"] for l in lines) == sorted(ids)
+    assert all(len(l["updates"]) == 1 for l in lines)
+
+
+def test_export_requires_ids_or_query():
+    assert client.get("/api/v1/tasks/export").status_code == 400
+    assert client.get("/api/v1/tasks/export", params={"ids": "abc^ORactive=true"}).status_code == 400